@@ -14,7 +14,16 @@ project_root = os.path.join(script_dir, '..')
 sys.path.insert(0, project_root) # Use insert(0, ...) to prioritize project modules
 
 # Now import the modules
-from utils.blockchain import blockchain_call
+from utils.resilience import resilient_blockchain_call as blockchain_call
+from utils.costs import get_cost_model, plan_batches
+from utils.mapping_reader import get_mapping_reader
+from app.blockchain.encrypt import commit_hash
+
+# Padding slot for mint_agents; rep_id 0field mints an inactive (status 0u8) agent
+# and leaves the status mapping untouched
+EMPTY_SLOT = "0field"
+
+PROGRAM_ID = "agent_manager.aleo"
 
 def extract_record_from_output(output):
     """
@@ -25,6 +34,86 @@ def extract_record_from_output(output):
         return match.group(0)
     raise ValueError("No record found in Leo output")
 
+def apply_acl_batch(operations, project_path="agent_manager"):
+    """
+    Applies queued ACL changes with as few transitions as possible.
+
+    Each operation is a dict with a "type" of "mint", "reactivate" or "revoke".
+    Mints and reactivations carry "rep_id" and "bank_name" field literals and
+    are minted through mint_agents, padded with inactive slots; revocations
+    carry the agent "record" and go through revoke_agents when four are
+    queued, revoke_agent otherwise. Transitions are broadcast so their
+    finalize blocks publish each agent's status under the commitment the
+    program derives from the record fields (see agent_commitment). Returns
+    one result dict per operation.
+    """
+    chain_ops = [dict(op, type="mint" if op["type"] == "reactivate" else op["type"])
+                 for op in operations]
+    results = {}
+    estimates = get_cost_model().estimates(project_path)
+    for batch in plan_batches(chain_ops, estimates):
+        program_name, function_name = batch.transition.split("/")
+        if function_name == "mint_agents":
+            slots = batch.operations + [None] * (4 - len(batch.operations))
+            rep_ids = [op["rep_id"] if op else EMPTY_SLOT for op in slots]
+            bank_names = [op["bank_name"] if op else EMPTY_SLOT for op in slots]
+            inputs = [f"[{', '.join(rep_ids)}]", f"[{', '.join(bank_names)}]"]
+        elif function_name == "mint_agent":
+            op = batch.operations[0]
+            inputs = [op["rep_id"], op["bank_name"]]
+        else:
+            inputs = [op.get("record", op.get("badge_ciphertext")) for op in batch.operations]
+
+        result = blockchain_call(
+            program_name=program_name,
+            function_name=function_name,
+            inputs=inputs,
+            project_path=project_path,
+            is_deployed=True
+        )
+        for op in batch.operations:
+            results[id(op)] = {
+                "success": result["success"],
+                "error": result.get("error"),
+                "transition": batch.transition
+            }
+    return [results[id(op)] for op in chain_ops]
+
+def agent_commitment(bank_name, rep_id):
+    """
+    Returns the field literal keying an agent in the public status mapping.
+
+    agent_manager.aleo derives the same key in-circuit from the record's
+    rep_id and bank_name field literals, so a status can only be published
+    for an agent the caller actually mints or holds.
+    """
+    return f"{commit_hash(bank_name, rep_id)}field"
+
+def get_agent_status(commitment, issuer, reader=None):
+    """
+    Reads an agent's public status from the agent_status mapping.
+
+    This is a key lookup against the chain state; no record or proof is
+    needed. Returns 1 for an active agent, 0 for a revoked one and None
+    for an unknown commitment. Anyone can mint a commitment first, so the
+    status only counts when issuer (the HR admin address expected to have
+    minted the agent) matches the agent_issuer mapping; an agent minted by
+    another address is reported as unknown.
+    """
+    reader = reader or get_mapping_reader()
+    if reader.get(PROGRAM_ID, "agent_issuer", commitment) != issuer:
+        return None
+    status = reader.get(PROGRAM_ID, "agent_status", commitment)
+    if status is None:
+        return None
+    return int(status.removesuffix("u8"))
+
+def is_agent_active(bank_name, rep_id, issuer, reader=None):
+    """
+    Checks whether an agent is active from the public status mapping.
+    """
+    return get_agent_status(agent_commitment(bank_name, rep_id), issuer, reader) == 1
+
 def test_create_two_agents_with_blockchain_call():
     print("\n--- Test Case: Creating Two Agents Using blockchain_call ---")
     
@@ -1,4 +1,5 @@
 from utils.blockchain import blockchain_call
+from agent_manager.agent_manager_logic import agent_commitment, get_agent_status
 import time
 
 def mint_new_agent(rep_id, bank_name):
@@ -6,7 +7,8 @@ def mint_new_agent(rep_id, bank_name):
     result = blockchain_call(
         "agent_manager.aleo",
         "mint_agent",
-        [rep_id, bank_name]
+        [rep_id, bank_name],
+        is_deployed=True
     )
     
     # Generate a secure seed for OTP generation
@@ -27,7 +29,8 @@ def revoke_agent(agent_id, rep_id, bank_name):
     result = blockchain_call(
         "agent_manager.aleo",
         "revoke_agent",
-        [agent_id]
+        [agent_id],
+        is_deployed=True
     )
     
     # Update database to mark agent as revoked
@@ -39,17 +42,14 @@ def revoke_agent(agent_id, rep_id, bank_name):
         "status": "revoked"
     }
 
-def check_agent_status(agent_id):
-    """Check if an agent is active"""
-    result = blockchain_call(
-        "agent_manager.aleo",
-        "is_agent_active",
-        [agent_id]
-    )
+def check_agent_status(rep_id, bank_name, issuer):
+    """Check if an agent minted by issuer is active (public mapping lookup, no proof)"""
+    commitment = agent_commitment(bank_name, rep_id)
+    status = get_agent_status(commitment, issuer)
     
     return {
-        "agent_id": agent_id,
-        "is_active": result["outputs"][0] if "outputs" in result else False
+        "commitment": commitment,
+        "is_active": status == 1
     }
 
 # Helper functions (would need implementation)
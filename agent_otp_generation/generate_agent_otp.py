@@ -115,6 +115,6 @@ if __name__ == "__main__":
     bank_name = "5678field"
     seed = "123field"
     timestamp = "1747100401"
-    otp = "100401"
+    otp = "992478"
     proof = generate_zk_proof(rep_id, bank_name, seed, timestamp, otp)
     print(json.dumps(proof, indent=2))
\ No newline at end of file
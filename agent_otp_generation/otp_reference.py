@@ -0,0 +1,61 @@
+"""
+Python reference implementation of the OTP circuit in agent_otp_generate.aleo.
+
+The circuit derives an OTP from the agent's seed, rep_id and bank_name and
+the time window of the timestamp. It uses only wrapping u64 additions and
+multiplications by constants, XORs and constant shifts (the splitmix64
+finalizer), which cost a few hundred constraints each. The old version used
+a variable `pow` and chains of divisions and modulos instead, ignored the
+seed, and was about five times as large.
+
+splitmix64 is a mixing function, not a keyed hash: every step is
+invertible and the seed is at most 64 bits, so a seed can be searched for
+from a few observed codes. The circuit is for demos only; app/core/otp.py
+only accepts it in DEMO_MODE and production codes use HMAC.
+
+Every function here mirrors the Leo code operation for operation, so
+`generate_otp` must return exactly what the `generate_otp` transition
+outputs. scripts/circuit_costs.py --check-parity compares the two.
+"""
+
+MASK64 = (1 << 64) - 1
+
+# splitmix64 constants
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+MIX_MULTIPLIER_1 = 0xBF58476D1CE4E5B9
+MIX_MULTIPLIER_2 = 0x94D049BB133111EB
+
+# Seconds per OTP window and digits of an OTP
+WINDOW_SECONDS = 60
+OTP_MODULUS = 1000000
+
+def mix64(x):
+    """
+    Mirror of `mix64`: splitmix64 step on a u64 with wrapping arithmetic.
+    """
+    z = (x + GOLDEN_GAMMA) & MASK64
+    z = ((z ^ (z >> 30)) * MIX_MULTIPLIER_1) & MASK64
+    z = ((z ^ (z >> 27)) * MIX_MULTIPLIER_2) & MASK64
+    return z ^ (z >> 31)
+
+def to_u64(value):
+    """
+    Mirror of a checked `field as u64` cast: the circuit rejects larger values.
+    """
+    value = int(str(value).removesuffix("field"))
+    if not 0 <= value <= MASK64:
+        raise ValueError(f"{value} does not fit in a u64")
+    return value
+
+def generate_otp(seed, rep_id, bank_name, timestamp):
+    """
+    Mirror of `internal_generate_otp`. Returns the OTP as an integer below 10^6.
+
+    seed, rep_id and bank_name may be integers or field literals ("1234field").
+    """
+    window = int(str(timestamp).removesuffix("u64")) // WINDOW_SECONDS
+    h = mix64(to_u64(seed))
+    h = mix64(h ^ to_u64(rep_id))
+    h = mix64(h ^ to_u64(bank_name))
+    h = mix64(h ^ window)
+    return h % OTP_MODULUS
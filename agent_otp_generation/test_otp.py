@@ -1,28 +1,16 @@
-# Test implementation of the OTP algorithm in Python to verify our Leo code
-def generate_otp(timestamp):
-    # Use the lowest 6 digits of timestamp as a base
-    base_otp = timestamp % 1000000
-    
-    # Create a modifier based on timestamp
-    # Use the tens and ones digits of the minutes to create a shift amount
-    minutes = (timestamp // 60) % 100
-    shift_amount = minutes % 10  # 0-9 shift
-    
-    # Apply a circular shift to the digits
-    # This is the same logic as in Leo
-    factor = 10 ** shift_amount
-    rotated = (base_otp % factor) * (1000000 // factor) + (base_otp // factor)
-    
-    # Final OTP is the rotated value
-    otp = rotated % 1000000
-    
-    # Ensure 6 digits with leading zeros
-    return f"{otp:06d}"
+# Test the Python reference of the OTP circuit against known values
+from otp_reference import generate_otp, WINDOW_SECONDS
 
-# Test the OTP generation with the same timestamp as used in Leo
-timestamp = 1747099999
-otp = generate_otp(timestamp)
+# Same inputs as the prove_otp_generation example in src/main.leo
+seed, rep_id, bank_name, timestamp = 123, 1233, 5678, 1747100401
+otp = generate_otp(seed, rep_id, bank_name, timestamp)
 print(f"Timestamp: {timestamp}")
-print(f"Minutes: {(timestamp // 60) % 100}")
-print(f"Shift amount: {(timestamp // 60) % 100 % 10}")
-print(f"Generated OTP: {otp}") 
\ No newline at end of file
+print(f"Window: {timestamp // WINDOW_SECONDS}")
+print(f"Generated OTP: {otp:06d}")
+assert otp == 992478
+
+# Same OTP for the whole window, a different one for the next window or seed
+window_start = timestamp - timestamp % WINDOW_SECONDS
+assert generate_otp(seed, rep_id, bank_name, window_start + WINDOW_SECONDS - 1) == otp
+assert generate_otp(seed, rep_id, bank_name, window_start + WINDOW_SECONDS) != otp
+assert generate_otp(seed + 1, rep_id, bank_name, timestamp) != otp
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+# Add the project root directory to sys.path so 'utils' can be imported
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))
+
+from utils.resilience import resilient_blockchain_call as blockchain_call
+from utils.costs import get_cost_model, plan_batches, OTP_PROOF_SPECS
+
+# Slots per verify_otps execution
+BATCH_SIZE = OTP_PROOF_SPECS["verify"].capacity
+
+# Padding slot for verify_otps; disabled slots are skipped by the circuit
+EMPTY_VERIFICATION = {
+    "enabled": False, "agent_id": 0, "timestamp": 0, "provided_otp": 0,
+    "agent_status": 0, "expected_otp": 0, "current_time": 0,
+}
+
+# Default OTP validity window in seconds
+DEFAULT_WINDOW_SIZE = 60
+
+def check_verification(verification, window_size=DEFAULT_WINDOW_SIZE):
+    """
+    Runs the checks of verify_otp locally.
+
+    Returns None if the verification would be proven, otherwise the reason
+    it would fail. Failing verifications are rejected before proving, so
+    one bad OTP cannot fail a whole batch.
+    """
+    if verification["agent_status"] != 1:
+        return "agent is not active"
+    if verification["provided_otp"] != verification["expected_otp"]:
+        return "OTP mismatch"
+    if abs(verification["current_time"] - verification["timestamp"]) > window_size:
+        return "OTP outside of time window"
+    return None
+
+def format_verification(verification):
+    """
+    Formats a verification as a Verification struct literal.
+
+    Every verification is enabled unless it says otherwise, so a real
+    agent is always checked whatever its agent_id.
+    """
+    enabled = "true" if verification.get("enabled", True) else "false"
+    return (
+        "{ "
+        f"enabled: {enabled}, "
+        f"agent_id: {verification['agent_id']}field, "
+        f"timestamp: {verification['timestamp']}u64, "
+        f"provided_otp: {verification['provided_otp']}u32, "
+        f"agent_status: {verification['agent_status']}u8, "
+        f"expected_otp: {verification['expected_otp']}u32, "
+        f"current_time: {verification['current_time']}u64"
+        " }"
+    )
+
+def verify_otp_batch(verifications, window_size=DEFAULT_WINDOW_SIZE, project_path="agent_otp_proof"):
+    """
+    Proves many caller verifications with as few executions as possible.
+
+    Each verification is a dict with integer "agent_id", "timestamp",
+    "provided_otp", "agent_status", "expected_otp" and "current_time"
+    (defaulting to now). Valid verifications are proven through
+    verify_otps, eight per execution with padded slots, or verify_otp
+    when that is cheaper for a small remainder (see utils.costs).
+
+    Returns one result dict per verification, in order, with "success",
+    "error" and the "transition" that proved it.
+    """
+    now = int(time.time())
+    results = {}
+    pending = []
+    for index, verification in enumerate(verifications):
+        verification = dict(verification, type="verify")
+        verification.setdefault("current_time", now)
+        error = check_verification(verification, window_size)
+        if error:
+            results[index] = {"success": False, "error": error, "transition": None}
+        else:
+            pending.append((index, verification))
+
+    operations = [verification for _, verification in pending]
+    indexes = {id(verification): index for index, verification in pending}
+    estimates = get_cost_model().estimates(project_path)
+    for batch in plan_batches(operations, estimates, specs=OTP_PROOF_SPECS):
+        program_name, function_name = batch.transition.split("/")
+        if function_name == "verify_otps":
+            slots = batch.operations + [EMPTY_VERIFICATION] * (BATCH_SIZE - len(batch.operations))
+            inputs = [f"[{', '.join(format_verification(v) for v in slots)}]", f"{window_size}u64"]
+        else:
+            v = batch.operations[0]
+            inputs = [f"{v['agent_id']}field", f"{v['timestamp']}u64", f"{v['provided_otp']}u32",
+                      f"{v['agent_status']}u8", f"{v['expected_otp']}u32", f"{v['current_time']}u64",
+                      f"{window_size}u64"]
+
+        result = blockchain_call(
+            program_name=program_name,
+            function_name=function_name,
+            inputs=inputs,
+            project_path=project_path
+        )
+        for operation in batch.operations:
+            results[indexes[id(operation)]] = {
+                "success": result["success"],
+                "error": result.get("error"),
+                "transition": batch.transition
+            }
+    return [results[index] for index in range(len(verifications))]
@@ -0,0 +1,228 @@
+"""acl_queue.py - Durable, coalescing queue of on-chain ACL changes.
+
+Agent lifecycle changes (mint, revoke, reactivate) take effect in the
+database immediately but are written to the chain in batches: operations
+are stored as ``AclOperation`` rows and flushed through
+``BlockchainClient.apply_acl_batch`` once ``ACL_BATCH_SIZE`` of them are
+pending or the oldest has waited ``ACL_BATCH_INTERVAL_SECONDS``.
+
+Redundant changes to the same rep_id are coalesced before they reach the
+chain:
+
+- mint or reactivate followed by revoke: both cancelled
+- revoke followed by reactivate: both cancelled
+- a repeated mint, revoke or reactivate: the new one is dropped
+"""
+
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.blockchain.client import BlockchainClient
+from app.blockchain.encrypt import string_to_number
+from app.core.config import settings
+from app.db.models.blockchain import AclOperation, AclOperationType, AclOperationStatus
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Pending operation -> new operation pairs that cancel each other out
+_CANCELLING = {
+    (AclOperationType.MINT, AclOperationType.REVOKE),
+    (AclOperationType.REACTIVATE, AclOperationType.REVOKE),
+    (AclOperationType.REVOKE, AclOperationType.REACTIVATE),
+}
+
+# Pending operation -> new operation pairs where the new one adds nothing
+_REDUNDANT = {
+    (AclOperationType.MINT, AclOperationType.MINT),
+    (AclOperationType.MINT, AclOperationType.REACTIVATE),
+    (AclOperationType.REVOKE, AclOperationType.REVOKE),
+    (AclOperationType.REACTIVATE, AclOperationType.REACTIVATE),
+    (AclOperationType.REACTIVATE, AclOperationType.MINT),
+}
+
+class AclChangeQueue:
+    """Queue of pending ACL changes, flushed to the chain in batches.
+
+    Args:
+        client: Blockchain client used to apply batches
+        batch_size: Pending operations that trigger a flush (default: settings)
+        interval_seconds: Maximum age of a pending operation (default: settings)
+        max_attempts: Submissions before an operation is marked failed
+    """
+
+    def __init__(self,
+                 client: Optional[BlockchainClient] = None,
+                 batch_size: Optional[int] = None,
+                 interval_seconds: Optional[int] = None,
+                 max_attempts: Optional[int] = None):
+        if client is None:
+            from app.blockchain import get_blockchain_client
+            client = get_blockchain_client()
+        self.client = client
+        self.batch_size = batch_size or settings.ACL_BATCH_SIZE
+        self.interval = timedelta(seconds=interval_seconds or settings.ACL_BATCH_INTERVAL_SECONDS)
+        self.max_attempts = max_attempts or settings.ACL_MAX_ATTEMPTS
+
+    def enqueue(self,
+                db: Session,
+                operation: AclOperationType,
+                rep_id: str,
+                identity_id: Optional[uuid.UUID] = None,
+                payload: Optional[Dict[str, Any]] = None) -> Optional[AclOperation]:
+        """Queue an ACL change, coalescing it with pending changes for the rep_id.
+
+        Args:
+            db: Database session (committed by this call)
+            operation: Change to apply
+            rep_id: Agent's representative ID
+            identity_id: Blockchain identity the change applies to
+            payload: Chain inputs for the change (badge ciphertext, bank name, ...)
+
+        Returns:
+            Optional[AclOperation]: The queued operation, or None if it was
+            coalesced away
+        """
+        pending = db.query(AclOperation).filter(
+            AclOperation.rep_id == rep_id,
+            AclOperation.status == AclOperationStatus.PENDING
+        ).order_by(AclOperation.created_at.desc()).first()
+
+        if pending is not None:
+            pair = (pending.operation, operation)
+            if pair in _CANCELLING:
+                pending.status = AclOperationStatus.CANCELLED
+                pending.completed_at = datetime.utcnow()
+                db.commit()
+                logger.info(f"Cancelled pending {pending.operation.value} for {rep_id} "
+                            f"against new {operation.value}")
+                return None
+            if pair in _REDUNDANT:
+                logger.info(f"Dropped redundant {operation.value} for {rep_id}")
+                return None
+
+        acl_operation = AclOperation(
+            operation=operation,
+            rep_id=rep_id,
+            identity_id=identity_id,
+            payload=payload or {}
+        )
+        db.add(acl_operation)
+        db.commit()
+        logger.info(f"Queued {operation.value} for {rep_id}")
+        return acl_operation
+
+    def pending(self, db: Session) -> List[AclOperation]:
+        """Get pending operations, oldest first."""
+        return db.query(AclOperation).filter(
+            AclOperation.status == AclOperationStatus.PENDING
+        ).order_by(AclOperation.created_at).all()
+
+    def pending_count(self, db: Session) -> int:
+        """Count pending operations."""
+        return db.query(AclOperation).filter(
+            AclOperation.status == AclOperationStatus.PENDING
+        ).count()
+
+    def due(self, db: Session, now: Optional[datetime] = None) -> bool:
+        """Whether the queue should be flushed.
+
+        True once the size threshold is reached or the oldest pending
+        operation has waited the full interval.
+        """
+        if self.pending_count(db) >= self.batch_size:
+            return True
+        oldest = db.query(AclOperation.created_at).filter(
+            AclOperation.status == AclOperationStatus.PENDING
+        ).order_by(AclOperation.created_at).first()
+        if oldest is None:
+            return False
+        return (now or datetime.utcnow()) - oldest[0] >= self.interval
+
+    def flush(self, db: Session) -> Dict[str, Any]:
+        """Submit every pending operation in batches of ``batch_size``.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Dict[str, Any]: Counts of submitted, confirmed and failed operations
+        """
+        operations = self.pending(db)
+        summary = {"submitted": 0, "confirmed": 0, "failed": 0, "batches": []}
+        for start in range(0, len(operations), self.batch_size):
+            chunk = operations[start:start + self.batch_size]
+            batch_id = uuid.uuid4().hex
+            now = datetime.utcnow()
+            for operation in chunk:
+                operation.status = AclOperationStatus.SUBMITTED
+                operation.batch_id = batch_id
+                operation.attempts += 1
+                operation.submitted_at = now
+            # Persist the submission before touching the chain, so a crash
+            # mid-batch leaves a record of what may have been broadcast
+            db.commit()
+
+            try:
+                results = self.client.apply_acl_batch([self._to_chain(op) for op in chunk])
+            except Exception as e:
+                logger.error(f"ACL batch {batch_id} failed: {str(e)}")
+                results = [{"success": False, "error": str(e)}] * len(chunk)
+
+            if len(results) != len(chunk):
+                logger.error(f"ACL batch {batch_id} returned {len(results)} results "
+                             f"for {len(chunk)} operations")
+                # Operations without a result are retried like failed ones
+                missing = {"success": False, "error": "No result returned for this operation"}
+                results = list(results[:len(chunk)]) + [missing] * (len(chunk) - len(results))
+
+            for operation, result in zip(chunk, results):
+                if result.get("success"):
+                    operation.status = AclOperationStatus.CONFIRMED
+                    operation.completed_at = datetime.utcnow()
+                    operation.error_message = None
+                    if result.get("badge_ciphertext") and operation.identity is not None:
+                        operation.identity.badge_ciphertext = result["badge_ciphertext"]
+                    summary["confirmed"] += 1
+                else:
+                    operation.error_message = result.get("error")
+                    if operation.attempts >= self.max_attempts:
+                        operation.status = AclOperationStatus.FAILED
+                        operation.completed_at = datetime.utcnow()
+                    else:
+                        operation.status = AclOperationStatus.PENDING
+                    summary["failed"] += 1
+            db.commit()
+            summary["submitted"] += len(chunk)
+            summary["batches"].append(batch_id)
+            logger.info(f"Flushed ACL batch {batch_id}: {len(chunk)} operations")
+        return summary
+
+    def maybe_flush(self, db: Session) -> Optional[Dict[str, Any]]:
+        """Flush if the queue is due; returns the flush summary or None."""
+        if not self.due(db):
+            return None
+        return self.flush(db)
+
+    @staticmethod
+    def _to_chain(operation: AclOperation) -> Dict[str, Any]:
+        """Convert a queued operation to the format of ``apply_acl_batch``.
+
+        Leo takes field literals: the rep_id is encoded with
+        ``string_to_number`` and the bank is the agent's organization.
+        """
+        payload = dict(operation.payload or {})
+        org_id = payload.get("org_id")
+        if org_id is None:
+            org_id = operation.identity.org_id if operation.identity is not None else settings.ORG_ID
+        return {
+            **payload,
+            "id": str(operation.id),
+            "type": operation.operation.value,
+            "rep_id": f"{string_to_number(operation.rep_id)}field",
+            "bank_name": f"{org_id}field",
+        }
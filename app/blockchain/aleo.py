@@ -1,2 +1,74 @@
-"""aleo.py"""
+"""aleo.py - Blockchain client backed by the deployed Leo programs."""
 
+import os
+import logging
+from typing import Dict, Any, List
+
+from app.blockchain.mock import MockBlockchainClient
+from app.core.config import settings
+from app.utils.merkle import root_to_field
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Leo projects live at the repository root, next to the app package
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+class AleoBlockchainClient(MockBlockchainClient):
+    """Blockchain client writing to the deployed Aleo programs.
+
+    ACL batches go through agent_manager.aleo, verification proofs through
+    agent_otp_proof.aleo and audit roots through agent_otp_generate.aleo,
+    each as a broadcast transaction. Accounts, badges and OTP codes are
+    still produced off-chain, as in MockBlockchainClient.
+    """
+
+    def apply_acl_batch(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply a batch of ACL changes with agent_manager.aleo.
+
+        Args:
+            operations: Queued ACL changes (see BlockchainClient.apply_acl_batch)
+
+        Returns:
+            List[Dict[str, Any]]: One result per operation
+        """
+        from agent_manager.agent_manager_logic import apply_acl_batch
+
+        logger.info(f"Applying ACL batch of {len(operations)} operations on-chain")
+        return apply_acl_batch(operations, project_path=os.path.join(PROJECT_ROOT, "agent_manager"))
+
+    def verify_otp_batch(self, verifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prove a batch of caller verifications with agent_otp_proof.aleo.
+
+        Args:
+            verifications: Verification tuples (see BlockchainClient.verify_otp_batch)
+
+        Returns:
+            List[Dict[str, Any]]: One result per verification
+        """
+        from agent_otp_proof.otp_proof_logic import verify_otp_batch
+
+        return verify_otp_batch(verifications, window_size=settings.OTP_WINDOW_SIZE,
+                                project_path=os.path.join(PROJECT_ROOT, "agent_otp_proof"))
+
+    def anchor_audit_root(self, root: str, leaf_count: int, interval_end: int) -> Dict[str, Any]:
+        """Anchor an audit Merkle root with agent_otp_generate.aleo.
+
+        Args:
+            root: Hex Merkle root
+            leaf_count: Number of events under the root
+            interval_end: End of the interval (unix seconds)
+
+        Returns:
+            Dict[str, Any]: ``success`` flag and ``error`` on failure
+        """
+        from utils.resilience import resilient_blockchain_call as blockchain_call
+
+        result = blockchain_call(
+            program_name="agent_otp_generate.aleo",
+            function_name="anchor_audit_root",
+            inputs=[root_to_field(root), f"{leaf_count}u32", f"{interval_end}u64"],
+            project_path=os.path.join(PROJECT_ROOT, "agent_otp_generation"),
+            is_deployed=True
+        )
+        return {"success": result["success"], "error": result.get("error")}
@@ -0,0 +1,213 @@
+"""audit_anchor.py - Anchor OTP audit events on-chain, one Merkle root per interval.
+
+Every OTP generation and verification is written as an ``AuditLog`` row.
+Anchoring each of them on-chain would cost one transaction per event, so
+``AuditAnchorer`` groups the events of each closed interval
+(``AUDIT_ANCHOR_INTERVAL_SECONDS``, per tenant), builds a Merkle tree over
+their hashes and anchors only the root through
+``BlockchainClient.anchor_audit_root``. Each row then stores its leaf hash
+and inclusion proof, so any single event can later be shown to be part of
+the anchored root; the chain cost is one transaction per interval
+regardless of traffic.
+
+A root is only anchored once on-chain, so before resubmitting the root of
+a failed or interrupted attempt the ``audit_roots`` mapping is read: the
+broadcast may have gone through with its response lost, in which case the
+anchor is simply confirmed.
+
+Leaves hash the entry's immutable fields (see ``audit_leaf``); an entry
+edited after anchoring no longer matches its leaf and fails ``verify``.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.blockchain.client import BlockchainClient
+from app.core.config import settings
+from app.db.models.blockchain import AuditAnchor, AuditLog, AuditLogAction
+from app.utils.merkle import MerkleTree, leaf_hash, root_to_field, verify_proof
+from utils.mapping_reader import MappingReadError, get_mapping_reader
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Audit actions anchored on-chain
+ANCHORED_ACTIONS = (AuditLogAction.AGENT_OTP_GENERATE, AuditLogAction.AGENT_OTP_VERIFY)
+
+# Program and mapping holding anchored roots
+ANCHOR_PROGRAM = "agent_otp_generate.aleo"
+ANCHOR_MAPPING = "audit_roots"
+
+EPOCH = datetime(1970, 1, 1)
+
+def audit_leaf(log: AuditLog) -> str:
+    """Leaf hash of an audit entry, over its canonical JSON encoding."""
+    data = {
+        "id": str(log.id),
+        "action": log.action.value,
+        "timestamp": log.timestamp.isoformat(),
+        "org_id": log.org_id,
+        "resource_type": log.resource_type,
+        "resource_id": log.resource_id,
+        "details": log.details,
+        "status": log.status,
+    }
+    return leaf_hash(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode())
+
+class AuditAnchorer:
+    """Anchor closed intervals of audit events on-chain.
+
+    Args:
+        client: Blockchain client submitting the roots
+        interval_seconds: Length of an anchoring interval (default: settings)
+        actions: Audit actions to anchor
+        reader: Mapping reader checking retried roots on-chain (default:
+            the shared reader, see utils.mapping_reader)
+    """
+
+    def __init__(self,
+                 client: Optional[BlockchainClient] = None,
+                 interval_seconds: Optional[int] = None,
+                 actions: Sequence[AuditLogAction] = ANCHORED_ACTIONS,
+                 reader=None):
+        if client is None:
+            from app.blockchain import get_blockchain_client
+            client = get_blockchain_client()
+        self.client = client
+        self.interval = timedelta(seconds=interval_seconds or settings.AUDIT_ANCHOR_INTERVAL_SECONDS)
+        self.actions = list(actions)
+        self._reader = reader
+
+    def interval_start(self, timestamp: datetime) -> datetime:
+        """Start of the interval containing ``timestamp``."""
+        return EPOCH + ((timestamp - EPOCH) // self.interval) * self.interval
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = get_mapping_reader()
+        return self._reader
+
+    def _on_chain(self, root: str) -> bool:
+        """Whether a root is already anchored; unknown counts as not."""
+        try:
+            return self.reader.get(ANCHOR_PROGRAM, ANCHOR_MAPPING, root_to_field(root)) is not None
+        except MappingReadError as e:
+            logger.warning(f"Could not check audit root {root} on-chain: {e}")
+            return False
+
+    def _unanchored(self, db: Session, before: datetime):
+        return db.query(AuditLog).filter(
+            AuditLog.anchor_id.is_(None),
+            AuditLog.action.in_(self.actions),
+            AuditLog.timestamp < before
+        )
+
+    def due(self, db: Session, now: Optional[datetime] = None) -> bool:
+        """Whether a closed interval has events waiting to be anchored."""
+        before = self.interval_start(now or datetime.utcnow())
+        return self._unanchored(db, before).first() is not None
+
+    def anchor(self, db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Anchor every closed interval with unanchored events.
+
+        Args:
+            db: Database session
+            now: Current time; the interval containing it is still open
+
+        Returns:
+            Dict[str, Any]: Counts of anchored intervals and events, failed
+            intervals and the anchor ids
+        """
+        before = self.interval_start(now or datetime.utcnow())
+        logs = self._unanchored(db, before).order_by(AuditLog.timestamp, AuditLog.id).all()
+        summary = {"intervals": 0, "events": 0, "failed": 0, "anchors": []}
+        key = lambda log: (log.org_id, self.interval_start(log.timestamp))
+        for (org_id, start), group in groupby(sorted(logs, key=key), key=key):
+            if self._anchor_interval(db, org_id, start, list(group), summary):
+                summary["intervals"] += 1
+            else:
+                summary["failed"] += 1
+        return summary
+
+    def _anchor_interval(self, db: Session, org_id: int, start: datetime, logs: List[AuditLog],
+                         summary: Dict[str, Any]) -> bool:
+        leaves = [audit_leaf(log) for log in logs]
+        tree = MerkleTree(leaves)
+        end = start + self.interval
+
+        # A failed or interrupted attempt over the same events has the same root
+        anchor = db.query(AuditAnchor).filter(AuditAnchor.root == tree.root).first()
+        if anchor is not None and self._on_chain(tree.root):
+            # The earlier broadcast landed; resubmitting would fail finalize
+            logger.info(f"Audit root {tree.root} is already on-chain")
+            result = {"success": True, "transaction_id": anchor.transaction_id}
+        else:
+            if anchor is None:
+                anchor = AuditAnchor(org_id=org_id, interval_start=start, interval_end=end,
+                                     root=tree.root, leaf_count=len(leaves))
+                db.add(anchor)
+            anchor.status = "submitted"
+            # Persist the root before touching the chain, so a crash leaves a
+            # record of what may have been broadcast
+            db.commit()
+
+            try:
+                result = self.client.anchor_audit_root(tree.root, len(leaves), int((end - EPOCH).total_seconds()))
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+        if not result.get("success"):
+            anchor.status = "failed"
+            anchor.error_message = result.get("error")
+            db.commit()
+            logger.error(f"Anchoring {len(leaves)} audit events of {start} failed: {result.get('error')}")
+            return False
+
+        anchor.status = "confirmed"
+        anchor.transaction_id = result.get("transaction_id")
+        anchor.error_message = None
+        anchor.anchored_at = datetime.utcnow()
+        for index, (log, leaf) in enumerate(zip(logs, leaves)):
+            log.anchor_id = anchor.id
+            log.leaf_index = index
+            log.leaf_hash = leaf
+            log.merkle_proof = tree.proof(index)
+        db.commit()
+        summary["events"] += len(leaves)
+        summary["anchors"].append(str(anchor.id))
+        logger.info(f"Anchored {len(leaves)} audit events of {start} (org {org_id}): {tree.root}")
+        return True
+
+    def maybe_anchor(self, db: Session) -> Optional[Dict[str, Any]]:
+        """Anchor if an interval is due; returns the summary or None."""
+        if not self.due(db):
+            return None
+        return self.anchor(db)
+
+    @staticmethod
+    def verify(log: AuditLog, reader=None) -> bool:
+        """Check an audit entry against its anchored root.
+
+        Args:
+            log: Anchored audit entry
+            reader: Mapping reader (see utils.mapping_reader); when given,
+                the root must also be present on-chain
+
+        Returns:
+            bool: True if the entry is unchanged and included in the root
+        """
+        anchor = log.anchor
+        if anchor is None or anchor.status != "confirmed" or log.merkle_proof is None:
+            return False
+        leaf = audit_leaf(log)
+        if leaf != log.leaf_hash or not verify_proof(leaf, log.merkle_proof, anchor.root):
+            return False
+        if reader is None:
+            return True
+        interval_end = int((anchor.interval_end - EPOCH).total_seconds())
+        return reader.get(ANCHOR_PROGRAM, ANCHOR_MAPPING, root_to_field(anchor.root)) == f"{interval_end}u64"
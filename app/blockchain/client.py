@@ -1,7 +1,7 @@
 """client.py"""
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 
 class BlockchainClient(ABC):
     """Abstract base class for blockchain operations.
@@ -61,6 +61,51 @@ class BlockchainClient(ABC):
         """
         pass
     
+    @abstractmethod
+    def apply_acl_batch(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply a batch of queued ACL changes on-chain.
+        
+        Args:
+            operations: Dicts with ``id``, ``type`` ("mint", "revoke" or
+                "reactivate"), ``rep_id`` and ``bank_name`` field literals
+                and the operation's payload (``badge_ciphertext`` for
+                revocations)
+            
+        Returns:
+            List[Dict[str, Any]]: One result per operation, in order, each with
+            a ``success`` flag and optionally ``error`` or ``badge_ciphertext``
+        """
+        pass
+    
+    @abstractmethod
+    def verify_otp_batch(self, verifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prove a batch of caller verifications on-chain.
+        
+        Args:
+            verifications: Dicts with integer ``agent_id``, ``timestamp``,
+                ``provided_otp``, ``agent_status``, ``expected_otp`` and
+                ``current_time``
+            
+        Returns:
+            List[Dict[str, Any]]: One result per verification, in order, each
+            with a ``success`` flag and optionally ``error`` or ``transaction_id``
+        """
+        pass
+    
+    @abstractmethod
+    def anchor_audit_root(self, root: str, leaf_count: int, interval_end: int) -> Dict[str, Any]:
+        """Anchor the Merkle root of an interval of audit events on-chain.
+        
+        Args:
+            root: Hex SHA-256 Merkle root (see app.utils.merkle)
+            leaf_count: Number of events under the root
+            interval_end: End of the interval (unix seconds)
+            
+        Returns:
+            Dict[str, Any]: ``success`` flag and ``transaction_id`` or ``error``
+        """
+        pass
+    
     @abstractmethod
     def generate_otp(self, 
                     seed: int, 
@@ -2,14 +2,13 @@
 
 import random
 import uuid
-import hmac
-import hashlib
 import time
 import logging
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 
 from app.blockchain.client import BlockchainClient
 from app.core.config import settings
+from app.core.otp import get_otp_engine
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -100,6 +99,64 @@ class MockBlockchainClient(BlockchainClient):
             "message": "Agent badge revoked successfully in demo mode"
         }
     
+    def apply_acl_batch(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply a batch of ACL changes in a single simulated transaction.
+        
+        Args:
+            operations: Queued ACL changes (see BlockchainClient.apply_acl_batch)
+            
+        Returns:
+            List[Dict[str, Any]]: One result per operation
+        """
+        transaction_id = f"at1{uuid.uuid4().hex}"
+        logger.info(f"[DEMO] Simulated ACL batch {transaction_id} with {len(operations)} operations")
+        results = []
+        for operation in operations:
+            result = {"success": True, "transaction_id": transaction_id}
+            if operation["type"] in ("mint", "reactivate"):
+                result["badge_ciphertext"] = f"demo_badge_{operation['rep_id']}_{uuid.uuid4().hex}"
+            results.append(result)
+        return results
+    
+    def verify_otp_batch(self, verifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Check a batch of caller verifications in a single simulated proof.
+        
+        Args:
+            verifications: Verification tuples (see BlockchainClient.verify_otp_batch)
+            
+        Returns:
+            List[Dict[str, Any]]: One result per verification
+        """
+        transaction_id = f"at1{uuid.uuid4().hex}"
+        logger.info(f"[DEMO] Simulated verify_otps {transaction_id} with {len(verifications)} verifications")
+        results = []
+        for verification in verifications:
+            if verification["agent_status"] != 1:
+                results.append({"success": False, "error": "agent is not active"})
+            elif verification["provided_otp"] != verification["expected_otp"]:
+                results.append({"success": False, "error": "OTP mismatch"})
+            elif abs(verification["current_time"] - verification["timestamp"]) > settings.OTP_WINDOW_SIZE:
+                results.append({"success": False, "error": "OTP outside of time window"})
+            else:
+                results.append({"success": True, "transaction_id": transaction_id})
+        return results
+    
+    def anchor_audit_root(self, root: str, leaf_count: int, interval_end: int) -> Dict[str, Any]:
+        """Simulate anchoring an audit Merkle root.
+        
+        Args:
+            root: Hex Merkle root
+            leaf_count: Number of events under the root
+            interval_end: End of the interval (unix seconds)
+            
+        Returns:
+            Dict[str, Any]: Simulated transaction
+        """
+        transaction_id = f"at1{uuid.uuid4().hex}"
+        logger.info(f"[DEMO] Simulated anchor_audit_root {transaction_id}: {root} "
+                    f"({leaf_count} events up to {interval_end})")
+        return {"success": True, "transaction_id": transaction_id}
+    
     def generate_otp(self, 
                     seed: int, 
                     org_id: int, 
@@ -108,8 +165,8 @@ class MockBlockchainClient(BlockchainClient):
                     digits: int = 6) -> Tuple[str, int]:
         """Generate a one-time password for agent verification.
         
-        In the mock implementation, we still use a proper HMAC-based implementation
-        to ensure the OTP codes change regularly and are deterministic.
+        Codes come from the shared OTP engine (app/core/otp.py), so they
+        match the dashboard's and any verifier's.
         
         Args:
             seed: Secret seed value
@@ -121,32 +178,16 @@ class MockBlockchainClient(BlockchainClient):
         Returns:
             Tuple[str, int]: (otp_code, time_window)
         """
-        # Convert parameters to bytes
-        seed_bytes = seed.to_bytes((seed.bit_length() + 7) // 8, "big")
-        
-        # Build message: org_id(1B) ∥ rep_id_numeric(2B) ∥ time_window(8B)
-        msg = (
-            org_id.to_bytes(1, "big") +
-            rep_id_numeric.to_bytes(2, "big") +
-            time_window.to_bytes(8, "big")
-        )
-        
-        # Calculate HMAC
-        digest = hmac.new(seed_bytes, msg, hashlib.sha256).digest()
-        
-        # Generate code
-        code = int.from_bytes(digest, "big") % (10**digits)
-        
-        # Format code with leading zeros
-        return f"{code:0{digits}d}", time_window
+        code = get_otp_engine().generate(seed, org_id, rep_id_numeric, digits, time_window=time_window)
+        return code, time_window
 
 # Factory function to create client
 def get_blockchain_client() -> BlockchainClient:
     """Create and return a blockchain client instance.
     
-    In production, this would create the real Aleo implementation.
+    In production, this creates the Aleo implementation.
     In development/test mode, it creates the mock implementation.
-    
+
     Returns:
         BlockchainClient: The appropriate blockchain client implementation
     """
@@ -154,11 +195,7 @@ def get_blockchain_client() -> BlockchainClient:
         logger.info("Using mock blockchain client")
         return MockBlockchainClient()
     else:
-        # In the future, we'd import and return the real implementation
-        # from app.blockchain.aleo import AleoBlockchainClient
-        # return AleoBlockchainClient()
-        
-        # For now, always return the mock implementation
-        logger.warning("Real blockchain client not implemented, using mock")
-        return MockBlockchainClient()
+        from app.blockchain.aleo import AleoBlockchainClient
+        logger.info("Using Aleo blockchain client")
+        return AleoBlockchainClient()
 
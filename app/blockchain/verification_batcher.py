@@ -0,0 +1,203 @@
+"""verification_batcher.py - Collect caller verifications and prove them in batches.
+
+Proving one caller verification at a time pays the whole fixed cost of an
+execution (proof setup, transaction, base fee) for a handful of
+constraints. ``VerificationBatcher`` holds verifications for up to
+``OTP_PROOF_BATCH_INTERVAL_SECONDS`` and submits them together through
+``BlockchainClient.verify_otp_batch`` (the ``verify_otps`` transition,
+padded when a batch is not full), so that cost is shared by up to
+``OTP_PROOF_BATCH_SIZE`` verifications.
+
+Attempts are rate limited per rep_id and per caller source
+(app/core/rate_limit.py). A verification of an inactive agent or outside
+the time window is rejected at once; otherwise an OTP that matches is
+consumed in the replay cache (app/core/replay.py), keyed by its tenant and
+the window it matched, before it is queued. So codes cannot be guessed at
+volume and the same code cannot be accepted twice.
+"""
+
+import time
+import queue
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.blockchain.client import BlockchainClient
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, get_rate_limiter
+from app.core.replay import ReplayCache, get_replay_cache
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Slots of the verify_otps transition ([Verification; 8] in agent_otp_proof)
+VERIFY_OTPS_SLOTS = 8
+
+class VerificationBatcher:
+    """Batch caller verifications from a background thread.
+
+    ``submit`` returns a Future resolved with the verification's result
+    once its batch has been proven.
+
+    Args:
+        client: Blockchain client proving the batches
+        batch_size: Verifications per proof (default: settings; at most
+            ``VERIFY_OTPS_SLOTS``)
+        interval_seconds: Maximum seconds a verification waits (default: settings)
+        replay_cache: Consumed OTPs (default: the shared replay cache)
+        rate_limiter: Attempt limits (default: the shared rate limiter)
+    """
+
+    def __init__(self, client: Optional[BlockchainClient] = None, batch_size: Optional[int] = None,
+                 interval_seconds: Optional[float] = None, replay_cache: Optional[ReplayCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        if client is None:
+            from app.blockchain import get_blockchain_client
+            client = get_blockchain_client()
+        self.client = client
+        self.batch_size = batch_size or settings.OTP_PROOF_BATCH_SIZE
+        if self.batch_size > VERIFY_OTPS_SLOTS:
+            logger.warning(f"Proof batch size {self.batch_size} exceeds the {VERIFY_OTPS_SLOTS} slots "
+                           f"of verify_otps; using {VERIFY_OTPS_SLOTS}")
+            self.batch_size = VERIFY_OTPS_SLOTS
+        self.interval_seconds = settings.OTP_PROOF_BATCH_INTERVAL_SECONDS if interval_seconds is None \
+            else interval_seconds
+        # An empty ReplayCache is falsy (it has a length), so test for None
+        self.replay_cache = replay_cache if replay_cache is not None else get_replay_cache()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._queue: "queue.Queue[Tuple[Dict[str, Any], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def submit(self, agent_id: int, timestamp: int, provided_otp: int, agent_status: int,
+               expected_otp: int, time_window: int, org_id: int, current_time: Optional[int] = None,
+               source: Optional[str] = None) -> Future:
+        """Queue a caller verification for the next batch.
+
+        Args:
+            agent_id: Numeric agent id (short_id, unique per organization)
+            timestamp: When the OTP was generated
+            provided_otp: OTP given by the caller
+            agent_status: On-chain agent status (1 = active)
+            expected_otp: OTP computed from the agent's seed
+            time_window: Window expected_otp belongs to, as matched by
+                ``OTPEngine.matching_window``; the code is consumed for it
+            org_id: The agent's organization
+            current_time: When the caller submitted the OTP (default: now)
+            source: Caller source (address, phone number), rate limited
+                alongside the agent
+
+        Returns:
+            Future: Resolves to a dict with ``success`` and optionally
+            ``error`` or ``transaction_id``; rate limited attempts,
+            verifications the proof would reject and OTPs that were already
+            used are rejected at once
+        """
+        future: Future = Future()
+        current_time = int(time.time()) if current_time is None else current_time
+        retry_after = self.rate_limiter.check_verification(agent_id, source, org_id=org_id)
+        if retry_after:
+            future.set_result({"success": False, "error": "Too many attempts", "retry_after": retry_after})
+            return future
+        # Same checks as verify_otps, made before the code is consumed so a
+        # rejected attempt does not use it up
+        if agent_status != 1:
+            future.set_result({"success": False, "error": "agent is not active"})
+            return future
+        if abs(current_time - timestamp) > settings.OTP_WINDOW_SIZE:
+            future.set_result({"success": False, "error": "OTP outside of time window"})
+            return future
+        if provided_otp == expected_otp and not self.replay_cache.consume(
+                agent_id, time_window, org_id, now=current_time):
+            future.set_result({"success": False, "error": "OTP already used"})
+            return future
+        self._ensure_started()
+        self._queue.put(({
+            "agent_id": agent_id,
+            "timestamp": timestamp,
+            "provided_otp": provided_otp,
+            "agent_status": agent_status,
+            "expected_otp": expected_otp,
+            "current_time": current_time,
+        }, future))
+        return future
+
+    def flush(self) -> int:
+        """Prove all queued verifications now; returns the number submitted."""
+        submitted = 0
+        while True:
+            batch = self._drain(wait=False)
+            if not batch:
+                return submitted
+            submitted += self._prove(batch)
+
+    def stop(self) -> None:
+        """Stop the batching thread after proving pending verifications."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 5)
+        self.flush()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="verification-batcher", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _drain(self, wait: bool) -> List[Tuple[Dict[str, Any], Future]]:
+        """Take up to ``batch_size`` verifications; when ``wait``, wait for the
+        first one and then until the batch is full or ``interval_seconds`` passed."""
+        batch = []
+        try:
+            if wait:
+                batch.append(self._queue.get(timeout=0.5))
+                deadline = time.monotonic() + self.interval_seconds
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._drain(wait=True)
+            if batch:
+                self._prove(batch)
+
+    def _prove(self, batch: List[Tuple[Dict[str, Any], Future]]) -> int:
+        verifications = [verification for verification, _ in batch]
+        try:
+            results = self.client.verify_otp_batch(verifications)
+        except Exception as e:
+            logger.error(f"Error proving {len(batch)} verifications: {e}")
+            results = [{"success": False, "error": str(e)}] * len(batch)
+        if len(results) != len(batch):
+            logger.error(f"Proving {len(batch)} verifications returned {len(results)} results")
+        for index, (_, future) in enumerate(batch):
+            if index < len(results):
+                future.set_result(results[index])
+            else:
+                # Never leave a caller waiting on a verification without a result
+                future.set_result({"success": False, "error": "No result returned for this verification"})
+        return len(batch)
+
+# Shared batcher
+_verification_batcher: Optional[VerificationBatcher] = None
+
+def get_verification_batcher() -> VerificationBatcher:
+    """Get the shared verification batcher."""
+    global _verification_batcher
+    if _verification_batcher is None:
+        _verification_batcher = VerificationBatcher()
+    return _verification_batcher
@@ -0,0 +1,261 @@
+"""change_feed.py - Versioned feed of agent lifecycle changes for verifiers.
+
+Remote verifiers (edge snapshots, OTP indexes, caches) need to learn about
+enables, revocations and reactivations without re-reading every identity.
+``ChangeFeed`` keeps an ``agent_changes`` log whose ``version`` increases
+with every entry, and verifiers pull only the entries after the last
+version they applied:
+
+- ``capture`` derives entries from the identities: those whose
+  ``BlockchainIdentity.updated_at`` is at most ``AGENT_CHANGE_OVERLAP_SECONDS``
+  older than the last captured one (so late commits are not missed), plus
+  those named by recent enable/revoke/delete ``AuditLog`` events (so a
+  deleted identity becomes a ``delete`` entry). An entry is only written
+  when the identity's state differs from its latest entry, so rescanning is
+  idempotent; the first capture records every identity.
+- each entry carries the identity's complete verifier-visible state, so a
+  verifier only needs the latest entry per identity. ``compact`` drops
+  entries superseded for longer than ``AGENT_CHANGE_RETENTION_SECONDS``;
+  latest entries (including deletes) are kept, so a pull from any version,
+  0 included, still yields the current state.
+- ``pull`` returns a JSON-serializable page; with the edge snapshot key it
+  includes each agent's seed wrapped for snapshots (see app/core/snapshot.py).
+
+Captures hold a lock (an advisory lock on PostgreSQL; SQLite serializes
+writers), so versions are committed in order and a reader never skips an
+entry committed late.
+"""
+
+import base64
+import hashlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.blockchain import (
+    AgentChange, AgentChangeType, AuditLog, AuditLogAction, BlockchainIdentity
+)
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Audit actions whose resources are re-examined on capture
+LIFECYCLE_ACTIONS = (AuditLogAction.AGENT_ENABLE, AuditLogAction.AGENT_REVOKE, AuditLogAction.EMPLOYEE_DELETE)
+
+# Advisory lock key of captures on PostgreSQL
+CAPTURE_LOCK_KEY = 0x5A4B4346
+
+def state_hash(identity: BlockchainIdentity) -> str:
+    """Fingerprint of an identity's verifier-visible state (including its seed)."""
+    state = (f"{identity.org_id}|{identity.short_id}|{int(bool(identity.is_active))}|{identity.otp_digits}|"
+             f"{identity.seed}|{identity.data_key_wrapped or ''}")
+    return hashlib.sha256(state.encode()).hexdigest()
+
+def _uuids(values: Iterable[Optional[str]]) -> List[uuid.UUID]:
+    ids = []
+    for value in values:
+        try:
+            ids.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return ids
+
+class ChangeFeed:
+    """Capture, serve and compact the agent change feed.
+
+    Args:
+        overlap_seconds: Rescan window before the last capture (default: settings)
+        retention_seconds: Age after which superseded entries are compacted (default: settings)
+    """
+
+    def __init__(self, overlap_seconds: Optional[int] = None, retention_seconds: Optional[int] = None):
+        self.overlap = timedelta(seconds=settings.AGENT_CHANGE_OVERLAP_SECONDS if overlap_seconds is None
+                                 else overlap_seconds)
+        self.retention = timedelta(seconds=retention_seconds or settings.AGENT_CHANGE_RETENTION_SECONDS)
+
+    def latest_version(self, db: Session) -> int:
+        """Version of the newest entry (0 for an empty feed)."""
+        return db.query(func.max(AgentChange.version)).scalar() or 0
+
+    def _latest_entries(self, db: Session, *conditions) -> Dict[uuid.UUID, AgentChange]:
+        """Latest entry of every identity (matching any of ``conditions``)."""
+        latest = db.query(func.max(AgentChange.version)).group_by(AgentChange.identity_id)
+        if conditions:
+            latest = latest.filter(or_(*conditions))
+        entries = db.query(AgentChange).filter(AgentChange.version.in_(latest.scalar_subquery()))
+        return {entry.identity_id: entry for entry in entries}
+
+    def _lock(self, db: Session) -> None:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CAPTURE_LOCK_KEY})
+
+    def capture(self, db: Session, full: bool = False) -> int:
+        """Append entries for identities whose state changed since their latest entry.
+
+        Args:
+            db: Database session
+            full: Examine every identity and every identity known to the
+                feed (reconciliation; the first capture is always full)
+
+        Returns:
+            int: Number of entries appended
+        """
+        self._lock(db)
+        watermark = db.query(func.max(AgentChange.source_updated_at)).scalar()
+        full = full or watermark is None
+
+        if full:
+            identities = db.query(BlockchainIdentity).all()
+            latest = self._latest_entries(db)
+            gone = list(latest.values())
+        else:
+            since = watermark - self.overlap
+            resource_ids = _uuids(resource_id for (resource_id,) in db.query(AuditLog.resource_id).filter(
+                AuditLog.action.in_(LIFECYCLE_ACTIONS),
+                AuditLog.timestamp >= since
+            ))
+            conditions = [BlockchainIdentity.updated_at >= since]
+            if resource_ids:
+                # Agent events name the identity, enable and delete events the employee
+                conditions += [BlockchainIdentity.id.in_(resource_ids), BlockchainIdentity.employee_id.in_(resource_ids)]
+            identities = db.query(BlockchainIdentity).filter(or_(*conditions)).all()
+            latest = self._latest_entries(db, AgentChange.identity_id.in_([identity.id for identity in identities]),
+                                          AgentChange.identity_id.in_(resource_ids),
+                                          AgentChange.employee_id.in_(resource_ids))
+            named = set(resource_ids)
+            gone = [entry for entry in latest.values() if entry.identity_id in named or entry.employee_id in named]
+
+        entries = []
+        for identity in sorted(identities, key=lambda identity: identity.updated_at):
+            fingerprint = state_hash(identity)
+            previous = latest.get(identity.id)
+            if previous is not None and previous.change != AgentChangeType.DELETE \
+                    and previous.state_hash == fingerprint:
+                continue
+            if previous is None or previous.change == AgentChangeType.DELETE:
+                change = AgentChangeType.ENABLE
+            elif previous.is_active and not identity.is_active:
+                change = AgentChangeType.REVOKE
+            elif not previous.is_active and identity.is_active:
+                change = AgentChangeType.REACTIVATE
+            else:
+                change = AgentChangeType.UPDATE
+            entries.append(AgentChange(identity_id=identity.id, employee_id=identity.employee_id,
+                                       org_id=identity.org_id, change=change,
+                                       short_id=identity.short_id, is_active=identity.is_active,
+                                       otp_digits=identity.otp_digits, state_hash=fingerprint,
+                                       source_updated_at=identity.updated_at))
+
+        # Every identity named by an event was loaded above, so one missing here was deleted
+        existing = {identity.id for identity in identities}
+        for previous in gone:
+            if previous.change == AgentChangeType.DELETE or previous.identity_id in existing:
+                continue
+            entries.append(AgentChange(identity_id=previous.identity_id, employee_id=previous.employee_id,
+                                       org_id=previous.org_id,
+                                       change=AgentChangeType.DELETE, short_id=previous.short_id,
+                                       is_active=False, otp_digits=previous.otp_digits, state_hash=""))
+
+        db.add_all(entries)
+        db.commit()
+        if entries:
+            logger.info(f"Captured {len(entries)} agent change(s)")
+        return len(entries)
+
+    def pull(self, db: Session, since: int = 0, limit: int = 1000, org_id: Optional[int] = None,
+             key: Optional[bytes] = None, capture: bool = True) -> Dict[str, Any]:
+        """Entries after version ``since``, oldest first.
+
+        Args:
+            db: Database session
+            since: Last version the caller applied (0 for everything)
+            limit: Maximum entries returned
+            org_id: Only entries of this organization
+            key: Edge snapshot key; when given, active agents' seeds are
+                included wrapped for snapshots (``wrapped_key``, base64)
+            capture: Capture pending changes first
+
+        Returns:
+            Dict[str, Any]: ``since``, ``version`` (pass it as ``since`` to
+            the next pull), ``latest``, ``more`` and ``changes`` (entry
+            dicts with the agent's rep_id, department and permissions)
+        """
+        from app.db.models.employee import Employee
+
+        if capture:
+            self.capture(db)
+        query = db.query(AgentChange).filter(AgentChange.version > since)
+        if org_id is not None:
+            query = query.filter(AgentChange.org_id == org_id)
+        entries = query.order_by(AgentChange.version).limit(limit + 1).all()
+        more = len(entries) > limit
+        entries = entries[:limit]
+
+        identity_ids = list({entry.identity_id for entry in entries})
+        rows = db.query(BlockchainIdentity, Employee).join(
+            Employee, Employee.id == BlockchainIdentity.employee_id
+        ).filter(BlockchainIdentity.id.in_(identity_ids)).all() if identity_ids else []
+        current = {identity.id: (identity, employee) for identity, employee in rows}
+
+        changes = []
+        for entry in entries:
+            change = entry.to_dict()
+            identity, employee = current.get(entry.identity_id, (None, None))
+            if employee is not None:
+                change.update(rep_id=employee.rep_id, department=employee.department,
+                              permissions=employee.permissions)
+            if key is not None and identity is not None and entry.is_active:
+                change["wrapped_key"] = self._wrapped_key(identity, entry, key)
+            changes.append(change)
+
+        return {
+            "since": since,
+            "version": entries[-1].version if entries else since,
+            "latest": self.latest_version(db),
+            "more": more,
+            "changes": changes,
+        }
+
+    @staticmethod
+    def _wrapped_key(identity: BlockchainIdentity, entry: AgentChange, key: bytes) -> Optional[str]:
+        from app.core.snapshot import wrap_seed
+        from app.utils.crypto import decrypt
+
+        try:
+            seed = int(decrypt(identity.seed, data_key=identity.data_key_wrapped))
+        except Exception as e:
+            logger.error(f"Cannot wrap the seed of identity {identity.id}: {e}")
+            return None
+        return base64.b64encode(wrap_seed(key, seed, entry.org_id, entry.short_id)).decode()
+
+    def compact(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Delete entries superseded by a newer entry and older than the retention.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        cutoff = (now or datetime.utcnow()) - self.retention
+        latest = db.query(func.max(AgentChange.version)).group_by(AgentChange.identity_id).scalar_subquery()
+        deleted = db.query(AgentChange).filter(
+            AgentChange.recorded_at < cutoff,
+            AgentChange.version.notin_(latest)
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"Compacted {deleted} superseded agent change(s)")
+        return deleted
+
+# Shared change feed
+_change_feed: Optional[ChangeFeed] = None
+
+def get_change_feed() -> ChangeFeed:
+    """Get the shared change feed."""
+    global _change_feed
+    if _change_feed is None:
+        _change_feed = ChangeFeed()
+    return _change_feed
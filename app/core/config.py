@@ -1,6 +1,7 @@
 """config.py"""
 
 import os
+import json
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
@@ -42,21 +43,107 @@ class Settings:
     JWT_SECRET_KEY: str = os.environ.get("JWT_SECRET_KEY", "change-this-in-production")
     JWT_ALGORITHM: str = os.environ.get("JWT_ALGORITHM", "HS256")
     JWT_EXPIRATION_MINUTES: int = int(os.environ.get("JWT_EXPIRATION_MINUTES", "30"))
+    # Require a login before the Streamlit pages are shown
+    REQUIRE_LOGIN: bool = os.environ.get("REQUIRE_LOGIN", "false").lower() in ("true", "1", "yes")
+    
+    # Password hashing: "argon2id" (needs argon2-cffi) or "scrypt"
+    PASSWORD_HASH_ALGORITHM: str = os.environ.get("PASSWORD_HASH_ALGORITHM", "argon2id")
+    SCRYPT_LOG_N: int = int(os.environ.get("SCRYPT_LOG_N", "15"))  # 2^15 * 128 * r bytes = 32 MiB
+    SCRYPT_R: int = int(os.environ.get("SCRYPT_R", "8"))
+    SCRYPT_P: int = int(os.environ.get("SCRYPT_P", "1"))
+    ARGON2_TIME_COST: int = int(os.environ.get("ARGON2_TIME_COST", "3"))
+    ARGON2_MEMORY_KIB: int = int(os.environ.get("ARGON2_MEMORY_KIB", "65536"))
+    ARGON2_PARALLELISM: int = int(os.environ.get("ARGON2_PARALLELISM", "1"))
+    # Concurrent hash computations (each holds SCRYPT/ARGON2 memory)
+    PASSWORD_HASH_WORKERS: int = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+    
+    # Login lockout
+    MAX_FAILED_LOGINS: int = int(os.environ.get("MAX_FAILED_LOGINS", "5"))
+    LOCKOUT_MINUTES: int = int(os.environ.get("LOCKOUT_MINUTES", "15"))
+    
+    # Lifetime of cached permission masks; bounds how long another process
+    # serves grants changed elsewhere when the user row is not reloaded
+    PERMISSION_CACHE_TTL_SECONDS: int = int(os.environ.get("PERMISSION_CACHE_TTL_SECONDS", "60"))
     
     ADMIN_USERNAME: str = os.environ.get("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD: str = os.environ.get("ADMIN_PASSWORD", "")
     
     # Crypto settings
     FERNET_KEY: str = os.environ.get("FERNET_KEY", "")
+    # Comma-separated keys during rotation, new key first (see scripts/rotate_keys.py)
+    FERNET_KEYS: str = os.environ.get("FERNET_KEYS", "")
+    
+    # Envelope encryption: per-identity data keys wrapped by a KMS key
+    KMS_PROVIDER: str = os.environ.get("KMS_PROVIDER", "local")
+    KMS_KEY_PATH: str = os.environ.get("KMS_KEY_PATH", "")  # local KMS keyring (default: ~/.zk_caller_verification/kms_keyring.json)
+    DATA_KEY_CACHE_TTL_SECONDS: int = int(os.environ.get("DATA_KEY_CACHE_TTL_SECONDS", "300"))
+    DATA_KEY_CACHE_SIZE: int = int(os.environ.get("DATA_KEY_CACHE_SIZE", "1024"))
+    # Key wrapping OTP seeds in edge verifier snapshots (app/core/snapshot.py;
+    # default: ~/.zk_caller_verification/edge_snapshot.key)
+    EDGE_SNAPSHOT_KEY_PATH: str = os.environ.get("EDGE_SNAPSHOT_KEY_PATH", "")
     
     # Blockchain settings
     TRUSTED_PROGRAM_ID: str = os.environ.get("TRUSTED_PROGRAM_ID", "zk_verify.aleo")
     CALLCENTRE_ADMIN_PK: str = os.environ.get("CALLCENTRE_ADMIN_PK", "")
     ORG_ID: int = int(os.environ.get("ORG_ID", "171"))
     
+    # Tenant shard map: JSON object of org_id -> database URL, e.g.
+    # {"171": "postgresql://.../bank_a", "172": "sqlite:///bank_b.db"}.
+    # Orgs not listed use DATABASE_URL; orgs sharing a URL share an engine.
+    SHARD_MAP: Dict[int, str] = {
+        int(org_id): url for org_id, url in json.loads(os.environ.get("SHARD_MAP", "{}")).items()
+    }
+    
+    # Days a released short_id is held back before it is reassigned
+    SHORT_ID_QUARANTINE_DAYS: int = int(os.environ.get("SHORT_ID_QUARANTINE_DAYS", "30"))
+    
+    # ACL change batching: queued mints/revokes are flushed on-chain once
+    # ACL_BATCH_SIZE operations are pending or the oldest is this old
+    ACL_BATCH_SIZE: int = int(os.environ.get("ACL_BATCH_SIZE", "20"))
+    ACL_BATCH_INTERVAL_SECONDS: int = int(os.environ.get("ACL_BATCH_INTERVAL_SECONDS", str(7 * 24 * 3600)))
+    ACL_MAX_ATTEMPTS: int = int(os.environ.get("ACL_MAX_ATTEMPTS", "3"))
+    
     # OTP settings
     DEFAULT_OTP_DIGITS: int = int(os.environ.get("DEFAULT_OTP_DIGITS", "6"))
     OTP_WINDOW_SIZE: int = 60  # Force exactly 60 seconds (1 minute)
+    # Algorithm of the OTP engine (app/core/otp.py): hmac-sha256, hmac-sha1 or
+    # circuit (DEMO_MODE only)
+    OTP_ALGORITHM: str = os.environ.get("OTP_ALGORITHM", "hmac-sha256")
+    # Earlier windows whose codes are still accepted (clock skew, slow callers)
+    OTP_SKEW_WINDOWS: int = int(os.environ.get("OTP_SKEW_WINDOWS", "1"))
+    
+    # Consumed codes (app/core/replay.py): lock shards, and an optional shared
+    # store for multi-process verifiers ("sqlite:///<path>" or "redis://...")
+    OTP_REPLAY_SHARDS: int = int(os.environ.get("OTP_REPLAY_SHARDS", "16"))
+    OTP_REPLAY_STORE_URL: str = os.environ.get("OTP_REPLAY_STORE_URL", "")
+    
+    # Token-bucket rate limits (app/core/rate_limit.py): sustained requests per
+    # minute and burst, for OTP generation per agent and verification attempts
+    # per rep_id and per caller source
+    OTP_GENERATE_PER_MINUTE: float = float(os.environ.get("OTP_GENERATE_PER_MINUTE", "6"))
+    OTP_GENERATE_BURST: int = int(os.environ.get("OTP_GENERATE_BURST", "5"))
+    OTP_VERIFY_AGENT_PER_MINUTE: float = float(os.environ.get("OTP_VERIFY_AGENT_PER_MINUTE", "10"))
+    OTP_VERIFY_AGENT_BURST: int = int(os.environ.get("OTP_VERIFY_AGENT_BURST", "5"))
+    OTP_VERIFY_SOURCE_PER_MINUTE: float = float(os.environ.get("OTP_VERIFY_SOURCE_PER_MINUTE", "20"))
+    OTP_VERIFY_SOURCE_BURST: int = int(os.environ.get("OTP_VERIFY_SOURCE_BURST", "10"))
+    # Bucket shards, and an optional shared store ("sqlite:///<path>" or "redis://...")
+    RATE_LIMIT_SHARDS: int = int(os.environ.get("RATE_LIMIT_SHARDS", "16"))
+    RATE_LIMIT_STORE_URL: str = os.environ.get("RATE_LIMIT_STORE_URL", "")
+    
+    # Caller verifications are proven in batches (verify_otps) of up to
+    # OTP_PROOF_BATCH_SIZE (at most the transition's 8 slots), collected for
+    # at most this many seconds
+    OTP_PROOF_BATCH_SIZE: int = int(os.environ.get("OTP_PROOF_BATCH_SIZE", "8"))
+    OTP_PROOF_BATCH_INTERVAL_SECONDS: float = float(os.environ.get("OTP_PROOF_BATCH_INTERVAL_SECONDS", "2.0"))
+    
+    # OTP audit events are anchored on-chain as one Merkle root per interval
+    AUDIT_ANCHOR_INTERVAL_SECONDS: int = int(os.environ.get("AUDIT_ANCHOR_INTERVAL_SECONDS", "3600"))
+    
+    # Agent change feed (app/core/change_feed.py): identity changes up to this
+    # many seconds older than the last captured one are re-examined (late
+    # commits), and superseded entries are compacted after the retention
+    AGENT_CHANGE_OVERLAP_SECONDS: int = int(os.environ.get("AGENT_CHANGE_OVERLAP_SECONDS", "120"))
+    AGENT_CHANGE_RETENTION_SECONDS: int = int(os.environ.get("AGENT_CHANGE_RETENTION_SECONDS", str(7 * 24 * 3600)))
     
     # Default permissions for new agents
     DEFAULT_PERMISSIONS: Dict[str, bool] = {
@@ -87,7 +174,7 @@ class Settings:
         if self.ENVIRONMENT == "production":
             assert self.DB_TYPE == "postgresql", "Production environment requires PostgreSQL database"
             assert len(self.JWT_SECRET_KEY) >= 32, "Production environment requires strong JWT secret key"
-            assert self.FERNET_KEY, "Production environment requires FERNET_KEY to be set"
+            assert self.FERNET_KEY or self.FERNET_KEYS, "Production environment requires FERNET_KEY to be set"
             assert self.ADMIN_PASSWORD, "Production environment requires ADMIN_PASSWORD to be set"
 
 # Create global settings instance
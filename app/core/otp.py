@@ -0,0 +1,250 @@
+"""otp.py - The one OTP engine used by every code generator and verifier.
+
+Codes used to come from three unrelated algorithms: HMAC-SHA1 with a
+microsecond perturbation in the dashboard, HMAC-SHA256 in
+``crypto.generate_totp`` and the mock client, and digit rotation in the
+Leo program. A verifier could not reproduce the dashboard's codes.
+``OTPEngine`` computes every code from the same inputs (seed, org_id,
+rep_id_numeric and time window of ``OTP_WINDOW_SIZE`` seconds) with one
+algorithm chosen by ``settings.OTP_ALGORITHM``:
+
+- ``hmac-sha256``: HMAC-SHA256 over org_id(1B) ∥ rep_id_numeric(2B) ∥
+  time_window(8B), reduced mod 10^digits (the ``generate_totp`` layout)
+- ``hmac-sha1``: HMAC-SHA1 over the same message with RFC 4226 dynamic
+  truncation
+- ``circuit``: the ``agent_otp_generate.aleo`` circuit, via its Python
+  reference, so codes can also be proven on-chain (at most 6 digits).
+  Demo only: its splitmix64 mixing is not a keyed hash and its seed is at
+  most 64 bits, so the engine refuses it unless ``DEMO_MODE`` is set
+
+Algorithms split work into a per-seed key state (``prepare``: HMAC pads,
+the circuit's first mixing round) and a per-window step. The engine keeps
+prepared states in a small LRU, so an agent's repeated codes and
+verifications only pay the per-window step. New algorithms are added with
+``register_algorithm``; ``OTPEngine.new_seed`` draws seeds of the size
+the algorithm takes.
+"""
+
+import os
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class OTPAlgorithm(ABC):
+    """An OTP algorithm, split into per-seed and per-code work."""
+
+    name: str = ""
+    # Random bytes in a new seed
+    seed_bytes: int = 32
+    # Refused outside DEMO_MODE
+    demo_only: bool = False
+
+    @abstractmethod
+    def prepare(self, seed: int) -> Any:
+        """Precompute the key state of a seed."""
+        pass
+
+    @abstractmethod
+    def code(self, state: Any, org_id: int, rep_id_numeric: int, time_window: int, digits: int) -> int:
+        """Compute the code of one time window from a prepared key state."""
+        pass
+
+def _message(org_id: int, rep_id_numeric: int, time_window: int) -> bytes:
+    # org_id(1B) ∥ rep_id_numeric(2B) ∥ time_window(8B)
+    return org_id.to_bytes(1, "big") + rep_id_numeric.to_bytes(2, "big") + time_window.to_bytes(8, "big")
+
+class HmacSha256Algorithm(OTPAlgorithm):
+    """HMAC-SHA256 of the OTP message, reduced mod 10^digits."""
+
+    name = "hmac-sha256"
+    digestmod = hashlib.sha256
+
+    def prepare(self, seed: int) -> Any:
+        # The HMAC object after absorbing the key pads; copied per code
+        return hmac.new(seed.to_bytes((seed.bit_length() + 7) // 8, "big"), digestmod=self.digestmod)
+
+    def code(self, state: Any, org_id: int, rep_id_numeric: int, time_window: int, digits: int) -> int:
+        mac = state.copy()
+        mac.update(_message(org_id, rep_id_numeric, time_window))
+        return int.from_bytes(mac.digest(), "big") % (10 ** digits)
+
+class HmacSha1Algorithm(HmacSha256Algorithm):
+    """HMAC-SHA1 of the OTP message with RFC 4226 dynamic truncation."""
+
+    name = "hmac-sha1"
+    digestmod = hashlib.sha1
+
+    def code(self, state: Any, org_id: int, rep_id_numeric: int, time_window: int, digits: int) -> int:
+        mac = state.copy()
+        mac.update(_message(org_id, rep_id_numeric, time_window))
+        digest = mac.digest()
+        offset = digest[-1] & 0x0F
+        return (int.from_bytes(digest[offset:offset + 4], "big") & 0x7FFFFFFF) % (10 ** digits)
+
+class CircuitAlgorithm(OTPAlgorithm):
+    """The agent_otp_generate.aleo circuit (org_id as bank_name, rep_id_numeric
+    as rep_id), so generated codes can be proven with prove_otp_generation.
+
+    splitmix64 is an unkeyed bijection and the seed must fit in a u64, so
+    the seed can be searched for from a few observed codes. Demo only.
+    """
+
+    name = "circuit"
+    seed_bytes = 8
+    demo_only = True
+
+    def __init__(self):
+        from agent_otp_generation import otp_reference
+
+        self.reference = otp_reference
+
+    def prepare(self, seed: int) -> Any:
+        return self.reference.mix64(self.reference.to_u64(seed))
+
+    def code(self, state: Any, org_id: int, rep_id_numeric: int, time_window: int, digits: int) -> int:
+        if digits > 6:
+            raise ValueError("The circuit algorithm produces at most 6 digits")
+        mix64 = self.reference.mix64
+        h = mix64(state ^ rep_id_numeric)
+        h = mix64(h ^ org_id)
+        # The circuit derives its 60 second window from a timestamp
+        h = mix64(h ^ (time_window * settings.OTP_WINDOW_SIZE // self.reference.WINDOW_SECONDS))
+        return h % (10 ** digits)
+
+# Registered algorithms by name
+ALGORITHMS: Dict[str, Type[OTPAlgorithm]] = {
+    HmacSha256Algorithm.name: HmacSha256Algorithm,
+    HmacSha1Algorithm.name: HmacSha1Algorithm,
+    CircuitAlgorithm.name: CircuitAlgorithm,
+}
+
+def register_algorithm(algorithm: Type[OTPAlgorithm]) -> None:
+    """Make an algorithm available to ``OTPEngine`` under its name."""
+    ALGORITHMS[algorithm.name] = algorithm
+
+class OTPEngine:
+    """Generate and verify OTPs with one algorithm.
+
+    Args:
+        algorithm: Algorithm name (default: settings.OTP_ALGORITHM)
+        window_size: Seconds per time window (default: settings.OTP_WINDOW_SIZE)
+        cache_size: Prepared key states kept in memory
+    """
+
+    def __init__(self, algorithm: Optional[str] = None, window_size: Optional[int] = None,
+                 cache_size: int = 1024):
+        name = algorithm or settings.OTP_ALGORITHM
+        if name not in ALGORITHMS:
+            raise ValueError(f"Unknown OTP algorithm: {name}")
+        if ALGORITHMS[name].demo_only and not settings.DEMO_MODE:
+            raise ValueError(f"The {name} OTP algorithm is only available in DEMO_MODE")
+        self.algorithm = ALGORITHMS[name]()
+        self.window_size = window_size or settings.OTP_WINDOW_SIZE
+        self.cache_size = cache_size
+        self._states: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def new_seed(self) -> int:
+        """Draw a random seed of the algorithm's ``seed_bytes``."""
+        return int.from_bytes(os.urandom(self.algorithm.seed_bytes), "big")
+
+    def time_window(self, timestamp: Optional[float] = None) -> int:
+        """Time window containing ``timestamp`` (default: now)."""
+        return int((time.time() if timestamp is None else timestamp) // self.window_size)
+
+    def _state(self, seed: int) -> Any:
+        with self._lock:
+            state = self._states.get(seed)
+            if state is not None:
+                self._states.move_to_end(seed)
+                return state
+        state = self.algorithm.prepare(seed)
+        if self.cache_size:
+            with self._lock:
+                self._states[seed] = state
+                while len(self._states) > self.cache_size:
+                    self._states.popitem(last=False)
+        return state
+
+    def generate(self, seed: int, org_id: int, rep_id_numeric: int, digits: Optional[int] = None,
+                 time_window: Optional[int] = None, timestamp: Optional[float] = None) -> str:
+        """Generate a code.
+
+        Args:
+            seed: Agent's secret seed
+            org_id: Organization ID
+            rep_id_numeric: Numeric agent ID (short_id)
+            digits: Code length (default: settings.DEFAULT_OTP_DIGITS; pass
+                ``BlockchainIdentity.otp_digits``)
+            time_window: Time window (default: the one containing ``timestamp``)
+            timestamp: Unix time (default: now)
+
+        Returns:
+            str: Zero-padded code
+        """
+        digits = digits or settings.DEFAULT_OTP_DIGITS
+        if time_window is None:
+            time_window = self.time_window(timestamp)
+        code = self.algorithm.code(self._state(seed), org_id, rep_id_numeric, time_window, digits)
+        return f"{code:0{digits}d}"
+
+    def matching_window(self, code: str, seed: int, org_id: int, rep_id_numeric: int,
+                        digits: Optional[int] = None, timestamp: Optional[float] = None,
+                        skew_windows: Optional[int] = None) -> Optional[int]:
+        """Find the window a code belongs to among the current window and
+        ``skew_windows`` (default: settings.OTP_SKEW_WINDOWS) before it."""
+        current = self.time_window(timestamp)
+        skew_windows = settings.OTP_SKEW_WINDOWS if skew_windows is None else skew_windows
+        matched = None
+        for time_window in range(current - skew_windows, current + 1):
+            expected = self.generate(seed, org_id, rep_id_numeric, digits, time_window=time_window)
+            # No early exit: the comparison time does not depend on which window matched
+            if hmac.compare_digest(expected, str(code)):
+                matched = time_window
+        return matched
+
+    def verify(self, code: str, seed: int, org_id: int, rep_id_numeric: int, digits: Optional[int] = None,
+               timestamp: Optional[float] = None, skew_windows: Optional[int] = None,
+               replay_cache=None) -> bool:
+        """Check a code against the current window and ``skew_windows`` before it.
+
+        Args:
+            code: Code given by the caller
+            seed: Agent's secret seed
+            org_id: Organization ID
+            rep_id_numeric: Numeric agent ID (short_id)
+            digits: Code length (default: settings.DEFAULT_OTP_DIGITS)
+            timestamp: Unix time of the check (default: now)
+            skew_windows: Earlier windows still accepted (default: settings)
+            replay_cache: ReplayCache (app/core/replay.py); when given, a
+                code is accepted once per window
+
+        Returns:
+            bool: True if the code matches one of the windows (and was not used before)
+        """
+        time_window = self.matching_window(code, seed, org_id, rep_id_numeric, digits, timestamp, skew_windows)
+        if time_window is None:
+            return False
+        if replay_cache is not None:
+            return replay_cache.consume(rep_id_numeric, time_window, org_id, now=timestamp)
+        return True
+
+# Shared engine
+_otp_engine: Optional[OTPEngine] = None
+
+def get_otp_engine() -> OTPEngine:
+    """Get the shared OTP engine."""
+    global _otp_engine
+    if _otp_engine is None:
+        _otp_engine = OTPEngine()
+    return _otp_engine
@@ -0,0 +1,237 @@
+"""otp_index.py - Find the agent behind a code read out without a rep_id.
+
+In the IVR flow a caller often only reads out the code. Finding its agent
+by recomputing every active agent's code per call costs one MAC per agent
+and window on every lookup. ``OTPIndex`` instead keeps, for each time
+window still accepted (plus the next one, computed ahead of time), a map
+from code to the agents producing it, so a lookup is a dict access per
+window:
+
+- windows are built once as they roll in and dropped as they roll out;
+  each agent's key state is prepared once, when it is added
+- agents are added and removed incrementally (enable, revoke, rotation),
+  directly or from a page of the agent change feed (``apply_changes``)
+- with tens of thousands of agents and 10^6 codes, distinct agents
+  sharing a code is expected; ``lookup`` returns every candidate and
+  reports the match as ambiguous, and candidates can be narrowed by
+  department or by required ``Employee.permissions``
+"""
+
+import time
+import base64
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.otp import OTPEngine, get_otp_engine
+from app.core.permissions import registry as permission_registry
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class IndexedAgent(NamedTuple):
+    """An active agent and its prepared OTP key state."""
+
+    identity_id: str
+    rep_id: str
+    org_id: int
+    short_id: int
+    digits: int
+    department: Optional[str]
+    permission_mask: int
+    state: object
+
+class OTPMatch(NamedTuple):
+    """Agents whose code in ``time_window`` equals the looked up code."""
+
+    candidates: List[Tuple[IndexedAgent, int]]
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.candidates) > 1
+
+    @property
+    def agent(self) -> Optional[IndexedAgent]:
+        """The matching agent if there is exactly one."""
+        return self.candidates[0][0] if len(self.candidates) == 1 else None
+
+class OTPIndex:
+    """Reverse index from (time_window, code) to agents.
+
+    Args:
+        engine: OTP engine whose codes are indexed (default: the shared engine)
+        skew_windows: Earlier windows still accepted (default: settings.OTP_SKEW_WINDOWS)
+        lookahead: Future windows built ahead of time
+    """
+
+    def __init__(self, engine: Optional[OTPEngine] = None, skew_windows: Optional[int] = None,
+                 lookahead: int = 1):
+        self.engine = engine or get_otp_engine()
+        self.skew_windows = settings.OTP_SKEW_WINDOWS if skew_windows is None else skew_windows
+        self.lookahead = lookahead
+        self._agents: Dict[str, IndexedAgent] = {}
+        # time_window -> code -> identity ids
+        self._windows: Dict[int, Dict[str, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _code(self, agent: IndexedAgent, time_window: int) -> str:
+        code = self.engine.algorithm.code(agent.state, agent.org_id, agent.short_id, time_window, agent.digits)
+        return f"{code:0{agent.digits}d}"
+
+    def add_agent(self, identity_id, rep_id: str, seed: int, org_id: int, short_id: int,
+                  digits: Optional[int] = None, department: Optional[str] = None,
+                  permissions: Optional[Dict[str, bool]] = None) -> None:
+        """Index an agent (replacing a previous entry for the same identity)."""
+        agent = IndexedAgent(str(identity_id), rep_id, org_id, short_id, digits or settings.DEFAULT_OTP_DIGITS,
+                             department, permission_registry.grants_mask(permissions),
+                             self.engine.algorithm.prepare(seed))
+        with self._lock:
+            self._remove(agent.identity_id)
+            self._agents[agent.identity_id] = agent
+            for time_window, codes in self._windows.items():
+                codes.setdefault(self._code(agent, time_window), []).append(agent.identity_id)
+
+    def remove_agent(self, identity_id) -> bool:
+        """Drop an agent from the index; returns False if it was not indexed."""
+        with self._lock:
+            return self._remove(str(identity_id))
+
+    def _remove(self, identity_id: str) -> bool:
+        agent = self._agents.pop(identity_id, None)
+        if agent is None:
+            return False
+        # Its codes are recomputed rather than searched for
+        for time_window, codes in self._windows.items():
+            code = self._code(agent, time_window)
+            ids = [i for i in codes.get(code, ()) if i != identity_id]
+            if ids:
+                codes[code] = ids
+            else:
+                codes.pop(code, None)
+        return True
+
+    def apply_changes(self, changes: Iterable[Dict[str, Any]], key: bytes) -> int:
+        """Apply change feed entries (``ChangeFeed.pull`` with the snapshot key).
+
+        Active agents are (re)indexed with their unwrapped seed; revoked and
+        deleted ones are dropped. Returns the number of entries applied.
+        """
+        from app.core.snapshot import unwrap_seed
+
+        applied = 0
+        for change in changes:
+            applied += 1
+            if change["change"] == "delete" or not change["is_active"] or not change.get("wrapped_key"):
+                self.remove_agent(change["identity_id"])
+                continue
+            seed = unwrap_seed(key, base64.b64decode(change["wrapped_key"]), change["org_id"], change["short_id"])
+            self.add_agent(change["identity_id"], change.get("rep_id"), seed, change["org_id"], change["short_id"],
+                           change["otp_digits"], change.get("department"), change.get("permissions"))
+        return applied
+
+    def load(self, db: Session, org_id: Optional[int] = None) -> int:
+        """Index every active agent (of ``org_id`` if given); returns the count.
+
+        Seeds are decrypted once here; agents whose seed cannot be
+        decrypted are skipped and logged.
+        """
+        from app.db.models.blockchain import BlockchainIdentity
+        from app.db.models.employee import Employee
+        from app.utils.crypto import decrypt
+
+        query = db.query(BlockchainIdentity, Employee).join(
+            Employee, Employee.id == BlockchainIdentity.employee_id
+        ).filter(BlockchainIdentity.is_active.is_(True))
+        if org_id is not None:
+            query = query.filter(BlockchainIdentity.org_id == org_id)
+
+        loaded = 0
+        for identity, employee in query.yield_per(1000):
+            try:
+                seed = int(decrypt(identity.seed, data_key=identity.data_key_wrapped))
+            except Exception as e:
+                logger.error(f"Cannot index agent {employee.rep_id}: {e}")
+                continue
+            self.add_agent(identity.id, employee.rep_id, seed, identity.org_id, identity.short_id,
+                           identity.otp_digits, employee.department, employee.permissions)
+            loaded += 1
+        logger.info(f"Indexed {loaded} active agents")
+        return loaded
+
+    def roll(self, now: Optional[float] = None) -> None:
+        """Build the windows accepted at ``now`` (and ahead) and drop older ones.
+
+        Lookups call this themselves; calling it from a timer shortly
+        before each window boundary keeps the build off the lookup path.
+        """
+        current = self.engine.time_window(now)
+        wanted = range(current - self.skew_windows, current + self.lookahead + 1)
+        if all(time_window in self._windows for time_window in wanted):
+            return
+        with self._lock:
+            for time_window in wanted:
+                if time_window in self._windows:
+                    continue
+                codes: Dict[str, List[str]] = {}
+                for agent in self._agents.values():
+                    codes.setdefault(self._code(agent, time_window), []).append(agent.identity_id)
+                # Published only once complete, so lock-free lookups see whole windows
+                self._windows[time_window] = codes
+            for time_window in [w for w in self._windows if w not in wanted]:
+                del self._windows[time_window]
+
+    def lookup(self, code: str, now: Optional[float] = None, department: Optional[str] = None,
+               permissions: Iterable[str] = ()) -> OTPMatch:
+        """Find the agents a code belongs to.
+
+        Args:
+            code: Code read out by the caller
+            now: Unix time of the call (default: now)
+            department: Only agents of this department
+            permissions: Only agents granted all of these permissions
+
+        Returns:
+            OTPMatch: Candidates with the window their code matched, most
+            recent window first
+        """
+        self.roll(now)
+        current = self.engine.time_window(now)
+        required = permission_registry.mask(permissions)
+        candidates = []
+        for time_window in range(current, current - self.skew_windows - 1, -1):
+            for identity_id in self._windows.get(time_window, {}).get(str(code), ()):
+                agent = self._agents.get(identity_id)
+                if agent is None:
+                    continue
+                if department is not None and agent.department != department:
+                    continue
+                if agent.permission_mask & required != required:
+                    continue
+                candidates.append((agent, time_window))
+        return OTPMatch(candidates)
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+def get_otp_index(org_id: Optional[int] = None) -> OTPIndex:
+    """Get the OTP index of a tenant, loading its active agents on first use.
+
+    Each tenant's index is loaded from its own shard and kept in its tenant
+    cache; without ``org_id`` the index covers every tenant on the default
+    database.
+    """
+    from app.db.base import get_db
+    from app.db.sharding import tenant_cache
+
+    cache = tenant_cache(org_id, "otp_index")
+    index = cache.get("index")
+    if index is None:
+        index = OTPIndex()
+        with get_db(org_id) as db:
+            index.load(db, org_id)
+        # A concurrent first use may have loaded it too; keep one
+        index = cache.setdefault("index", index)
+    return index
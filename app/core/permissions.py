@@ -0,0 +1,159 @@
+"""permissions.py - Compiled permission resolver.
+
+Permission names are interned to bit positions once, so a set of
+permissions is a single integer and a check is one bitwise AND:
+
+    mask = permission_resolver.effective_mask(user)
+    if mask & permission_bit("enable_agents"): ...
+
+Role grants from ``settings.USER_ROLES`` are compiled into masks on first
+use. A user's effective mask (role | custom grants | superuser grants) is
+cached by user id, together with the ``updated_at`` it was computed from,
+for at most ``PERMISSION_CACHE_TTL_SECONDS``. Updates made by this process
+drop the entry at once (see the listeners in ``app.db.models.user``);
+updates made by another process are seen as soon as the user row is
+reloaded, since its ``updated_at`` no longer matches, and otherwise when
+the entry expires.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Granted to superusers regardless of role
+SUPERUSER_PERMISSIONS = ("read_all", "write_all")
+
+class PermissionRegistry:
+    """Interns permission names to bit positions."""
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def bit(self, name: str) -> int:
+        """Get the bit for a permission, assigning the next free one if new."""
+        bit = self._bits.get(name)
+        if bit is not None:
+            return bit
+        with self._lock:
+            if name not in self._bits:
+                self._bits[name] = 1 << len(self._names)
+                self._names.append(name)
+            return self._bits[name]
+
+    def mask(self, names: Iterable[str]) -> int:
+        """Compile permission names into a mask."""
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+    def grants_mask(self, grants: Optional[Dict[str, Any]]) -> int:
+        """Compile a ``{permission: enabled}`` dict into a mask of enabled ones."""
+        if not grants:
+            return 0
+        return self.mask(name for name, enabled in grants.items() if enabled)
+
+    def names(self, mask: int) -> List[str]:
+        """Expand a mask back into permission names, in registration order."""
+        return [name for index, name in enumerate(self._names) if mask >> index & 1]
+
+# Shared registry
+registry = PermissionRegistry()
+
+def permission_bit(name: str) -> int:
+    """Get the bit for a permission name."""
+    return registry.bit(name)
+
+class PermissionResolver:
+    """Computes and caches users' effective permission masks.
+
+    Args:
+        roles: Role name to permission names (default: settings.USER_ROLES)
+        permission_registry: Registry used to intern names
+        ttl: Seconds a cached mask is used (default: settings.PERMISSION_CACHE_TTL_SECONDS)
+    """
+
+    def __init__(self, roles: Optional[Dict[str, List[str]]] = None,
+                 permission_registry: PermissionRegistry = registry,
+                 ttl: Optional[float] = None):
+        self.registry = permission_registry
+        self._roles = roles
+        self._role_masks: Optional[Dict[str, int]] = None
+        self._superuser_mask = permission_registry.mask(SUPERUSER_PERMISSIONS)
+        self.ttl = settings.PERMISSION_CACHE_TTL_SECONDS if ttl is None else ttl
+        # user id -> (mask, updated_at it was computed from, expiry)
+        self._cache: Dict[Any, Tuple[int, Any, float]] = {}
+        # Bumped by every invalidation
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def role_mask(self, role: Optional[str]) -> int:
+        """Get the compiled mask of a role."""
+        if self._role_masks is None:
+            roles = settings.USER_ROLES if self._roles is None else self._roles
+            self._role_masks = {name: self.registry.mask(perms) for name, perms in roles.items()}
+        return self._role_masks.get(role, 0) if role else 0
+
+    def compute_mask(self, user) -> int:
+        """Compute a user's effective mask without the cache."""
+        mask = self.role_mask(user.role.value if user.role else None)
+        mask |= self.registry.grants_mask(user.permissions)
+        if user.is_superuser:
+            mask |= self._superuser_mask
+        return mask
+
+    def effective_mask(self, user) -> int:
+        """Get a user's effective mask, cached by user id.
+
+        A cached mask is used while it is fresh and was computed from the
+        same ``user.updated_at``.
+        """
+        if user.id is None:
+            # Not yet flushed; nothing stable to cache under
+            return self.compute_mask(user)
+        version = user.updated_at
+        now = time.monotonic()
+        entry = self._cache.get(user.id)
+        if entry is not None and entry[1] == version and entry[2] > now:
+            return entry[0]
+        generation = self._generation
+        mask = self.compute_mask(user)
+        with self._lock:
+            # An invalidation while computing may mean ``user`` was read before
+            # the change; the mask is still returned but not cached
+            if self._generation == generation:
+                self._cache[user.id] = (mask, version, now + self.ttl)
+        return mask
+
+    def has_permission(self, user, name: str) -> bool:
+        """Whether a user holds a permission."""
+        return bool(self.effective_mask(user) & self.registry.bit(name))
+
+    def has_all(self, user, mask: int) -> bool:
+        """Whether a user holds every permission in a precompiled mask."""
+        return self.effective_mask(user) & mask == mask
+
+    def permission_names(self, user) -> List[str]:
+        """Get a user's effective permissions as names."""
+        return self.registry.names(self.effective_mask(user))
+
+    def invalidate(self, user_id=None) -> None:
+        """Drop the cached mask of one user, or of everyone if no id is given."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._cache.clear()
+                self._role_masks = None
+            else:
+                self._cache.pop(user_id, None)
+
+# Shared resolver
+permission_resolver = PermissionResolver()
@@ -0,0 +1,310 @@
+"""rate_limit.py - Token-bucket rate limits on OTP generation and verification.
+
+Every OTP generation costs a DB query, a seed decryption, a MAC and an
+audit insert, and every verification attempt is a guess at a 6 digit
+code, so both are limited per key with token buckets: a bucket holds at
+most ``burst`` tokens, refills at ``rate`` tokens per second and each
+request takes one. The limits (``default_limits``) are:
+
+- ``otp_generate``: per agent identity
+- ``otp_verify_agent``: verification attempts per rep_id
+- ``otp_verify_source``: verification attempts per caller source (address,
+  phone number, ...)
+
+Buckets live in process memory, split into independently locked shards;
+a bucket is a few floats and buckets that refilled completely are
+dropped, since a missing bucket is a full one. ``RATE_LIMIT_STORE_URL``
+moves them to a store shared by several processes (``sqlite:///<path>``
+or ``redis://...``). While that store is unavailable, generation fails
+open (an outage must not stop OTPs altogether) but verification attempts
+fall back to per-process buckets, so codes cannot be guessed without
+limit during the outage. Denied requests are recorded as ``AuthAttempt`` rows
+through the background recorder, at most once per key and minute, so an
+abusive client cannot turn its requests into DB writes.
+"""
+
+import time
+import logging
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class RateLimit(NamedTuple):
+    """A token-bucket limit: ``burst`` requests at once, ``per_minute`` sustained."""
+
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.per_minute / 60.0
+
+def default_limits() -> Dict[str, RateLimit]:
+    """Limits configured in settings, by name."""
+    return {
+        "otp_generate": RateLimit(settings.OTP_GENERATE_PER_MINUTE, settings.OTP_GENERATE_BURST),
+        "otp_verify_agent": RateLimit(settings.OTP_VERIFY_AGENT_PER_MINUTE, settings.OTP_VERIFY_AGENT_BURST),
+        "otp_verify_source": RateLimit(settings.OTP_VERIFY_SOURCE_PER_MINUTE, settings.OTP_VERIFY_SOURCE_BURST),
+    }
+
+class RateLimitBackend(ABC):
+    """Storage of token buckets."""
+
+    @abstractmethod
+    def take(self, key: str, limit: RateLimit, now: float) -> float:
+        """Take one token from the bucket of ``key``.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        pass
+
+def _refill(tokens: float, updated: float, limit: RateLimit, now: float) -> float:
+    return min(float(limit.burst), tokens + max(0.0, now - updated) * limit.rate)
+
+def _wait(tokens: float, limit: RateLimit) -> float:
+    return (1.0 - tokens) / limit.rate if limit.rate > 0 else float("inf")
+
+class _BucketShard:
+    """One lock and the buckets of its keys: key -> (tokens, updated, full_at)."""
+
+    __slots__ = ("lock", "buckets", "last_prune")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, Tuple[float, float, float]] = {}
+        self.last_prune = 0.0
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets in process memory, sharded by key.
+
+    Args:
+        shards: Number of independently locked shards (default: settings)
+        prune_interval: Seconds between sweeps for full buckets in a shard
+    """
+
+    def __init__(self, shards: Optional[int] = None, prune_interval: float = 60.0):
+        self._shards: List[_BucketShard] = [_BucketShard() for _ in range(shards or settings.RATE_LIMIT_SHARDS)]
+        self.prune_interval = prune_interval
+
+    def take(self, key: str, limit: RateLimit, now: float) -> float:
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            tokens = float(limit.burst) if bucket is None else _refill(bucket[0], bucket[1], limit, now)
+            waited = 0.0 if tokens >= 1.0 else _wait(tokens, limit)
+            if not waited:
+                tokens -= 1.0
+            full_at = now + (limit.burst - tokens) / limit.rate if limit.rate > 0 else float("inf")
+            shard.buckets[key] = (tokens, now, full_at)
+            if now - shard.last_prune >= self.prune_interval:
+                self._prune(shard, now)
+        return waited
+
+    @staticmethod
+    def _prune(shard: _BucketShard, now: float) -> None:
+        # A bucket that refilled completely is the same as no bucket
+        for key in [k for k, (_, _, full_at) in shard.buckets.items() if full_at <= now]:
+            del shard.buckets[key]
+        shard.last_prune = now
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Buckets in a SQLite file shared by processes on one host.
+
+    Args:
+        path: Database file
+    """
+
+    def __init__(self, path: str):
+        import sqlite3
+
+        self.path = path
+        self._local = threading.local()
+        self._takes = itertools.count(1)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _conn(self):
+        import sqlite3
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        return conn
+
+    def take(self, key: str, limit: RateLimit, now: float) -> float:
+        conn = self._conn()
+        # Write lock up front: read-modify-write of one bucket across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = float(limit.burst) if row is None else _refill(row[0], row[1], limit, now)
+            waited = 0.0 if tokens >= 1.0 else _wait(tokens, limit)
+            if not waited:
+                tokens -= 1.0
+            conn.execute("INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            if next(self._takes) % 256 == 0:
+                # Occasional sweep of buckets idle for an hour (full for any sane limit)
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - 3600,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return waited
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets in Redis, updated atomically by a Lua script.
+
+    Args:
+        url: Redis URL
+    """
+
+    # KEYS[1] bucket; ARGV: rate, burst, now. Returns the wait as a string.
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = burst
+if bucket[1] then
+  tokens = math.min(burst, tonumber(bucket[1]) + math.max(0, now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisRateLimitBackend requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key: str, limit: RateLimit, now: float) -> float:
+        return float(self._script(keys=[f"rate_limit:{key}"], args=[limit.rate, limit.burst, now]))
+
+def rate_limit_backend_from_url(url: str) -> RateLimitBackend:
+    """Create the backend configured by ``url`` (in memory for an empty URL)."""
+    if not url:
+        return MemoryRateLimitBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteRateLimitBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisRateLimitBackend(url)
+    raise ValueError(f"Unsupported rate limit store URL: {url}")
+
+class RateLimiter:
+    """Named token-bucket limits over one backend.
+
+    Args:
+        limits: Limits by name (default: ``default_limits()``)
+        backend: Bucket storage (default: from settings.RATE_LIMIT_STORE_URL)
+        report_interval: Minimum seconds between two recorded denials of a key
+    """
+
+    def __init__(self, limits: Optional[Dict[str, RateLimit]] = None,
+                 backend: Optional[RateLimitBackend] = None, report_interval: float = 60.0):
+        self.limits = limits or default_limits()
+        # An empty MemoryRateLimitBackend is falsy (it has a length), so test for None
+        self.backend = backend if backend is not None else rate_limit_backend_from_url(settings.RATE_LIMIT_STORE_URL)
+        self._fallback: Optional[MemoryRateLimitBackend] = None
+        self._fallback_lock = threading.Lock()
+        self.report_interval = report_interval
+        self._reported: Dict[str, float] = {}
+        self._reported_lock = threading.Lock()
+
+    def check(self, name: str, key, now: Optional[float] = None, ip_address: Optional[str] = None) -> float:
+        """Take a token from the ``name`` bucket of ``key``.
+
+        Args:
+            name: Limit name
+            key: What is limited (identity, rep_id, caller source)
+            now: Current unix time (default: now)
+            ip_address: Client address, for the attempt log
+
+        Returns:
+            float: 0 if allowed, otherwise seconds to wait before retrying
+        """
+        limit = self.limits[name]
+        now = time.time() if now is None else now
+        bucket = f"{name}:{key}"
+        try:
+            waited = self.backend.take(bucket, limit, now)
+        except Exception as e:
+            logger.error(f"Rate limit store unavailable: {e}")
+            if not name.startswith("otp_verify"):
+                # Fail open: an unavailable shared store must not stop OTPs altogether
+                return 0.0
+            # Verification attempts are guesses: keep limiting them locally
+            waited = self.fallback_backend().take(bucket, limit, now)
+        if waited:
+            self._report(name, bucket, str(key), now, ip_address)
+        return waited
+
+    def fallback_backend(self) -> "MemoryRateLimitBackend":
+        """Per-process buckets used for verification while the store is down."""
+        if self._fallback is None:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    self._fallback = MemoryRateLimitBackend()
+        return self._fallback
+
+    def check_generation(self, identity, now: Optional[float] = None) -> float:
+        """Rate limit OTP generation for an agent identity (id or rep_id)."""
+        return self.check("otp_generate", identity, now)
+
+    def check_verification(self, agent_id, source: Optional[str] = None, now: Optional[float] = None,
+                           org_id: Optional[int] = None) -> float:
+        """Rate limit a verification attempt, per caller source and per agent.
+
+        The source is checked first, so a client guessing codes for many
+        agents is stopped without draining their buckets. short_ids are
+        only unique within an org, so the agent bucket is keyed by
+        ``(org_id, agent_id)`` (org_id defaults to settings.ORG_ID).
+        """
+        org_id = settings.ORG_ID if org_id is None else org_id
+        if source:
+            waited = self.check("otp_verify_source", source, now, ip_address=source)
+            if waited:
+                return waited
+        return self.check("otp_verify_agent", f"{org_id}:{agent_id}", now, ip_address=source)
+
+    def _report(self, name: str, bucket: str, key: str, now: float, ip_address: Optional[str]) -> None:
+        with self._reported_lock:
+            if now - self._reported.get(bucket, float("-inf")) < self.report_interval:
+                return
+            self._reported[bucket] = now
+            if len(self._reported) > 10000:
+                self._reported = {k: t for k, t in self._reported.items() if now - t < self.report_interval}
+
+        from app.core.security import auth_attempts
+        from app.db.models.blockchain import AuthAttemptResult
+
+        logger.warning(f"Rate limit {name} exceeded for {key}")
+        auth_attempts.record(key, AuthAttemptResult.RATE_LIMITED, ip_address=ip_address,
+                             details={"limit": name})
+
+# Shared rate limiter
+_rate_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the shared rate limiter."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,202 @@
+"""replay.py - Reject OTPs that were already accepted.
+
+A code is valid for its whole time window (and ``OTP_SKEW_WINDOWS`` after
+it), so without bookkeeping the same (agent, window, code) could be
+accepted any number of times. ``ReplayCache`` remembers which
+(org_id, short_id, time_window) pairs have been consumed:
+
+- entries are bucketed by time window and whole buckets are dropped once
+  their window can no longer be accepted, so memory is bounded by active
+  agents × tolerated windows and there is no per-entry timer
+- the cache is split into shards, each with its own lock, so concurrent
+  verifications of different agents rarely contend
+- a rejection is one dict lookup; only a first use goes to the optional
+  shared store (``ReplayStore``), which lets several verifier processes
+  agree that a code was used
+
+Stores are selected with ``OTP_REPLAY_STORE_URL``: ``sqlite:///<path>`` for
+processes on one host, ``redis://...`` for several hosts (needs the
+``redis`` package).
+"""
+
+import time
+import logging
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class ReplayStore(ABC):
+    """Shared record of consumed codes for multi-process verifiers."""
+
+    @abstractmethod
+    def add(self, key: str, ttl_seconds: int) -> bool:
+        """Record ``key`` for ``ttl_seconds``; returns False if it was already recorded."""
+        pass
+
+class SQLiteReplayStore(ReplayStore):
+    """Replay store in a SQLite file shared by processes on one host.
+
+    Args:
+        path: Database file
+    """
+
+    def __init__(self, path: str):
+        import sqlite3
+
+        self.path = path
+        self._local = threading.local()
+        self._adds = itertools.count(1)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS otp_replay (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    def _conn(self):
+        import sqlite3
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        return conn
+
+    def add(self, key: str, ttl_seconds: int) -> bool:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM otp_replay WHERE key = ? AND expires_at <= ?", (key, now))
+        cursor = conn.execute("INSERT OR IGNORE INTO otp_replay (key, expires_at) VALUES (?, ?)",
+                              (key, now + ttl_seconds))
+        if next(self._adds) % 256 == 0:
+            # Occasional sweep of expired keys
+            conn.execute("DELETE FROM otp_replay WHERE expires_at <= ?", (now,))
+        return cursor.rowcount == 1
+
+class RedisReplayStore(ReplayStore):
+    """Replay store in Redis (``SET NX EX``), shared across hosts.
+
+    Args:
+        url: Redis URL
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisReplayStore requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+
+    def add(self, key: str, ttl_seconds: int) -> bool:
+        return bool(self.client.set(f"otp_replay:{key}", 1, nx=True, ex=ttl_seconds))
+
+def replay_store_from_url(url: str) -> Optional[ReplayStore]:
+    """Create the replay store configured by ``url`` (None for an empty URL)."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteReplayStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisReplayStore(url)
+    raise ValueError(f"Unsupported replay store URL: {url}")
+
+class _Shard:
+    """One lock and the consumed keys of its agents, bucketed by window."""
+
+    __slots__ = ("lock", "windows", "oldest")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows: Dict[int, Set[Tuple[int, int]]] = {}
+        self.oldest = 0
+
+    def expire(self, oldest: int) -> None:
+        # Only runs when the oldest acceptable window moved on
+        if oldest <= self.oldest:
+            return
+        for window in [w for w in self.windows if w < oldest]:
+            del self.windows[window]
+        self.oldest = oldest
+
+class ReplayCache:
+    """Sharded in-memory record of consumed (org_id, short_id, time_window).
+
+    Args:
+        tolerated_windows: Windows a code stays acceptable (default:
+            settings.OTP_SKEW_WINDOWS + 1)
+        window_size: Seconds per window (default: settings.OTP_WINDOW_SIZE)
+        shards: Number of independently locked shards (default: settings)
+        store: Shared store for multi-process verifiers (default: from
+            settings.OTP_REPLAY_STORE_URL)
+    """
+
+    def __init__(self, tolerated_windows: Optional[int] = None, window_size: Optional[int] = None,
+                 shards: Optional[int] = None, store: Optional[ReplayStore] = None):
+        self.tolerated_windows = tolerated_windows or settings.OTP_SKEW_WINDOWS + 1
+        self.window_size = window_size or settings.OTP_WINDOW_SIZE
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards or settings.OTP_REPLAY_SHARDS)]
+        self.store = store if store is not None else replay_store_from_url(settings.OTP_REPLAY_STORE_URL)
+
+    def _shard(self, org_id: int, short_id: int) -> _Shard:
+        return self._shards[hash((org_id, short_id)) % len(self._shards)]
+
+    def oldest_window(self, now: Optional[float] = None) -> int:
+        """Oldest time window still accepted at ``now``."""
+        current = int((time.time() if now is None else now) // self.window_size)
+        return current - self.tolerated_windows + 1
+
+    def consume(self, short_id: int, time_window: int, org_id: Optional[int] = None,
+                now: Optional[float] = None) -> bool:
+        """Mark a code's window as used.
+
+        Args:
+            short_id: Agent's numeric ID
+            time_window: Window the accepted code belongs to
+            org_id: Organization ID (default: settings.ORG_ID)
+            now: Current unix time (default: now)
+
+        Returns:
+            bool: True on first use; False for a replay or a window too old
+            to be tracked (and therefore to be accepted)
+        """
+        org_id = settings.ORG_ID if org_id is None else org_id
+        oldest = self.oldest_window(now)
+        if time_window < oldest:
+            return False
+        shard = self._shard(org_id, short_id)
+        with shard.lock:
+            shard.expire(oldest)
+            consumed = shard.windows.setdefault(time_window, set())
+            if (org_id, short_id) in consumed:
+                return False
+            consumed.add((org_id, short_id))
+
+        if self.store is not None:
+            # Expires with the last window the code could be accepted in
+            expires_at = (time_window + self.tolerated_windows) * self.window_size
+            ttl = max(1, int(expires_at - (time.time() if now is None else now)))
+            try:
+                if not self.store.add(f"{org_id}:{short_id}:{time_window}", ttl):
+                    return False
+            except Exception as e:
+                # Fail closed: a code that cannot be recorded is not accepted
+                logger.error(f"Replay store unavailable: {e}")
+                with shard.lock:
+                    shard.windows.get(time_window, set()).discard((org_id, short_id))
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return sum(len(keys) for shard in self._shards for keys in shard.windows.values())
+
+# Shared cache
+_replay_cache: Optional[ReplayCache] = None
+
+def get_replay_cache() -> ReplayCache:
+    """Get the shared replay cache."""
+    global _replay_cache
+    if _replay_cache is None:
+        _replay_cache = ReplayCache()
+    return _replay_cache
@@ -1,2 +1,545 @@
-"""security.py"""
+"""security.py - Password hashing and user authentication.
 
+Passwords are hashed with Argon2id when ``argon2-cffi`` is installed and
+with scrypt (``hashlib.scrypt``) otherwise. Both are memory-hard, so every
+hash holds tens of MiB for tens of milliseconds; hashing therefore runs on
+a bounded worker pool (``PASSWORD_HASH_WORKERS``), which caps both CPU and
+memory use and keeps the cost off the caller's event loop or request
+thread. Both implementations release the GIL, so threads scale across
+cores.
+
+Stored hash formats:
+
+- ``$argon2id$v=19$m=...,t=...,p=...$<salt>$<hash>`` (argon2-cffi)
+- ``$scrypt$ln=<log2 N>,r=<r>,p=<p>$<salt>$<hash>`` (unpadded base64)
+- ``<sha256 hex>:<salt>`` (legacy, verify only)
+
+Hashes using an older algorithm or weaker parameters than the current
+settings are transparently upgraded on the next successful login.
+
+Sessions are JWTs (HS256/384/512, signed with ``JWT_SECRET_KEY``) carrying
+the user's id, role and effective permissions, so verifying a request
+is an HMAC and a dict lookup in the in-memory ``jti`` denylist, with no
+database access.
+"""
+
+import os
+import hmac
+import json
+import time
+import uuid
+import heapq
+import queue
+import atexit
+import base64
+import asyncio
+import hashlib
+import functools
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    from argon2 import PasswordHasher, Type
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:
+    PasswordHasher = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+SCRYPT_PREFIX = "$scrypt$"
+ARGON2_PREFIX = "$argon2"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+def _argon2_hasher():
+    """Argon2id hasher for the configured parameters, or None if unavailable."""
+    if PasswordHasher is None:
+        return None
+    return PasswordHasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_KIB,
+        parallelism=settings.ARGON2_PARALLELISM,
+        hash_len=HASH_BYTES,
+        salt_len=SALT_BYTES,
+        type=Type.ID
+    )
+
+_argon2 = _argon2_hasher()
+
+def current_algorithm() -> str:
+    """Algorithm used for new hashes ("argon2id" or "scrypt")."""
+    if settings.PASSWORD_HASH_ALGORITHM == "argon2id" and _argon2 is not None:
+        return "argon2id"
+    return "scrypt"
+
+def _scrypt(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+    n = 1 << log_n
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        # OpenSSL's default limit (32 MiB) is just below what N=2^15, r=8 needs
+        maxmem=256 * n * r * p,
+        dklen=HASH_BYTES
+    )
+
+def hash_password(password: str) -> str:
+    """Hash a password with the current algorithm and parameters.
+
+    CPU and memory heavy; prefer ``hash_password_async`` or the worker pool
+    from request handlers.
+
+    Args:
+        password: Plain text password
+
+    Returns:
+        str: Encoded hash for ``User.hashed_password``
+    """
+    if current_algorithm() == "argon2id":
+        return _argon2.hash(password)
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, settings.SCRYPT_LOG_N, settings.SCRYPT_R, settings.SCRYPT_P)
+    return (f"{SCRYPT_PREFIX}ln={settings.SCRYPT_LOG_N},r={settings.SCRYPT_R},p={settings.SCRYPT_P}"
+            f"${_b64encode(salt)}${_b64encode(digest)}")
+
+def _parse_scrypt(hashed: str) -> Tuple[int, int, int, bytes, bytes]:
+    params, salt, digest = hashed[len(SCRYPT_PREFIX):].split("$")
+    values = dict(item.split("=") for item in params.split(","))
+    return int(values["ln"]), int(values["r"]), int(values["p"]), _b64decode(salt), _b64decode(digest)
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Check a password against a stored hash of any supported format.
+
+    Args:
+        password: Plain text password
+        hashed: Stored hash
+
+    Returns:
+        bool: True if the password matches
+    """
+    try:
+        if hashed.startswith(ARGON2_PREFIX):
+            if _argon2 is None:
+                logger.error("Argon2 hash found but argon2-cffi is not installed")
+                return False
+            try:
+                return _argon2.verify(hashed, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        if hashed.startswith(SCRYPT_PREFIX):
+            log_n, r, p, salt, digest = _parse_scrypt(hashed)
+            return hmac.compare_digest(_scrypt(password, salt, log_n, r, p), digest)
+        # Legacy sha256(password + salt) hex digest
+        digest, salt = hashed.split(":", 1)
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(candidate, digest)
+    except (ValueError, KeyError) as e:
+        logger.error(f"Malformed password hash: {e}")
+        return False
+
+def needs_rehash(hashed: str) -> bool:
+    """Whether a stored hash should be replaced with one using current settings."""
+    algorithm = current_algorithm()
+    if hashed.startswith(ARGON2_PREFIX):
+        return algorithm != "argon2id" or _argon2.check_needs_rehash(hashed)
+    if hashed.startswith(SCRYPT_PREFIX):
+        if algorithm != "scrypt":
+            return True
+        try:
+            log_n, r, p, _, _ = _parse_scrypt(hashed)
+        except (ValueError, KeyError):
+            return True
+        return (log_n, r, p) != (settings.SCRYPT_LOG_N, settings.SCRYPT_R, settings.SCRYPT_P)
+    return True
+
+# Bounded pool for hash computations
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+def get_hash_pool() -> ThreadPoolExecutor:
+    """Get the shared password hashing pool."""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+        return _hash_pool
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the worker pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_pool(), hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify a password on the worker pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_pool(), verify_password, password, hashed)
+
+class AuthAttemptRecorder:
+    """Write ``AuthAttempt`` rows in batches from a background thread.
+
+    Logins only enqueue a dict; rows are inserted ``batch_size`` at a time,
+    or every ``flush_interval`` seconds, in one transaction.
+
+    Args:
+        batch_size: Rows per insert transaction
+        flush_interval: Maximum seconds a row waits before being written
+        max_queue: Attempts buffered before new ones are dropped
+    """
+
+    def __init__(self, batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def record(self, username: str, result, ip_address: Optional[str] = None,
+               user_agent: Optional[str] = None, details: Optional[Dict[str, Any]] = None) -> None:
+        """Queue an authentication attempt for writing."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait({
+                "timestamp": datetime.utcnow(),
+                "username": username[:100],
+                "ip_address": ip_address,
+                "user_agent": user_agent[:500] if user_agent else None,
+                "result": result,
+                "details": details
+            })
+        except queue.Full:
+            logger.warning("Auth attempt queue full, dropping attempt record")
+
+    def flush(self) -> int:
+        """Write all queued attempts now; returns the number written."""
+        written = 0
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def stop(self) -> None:
+        """Stop the writer thread after flushing pending attempts."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="auth-attempt-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _drain(self, block: bool) -> List[Dict[str, Any]]:
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        from app.db.base import SessionLocal
+        from app.db.models.blockchain import AuthAttempt
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(AuthAttempt, batch)
+            db.commit()
+            return len(batch)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error writing {len(batch)} auth attempts: {e}")
+            return 0
+        finally:
+            db.close()
+
+# Shared attempt recorder
+auth_attempts = AuthAttemptRecorder()
+
+# Hash verified for unknown usernames so they take as long as known ones
+_dummy_hash: Optional[str] = None
+
+def _verify_in_pool(password: str, hashed: str) -> bool:
+    return get_hash_pool().submit(verify_password, password, hashed).result()
+
+def is_locked(user, now: Optional[datetime] = None) -> bool:
+    """Whether a user is locked out after too many failed logins.
+
+    The lock lasts ``LOCKOUT_MINUTES`` from the failed attempt that set it
+    (``User.locked_until``).
+    """
+    return user.locked_until is not None and user.locked_until > (now or datetime.utcnow())
+
+def _record_failed_login(db, user, now: datetime) -> bool:
+    """Count a failed login in SQL, locking the user at the limit.
+
+    The counter is incremented by the database, so concurrent failures are
+    all counted; a lock that already expired starts the count again.
+    Returns True if this attempt locked the user.
+    """
+    from sqlalchemy import case
+    from app.db.models.user import User
+
+    expired = User.locked_until.isnot(None) & (User.locked_until <= now)
+    db.query(User).filter(User.id == user.id).update({
+        User.failed_login_attempts: case((expired, 1), else_=User.failed_login_attempts + 1),
+        User.locked_until: case((expired, None), else_=User.locked_until),
+    }, synchronize_session=False)
+    locked = db.query(User).filter(
+        User.id == user.id,
+        User.failed_login_attempts >= settings.MAX_FAILED_LOGINS,
+        User.locked_until.is_(None)
+    ).update({User.locked_until: now + timedelta(minutes=settings.LOCKOUT_MINUTES)},
+             synchronize_session=False)
+    db.commit()
+    return bool(locked)
+
+def authenticate(db, username: str, password: str, ip_address: Optional[str] = None,
+                 user_agent: Optional[str] = None):
+    """Authenticate a user by username and password.
+
+    Verification runs on the hashing pool. Failed attempts count towards
+    the lockout; a successful login resets the counter, updates
+    ``last_login`` and upgrades an outdated hash. Every attempt is recorded
+    as an ``AuthAttempt`` in the background.
+
+    Args:
+        db: Database session
+        username: Username
+        password: Plain text password
+        ip_address: Client address, for the attempt log
+        user_agent: Client user agent, for the attempt log
+
+    Returns:
+        Tuple[Optional[User], AuthAttemptResult]: The user on success, and
+        the attempt result
+    """
+    global _dummy_hash
+    from app.db.models.user import User
+    from app.db.models.blockchain import AuthAttemptResult
+
+    def finish(user, result):
+        auth_attempts.record(username, result, ip_address, user_agent)
+        return user, result
+
+    user = db.query(User).filter(User.username == username).first()
+    if user is None:
+        if _dummy_hash is None:
+            _dummy_hash = get_hash_pool().submit(hash_password, os.urandom(16).hex()).result()
+        _verify_in_pool(password, _dummy_hash)
+        return finish(None, AuthAttemptResult.INVALID_CREDENTIALS)
+
+    if not user.is_active:
+        return finish(None, AuthAttemptResult.ACCOUNT_DISABLED)
+    if is_locked(user):
+        return finish(None, AuthAttemptResult.ACCOUNT_LOCKED)
+
+    if not _verify_in_pool(password, user.hashed_password):
+        if _record_failed_login(db, user, datetime.utcnow()):
+            logger.warning(f"Locking user '{username}' after {settings.MAX_FAILED_LOGINS} failed logins")
+        return finish(None, AuthAttemptResult.INVALID_CREDENTIALS)
+
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = get_hash_pool().submit(hash_password, password).result()
+        logger.info(f"Upgraded password hash for user '{username}' to {current_algorithm()}")
+    user.failed_login_attempts = 0
+    user.locked_until = None
+    user.last_login = datetime.utcnow()
+    db.commit()
+    return finish(user, AuthAttemptResult.SUCCESS)
+
+async def authenticate_async(db, username: str, password: str, ip_address: Optional[str] = None,
+                             user_agent: Optional[str] = None):
+    """``authenticate`` for async callers; runs off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, authenticate, db, username, password, ip_address, user_agent)
+
+class TokenError(Exception):
+    """Raised when an access token is malformed, expired, forged or revoked."""
+    pass
+
+_JWT_HASHES = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+# Leeway for clock skew between token issuer and verifier
+JWT_LEEWAY_SECONDS = 30
+
+class TokenDenylist:
+    """In-memory set of revoked token ids, each kept until its token expires.
+
+    Expired entries are swept from a min-heap ordered by expiry, so the
+    denylist only ever holds tokens that would otherwise still verify.
+    """
+
+    def __init__(self, clock=time.time):
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Deny a token id until ``expires_at`` (epoch seconds)."""
+        with self._lock:
+            self._sweep()
+            if expires_at + JWT_LEEWAY_SECONDS <= self._clock():
+                return
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+
+    def is_revoked(self, jti: str) -> bool:
+        """Whether a token id has been revoked."""
+        # Lock-free read; dict lookups are atomic
+        return jti in self._expiry
+
+    def sweep(self) -> None:
+        """Drop entries whose tokens have expired."""
+        with self._lock:
+            self._sweep()
+
+    def _sweep(self) -> None:
+        cutoff = self._clock() - JWT_LEEWAY_SECONDS
+        while self._heap and self._heap[0][0] <= cutoff:
+            _, jti = heapq.heappop(self._heap)
+            self._expiry.pop(jti, None)
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+# Shared denylist
+token_denylist = TokenDenylist()
+
+# (secret, algorithm) -> (key bytes, hash function, encoded header)
+_jwt_key_cache: Dict[Tuple[str, str], Tuple[bytes, Any, str]] = {}
+
+def _jwt_key() -> Tuple[bytes, Any, str]:
+    """Signing key, hash function and encoded header for the current settings."""
+    cache_key = (settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM)
+    cached = _jwt_key_cache.get(cache_key)
+    if cached is None:
+        digestmod = _JWT_HASHES.get(settings.JWT_ALGORITHM)
+        if digestmod is None:
+            raise ValueError(f"Unsupported JWT algorithm: {settings.JWT_ALGORITHM}")
+        header = _b64url(json.dumps({"alg": settings.JWT_ALGORITHM, "typ": "JWT"},
+                                    separators=(",", ":")).encode())
+        cached = (settings.JWT_SECRET_KEY.encode(), digestmod, header)
+        _jwt_key_cache[cache_key] = cached
+    return cached
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(signing_input: str) -> str:
+    key, digestmod, _ = _jwt_key()
+    return _b64url(hmac.new(key, signing_input.encode(), digestmod).digest())
+
+def create_access_token(user, expires_minutes: Optional[int] = None,
+                        extra_claims: Optional[Dict[str, Any]] = None) -> str:
+    """Issue an access token for a user.
+
+    Args:
+        user: Authenticated User
+        expires_minutes: Lifetime (default: JWT_EXPIRATION_MINUTES)
+        extra_claims: Additional claims to include
+
+    Returns:
+        str: Signed JWT
+    """
+    from app.core.permissions import permission_resolver
+
+    now = int(time.time())
+    claims = {
+        "sub": str(user.id),
+        "username": user.username,
+        "role": user.role.value if user.role else None,
+        # Names, not the mask: bit positions are only stable within a process
+        "perms": permission_resolver.permission_names(user),
+        "iat": now,
+        "exp": now + 60 * (expires_minutes or settings.JWT_EXPIRATION_MINUTES),
+        "jti": uuid.uuid4().hex
+    }
+    if extra_claims:
+        claims.update(extra_claims)
+    _, _, header = _jwt_key()
+    signing_input = f"{header}.{_b64url(json.dumps(claims, separators=(',', ':')).encode())}"
+    return f"{signing_input}.{_sign(signing_input)}"
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Verify an access token and return its claims.
+
+    Checks the signature, expiry and denylist only; no database access.
+
+    Raises:
+        TokenError: If the token is invalid, expired or revoked
+    """
+    try:
+        header, payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        raise TokenError("Malformed token")
+    if header != _jwt_key()[2]:
+        raise TokenError("Unexpected token header")
+    if not hmac.compare_digest(signature, _sign(f"{header}.{payload}")):
+        raise TokenError("Invalid token signature")
+    try:
+        claims = json.loads(_b64url_decode(payload))
+    except ValueError:
+        raise TokenError("Malformed token payload")
+    if claims.get("exp", 0) + JWT_LEEWAY_SECONDS < time.time():
+        raise TokenError("Token expired")
+    if token_denylist.is_revoked(claims.get("jti", "")):
+        raise TokenError("Token revoked")
+    return claims
+
+def revoke_access_token(token: str) -> None:
+    """Revoke a token (e.g. on logout) until it would have expired.
+
+    Raises:
+        TokenError: If the token is not a valid token
+    """
+    claims = decode_access_token(token)
+    token_denylist.revoke(claims["jti"], claims["exp"])
+
+@functools.lru_cache(maxsize=1024)
+def _claims_mask(perms: Tuple[str, ...]) -> int:
+    from app.core.permissions import registry
+
+    return registry.mask(perms)
+
+def token_has_permission(claims: Dict[str, Any], permission: str) -> bool:
+    """Check a permission against the permissions in verified token claims."""
+    from app.core.permissions import permission_bit
+
+    return bool(_claims_mask(tuple(claims.get("perms", ()))) & permission_bit(permission))
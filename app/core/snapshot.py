@@ -0,0 +1,404 @@
+"""snapshot.py - Read-only verifier snapshots for edge verification nodes.
+
+A branch verifier only needs, per agent, whether it is active, how many
+digits its codes have and its OTP key. Rather than the database, the
+SQLAlchemy models and the Fernet/KMS keys, it gets one snapshot file that
+it ``mmap``s: opening reads a fixed header, a lookup is a few
+``struct.unpack_from`` calls on the mapping, and every process on the node
+shares the same page cache. Layout (little-endian):
+
+- header (``HEADER_SIZE`` bytes): magic, format version, record size,
+  org_id (0 for all tenants), OTP window size and algorithm, record and
+  bucket counts, creation time, change feed version, snapshot key id and
+  a SHA-256 of the body
+- hash index: ``bucket_count`` (a power of two) u32 record numbers,
+  ``EMPTY`` for a free bucket; open addressing with linear probing on
+  (org_id, short_id)
+- records (``RECORD_SIZE`` bytes each): org_id u32, short_id u32, active
+  u8, otp_digits u8, 2 reserved bytes, identity id (16 byte UUID), wrapped
+  OTP key
+
+OTP keys (seeds) are wrapped with AES-256-GCM under a snapshot key
+provisioned to edge nodes (``EDGE_SNAPSHOT_KEY_PATH``), bound to their
+(org_id, short_id), so a stolen file alone reveals no key and records
+cannot be swapped. Revoked agents are kept with the active flag cleared,
+so an edge verifier can tell a revoked agent from an unknown one.
+
+``export_snapshot`` builds a file from ``BlockchainIdentity`` (see
+scripts/export_snapshot.py) and ``apply_changes`` brings one up to date
+with a page of the agent change feed (app/core/change_feed.py) without
+the database; files are replaced atomically, so readers of the previous
+file keep a consistent mapping until they reopen.
+"""
+
+import os
+import mmap
+import time
+import uuid
+import base64
+import struct
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ZKVSNAP\x00"
+FORMAT_VERSION = 2
+
+# magic, version, record size, org_id, window size, record count, bucket
+# count, created at, change feed version, algorithm, key id, body SHA-256
+HEADER = struct.Struct("<8sHHIIIIQQ16s8s32s")
+HEADER_SIZE = 128
+
+# Seeds are stored as fixed 32-byte integers: nonce + ciphertext + tag
+SEED_BYTES = 32
+NONCE_BYTES = 12
+WRAPPED_BYTES = NONCE_BYTES + SEED_BYTES + 16
+RECORD = struct.Struct(f"<IIBBH16s{WRAPPED_BYTES}s")
+RECORD_SIZE = RECORD.size
+
+INDEX_ENTRY = struct.Struct("<I")
+EMPTY = 0xFFFFFFFF
+
+DEFAULT_KEY_PATH = Path.home() / ".zk_caller_verification" / "edge_snapshot.key"
+
+class SnapshotError(Exception):
+    """Invalid, corrupt or undecryptable snapshot."""
+    pass
+
+class SnapshotAgent(NamedTuple):
+    """One agent record of a snapshot."""
+
+    org_id: int
+    short_id: int
+    active: bool
+    otp_digits: int
+    identity_id: str
+    wrapped_key: bytes
+
+def _slot(org_id: int, short_id: int, bits: int) -> int:
+    # Fibonacci hashing of the 64-bit (org_id, short_id) key
+    key = (org_id << 32) | short_id
+    return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - bits)
+
+def key_id(key: bytes) -> bytes:
+    """Identifier of a snapshot key stored in the header (not secret)."""
+    return hashlib.sha256(b"zk-snapshot-key" + key).digest()[:8]
+
+def load_snapshot_key(path: Optional[Union[str, Path]] = None, create: bool = False) -> bytes:
+    """Read the snapshot key (base64 of 32 bytes).
+
+    Args:
+        path: Key file (default: settings.EDGE_SNAPSHOT_KEY_PATH or
+            ~/.zk_caller_verification/edge_snapshot.key)
+        create: Create a new key if the file does not exist (exporter side)
+    """
+    path = Path(path or settings.EDGE_SNAPSHOT_KEY_PATH or DEFAULT_KEY_PATH)
+    if not path.exists():
+        if not create:
+            raise SnapshotError(f"Snapshot key {path} not found")
+        path.parent.mkdir(exist_ok=True, parents=True)
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            f.write(base64.urlsafe_b64encode(AESGCM.generate_key(bit_length=256)).decode())
+        logger.warning(f"Created edge snapshot key at {path} - provision it to verification nodes")
+    key = base64.urlsafe_b64decode(path.read_text().strip())
+    if len(key) != 32:
+        raise SnapshotError(f"Snapshot key {path} is not a 256-bit key")
+    return key
+
+def _aad(org_id: int, short_id: int) -> bytes:
+    return struct.pack("<II", org_id, short_id)
+
+def wrap_seed(key: bytes, seed: int, org_id: int, short_id: int) -> bytes:
+    """Encrypt a seed for the record of (org_id, short_id)."""
+    nonce = os.urandom(NONCE_BYTES)
+    return nonce + AESGCM(key).encrypt(nonce, seed.to_bytes(SEED_BYTES, "big"), _aad(org_id, short_id))
+
+def unwrap_seed(key: bytes, wrapped: bytes, org_id: int, short_id: int) -> int:
+    """Decrypt a seed wrapped for the record of (org_id, short_id).
+
+    Raises:
+        SnapshotError: If the key or the record does not match
+    """
+    from cryptography.exceptions import InvalidTag
+
+    try:
+        plain = AESGCM(key).decrypt(wrapped[:NONCE_BYTES], wrapped[NONCE_BYTES:], _aad(org_id, short_id))
+    except InvalidTag as e:
+        raise SnapshotError(f"Record {org_id}/{short_id} does not decrypt") from e
+    return int.from_bytes(plain, "big")
+
+def write_snapshot(path: Union[str, Path], agents: Iterable[Tuple[Any, int, int, bool, int, int]], key: bytes,
+                   org_id: int = 0, algorithm: Optional[str] = None, window_size: Optional[int] = None,
+                   feed_version: int = 0) -> int:
+    """Write a snapshot file atomically.
+
+    Args:
+        path: Snapshot file
+        agents: (identity_id, org_id, short_id, active, otp_digits, seed) per agent
+        key: Snapshot key wrapping the seeds
+        org_id: Tenant of the snapshot (0 for all)
+        algorithm: OTP algorithm of the codes (default: settings.OTP_ALGORITHM)
+        window_size: OTP window size (default: settings.OTP_WINDOW_SIZE)
+        feed_version: Change feed version the snapshot is current with
+
+    Returns:
+        int: Number of records written
+
+    Raises:
+        SnapshotError: If two active agents share an (org_id, short_id)
+    """
+    return _write_records(path, [
+        SnapshotAgent(agent_org, short_id, bool(active), digits, str(identity_id),
+                      wrap_seed(key, seed, agent_org, short_id))
+        for identity_id, agent_org, short_id, active, digits, seed in agents
+    ], key_id(key), org_id, algorithm or settings.OTP_ALGORITHM, window_size or settings.OTP_WINDOW_SIZE,
+        feed_version)
+
+def _write_records(path: Union[str, Path], agents: List[SnapshotAgent], snapshot_key_id: bytes, org_id: int,
+                   algorithm: str, window_size: int, feed_version: int) -> int:
+    # A revoked agent's short ID can be reassigned: the active holder wins
+    by_short_id: Dict[Tuple[int, int], SnapshotAgent] = {}
+    for agent in agents:
+        other = by_short_id.get((agent.org_id, agent.short_id))
+        if other is not None and other.active:
+            if agent.active:
+                raise SnapshotError(f"Duplicate agent {agent.org_id}/{agent.short_id}")
+            continue
+        by_short_id[(agent.org_id, agent.short_id)] = agent
+    records = [RECORD.pack(agent.org_id, agent.short_id, int(agent.active), agent.otp_digits, 0,
+                           uuid.UUID(agent.identity_id).bytes, agent.wrapped_key)
+               for agent in by_short_id.values()]
+
+    # At most half full, so probe sequences stay short
+    bits = max(3, (2 * len(records) - 1).bit_length())
+    buckets = [EMPTY] * (1 << bits)
+    for number, record in enumerate(records):
+        agent_org, short_id = struct.unpack_from("<II", record)
+        slot = _slot(agent_org, short_id, bits)
+        while buckets[slot] != EMPTY:
+            slot = (slot + 1) & ((1 << bits) - 1)
+        buckets[slot] = number
+
+    body = struct.pack(f"<{len(buckets)}I", *buckets) + b"".join(records)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_SIZE, org_id, window_size, len(records), len(buckets),
+                         int(time.time()), feed_version, algorithm.encode(), snapshot_key_id,
+                         hashlib.sha256(body).digest())
+
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    # Write-then-rename: readers keep mapping the previous file until they reopen
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(records)
+
+def export_snapshot(db, path: Union[str, Path], key: bytes, org_id: Optional[int] = None) -> int:
+    """Write a snapshot of every agent (of ``org_id`` if given) from ``BlockchainIdentity``.
+
+    Seeds are decrypted here, once; agents whose seed cannot be decrypted
+    are left out and logged. The snapshot records the change feed version
+    read before the identities, so changes made while exporting are pulled
+    again by ``apply_changes``.
+    """
+    from app.core.change_feed import get_change_feed
+    from app.db.models.blockchain import BlockchainIdentity
+    from app.utils.crypto import decrypt
+
+    feed = get_change_feed()
+    feed.capture(db)
+    feed_version = feed.latest_version(db)
+
+    query = db.query(BlockchainIdentity)
+    if org_id is not None:
+        query = query.filter(BlockchainIdentity.org_id == org_id)
+
+    def agents():
+        for identity in query.yield_per(1000):
+            try:
+                seed = int(decrypt(identity.seed, data_key=identity.data_key_wrapped))
+            except Exception as e:
+                logger.error(f"Leaving identity {identity.id} out of the snapshot: {e}")
+                continue
+            yield identity.id, identity.org_id, identity.short_id, identity.is_active, identity.otp_digits, seed
+
+    count = write_snapshot(path, agents(), key, org_id=org_id or 0, feed_version=feed_version)
+    logger.info(f"Exported {count} agents to {path}")
+    return count
+
+class VerifierSnapshot:
+    """A snapshot file mapped read-only.
+
+    Args:
+        path: Snapshot file
+        key: Snapshot key (default: ``load_snapshot_key()``)
+
+    Raises:
+        SnapshotError: If the file is not a snapshot of a supported version
+            or was written with another key
+    """
+
+    def __init__(self, path: Union[str, Path], key: Optional[bytes] = None):
+        self.path = Path(path)
+        key = key if key is not None else load_snapshot_key()
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER_SIZE:
+            raise SnapshotError(f"{self.path} is too short to be a snapshot")
+        (magic, version, record_size, self.org_id, self.window_size, self.record_count, self.bucket_count,
+         self.created_at, self.feed_version, algorithm, self.key_id, self.checksum) = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a verifier snapshot")
+        if version != FORMAT_VERSION or record_size != RECORD_SIZE:
+            raise SnapshotError(f"{self.path} has unsupported format version {version}")
+        if self.key_id != key_id(key):
+            raise SnapshotError(f"{self.path} was written with another snapshot key")
+        self.algorithm = algorithm.rstrip(b"\x00").decode()
+        self._key = key
+        self._bits = self.bucket_count.bit_length() - 1
+        self._records_offset = HEADER_SIZE + self.bucket_count * INDEX_ENTRY.size
+        if len(self._map) != self._records_offset + self.record_count * RECORD_SIZE:
+            raise SnapshotError(f"{self.path} is truncated")
+        self._engine = None
+
+    def check(self) -> bool:
+        """Compare the body with the header's checksum (reads the whole file)."""
+        return hashlib.sha256(self._map[HEADER_SIZE:]).digest() == self.checksum
+
+    def find(self, org_id: int, short_id: int) -> Optional[SnapshotAgent]:
+        """The record of (org_id, short_id), or None if not in the snapshot."""
+        mask = self.bucket_count - 1
+        slot = _slot(org_id, short_id, self._bits)
+        for _ in range(self.bucket_count):
+            number = INDEX_ENTRY.unpack_from(self._map, HEADER_SIZE + slot * INDEX_ENTRY.size)[0]
+            if number == EMPTY:
+                return None
+            agent = self._record(number)
+            if agent.org_id == org_id and agent.short_id == short_id:
+                return agent
+            slot = (slot + 1) & mask
+        return None
+
+    def _record(self, number: int) -> SnapshotAgent:
+        org_id, short_id, active, digits, _, identity, wrapped = RECORD.unpack_from(
+            self._map, self._records_offset + number * RECORD_SIZE)
+        return SnapshotAgent(org_id, short_id, bool(active), digits, str(uuid.UUID(bytes=identity)), wrapped)
+
+    def agents(self) -> Iterator[SnapshotAgent]:
+        """Every record, in file order."""
+        for number in range(self.record_count):
+            yield self._record(number)
+
+    def seed(self, agent: SnapshotAgent) -> int:
+        """Unwrap an agent's seed."""
+        return unwrap_seed(self._key, agent.wrapped_key, agent.org_id, agent.short_id)
+
+    @property
+    def engine(self):
+        """OTP engine matching the snapshot's algorithm and window size."""
+        if self._engine is None:
+            from app.core.otp import OTPEngine
+            self._engine = OTPEngine(self.algorithm, self.window_size)
+        return self._engine
+
+    def verify(self, code: str, short_id: int, org_id: Optional[int] = None,
+               timestamp: Optional[float] = None, skew_windows: Optional[int] = None,
+               replay_cache=None) -> bool:
+        """Check a code of an active agent in the snapshot.
+
+        Args:
+            code: Code given by the caller
+            short_id: Agent's numeric ID
+            org_id: Organization ID (default: the snapshot's, else settings.ORG_ID)
+            timestamp: Unix time of the check (default: now)
+            skew_windows: Earlier windows still accepted (default: settings)
+            replay_cache: ReplayCache rejecting reused codes (optional)
+
+        Returns:
+            bool: True if the agent is active and the code matches
+        """
+        org_id = org_id if org_id is not None else (self.org_id or settings.ORG_ID)
+        agent = self.find(org_id, short_id)
+        if agent is None or not agent.active:
+            return False
+        return self.engine.verify(code, self.seed(agent), org_id, short_id, agent.otp_digits,
+                                  timestamp, skew_windows, replay_cache)
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "VerifierSnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def apply_changes(path: Union[str, Path], page: Dict[str, Any], key: bytes) -> int:
+    """Bring a snapshot up to date with a page of the agent change feed.
+
+    Runs on the verifier: only the snapshot, the page (``ChangeFeed.pull``
+    with the snapshot key, so changes carry wrapped seeds) and the key are
+    needed. Changes are applied in version order, each replacing the
+    identity's record; the file is rewritten only if the page moved the
+    snapshot's feed version.
+
+    The feed only wraps seeds of active agents, so a revocation arrives
+    without ``wrapped_key``: the record is kept with the active flag
+    cleared (an agent not in the snapshot yet gets an empty key), like a
+    revoked agent in a full export. Only ``delete`` changes drop a record,
+    and so does an active change whose seed could not be wrapped.
+
+    Args:
+        path: Snapshot file
+        page: Result of ``ChangeFeed.pull(since=<snapshot feed version>, key=...)``
+        key: Snapshot key
+
+    Returns:
+        int: Number of changes applied
+
+    Raises:
+        SnapshotError: If the page does not continue the snapshot
+    """
+    with VerifierSnapshot(path, key) as snapshot:
+        if page["since"] != snapshot.feed_version:
+            raise SnapshotError(f"Page starts at version {page['since']}, snapshot is at {snapshot.feed_version}")
+        if page["version"] == snapshot.feed_version:
+            return 0
+        agents = {agent.identity_id: agent for agent in snapshot.agents()}
+        header = (snapshot.key_id, snapshot.org_id, snapshot.algorithm, snapshot.window_size)
+
+    for change in page["changes"]:
+        identity_id = change["identity_id"]
+        if change["change"] == "delete":
+            agents.pop(identity_id, None)
+            continue
+        if change.get("wrapped_key") is not None:
+            wrapped_key = base64.b64decode(change["wrapped_key"])
+        elif not change["is_active"]:
+            previous = agents.get(identity_id)
+            wrapped_key = previous.wrapped_key if previous is not None else bytes(WRAPPED_BYTES)
+        else:
+            logger.warning(f"Change {change['version']} of identity {identity_id} has no wrapped key; "
+                           f"dropping the agent")
+            agents.pop(identity_id, None)
+            continue
+        agents[identity_id] = SnapshotAgent(
+            change["org_id"], change["short_id"], change["is_active"], change["otp_digits"],
+            identity_id, wrapped_key)
+
+    _write_records(path, list(agents.values()), *header, page["version"])
+    return len(page["changes"])
@@ -0,0 +1,102 @@
+"""startup.py - Cheap checks deciding what has to run before the UI starts.
+
+``main.py`` used to start two extra interpreters on every launch, each
+importing SQLAlchemy, cryptography and every model, just to find that the
+database was already initialized and to seed yet another batch of test
+employees. The checks here answer "does the schema need migrating?" and
+"has the database been seeded?" from markers the database already holds:
+
+- schema marker: the highest version in ``schema_version`` compared with
+  the newest migration file on disk (listed, not imported)
+- seed marker: whether the ``employees`` table has any row
+
+For SQLite both are read with the stdlib ``sqlite3`` module, so an
+up-to-date database costs a few milliseconds and never imports
+SQLAlchemy. Other databases fall back to the application engine.
+"""
+
+import os
+import re
+import logging
+from typing import NamedTuple, Optional
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Migration modules, listed by file name
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "db", "migrations", "versions")
+_MIGRATION_FILE = re.compile(r"^v(\d+)_\w+\.py$")
+
+class DatabaseMarkers(NamedTuple):
+    """State of the database as far as startup is concerned."""
+
+    # Any table exists (False for a new database)
+    initialized: bool
+    # Highest applied migration, None if migrations never ran
+    schema_version: Optional[int]
+    # Employees exist (test data or real data was loaded)
+    seeded: bool
+
+def latest_schema_version() -> int:
+    """Get the newest migration version without importing the migrations."""
+    versions = [int(match.group(1)) for match in map(_MIGRATION_FILE.match, os.listdir(MIGRATIONS_DIR))
+                if match]
+    return max(versions, default=0)
+
+def _sqlite_path(database_url: str) -> Optional[str]:
+    """File path of a SQLite URL, None for other databases."""
+    if not database_url.startswith("sqlite:///"):
+        return None
+    return database_url[len("sqlite:///"):]
+
+def read_markers(database_url: Optional[str] = None) -> DatabaseMarkers:
+    """Read the startup markers of a database.
+
+    Args:
+        database_url: Database to check (default: settings.DATABASE_URL)
+
+    Returns:
+        DatabaseMarkers: Initialization, schema and seed state
+    """
+    database_url = database_url or settings.DATABASE_URL
+    path = _sqlite_path(database_url)
+    if path is None:
+        return _read_markers_sqlalchemy()
+    if path in ("", ":memory:") or not os.path.exists(path):
+        return DatabaseMarkers(False, None, False)
+
+    import sqlite3
+
+    # Read-only: never create or lock the file for writing
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        version = None
+        if "schema_version" in tables:
+            version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+        seeded = "employees" in tables and conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone() is not None
+        return DatabaseMarkers(bool(tables), version, seeded)
+    finally:
+        conn.close()
+
+def _read_markers_sqlalchemy() -> DatabaseMarkers:
+    """Read the markers through the application engine (non-SQLite databases)."""
+    from sqlalchemy import inspect, text
+    from app.db.base import engine
+
+    tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        version = None
+        if "schema_version" in tables:
+            version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+        seeded = "employees" in tables and conn.execute(
+            text("SELECT 1 FROM employees LIMIT 1")
+        ).first() is not None
+    return DatabaseMarkers(bool(tables), version, seeded)
+
+def needs_migration(markers: DatabaseMarkers) -> bool:
+    """Check whether an initialized database is behind the newest migration."""
+    return markers.schema_version is None or markers.schema_version < latest_schema_version()
@@ -2,7 +2,7 @@
 
 import logging
 from contextlib import contextmanager
-from typing import Generator, Any
+from typing import Generator, Any, Optional
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
@@ -30,25 +30,37 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 @contextmanager
-def get_db() -> Generator[Session, None, None]:
+def get_db(org_id: Optional[int] = None) -> Generator[Session, None, None]:
     """Get a database session.
     
+    Args:
+        org_id: Tenant whose shard to open (default: the default database)
+    
     Yields:
         Session: Database session
     """
+    if org_id is not None and settings.SHARD_MAP:
+        from app.db.sharding import get_shard_router
+        with get_shard_router().session(org_id) as db:
+            yield db
+        return
+    
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def import_models() -> None:
+    """Import every model module, so ``Base.metadata`` holds all tables."""
+    # Imported here to avoid circular imports
+    from app.db.models import user, employee, blockchain  # noqa: F401
+
 def init_db() -> None:
     """Initialize the database by creating all tables."""
-    # Import models here to avoid circular imports
-    from app.db.models.user import User
-    from app.db.models.employee import Employee
-    from app.db.models.blockchain import BlockchainIdentity, AuditLog, AuthAttempt
+    import_models()
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create all tables on every tenant shard
+    from app.db.sharding import get_shard_router
+    get_shard_router().init_shards()
 
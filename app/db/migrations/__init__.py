@@ -0,0 +1,275 @@
+"""Versioned schema migrations with online DDL and resumable backfills.
+
+Migrations live in ``app/db/migrations/versions/`` as modules named
+``v<NNNN>_<name>.py`` defining ``VERSION``, ``DESCRIPTION`` and
+``upgrade(ctx)``. Applied versions are recorded in the ``schema_version``
+table; ``run_migrations`` applies the pending ones in order.
+
+``MigrationContext`` provides the operations, written so production
+tables stay available while they run:
+
+- ``add_column``: idempotent; constant defaults are metadata-only on
+  PostgreSQL 11+
+- ``create_index``: ``CREATE INDEX CONCURRENTLY`` on PostgreSQL
+- ``backfill``: walks a table by primary key in small batches, one short
+  transaction per batch, recording progress in ``backfill_progress`` so an
+  interrupted backfill resumes where it stopped
+
+DDL on PostgreSQL runs with a short ``lock_timeout``; if a long-running
+transaction holds the table it fails fast and is retried instead of
+queueing every other query behind it.
+"""
+
+import time
+import logging
+import pkgutil
+import importlib
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Bookkeeping tables, kept out of the application's Base metadata
+migration_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version", migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+backfill_progress = Table(
+    "backfill_progress", migration_metadata,
+    Column("name", String(100), primary_key=True),
+    Column("last_key", String(100), nullable=True),
+    Column("rows_done", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime, nullable=False),
+    Column("completed_at", DateTime, nullable=True),
+)
+
+class Migration:
+    """A migration module loaded from the versions package."""
+
+    def __init__(self, version: int, description: str, upgrade: Callable[["MigrationContext"], None]):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self) -> str:
+        return f"Migration({self.version:04d}, {self.description!r})"
+
+def load_migrations() -> List[Migration]:
+    """Load all migrations, ordered by version.
+
+    Raises:
+        ValueError: If two migrations share a version
+    """
+    from app.db.migrations import versions
+
+    migrations = {}
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        if not module_info.name.startswith("v"):
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        if module.VERSION in migrations:
+            raise ValueError(f"Duplicate migration version {module.VERSION}: {module_info.name}")
+        migrations[module.VERSION] = Migration(module.VERSION, module.DESCRIPTION, module.upgrade)
+    return [migrations[version] for version in sorted(migrations)]
+
+class MigrationContext:
+    """Operations available to a migration's ``upgrade``.
+
+    Args:
+        engine: Engine of the database being migrated
+        batch_size: Default rows per backfill batch
+        pause: Seconds to sleep between backfill batches (throttling)
+        lock_timeout: Seconds DDL may wait for a lock on PostgreSQL
+    """
+
+    def __init__(self, engine: Engine, batch_size: int = 500, pause: float = 0.0,
+                 lock_timeout: float = 5.0):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lock_timeout = lock_timeout
+        self.is_postgresql = engine.dialect.name == "postgresql"
+
+    def table_names(self) -> List[str]:
+        return inspect(self.engine).get_table_names()
+
+    def column_names(self, table: str) -> List[str]:
+        return [column["name"] for column in inspect(self.engine).get_columns(table)]
+
+    def index_names(self, table: str) -> List[str]:
+        return [index["name"] for index in inspect(self.engine).get_indexes(table)]
+
+    def execute(self, sql: str, retries: int = 5, autocommit: bool = False) -> None:
+        """Run a DDL statement, retrying when it cannot get its lock in time."""
+        for attempt in range(1, retries + 1):
+            try:
+                if autocommit:
+                    with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        self._set_lock_timeout(conn)
+                        conn.execute(text(sql))
+                else:
+                    with self.engine.begin() as conn:
+                        self._set_lock_timeout(conn)
+                        conn.execute(text(sql))
+                return
+            except OperationalError as e:
+                if attempt == retries or "lock" not in str(e).lower():
+                    raise
+                delay = min(30.0, 2 ** attempt)
+                logger.warning(f"Lock timeout running {sql!r}, retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def _set_lock_timeout(self, conn: Connection) -> None:
+        if self.is_postgresql:
+            conn.execute(text(f"SET lock_timeout = '{int(self.lock_timeout * 1000)}ms'"))
+
+    def create_all(self) -> None:
+        """Create any application tables that do not exist yet."""
+        from app.db.base import Base, import_models
+
+        # Callers such as scripts/migrate_db.py never import the models
+        # themselves; an empty metadata would create nothing
+        import_models()
+        Base.metadata.create_all(bind=self.engine)
+
+    def add_column(self, table: str, column: str, definition: str) -> bool:
+        """Add a column if it is missing; returns True if it was added."""
+        if table not in self.table_names() or column in self.column_names(table):
+            return False
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {table}.{column}")
+        return True
+
+    def create_index(self, name: str, table: str, columns: Sequence[str], unique: bool = False) -> bool:
+        """Create an index without blocking writes; returns True if it was created."""
+        if table not in self.table_names() or name in self.index_names(table):
+            return False
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        if self.is_postgresql:
+            # CONCURRENTLY cannot run inside a transaction block
+            self.execute(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})",
+                         autocommit=True)
+        else:
+            self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        logger.info(f"Created index {name} on {table}")
+        return True
+
+    def backfill(self, name: str, table: str, process: Callable[[Connection, List[Any]], None],
+                 key_column: str = "id", columns: Sequence[str] = ("*",), where: Optional[str] = None,
+                 batch_size: Optional[int] = None) -> int:
+        """Process a table in primary-key order, one short transaction per batch.
+
+        ``process(conn, rows)`` receives each batch and writes its updates
+        through ``conn``; the batch's progress is committed in the same
+        transaction, so rerunning after a crash skips finished batches.
+
+        Args:
+            name: Unique backfill name (progress key)
+            table: Table to walk
+            process: Callback applying the change to a batch of rows
+            key_column: Unique, ordered column to paginate on
+            columns: Columns to select (must include ``key_column``)
+            where: Optional SQL filter
+            batch_size: Rows per batch (default: context batch_size)
+
+        Returns:
+            int: Rows processed in this run
+        """
+        batch_size = batch_size or self.batch_size
+        migration_metadata.create_all(bind=self.engine)
+        with self.engine.begin() as conn:
+            progress = conn.execute(
+                select(backfill_progress).where(backfill_progress.c.name == name)
+            ).first()
+            if progress is None:
+                conn.execute(backfill_progress.insert().values(
+                    name=name, last_key=None, rows_done=0, updated_at=datetime.utcnow()
+                ))
+                last_key, rows_done = None, 0
+            elif progress.completed_at is not None:
+                logger.info(f"Backfill {name} already complete ({progress.rows_done} rows)")
+                return 0
+            else:
+                last_key, rows_done = progress.last_key, progress.rows_done
+                if last_key is not None:
+                    logger.info(f"Resuming backfill {name} after {key_column}={last_key} ({rows_done} rows done)")
+
+        select_list = ", ".join(columns)
+        processed = 0
+        while True:
+            conditions = [f"{key_column} > :last_key"] if last_key is not None else []
+            if where:
+                conditions.append(f"({where})")
+            sql = f"SELECT {select_list} FROM {table}"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            sql += f" ORDER BY {key_column} LIMIT {int(batch_size)}"
+
+            with self.engine.begin() as conn:
+                rows = conn.execute(text(sql), {"last_key": last_key}).fetchall()
+                if not rows:
+                    conn.execute(backfill_progress.update().where(backfill_progress.c.name == name).values(
+                        updated_at=datetime.utcnow(), completed_at=datetime.utcnow()
+                    ))
+                    break
+                process(conn, rows)
+                last_key = getattr(rows[-1], key_column)
+                rows_done += len(rows)
+                conn.execute(backfill_progress.update().where(backfill_progress.c.name == name).values(
+                    last_key=str(last_key), rows_done=rows_done, updated_at=datetime.utcnow()
+                ))
+            processed += len(rows)
+            logger.info(f"Backfill {name}: {rows_done} rows done")
+            if self.pause:
+                time.sleep(self.pause)
+        logger.info(f"Backfill {name} complete ({rows_done} rows)")
+        return processed
+
+def applied_versions(engine: Engine) -> List[int]:
+    """Get the versions already applied to a database."""
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return [row.version for row in conn.execute(select(schema_version.c.version))]
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    """Get the migrations not yet applied to a database, in order."""
+    applied = set(applied_versions(engine))
+    return [migration for migration in load_migrations() if migration.version not in applied]
+
+def run_migrations(engine: Engine, target: Optional[int] = None, **context_options) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: all).
+
+    Each migration is recorded only after its ``upgrade`` finished, so a
+    failed migration is retried on the next run; its operations are
+    idempotent and its backfills resume.
+
+    Returns:
+        List[int]: Versions applied
+    """
+    context = MigrationContext(engine, **context_options)
+    applied = []
+    for migration in pending_migrations(engine):
+        if target is not None and migration.version > target:
+            break
+        logger.info(f"Applying migration {migration.version:04d}: {migration.description}")
+        migration.upgrade(context)
+        with engine.begin() as conn:
+            conn.execute(schema_version.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        applied.append(migration.version)
+    return applied
@@ -0,0 +1,9 @@
+"""Baseline: create the application tables."""
+
+VERSION = 1
+DESCRIPTION = "Create application tables"
+
+def upgrade(ctx) -> None:
+    # Only creates tables that are missing, so existing databases adopt
+    # the migration history without changes
+    ctx.create_all()
@@ -0,0 +1,14 @@
+"""Add org_id to tenant tables created before multi-tenancy."""
+
+from app.core.config import settings
+from app.db.sharding import TENANT_TABLES
+
+VERSION = 2
+DESCRIPTION = "Add org_id to tenant tables"
+
+def upgrade(ctx) -> None:
+    # Existing rows belong to the deployment's single org; a constant
+    # default makes this a metadata-only change on PostgreSQL
+    for table in TENANT_TABLES:
+        ctx.add_column(table, "org_id", f"INTEGER NOT NULL DEFAULT {int(settings.ORG_ID)}")
+        ctx.create_index(f"ix_{table}_org_id", table, ["org_id"])
@@ -0,0 +1,8 @@
+"""Index audit logs by tenant and time."""
+
+VERSION = 3
+DESCRIPTION = "Index audit_logs on (org_id, timestamp)"
+
+def upgrade(ctx) -> None:
+    # Per-tenant activity views filter on org_id and sort by timestamp
+    ctx.create_index("ix_audit_logs_org_id_timestamp", "audit_logs", ["org_id", "timestamp"])
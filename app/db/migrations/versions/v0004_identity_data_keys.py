@@ -0,0 +1,8 @@
+"""Store wrapped per-identity data keys for envelope encryption."""
+
+VERSION = 4
+DESCRIPTION = "Add blockchain_identities.data_key_wrapped"
+
+def upgrade(ctx) -> None:
+    # Nullable with no default: metadata-only, existing rows stay on the app-wide key
+    ctx.add_column("blockchain_identities", "data_key_wrapped", "VARCHAR(500)")
@@ -0,0 +1,15 @@
+"""Anchor audit events on-chain through per-interval Merkle roots."""
+
+VERSION = 5
+DESCRIPTION = "Create audit_anchors, add audit_logs inclusion proof columns"
+
+def upgrade(ctx) -> None:
+    # New table only; create_all leaves existing tables untouched
+    ctx.create_all()
+    # Nullable with no default: metadata-only, existing entries are anchored later
+    uuid_type = "UUID" if ctx.is_postgresql else "CHAR(32)"
+    ctx.add_column("audit_logs", "anchor_id", f"{uuid_type} REFERENCES audit_anchors (id) ON DELETE SET NULL")
+    ctx.add_column("audit_logs", "leaf_index", "INTEGER")
+    ctx.add_column("audit_logs", "leaf_hash", "VARCHAR(64)")
+    ctx.add_column("audit_logs", "merkle_proof", "JSON")
+    ctx.create_index("ix_audit_logs_anchor_id", "audit_logs", ["anchor_id"])
@@ -0,0 +1,12 @@
+"""Add the enum values introduced since the baseline to PostgreSQL enum types."""
+
+VERSION = 6
+DESCRIPTION = "Add AGENT_OTP_VERIFY and RATE_LIMITED enum values"
+
+def upgrade(ctx) -> None:
+    # SQLite stores enums as VARCHAR; PostgreSQL enum types need the new labels.
+    # ADD VALUE cannot run inside a transaction block before PostgreSQL 12.
+    if not ctx.is_postgresql:
+        return
+    ctx.execute("ALTER TYPE auditlogaction ADD VALUE IF NOT EXISTS 'AGENT_OTP_VERIFY'", autocommit=True)
+    ctx.execute("ALTER TYPE authattemptresult ADD VALUE IF NOT EXISTS 'RATE_LIMITED'", autocommit=True)
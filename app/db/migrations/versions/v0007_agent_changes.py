@@ -0,0 +1,9 @@
+"""Agent change feed for incremental verifier sync."""
+
+VERSION = 7
+DESCRIPTION = "Create agent_changes"
+
+def upgrade(ctx) -> None:
+    # New table only; create_all leaves existing tables untouched. The feed
+    # is seeded by the first ChangeFeed.capture, which records every identity.
+    ctx.create_all()
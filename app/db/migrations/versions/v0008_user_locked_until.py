@@ -0,0 +1,9 @@
+"""Store the end of a login lockout instead of deriving it from updated_at."""
+
+VERSION = 8
+DESCRIPTION = "Add users.locked_until"
+
+def upgrade(ctx) -> None:
+    # Nullable with no default: metadata-only; a user at the failure limit
+    # before this upgrade is locked again by their next failed login
+    ctx.add_column("users", "locked_until", "TIMESTAMP")
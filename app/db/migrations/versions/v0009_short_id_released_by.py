@@ -0,0 +1,10 @@
+"""Record which identity released a short_id."""
+
+VERSION = 9
+DESCRIPTION = "Add short_id_allocations.released_by"
+
+def upgrade(ctx) -> None:
+    # Nullable with no default: metadata-only; ids released before this
+    # upgrade can only be reused after their quarantine
+    uuid_type = "UUID" if ctx.is_postgresql else "CHAR(32)"
+    ctx.add_column("short_id_allocations", "released_by", uuid_type)
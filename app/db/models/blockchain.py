@@ -6,7 +6,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 from sqlalchemy import (
     Column, String, Boolean, DateTime, ForeignKey, 
-    Integer, JSON, Text, Enum, LargeBinary
+    Integer, JSON, Text, Enum, LargeBinary, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
@@ -28,6 +28,9 @@ class BlockchainIdentity(Base):
     
     # Link to employee
     employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), nullable=False, unique=True)
+    
+    # Tenant (bank); also packed into the OTP message
+    org_id = Column(Integer, default=lambda: settings.ORG_ID, nullable=False, index=True)
     employee = relationship("Employee", back_populates="blockchain_identity")
     
     # Aleo blockchain info
@@ -35,6 +38,10 @@ class BlockchainIdentity(Base):
     private_key_encrypted = Column(String(500), nullable=False)
     view_key_encrypted = Column(String(500), nullable=False)
     
+    # Per-identity data key wrapped by the KMS; NULL for secrets encrypted
+    # with the application-wide Fernet key
+    data_key_wrapped = Column(String(500), nullable=True)
+    
     # Agent identity details
     short_id = Column(Integer, nullable=False)
     seed = Column(String(500), nullable=False)  # Encrypted
@@ -63,6 +70,7 @@ class BlockchainIdentity(Base):
         result = {
             "id": str(self.id),
             "employee_id": str(self.employee_id),
+            "org_id": self.org_id,
             "aleo_address": self.aleo_address,
             "short_id": self.short_id,
             "otp_digits": self.otp_digits,
@@ -78,6 +86,7 @@ class BlockchainIdentity(Base):
                 "private_key_encrypted": self.private_key_encrypted,
                 "view_key_encrypted": self.view_key_encrypted,
                 "seed": self.seed,
+                "data_key_wrapped": self.data_key_wrapped,
                 "badge_ciphertext": self.badge_ciphertext
             })
             
@@ -102,6 +111,7 @@ class AuditLogAction(enum.Enum):
     AGENT_ENABLE = "agent_enable"
     AGENT_REVOKE = "agent_revoke"
     AGENT_OTP_GENERATE = "agent_otp_generate"
+    AGENT_OTP_VERIFY = "agent_otp_verify"
     
     # Admin actions
     SETTINGS_UPDATE = "settings_update"
@@ -118,6 +128,7 @@ class AuditLog(Base):
     # Action details
     action = Column(Enum(AuditLogAction), nullable=False, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    org_id = Column(Integer, default=lambda: settings.ORG_ID, nullable=False, index=True)
     
     # Actor information
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
@@ -135,12 +146,21 @@ class AuditLog(Base):
     status = Column(String(20), default="success", nullable=False)
     error_message = Column(Text, nullable=True)
     
+    # On-chain anchoring: the Merkle leaf of this entry and its inclusion
+    # proof up to the root anchored for its interval
+    anchor_id = Column(UUID(as_uuid=True), ForeignKey("audit_anchors.id", ondelete="SET NULL"), nullable=True, index=True)
+    anchor = relationship("AuditAnchor")
+    leaf_index = Column(Integer, nullable=True)
+    leaf_hash = Column(String(64), nullable=True)
+    merkle_proof = Column(JSON, nullable=True)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert audit log to dictionary."""
         return {
             "id": str(self.id),
             "action": self.action.value if self.action else None,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "org_id": self.org_id,
             "user_id": str(self.user_id) if self.user_id else None,
             "ip_address": self.ip_address,
             "user_agent": self.user_agent,
@@ -148,7 +168,53 @@ class AuditLog(Base):
             "resource_id": self.resource_id,
             "details": self.details,
             "status": self.status,
-            "error_message": self.error_message
+            "error_message": self.error_message,
+            "anchor_id": str(self.anchor_id) if self.anchor_id else None,
+            "leaf_index": self.leaf_index,
+            "leaf_hash": self.leaf_hash,
+            "merkle_proof": self.merkle_proof
+        }
+
+class AuditAnchor(Base):
+    """Merkle root of one interval of audit events, anchored on-chain."""
+    
+    __tablename__ = "audit_anchors"
+    
+    # Primary key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    
+    # Interval covered
+    org_id = Column(Integer, default=lambda: settings.ORG_ID, nullable=False, index=True)
+    interval_start = Column(DateTime, nullable=False)
+    interval_end = Column(DateTime, nullable=False, index=True)
+    
+    # Merkle tree
+    root = Column(String(64), nullable=False, unique=True)
+    leaf_count = Column(Integer, nullable=False)
+    
+    # Chain transaction
+    status = Column(String(20), default="pending", nullable=False)
+    transaction_id = Column(String(100), nullable=True)
+    error_message = Column(Text, nullable=True)
+    
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    anchored_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert audit anchor to dictionary."""
+        return {
+            "id": str(self.id),
+            "org_id": self.org_id,
+            "interval_start": self.interval_start.isoformat() if self.interval_start else None,
+            "interval_end": self.interval_end.isoformat() if self.interval_end else None,
+            "root": self.root,
+            "leaf_count": self.leaf_count,
+            "status": self.status,
+            "transaction_id": self.transaction_id,
+            "error_message": self.error_message,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "anchored_at": self.anchored_at.isoformat() if self.anchored_at else None
         }
 
 class AuthAttemptResult(enum.Enum):
@@ -161,6 +227,7 @@ class AuthAttemptResult(enum.Enum):
     OTP_REQUIRED = "otp_required"
     OTP_INVALID = "otp_invalid"
     OTP_EXPIRED = "otp_expired"
+    RATE_LIMITED = "rate_limited"
 
 class AuthAttempt(Base):
     """Authentication attempt tracking for security."""
@@ -194,3 +261,155 @@ class AuthAttempt(Base):
             "details": self.details
         }
 
+
+class AclOperationType(enum.Enum):
+    """Agent lifecycle changes that must be reflected on-chain."""
+    
+    MINT = "mint"
+    REVOKE = "revoke"
+    REACTIVATE = "reactivate"
+
+class AclOperationStatus(enum.Enum):
+    """Lifecycle of a queued ACL operation."""
+    
+    PENDING = "pending"
+    SUBMITTED = "submitted"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class AclOperation(Base):
+    """Queued on-chain ACL change, flushed to the chain in batches."""
+    
+    __tablename__ = "acl_operations"
+    
+    # Primary key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    
+    # Operation details
+    operation = Column(Enum(AclOperationType), nullable=False, index=True)
+    status = Column(Enum(AclOperationStatus), default=AclOperationStatus.PENDING, nullable=False, index=True)
+    rep_id = Column(String(10), nullable=False, index=True)
+    identity_id = Column(UUID(as_uuid=True), ForeignKey("blockchain_identities.id", ondelete="CASCADE"), nullable=True)
+    identity = relationship("BlockchainIdentity")
+    
+    # Chain inputs (badge ciphertext, bank name, ...)
+    payload = Column(JSON, nullable=True)
+    
+    # Batch tracking
+    batch_id = Column(String(50), nullable=True, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    error_message = Column(Text, nullable=True)
+    
+    # Metadata
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    submitted_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert ACL operation to dictionary."""
+        return {
+            "id": str(self.id),
+            "operation": self.operation.value if self.operation else None,
+            "status": self.status.value if self.status else None,
+            "rep_id": self.rep_id,
+            "identity_id": str(self.identity_id) if self.identity_id else None,
+            "payload": self.payload,
+            "batch_id": self.batch_id,
+            "attempts": self.attempts,
+            "error_message": self.error_message,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "submitted_at": self.submitted_at.isoformat() if self.submitted_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class ShortIdAllocation(Base):
+    """Assignment of a dense numeric short_id to a blockchain identity.
+    
+    short_id is packed into two bytes of the OTP message, so each org has
+    65535 of them (0 is reserved). Released ids are recycled after a
+    quarantine period.
+    """
+    
+    __tablename__ = "short_id_allocations"
+    __table_args__ = (
+        UniqueConstraint("org_id", "short_id", name="uq_short_id_allocations_org_short_id"),
+    )
+    
+    # Primary key
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    
+    # Allocation
+    org_id = Column(Integer, nullable=False, index=True)
+    short_id = Column(Integer, nullable=False)
+    identity_id = Column(UUID(as_uuid=True), ForeignKey("blockchain_identities.id", ondelete="SET NULL"), nullable=True, unique=True)
+    
+    # Metadata
+    allocated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    released_at = Column(DateTime, nullable=True, index=True)
+    # Identity that released the id; only it may take the id back early
+    released_by = Column(UUID(as_uuid=True), nullable=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert short_id allocation to dictionary."""
+        return {
+            "id": str(self.id),
+            "org_id": self.org_id,
+            "short_id": self.short_id,
+            "identity_id": str(self.identity_id) if self.identity_id else None,
+            "allocated_at": self.allocated_at.isoformat() if self.allocated_at else None,
+            "released_at": self.released_at.isoformat() if self.released_at else None,
+            "released_by": str(self.released_by) if self.released_by else None
+        }
+
+class AgentChangeType(enum.Enum):
+    """Agent lifecycle changes published to verifiers."""
+    
+    ENABLE = "enable"
+    REVOKE = "revoke"
+    REACTIVATE = "reactivate"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class AgentChange(Base):
+    """Entry of the agent change feed pulled by remote verifiers.
+    
+    ``version`` increases with every entry; each entry carries the
+    identity's full verifier-visible state after the change.
+    """
+    
+    __tablename__ = "agent_changes"
+    
+    # Feed position
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # No foreign keys: entries outlive deleted identities and employees
+    identity_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    employee_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    org_id = Column(Integer, nullable=False, index=True)
+    change = Column(Enum(AgentChangeType), nullable=False)
+    
+    # Verifier-visible state after the change
+    short_id = Column(Integer, nullable=True)
+    is_active = Column(Boolean, nullable=False)
+    otp_digits = Column(Integer, nullable=True)
+    state_hash = Column(String(64), nullable=False)
+    
+    # BlockchainIdentity.updated_at the change was derived from
+    source_updated_at = Column(DateTime, nullable=True, index=True)
+    recorded_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert change feed entry to dictionary."""
+        return {
+            "version": self.version,
+            "identity_id": str(self.identity_id),
+            "employee_id": str(self.employee_id) if self.employee_id else None,
+            "org_id": self.org_id,
+            "change": self.change.value if self.change else None,
+            "short_id": self.short_id,
+            "is_active": self.is_active,
+            "otp_digits": self.otp_digits,
+            "recorded_at": self.recorded_at.isoformat() if self.recorded_at else None
+        }
@@ -13,6 +13,7 @@ from sqlalchemy.dialects.postgresql import UUID
 
 from app.db.base import Base
 from app.core.config import settings
+from app.core.permissions import registry as permission_registry
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -27,6 +28,9 @@ class Employee(Base):
     rep_id = Column(String(10), unique=True, nullable=False, index=True)
     username = Column(String(50), unique=True, nullable=False, index=True)
     
+    # Tenant (bank) the employee belongs to
+    org_id = Column(Integer, default=lambda: settings.ORG_ID, nullable=False, index=True)
+    
     # Personal information
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=False)
@@ -45,12 +49,18 @@ class Employee(Base):
     # Relationships
     blockchain_identity = relationship("BlockchainIdentity", back_populates="employee", uselist=False)
     
+    @property
+    def permission_mask(self) -> int:
+        """Enabled agent permissions compiled to a bitmask (see app.core.permissions)."""
+        return permission_registry.grants_mask(self.permissions)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert employee to dictionary."""
         return {
             "id": str(self.id),
             "rep_id": self.rep_id,
             "username": self.username,
+            "org_id": self.org_id,
             "first_name": self.first_name,
             "last_name": self.last_name,
             "department": self.department,
@@ -5,12 +5,13 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import enum
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, JSON, Text, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer, JSON, Text, Enum, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db.base import Base
 from app.core.config import settings
+from app.core.permissions import permission_resolver
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -49,6 +50,7 @@ class User(Base):
     
     # Security
     failed_login_attempts = Column(Integer, default=0, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
     password_reset_token = Column(String(100), nullable=True)
     password_reset_expires = Column(DateTime, nullable=True)
     
@@ -87,6 +89,7 @@ class User(Base):
         if include_security:
             result.update({
                 "failed_login_attempts": self.failed_login_attempts,
+                "locked_until": self.locked_until.isoformat() if self.locked_until else None,
                 "has_password_reset": self.password_reset_token is not None,
                 "password_reset_expires": self.password_reset_expires.isoformat() if self.password_reset_expires else None
             })
@@ -99,18 +102,21 @@ class User(Base):
         Returns:
             List[str]: List of permission strings
         """
-        # Start with role-based permissions
-        permissions = settings.USER_ROLES.get(self.role.value, []) if self.role else []
-        
-        # Add custom permissions
-        if self.permissions:
-            for perm, enabled in self.permissions.items():
-                if enabled and perm not in permissions:
-                    permissions.append(perm)
+        return permission_resolver.permission_names(self)
+    
+    def has_permission(self, permission: str) -> bool:
+        """Check whether this user holds a permission.
         
-        # Superusers have all permissions
-        if self.is_superuser:
-            permissions = list(set(permissions + ['read_all', 'write_all']))
+        Args:
+            permission: Permission name
             
-        return permissions
+        Returns:
+            bool: True if granted by role, custom permissions or superuser status
+        """
+        return permission_resolver.has_permission(self, permission)
 
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_permissions(mapper, connection, target) -> None:
+    """Drop the cached permission mask when a user changes."""
+    permission_resolver.invalidate(target.id)
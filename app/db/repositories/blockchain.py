@@ -1,2 +1,172 @@
-"""blockchain.py"""
+"""blockchain.py - Data access for blockchain identities."""
 
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db.models.blockchain import ShortIdAllocation
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# short_id is packed into two bytes of the OTP message
+MAX_SHORT_IDS = 1 << 16
+
+# short_id 0 is reserved: 0field marks empty slots in the Leo batch circuits
+FIRST_SHORT_ID = 1
+
+class ShortIdExhaustedError(Exception):
+    """Raised when an org has no free short_id left."""
+    pass
+
+class ShortIdAllocator:
+    """Allocate dense, unique short_ids per org.
+
+    New ids fill the lowest gap in an org's id space, from
+    ``FIRST_SHORT_ID`` (0 is never handed out). Released ids are
+    only handed out again after ``quarantine`` so an OTP generated for a
+    revoked agent can never verify as a new one. Uniqueness is enforced by
+    the (org_id, short_id) constraint; concurrent allocators that pick the
+    same id retry.
+
+    Args:
+        max_ids: Size of the id space per org
+        quarantine: How long a released id is held back
+    """
+
+    def __init__(self, max_ids: int = MAX_SHORT_IDS, quarantine: Optional[timedelta] = None):
+        self.max_ids = max_ids
+        if quarantine is None:
+            quarantine = timedelta(days=settings.SHORT_ID_QUARANTINE_DAYS)
+        self.quarantine = quarantine
+
+    def allocate(self, db: Session, identity_id=None, org_id: Optional[int] = None,
+                 preferred: Optional[int] = None, retries: int = 5) -> int:
+        """Allocate a short_id (flushed, not committed).
+
+        Args:
+            db: Database session
+            identity_id: Identity the id is assigned to, if it exists yet
+            org_id: Tenant (default: settings.ORG_ID)
+            preferred: Id to take back without quarantine if ``identity_id``
+                released it (a reactivated agent's old id)
+            retries: Attempts when racing another allocator
+
+        Returns:
+            int: The allocated short_id
+
+        Raises:
+            ShortIdExhaustedError: If the org has no free id
+        """
+        org_id = settings.ORG_ID if org_id is None else org_id
+        for _ in range(retries):
+            savepoint = db.begin_nested()
+            try:
+                allocation = self._reuse(db, org_id, preferred, identity_id)
+                if allocation is None:
+                    short_id = self._lowest_free(db, org_id)
+                    if short_id is None:
+                        raise ShortIdExhaustedError(f"All {self.max_ids} short_ids of org {org_id} are in use")
+                    allocation = ShortIdAllocation(org_id=org_id, short_id=short_id)
+                    db.add(allocation)
+                allocation.identity_id = identity_id
+                allocation.allocated_at = datetime.utcnow()
+                allocation.released_at = None
+                allocation.released_by = None
+                db.flush()
+                savepoint.commit()
+                return allocation.short_id
+            except IntegrityError:
+                savepoint.rollback()
+                logger.info(f"short_id race in org {org_id}, retrying")
+            except ShortIdExhaustedError:
+                savepoint.rollback()
+                raise
+        raise ShortIdExhaustedError(f"Could not allocate a short_id for org {org_id} after {retries} attempts")
+
+    def assign(self, db: Session, short_id: int, identity_id, org_id: Optional[int] = None) -> None:
+        """Attach an allocated id to an identity created after allocation."""
+        org_id = settings.ORG_ID if org_id is None else org_id
+        db.query(ShortIdAllocation).filter(
+            ShortIdAllocation.org_id == org_id,
+            ShortIdAllocation.short_id == short_id,
+            ShortIdAllocation.identity_id.is_(None),
+            ShortIdAllocation.released_at.is_(None)
+        ).update({ShortIdAllocation.identity_id: identity_id}, synchronize_session=False)
+
+    def release(self, db: Session, identity_id) -> Optional[int]:
+        """Release an identity's short_id into quarantine (not committed)."""
+        allocation = db.query(ShortIdAllocation).filter(
+            ShortIdAllocation.identity_id == identity_id
+        ).first()
+        if allocation is None:
+            return None
+        allocation.identity_id = None
+        allocation.released_at = datetime.utcnow()
+        allocation.released_by = identity_id
+        return allocation.short_id
+
+    def discard(self, db: Session, short_id: int, org_id: Optional[int] = None) -> bool:
+        """Free an id allocated for an identity that was never created (not committed).
+
+        Only an allocation not yet assigned or released is deleted, so the
+        id goes straight back to the pool. Returns True if one was deleted.
+        """
+        org_id = settings.ORG_ID if org_id is None else org_id
+        return bool(db.query(ShortIdAllocation).filter(
+            ShortIdAllocation.org_id == org_id,
+            ShortIdAllocation.short_id == short_id,
+            ShortIdAllocation.identity_id.is_(None),
+            ShortIdAllocation.released_at.is_(None)
+        ).delete(synchronize_session=False))
+
+    def _reuse(self, db: Session, org_id: int, preferred: Optional[int],
+               identity_id=None) -> Optional[ShortIdAllocation]:
+        """Find a released allocation to recycle."""
+        free = db.query(ShortIdAllocation).filter(
+            ShortIdAllocation.org_id == org_id,
+            ShortIdAllocation.short_id >= FIRST_SHORT_ID,
+            ShortIdAllocation.identity_id.is_(None),
+            ShortIdAllocation.released_at.isnot(None)
+        )
+        if preferred is not None and identity_id is not None:
+            # A returning agent may take back its own id without quarantine
+            allocation = free.filter(
+                ShortIdAllocation.short_id == preferred,
+                ShortIdAllocation.released_by == identity_id
+            ).first()
+            if allocation is not None:
+                return allocation
+        cutoff = datetime.utcnow() - self.quarantine
+        return free.filter(ShortIdAllocation.released_at <= cutoff).order_by(
+            ShortIdAllocation.short_id
+        ).first()
+
+    def _lowest_free(self, db: Session, org_id: int) -> Optional[int]:
+        """Lowest short_id of an org, from FIRST_SHORT_ID, with no allocation row."""
+        taken = db.query(ShortIdAllocation.short_id).filter(
+            ShortIdAllocation.org_id == org_id,
+            ShortIdAllocation.short_id == FIRST_SHORT_ID
+        ).first()
+        if taken is None:
+            return FIRST_SHORT_ID
+        current, following = aliased(ShortIdAllocation), aliased(ShortIdAllocation)
+        gap = db.query(func.min(current.short_id + 1)).outerjoin(
+            following,
+            and_(following.org_id == current.org_id, following.short_id == current.short_id + 1)
+        ).filter(
+            current.org_id == org_id,
+            current.short_id >= FIRST_SHORT_ID,
+            following.id.is_(None)
+        ).scalar()
+        if gap is None or gap >= self.max_ids:
+            return None
+        return gap
+
+# Shared allocator
+short_id_allocator = ShortIdAllocator()
@@ -0,0 +1,149 @@
+"""sharding.py - Per-tenant database routing.
+
+Each organisation (bank) is a tenant identified by ``org_id``. The shard
+map in ``settings.SHARD_MAP`` assigns tenants to database URLs, so a large
+bank can live in its own database while small ones share the default
+``DATABASE_URL``. Engines are created lazily and shared between tenants
+that map to the same URL; within a shared database rows are separated by
+their ``org_id`` column.
+
+Caches keyed by tenant (``tenant_cache``) keep one tenant's working set
+from evicting another's.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Tables that carry an org_id column
+TENANT_TABLES = ("employees", "blockchain_identities", "audit_logs")
+
+# org_id is packed into one byte of the OTP message
+MAX_ORG_ID = 255
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+class ShardRouter:
+    """Route tenants to engines and sessions.
+
+    Args:
+        shard_map: org_id to database URL (default: settings.SHARD_MAP)
+        default_url: URL for unmapped tenants (default: settings.DATABASE_URL)
+    """
+
+    def __init__(self, shard_map: Optional[Dict[int, str]] = None, default_url: Optional[str] = None):
+        self.shard_map = dict(settings.SHARD_MAP if shard_map is None else shard_map)
+        self.default_url = default_url or settings.DATABASE_URL
+        for org_id in self.shard_map:
+            validate_org_id(org_id)
+        self._engines: Dict[str, Engine] = {}
+        self._sessions: Dict[str, sessionmaker] = {}
+        self._lock = threading.Lock()
+
+    def url_for(self, org_id: Optional[int]) -> str:
+        """Get the database URL of a tenant."""
+        if org_id is None:
+            return self.default_url
+        return self.shard_map.get(org_id, self.default_url)
+
+    def engine_for(self, org_id: Optional[int]) -> Engine:
+        """Get (creating if needed) the engine of a tenant's shard."""
+        url = self.url_for(org_id)
+        engine = self._engines.get(url)
+        if engine is not None:
+            return engine
+        with self._lock:
+            if url not in self._engines:
+                if url == settings.DATABASE_URL:
+                    # Reuse the application's default engine
+                    from app.db.base import engine
+                else:
+                    engine = create_engine(url)
+                    if url.startswith("sqlite"):
+                        event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+                self._engines[url] = engine
+                self._sessions[url] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                logger.info(f"Opened shard {engine.url!r}")
+            return self._engines[url]
+
+    @contextmanager
+    def session(self, org_id: Optional[int]) -> Generator[Session, None, None]:
+        """Open a session on a tenant's shard."""
+        self.engine_for(org_id)
+        db = self._sessions[self.url_for(org_id)]()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def shards(self) -> List[Engine]:
+        """Get one engine per distinct shard, including the default."""
+        urls = {self.default_url, *self.shard_map.values()}
+        org_for_url = {url: org_id for org_id, url in self.shard_map.items()}
+        return [self.engine_for(org_for_url.get(url)) for url in sorted(urls)]
+
+    def init_shards(self) -> None:
+        """Bring every shard up to the latest schema version."""
+        from app.db.migrations import run_migrations
+
+        for engine in self.shards():
+            applied = run_migrations(engine)
+            if applied:
+                logger.info(f"Applied migrations {applied} to {engine.url!r}")
+
+def validate_org_id(org_id: int) -> int:
+    """Check an org_id fits the OTP message format.
+
+    Raises:
+        ValueError: If the org_id is out of range
+    """
+    if not 0 <= org_id <= MAX_ORG_ID:
+        raise ValueError(f"org_id {org_id} out of range 0-{MAX_ORG_ID}")
+    return org_id
+
+def tenant_org_ids() -> List[int]:
+    """Get the tenants this deployment serves: ``ORG_ID`` first, then mapped ones."""
+    return [settings.ORG_ID] + sorted(org_id for org_id in settings.SHARD_MAP if org_id != settings.ORG_ID)
+
+# Per-tenant caches: (org_id, name) -> dict
+_tenant_caches: Dict[Any, Dict[Any, Any]] = {}
+_tenant_caches_lock = threading.Lock()
+
+def tenant_cache(org_id: Optional[int], name: str) -> Dict[Any, Any]:
+    """Get a named cache dict private to one tenant (None: all tenants)."""
+    key = (org_id, name)
+    cache = _tenant_caches.get(key)
+    if cache is None:
+        with _tenant_caches_lock:
+            cache = _tenant_caches.setdefault(key, {})
+    return cache
+
+def clear_tenant_caches(org_id: Optional[int] = None) -> None:
+    """Clear the caches of one tenant, or of all tenants."""
+    with _tenant_caches_lock:
+        for key in list(_tenant_caches):
+            if org_id is None or key[0] == org_id:
+                del _tenant_caches[key]
+
+# Shared router
+_router: Optional[ShardRouter] = None
+
+def get_shard_router() -> ShardRouter:
+    """Get the shared shard router."""
+    global _router
+    if _router is None:
+        _router = ShardRouter()
+    return _router
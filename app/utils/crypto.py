@@ -4,11 +4,10 @@ import os
 import base64
 import logging
 import hashlib
-import hmac
 from typing import Union, Optional
 from pathlib import Path
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from app.core.config import settings
 
 # Setup logging
@@ -17,32 +16,56 @@ logger = logging.getLogger(__name__)
 # Path to store development key
 DEV_KEY_PATH = Path.home() / ".zk_caller_verification" / "dev_key.txt"
 
-# Fernet cipher for symmetric encryption
+# Fernet cipher for symmetric encryption, cached with the keys it was built from
 _fernet = None
+_fernet_keys = None
+_primary_fernet = None
+
+def _configured_keys() -> Optional[tuple]:
+    """Keys from the environment, primary first, or None if unset.
+    
+    FERNET_KEYS holds a comma-separated list during key rotation; new data
+    is encrypted with the first key and any listed key can decrypt.
+    FERNET_KEY is the single-key form.
+    """
+    value = os.environ.get("FERNET_KEYS") or os.environ.get("FERNET_KEY")
+    if not value:
+        return None
+    return tuple(key.strip() for key in value.split(",") if key.strip())
 
 def get_fernet():
-    """Get a Fernet instance for encryption/decryption.
+    """Get a (Multi)Fernet instance for encryption/decryption.
     
-    Uses environment variable FERNET_KEY if available,
+    Uses environment variables FERNET_KEYS or FERNET_KEY if available,
     otherwise looks for a saved development key.
     If no key exists, generates a new key for development.
     
+    The instance is cached until the configured keys change.
+    
     Returns:
-        Fernet: Fernet instance for encryption/decryption
+        MultiFernet: Instance encrypting with the primary key and
+        decrypting with any configured key
     """
-    # Try to get key from environment
-    key = os.environ.get("FERNET_KEY")
-    
-    if not key:
-        # Check if we have a saved development key
-        if DEV_KEY_PATH.exists():
-            try:
-                with open(DEV_KEY_PATH, "r") as f:
-                    key = f.read().strip()
-                logger.info("Using saved development key from file")
-            except Exception as e:
-                logger.error(f"Error reading saved key: {e}")
-                # Fall through to key generation
+    global _fernet, _fernet_keys, _primary_fernet
+    keys = _configured_keys()
+    if _fernet is not None and (keys is None and _fernet_keys == "dev" or keys == _fernet_keys):
+        return _fernet
+    
+    if keys:
+        fernets = [Fernet(key.encode()) for key in keys]
+        _fernet, _fernet_keys, _primary_fernet = MultiFernet(fernets), keys, fernets[0]
+        return _fernet
+    
+    key = None
+    # Check if we have a saved development key
+    if DEV_KEY_PATH.exists():
+        try:
+            with open(DEV_KEY_PATH, "r") as f:
+                key = f.read().strip()
+            logger.info("Using saved development key from file")
+        except Exception as e:
+            logger.error(f"Error reading saved key: {e}")
+            # Fall through to key generation
     
     if not key:
         # Generate a new key for development
@@ -62,14 +85,51 @@ def get_fernet():
         except Exception as e:
             logger.error(f"Error saving development key: {e}")
     
-    # Return a Fernet instance using the key
-    return Fernet(key.encode() if isinstance(key, str) else key)
+    _primary_fernet = Fernet(key.encode())
+    _fernet, _fernet_keys = MultiFernet([_primary_fernet]), "dev"
+    return _fernet
+
+def rotate(token: str) -> str:
+    """Re-encrypt a token under the primary key.
+    
+    Args:
+        token: Token encrypted with any configured key
+        
+    Returns:
+        str: Token encrypted with the primary key
+    """
+    return get_fernet().rotate(token.encode()).decode()
 
-def encrypt(data: Union[str, bytes, int]) -> str:
+def is_current(token: str) -> bool:
+    """Check whether a token is already encrypted with the primary key.
+    
+    Args:
+        token: Encrypted token
+        
+    Returns:
+        bool: True if the primary key decrypts it
+    """
+    try:
+        get_fernet()
+        _primary_fernet.decrypt(token.encode())
+        return True
+    except InvalidToken:
+        return False
+
+def _cipher(data_key: Optional[str]):
+    """Cipher for a record: its own data key if it has one, else the app-wide key."""
+    if data_key is None:
+        return get_fernet()
+    from app.utils.kms import data_key_cipher
+    return data_key_cipher(data_key)
+
+def encrypt(data: Union[str, bytes, int], data_key: Optional[str] = None) -> str:
     """Encrypt data and return as string.
     
     Args:
         data: Data to encrypt (string, bytes, or integer)
+        data_key: Wrapped per-record data key (envelope encryption, see
+            app.utils.kms); the app-wide Fernet key is used if None
         
     Returns:
         str: Encrypted data as string
@@ -81,18 +141,19 @@ def encrypt(data: Union[str, bytes, int]) -> str:
         data = data.encode()
         
     # Encrypt and return as string
-    return get_fernet().encrypt(data).decode()
+    return _cipher(data_key).encrypt(data).decode()
 
-def decrypt(token: str) -> str:
+def decrypt(token: str, data_key: Optional[str] = None) -> str:
     """Decrypt token and return as string.
     
     Args:
         token: Encrypted token
+        data_key: Wrapped data key the token was encrypted with, if any
         
     Returns:
         str: Decrypted data as string
     """
-    return get_fernet().decrypt(token.encode()).decode()
+    return _cipher(data_key).decrypt(token.encode()).decode()
 
 def generate_numeric_hash(text: str, length: int = 4) -> int:
     """Generate a numeric hash of the specified length from text.
@@ -134,22 +195,7 @@ def generate_totp(seed: int,
     Returns:
         str: Generated OTP code
     """
-    # Convert parameters to bytes
-    seed_bytes = seed.to_bytes((seed.bit_length() + 7) // 8, "big")
-    
-    # Build message: org_id(1B) ∥ rep_id_numeric(2B) ∥ time_window(8B)
-    msg = (
-        org_id.to_bytes(1, "big") +
-        rep_id_numeric.to_bytes(2, "big") +
-        time_window.to_bytes(8, "big")
-    )
-    
-    # Calculate HMAC
-    digest = hmac.new(seed_bytes, msg, hashlib.sha256).digest()
-    
-    # Generate code
-    code = int.from_bytes(digest, "big") % (10**digits)
-    
-    # Format code with leading zeros
-    return f"{code:0{digits}d}"
+    from app.core.otp import get_otp_engine
+
+    return get_otp_engine().generate(seed, org_id, rep_id_numeric, digits, time_window=time_window)
 
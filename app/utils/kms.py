@@ -0,0 +1,246 @@
+"""kms.py - Envelope encryption with pluggable key management.
+
+Each blockchain identity's secrets are encrypted with its own random data
+key (a Fernet key). The data key is stored next to them only in wrapped
+form, encrypted by a key-encryption key (KEK) that never leaves the key
+management service. Decrypting a secret therefore takes one unwrap call to
+the KMS plus a local Fernet decrypt; unwrapped data keys are kept in a
+short-lived in-memory cache so hot agents skip the KMS round trip.
+
+``LocalFileKMS`` keeps its KEKs in a keyring file and stands in for a
+cloud KMS in development; other providers implement
+``KeyManagementService`` and are selected with ``settings.KMS_PROVIDER``.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.core.config import settings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Default keyring of the local KMS
+DEFAULT_KEYRING_PATH = Path.home() / ".zk_caller_verification" / "kms_keyring.json"
+
+class KMSError(Exception):
+    """Raised when a data key cannot be wrapped or unwrapped."""
+    pass
+
+class KeyManagementService(ABC):
+    """Interface of a key management service holding key-encryption keys."""
+
+    @property
+    @abstractmethod
+    def key_id(self) -> str:
+        """Id of the KEK that wraps new data keys."""
+        pass
+
+    @abstractmethod
+    def wrap(self, data_key: bytes) -> str:
+        """Encrypt a data key with the current KEK.
+
+        Args:
+            data_key: Plaintext data key
+
+        Returns:
+            str: Wrapped key, including the id of the KEK used
+        """
+        pass
+
+    @abstractmethod
+    def unwrap(self, wrapped: str) -> bytes:
+        """Decrypt a wrapped data key.
+
+        Raises:
+            KMSError: If the KEK is unknown or the wrapped key is invalid
+        """
+        pass
+
+    def generate_data_key(self) -> Tuple[bytes, str]:
+        """Create a new data key.
+
+        Returns:
+            Tuple[bytes, str]: Plaintext data key and its wrapped form
+        """
+        data_key = Fernet.generate_key()
+        return data_key, self.wrap(data_key)
+
+    def rewrap(self, wrapped: str) -> str:
+        """Re-wrap a data key under the current KEK (KEK rotation)."""
+        return self.wrap(self.unwrap(wrapped))
+
+class LocalFileKMS(KeyManagementService):
+    """KMS stand-in keeping KEKs in a local JSON keyring.
+
+    The keyring holds every KEK ever created, so data keys wrapped before a
+    ``rotate_master_key`` still unwrap. Wrapped keys have the form
+    ``<kek id>:<Fernet token>``.
+
+    Args:
+        path: Keyring file (default: settings.KMS_KEY_PATH or
+            ~/.zk_caller_verification/kms_keyring.json); created if missing
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path or settings.KMS_KEY_PATH or DEFAULT_KEYRING_PATH)
+        self._lock = threading.Lock()
+        self._keys: Dict[str, str] = {}
+        self._ciphers: Dict[str, Fernet] = {}
+        self._primary: Optional[str] = None
+        self._load()
+
+    @property
+    def key_id(self) -> str:
+        return self._primary
+
+    def wrap(self, data_key: bytes) -> str:
+        token = self._ciphers[self._primary].encrypt(data_key)
+        return f"{self._primary}:{token.decode()}"
+
+    def unwrap(self, wrapped: str) -> bytes:
+        key_id, _, token = wrapped.partition(":")
+        kek = self._ciphers.get(key_id)
+        if kek is None:
+            raise KMSError(f"Unknown key-encryption key {key_id!r}")
+        try:
+            return kek.decrypt(token.encode())
+        except InvalidToken as e:
+            raise KMSError(f"Wrapped data key does not match key-encryption key {key_id!r}") from e
+
+    def rotate_master_key(self) -> str:
+        """Create a new KEK and make it current; returns its id."""
+        with self._lock:
+            key_id = self._new_key_id()
+            self._keys[key_id] = Fernet.generate_key().decode()
+            self._ciphers[key_id] = Fernet(self._keys[key_id].encode())
+            self._primary = key_id
+            self._save()
+        logger.info(f"Rotated local KMS key-encryption key to {key_id}")
+        return key_id
+
+    def _new_key_id(self) -> str:
+        return f"local-{len(self._keys) + 1}-{os.urandom(4).hex()}"
+
+    def _load(self) -> None:
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                keyring = json.load(f)
+            self._keys = dict(keyring["keys"])
+            self._ciphers = {key_id: Fernet(key.encode()) for key_id, key in self._keys.items()}
+            self._primary = keyring["primary"]
+            return
+        self.rotate_master_key()
+        logger.warning(f"Created local KMS keyring at {self.path} - use a real KMS in production")
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        # Write-then-rename so a crash never leaves a truncated keyring
+        temp_path = self.path.with_suffix(".tmp")
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump({"primary": self._primary, "keys": self._keys}, f)
+        os.replace(temp_path, self.path)
+
+class DataKeyCache:
+    """Thread-safe LRU cache of unwrapped data keys with a TTL.
+
+    Entries are ready-to-use Fernet instances keyed by the wrapped key, so
+    a hit skips both the KMS unwrap and the key setup. A TTL of 0 disables
+    caching.
+
+    Args:
+        ttl_seconds: How long an unwrapped key may be reused
+        max_size: Maximum number of cached keys
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_size: Optional[int] = None):
+        self.ttl_seconds = settings.DATA_KEY_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_size = settings.DATA_KEY_CACHE_SIZE if max_size is None else max_size
+        self._entries: "OrderedDict[str, Tuple[float, Fernet]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, wrapped: str) -> Optional[Fernet]:
+        """Get the cached cipher of a wrapped key, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(wrapped)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[wrapped]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(wrapped)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, wrapped: str, cipher: Fernet) -> None:
+        """Cache the cipher of a wrapped key."""
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[wrapped] = (time.monotonic() + self.ttl_seconds, cipher)
+            self._entries.move_to_end(wrapped)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached key."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Shared KMS client and data key cache
+_kms: Optional[KeyManagementService] = None
+_data_key_cache: Optional[DataKeyCache] = None
+
+def get_kms() -> KeyManagementService:
+    """Get the configured KMS client.
+
+    Raises:
+        ValueError: If settings.KMS_PROVIDER is not supported
+    """
+    global _kms
+    if _kms is None:
+        if settings.KMS_PROVIDER != "local":
+            raise ValueError(f"Unsupported KMS provider: {settings.KMS_PROVIDER}")
+        _kms = LocalFileKMS()
+    return _kms
+
+def get_data_key_cache() -> DataKeyCache:
+    """Get the shared unwrapped data key cache."""
+    global _data_key_cache
+    if _data_key_cache is None:
+        _data_key_cache = DataKeyCache()
+    return _data_key_cache
+
+def new_data_key() -> str:
+    """Create a data key for a new record; returns its wrapped form.
+
+    The plaintext key is cached, so encrypting the record's secrets right
+    after needs no unwrap.
+    """
+    data_key, wrapped = get_kms().generate_data_key()
+    get_data_key_cache().put(wrapped, Fernet(data_key))
+    return wrapped
+
+def data_key_cipher(wrapped: str) -> Fernet:
+    """Get the cipher of a wrapped data key, unwrapping through the KMS on a cache miss."""
+    cache = get_data_key_cache()
+    cipher = cache.get(wrapped)
+    if cipher is None:
+        cipher = Fernet(get_kms().unwrap(wrapped))
+        cache.put(wrapped, cipher)
+    return cipher
@@ -0,0 +1,83 @@
+"""merkle.py - SHA-256 Merkle trees with inclusion proofs.
+
+Leaves and interior nodes are hashed with distinct prefixes (``0x00`` and
+``0x01``), so an interior node can never be passed off as a leaf. A node
+without a sibling is promoted to the next level unchanged instead of being
+paired with a copy of itself, which keeps every root unambiguous for its
+set of leaves.
+
+Proofs are lists of ``[side, sibling hash]`` pairs from the leaf up, where
+``side`` says whether the sibling sits on the ``"L"`` or ``"R"``; they are
+plain JSON and are stored next to the rows they prove.
+"""
+
+import hashlib
+from typing import List, Sequence
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+# On-chain roots are field elements; 31 bytes always fit the Aleo field
+FIELD_BYTES = 31
+
+def leaf_hash(data: bytes) -> str:
+    """Hash of a leaf's data, as hex."""
+    return hashlib.sha256(LEAF_PREFIX + data).hexdigest()
+
+def node_hash(left: str, right: str) -> str:
+    """Hash of an interior node from its children's hex hashes."""
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+class MerkleTree:
+    """Merkle tree over leaf hashes.
+
+    Args:
+        leaves: Hex leaf hashes (see ``leaf_hash``), in order
+    """
+
+    def __init__(self, leaves: Sequence[str]):
+        if not leaves:
+            raise ValueError("A Merkle tree needs at least one leaf")
+        self.levels: List[List[str]] = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self) -> str:
+        """Root hash, as hex."""
+        return self.levels[-1][0]
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def proof(self, index: int) -> List[List[str]]:
+        """Inclusion proof of the leaf at ``index``."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"Leaf {index} out of range")
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                proof.append(["L" if sibling < index else "R", level[sibling]])
+            index //= 2
+        return proof
+
+def verify_proof(leaf: str, proof: Sequence[Sequence[str]], root: str) -> bool:
+    """Check that ``leaf`` is included under ``root``."""
+    current = leaf
+    for side, sibling in proof:
+        if side == "L":
+            current = node_hash(sibling, current)
+        elif side == "R":
+            current = node_hash(current, sibling)
+        else:
+            return False
+    return current == root
+
+def root_to_field(root: str) -> str:
+    """Field literal committing to a root on-chain (its first 31 bytes)."""
+    return f"{int.from_bytes(bytes.fromhex(root)[:FIELD_BYTES], 'big')}field"
@@ -2,9 +2,13 @@
 """
 Main entry point for ZK Caller Verification System.
 This script:
-1. Initializes the database if not set up
-2. Creates test data if needed
+1. Initializes or migrates the database if its schema marker is behind
+2. Creates test data if the database has not been seeded
 3. Launches the Streamlit UI
+
+Initialization and seeding run in this process, and the modules they need
+(SQLAlchemy, cryptography, the models) are only imported when one of them
+has work to do; an up-to-date database is checked with sqlite3 alone.
 """
 
 import os
@@ -13,32 +17,31 @@ import logging
 import argparse
 import subprocess
 import getpass
-from pathlib import Path
+from types import SimpleNamespace
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Make the app package importable regardless of the working directory
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
 def check_database():
-    """Check if database is initialized by verifying if tables exist."""
+    """Read the database's schema and seed markers.
+    
+    Returns:
+        DatabaseMarkers: Markers, or None if the database could not be read
+    """
+    from app.core.startup import read_markers
+    
     try:
-        # Import needed modules
-        sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
-        from app.db.base import engine
-        from sqlalchemy import inspect
-        
-        # Check if tables exist
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        
-        # If we have tables, database is initialized
-        if len(tables) > 0:
-            logger.info(f"Database exists with {len(tables)} tables")
-            return True
-        return False
+        markers = read_markers()
+        if markers.initialized:
+            logger.info(f"Database exists at schema version {markers.schema_version}")
+        return markers
     except Exception as e:
         logger.error(f"Error checking database: {e}")
-        return False
+        return None
 
 def init_database(username=None, password=None, interactive=True):
     """Initialize the database tables and admin user.
@@ -52,52 +55,43 @@ def init_database(username=None, password=None, interactive=True):
         bool: Whether initialization was successful
     """
     logger.info("Initializing database...")
+    from scripts.init_db import main as init_db_main
     
-    cmd = [sys.executable, "scripts/init_db.py"]
+    # scripts/init_db.py prompts for missing credentials
+    if not interactive and not (username and password):
+        logger.error("Admin username and password are required in non-interactive mode")
+        return False
     
-    # Add username if provided
-    if username:
-        cmd.extend(["--username", username])
-        
-    # Add password if provided
-    if password:
-        cmd.extend(["--password", password])
+    try:
+        return init_db_main(SimpleNamespace(username=username, password=password, force=False)) == 0
+    except Exception as e:
+        logger.error(f"Database initialization failed: {e}")
+        return False
+
+def migrate_database():
+    """Apply pending migrations to an existing database."""
+    logger.info("Database schema is behind, applying migrations...")
+    from app.db.base import init_db
     
     try:
-        if interactive and not (username and password):
-            # Run interactively if credentials not provided
-            logger.info("Running database initialization interactively...")
-            result = subprocess.run(cmd)
-            return result.returncode == 0
-        else:
-            # Run non-interactively with provided credentials
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            logger.info("Database initialization completed.")
-            return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Database initialization failed: {e.stderr}")
+        init_db()
+        return True
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}")
         return False
 
 def create_test_data(count=10, enable=0):
     """Create test data for the application."""
     logger.info(f"Creating test data: {count} employees, {enable} enabled agents...")
+    from scripts.create_test_data import main as create_test_data_main
+    
     try:
-        # Run the create_test_data.py script
-        result = subprocess.run(
-            [sys.executable, "scripts/create_test_data.py", "--count", str(count), "--enable", str(enable)],
-            capture_output=True, 
-            text=True,
-            check=True
-        )
+        if create_test_data_main(SimpleNamespace(count=count, enable=enable)) != 0:
+            return False
         logger.info("Test data creation completed.")
         return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Test data creation failed: {e.stderr}")
+    except Exception as e:
+        logger.error(f"Test data creation failed: {e}")
         return False
 
 def launch_streamlit():
@@ -127,14 +121,17 @@ def main():
     parser.add_argument("--username", help="Admin username for database initialization")
     parser.add_argument("--password", help="Admin password for database initialization")
     parser.add_argument("--non-interactive", action="store_true", help="Run in non-interactive mode")
+    parser.add_argument("--prepare-only", action="store_true", help="Prepare the database and exit without launching the UI")
     
     args = parser.parse_args()
     
     # Check if database is initialized
-    db_initialized = check_database()
+    markers = check_database()
+    if markers is None:
+        return 1
     
     # Initialize database if needed
-    if not db_initialized and not args.skip_init:
+    if not markers.initialized and not args.skip_init:
         # If running non-interactively, ensure credentials are provided
         if args.non_interactive and not (args.username and args.password):
             logger.error("In non-interactive mode, both --username and --password must be provided")
@@ -158,11 +155,23 @@ def main():
         if not init_database(username, password, not args.non_interactive):
             logger.error("Failed to initialize database. Exiting.")
             return 1
+    elif markers.initialized and not args.skip_init:
+        from app.core.startup import needs_migration
+        
+        # Bring an existing database up to the newest schema
+        if needs_migration(markers) and not migrate_database():
+            logger.error("Failed to migrate database. Exiting.")
+            return 1
     
-    # Create test data if requested
-    if not args.skip_test_data:
+    # Create test data unless the database already holds employees
+    if not args.skip_test_data and not markers.seeded:
         if not create_test_data(args.employees, args.agents):
             logger.warning("Failed to create test data, but continuing with app launch.")
+    elif not args.skip_test_data:
+        logger.info("Database already seeded, skipping test data creation")
+    
+    if args.prepare_only:
+        return 0
     
     # Launch Streamlit UI
     process = launch_streamlit()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Agent change feed script.
+
+Captures agent lifecycle changes (enable, revoke, reactivate, delete) into
+the versioned change feed (app/core/change_feed.py) and compacts
+superseded entries. Run it from cron, every few seconds to a minute; the
+dashboard also captures right after an agent is enabled, revoked or
+reactivated. With
+--pull it prints the page of changes after a version as JSON, for
+verifiers that cannot reach the database (--wrap adds seeds wrapped with
+the edge snapshot key, for scripts/export_snapshot.py --apply).
+
+Example:
+    python scripts/agent_changes.py --compact
+    python scripts/agent_changes.py --pull 120 --wrap > page.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import get_db, init_db
+from app.core.change_feed import get_change_feed
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+def main(args):
+    """Main function."""
+    init_db()
+    feed = get_change_feed()
+    with get_db(args.org_id) as db:
+        if args.pull is not None:
+            key = None
+            if args.wrap:
+                from app.core.snapshot import load_snapshot_key
+                key = load_snapshot_key(args.key_file)
+            page = feed.pull(db, since=args.pull, limit=args.limit, org_id=args.org_id, key=key)
+            print(json.dumps(page, indent=2))
+            return 0
+
+        captured = feed.capture(db, full=args.full)
+        compacted = feed.compact(db) if args.compact else 0
+        logger.info(f"Captured {captured} change(s), compacted {compacted}; "
+                    f"feed at version {feed.latest_version(db)}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture, compact and pull the agent change feed")
+    parser.add_argument("--full", action="store_true", help="Reconcile every identity (finds deletions)")
+    parser.add_argument("--compact", action="store_true", help="Delete superseded entries past the retention")
+    parser.add_argument("--pull", type=int, metavar="VERSION", help="Print the changes after VERSION as JSON")
+    parser.add_argument("--limit", type=int, default=1000, help="Maximum changes per page")
+    parser.add_argument("--org-id", type=int, help="Only changes of this organization")
+    parser.add_argument("--wrap", action="store_true", help="Include seeds wrapped with the edge snapshot key")
+    parser.add_argument("--key-file", help="Snapshot key file (default: settings.EDGE_SNAPSHOT_KEY_PATH)")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
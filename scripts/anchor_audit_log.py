@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Audit anchoring script.
+
+Anchors OTP generation and verification audit events on-chain: each
+closed interval (AUDIT_ANCHOR_INTERVAL_SECONDS) of events is reduced to one
+Merkle root, submitted in a single transaction, and every event stores
+its inclusion proof. Run it from cron (e.g. every interval); intervals
+that fail are retried on the next run. Use --verify to check the proofs
+of anchored events instead.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import get_db, init_db
+from app.db.models.blockchain import AuditLog
+from app.blockchain.audit_anchor import AuditAnchorer
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def verify(args) -> int:
+    """Check every anchored event against its root."""
+    reader = None
+    if args.check_chain:
+        from utils.mapping_reader import get_mapping_reader
+        reader = get_mapping_reader()
+
+    checked = invalid = 0
+    with get_db() as db:
+        for log in db.query(AuditLog).filter(AuditLog.anchor_id.isnot(None)).yield_per(1000):
+            checked += 1
+            if not AuditAnchorer.verify(log, reader):
+                invalid += 1
+                logger.error(f"Audit entry {log.id} does not match its anchored root")
+    logger.info(f"Checked {checked} anchored audit entries, {invalid} invalid")
+    return 1 if invalid else 0
+
+def main(args):
+    """Main function."""
+    init_db()
+    if args.verify:
+        return verify(args)
+
+    with get_db() as db:
+        summary = AuditAnchorer().anchor(db)
+
+    logger.info(f"Anchored {summary['events']} audit event(s) in {summary['intervals']} interval(s), "
+                f"{summary['failed']} interval(s) failed")
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Anchor audit events on-chain as per-interval Merkle roots")
+    parser.add_argument("--verify", action="store_true", help="Verify inclusion proofs of anchored events")
+    parser.add_argument("--check-chain", action="store_true", help="With --verify, also read roots from the chain")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Envelope decryption benchmark.
+
+Measures seed decryptions per second for identities with per-record data
+keys, with and without the unwrapped data key cache, against the
+app-wide Fernet key as a baseline. Lookups follow a hot/cold split (most
+OTP requests come from a small set of busy agents). A real KMS is a
+network call; --kms-latency-ms adds that round trip to every unwrap of the
+local stand-in.
+
+Example:
+    python scripts/benchmark_envelope.py --identities 2000 --kms-latency-ms 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils import crypto, kms
+
+class SlowKMS(kms.LocalFileKMS):
+    """Local KMS with a simulated network round trip per unwrap."""
+
+    def __init__(self, path: str, latency: float):
+        super().__init__(path)
+        self.latency = latency
+        self.unwraps = 0
+
+    def unwrap(self, wrapped: str) -> bytes:
+        self.unwraps += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return super().unwrap(wrapped)
+
+def workload(count: int, identities: int, hot_fraction: float, hot_share: float, seed: int = 0):
+    """Indexes of the identities decrypted, hot agents getting ``hot_share`` of lookups."""
+    rng = random.Random(seed)
+    hot = max(1, int(identities * hot_fraction))
+    return [rng.randrange(hot) if rng.random() < hot_share else rng.randrange(identities)
+            for _ in range(count)]
+
+def run(records, order, data_keys: bool) -> float:
+    """Decrypt the records in ``order``; returns decryptions per second."""
+    start = time.perf_counter()
+    for index in order:
+        token, wrapped = records[index]
+        crypto.decrypt(token, data_key=wrapped if data_keys else None)
+    return len(order) / (time.perf_counter() - start)
+
+def main(args):
+    """Main function."""
+    keyring = os.path.join(tempfile.mkdtemp(), "kms_keyring.json")
+    kms._kms = slow_kms = SlowKMS(keyring, args.kms_latency_ms / 1000)
+
+    # Records under per-identity data keys, and the same seeds under the app-wide key
+    enveloped, legacy = [], []
+    for _ in range(args.identities):
+        seed = str(random.getrandbits(32))
+        wrapped = kms.get_kms().generate_data_key()[1]
+        enveloped.append((crypto.encrypt(seed, data_key=wrapped), wrapped))
+        legacy.append((crypto.encrypt(seed), None))
+    order = workload(args.decrypts, args.identities, args.hot_fraction, args.hot_share)
+
+    print(f"Identities: {args.identities}  decrypts: {args.decrypts}  "
+          f"hot: {args.hot_fraction:.0%} of agents get {args.hot_share:.0%} of lookups  "
+          f"KMS latency: {args.kms_latency_ms} ms")
+    print(f"{'mode':<24} {'decrypts/s':>12} {'KMS unwraps':>12} {'hit rate':>9}")
+
+    rate = run(legacy, order, data_keys=False)
+    print(f"{'app-wide key':<24} {rate:>12.0f} {'-':>12} {'-':>9}")
+
+    for label, ttl in (("data keys, no cache", 0), (f"data keys, {args.ttl:g}s cache", args.ttl)):
+        kms._data_key_cache = cache = kms.DataKeyCache(ttl_seconds=ttl, max_size=args.cache_size)
+        slow_kms.unwraps = 0
+        rate = run(enveloped, order, data_keys=True)
+        lookups = cache.hits + cache.misses
+        print(f"{label:<24} {rate:>12.0f} {slow_kms.unwraps:>12} "
+              f"{cache.hits / lookups if lookups else 0:>9.1%}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark envelope decryption with and without the data key cache")
+    parser.add_argument("--identities", type=int, default=1000, help="Number of identities")
+    parser.add_argument("--decrypts", type=int, default=20000, help="Decryptions per mode")
+    parser.add_argument("--hot-fraction", type=float, default=0.05, help="Fraction of agents that are hot")
+    parser.add_argument("--hot-share", type=float, default=0.9, help="Share of lookups going to hot agents")
+    parser.add_argument("--kms-latency-ms", type=float, default=0.0, help="Simulated KMS round trip per unwrap")
+    parser.add_argument("--ttl", type=float, default=300.0, help="Data key cache TTL in seconds")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Data key cache size")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Login throughput benchmark.
+
+Measures password verifications per second through the bounded hashing
+pool for increasing worker counts, and reports throughput per core. With
+--full, runs complete ``authenticate`` calls (lookup, verify, counter
+update, attempt logging) against a temporary SQLite database.
+
+Example:
+    python scripts/benchmark_login.py --algorithm scrypt --seconds 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def run_verifications(workers: int, seconds: float, hashed: str, password: str) -> int:
+    """Verify ``password`` on ``workers`` threads for ``seconds``; returns the count."""
+    from app.core.security import verify_password
+
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        done = 0
+        while time.perf_counter() < deadline:
+            verify_password(password, hashed)
+            done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda _: worker(), range(workers)))
+
+def run_logins(workers: int, seconds: float, username: str, password: str) -> int:
+    """Run full ``authenticate`` calls on ``workers`` threads for ``seconds``."""
+    from app.core.security import authenticate
+    from app.db.base import get_db
+
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        done = 0
+        with get_db() as db:
+            while time.perf_counter() < deadline:
+                user, _ = authenticate(db, username, password, ip_address="127.0.0.1")
+                assert user is not None
+                done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda _: worker(), range(workers)))
+
+def main(args):
+    """Main function."""
+    if args.full:
+        # Must be set before the engine is created on import
+        os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+    from app.core.config import settings
+    from app.core import security
+
+    settings.PASSWORD_HASH_ALGORITHM = args.algorithm
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, max(1, cores // 2), cores})
+    settings.PASSWORD_HASH_WORKERS = max(worker_counts)
+
+    password = "correct horse battery staple"
+    hashed = security.hash_password(password)
+    print(f"Algorithm: {security.current_algorithm()}  ({hashed.split('$')[2] if hashed.startswith('$') else 'legacy'})")
+    print(f"Cores: {cores}")
+
+    if args.full:
+        from app.db.base import get_db, init_db
+        from app.db.models.user import User, UserRole
+
+        init_db()
+        with get_db() as db:
+            db.add(User(username="bench", hashed_password=hashed, role=UserRole.HR_STAFF))
+            db.commit()
+
+    print(f"{'workers':>8} {'logins/s':>10} {'per core':>10} {'ms/login':>10}")
+    for workers in worker_counts:
+        if args.full:
+            count = run_logins(workers, args.seconds, "bench", password)
+        else:
+            count = run_verifications(workers, args.seconds, hashed, password)
+        rate = count / args.seconds
+        print(f"{workers:>8} {rate:>10.1f} {rate / min(workers, cores):>10.1f} "
+              f"{1000 * workers / rate if rate else float('inf'):>10.1f}")
+
+    if args.full:
+        security.auth_attempts.stop()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login throughput")
+    parser.add_argument("--algorithm", choices=["argon2id", "scrypt"], default="argon2id",
+                        help="Hash algorithm (argon2id falls back to scrypt if unavailable)")
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts to measure")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each measurement")
+    parser.add_argument("--full", action="store_true",
+                        help="Benchmark full authenticate() calls against a temporary database")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Startup time budget check.
+
+Measures, in fresh interpreters against a temporary SQLite database:
+
+- import time of ``main`` and ``app.core.startup`` (``python -X importtime``)
+- warm start: ``main.py --prepare-only`` on an initialized, seeded database,
+  i.e. everything main.py does before spawning Streamlit
+- the previous startup path on the same database for reference: importing
+  the engine and models to inspect the tables, then running
+  ``scripts/create_test_data.py`` in a second interpreter
+
+Exits with status 1 if a measurement is over its budget, so it can run in
+CI.
+
+Example:
+    python scripts/check_startup_budget.py --runs 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Budgets in milliseconds
+IMPORT_BUDGETS_MS = {
+    "main": 50.0,
+    "app.core.startup": 30.0,
+}
+WARM_START_BUDGET_MS = 250.0
+
+def import_time_ms(module: str, env: dict) -> float:
+    """Cumulative import time of ``module`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+def wall_time_ms(cmd, env: dict, runs: int) -> float:
+    """Median wall time of ``cmd`` over ``runs`` runs."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main(args):
+    """Main function."""
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DB_PATH=os.path.join(workdir, "startup.db"), HOME=workdir)
+
+    # First start initializes and seeds the database
+    subprocess.run([sys.executable, "main.py", "--prepare-only", "--non-interactive",
+                    "--username", "admin", "--password", "budget-check"],
+                   cwd=ROOT, env=env, capture_output=True, check=True)
+
+    over_budget = False
+    print(f"{'measurement':<36} {'ms':>9} {'budget':>9}")
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        elapsed = min(import_time_ms(module, env) for _ in range(args.runs))
+        over_budget |= elapsed > budget
+        print(f"{'import ' + module:<36} {elapsed:>9.1f} {budget:>9.0f}{'  OVER' if elapsed > budget else ''}")
+
+    warm = wall_time_ms([sys.executable, "main.py", "--prepare-only"], env, args.runs)
+    over_budget |= warm > WARM_START_BUDGET_MS
+    print(f"{'warm start (main.py --prepare-only)':<36} {warm:>9.1f} {WARM_START_BUDGET_MS:>9.0f}"
+          f"{'  OVER' if warm > WARM_START_BUDGET_MS else ''}")
+
+    if not args.skip_legacy:
+        inspect_cmd = [sys.executable, "-c",
+                       "from sqlalchemy import inspect; from app.db.base import engine; "
+                       "import app.db.models.user, app.db.models.employee, app.db.models.blockchain; "
+                       "inspect(engine).get_table_names()"]
+        seed_cmd = [sys.executable, "scripts/create_test_data.py", "--count", "10"]
+        legacy = wall_time_ms(inspect_cmd, env, args.runs) + wall_time_ms(seed_cmd, env, args.runs)
+        print(f"{'previous startup path (reference)':<36} {legacy:>9.1f} {'-':>9}")
+        print(f"Warm start takes {warm / legacy:.0%} of the previous startup path")
+
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check startup time against its budget")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not measure the previous startup path")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
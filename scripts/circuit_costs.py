@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Circuit cost harness.
+
+Runs every transition of the Leo programs on fixed sample inputs and
+records, per build, its constraint count and proving time:
+
+- each build is identified by the hash of its sources (see
+  utils.build_cache), so a row always describes exactly one circuit
+- rows are appended to a JSON lines history (one per transition and
+  build) and also feed the cost model used by the batch planner
+- the report compares every transition with the most recent different
+  build in the history; --max-regression fails the run (exit status 1)
+  when constraints grew by more than the given percentage
+
+--check-parity additionally runs generate_otp on random inputs and
+compares each output with the Python reference
+(agent_otp_generation/otp_reference.py).
+
+Example:
+    python scripts/circuit_costs.py --runs 3 --max-regression 5
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import argparse
+import logging
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from utils.blockchain import blockchain_call, extract_leo_output
+from utils.build_cache import get_build_cache
+from utils.costs import COST_CACHE_DIR
+from agent_otp_generation.otp_reference import generate_otp
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Leo projects measured, relative to the repository root
+PROJECTS = ("agent_manager", "agent_otp_generation", "agent_otp_proof")
+
+DEFAULT_HISTORY = COST_CACHE_DIR.parent / "circuit_costs.jsonl"
+
+# Sample OTP inputs: seed, rep_id, bank_name, timestamp
+SAMPLE_OTP = (123, 1233, 5678, 1747100401)
+
+def verification(slot: int) -> str:
+    """Verification struct literal for verify_otps."""
+    otp = generate_otp(*SAMPLE_OTP)
+    return (f"{{ enabled: true, agent_id: {slot + 1}field, timestamp: 1747100401u64, provided_otp: {otp}u32, "
+            f"agent_status: 1u8, expected_otp: {otp}u32, current_time: 1747100420u64 }}")
+
+def sample_inputs(agent_record: str):
+    """Inputs of every measured transition, by project and function.
+
+    ``leo run`` does not consume records, so one minted record serves every
+    transition taking an Agent.
+    """
+    seed, rep_id, bank_name, timestamp = SAMPLE_OTP
+    otp = generate_otp(*SAMPLE_OTP)
+    return {
+        "agent_manager": {
+            "mint_agent": ["1234field", "5678field"],
+            "mint_agents": ["[1field, 2field, 3field, 4field]", "[5field, 5field, 5field, 5field]"],
+            "revoke_agent": [agent_record],
+            "revoke_agents": [agent_record] * 4,
+            "is_agent_active": [agent_record],
+        },
+        "agent_otp_generation": {
+            "generate_otp": [f"{rep_id}field", f"{bank_name}field", f"{timestamp}u64", f"{seed}field"],
+            "prove_otp_generation": [f"{rep_id}field", f"{bank_name}field", f"{seed}field",
+                                     f"{timestamp}u64", f"{otp}u32"],
+            "anchor_audit_root": ["1field", "8u32", "1747101600u64"],
+        },
+        "agent_otp_proof": {
+            "verify_otp": ["1field", f"{timestamp}u64", f"{otp}u32", "1u8", f"{otp}u32",
+                           "1747100420u64", "60u64"],
+            "verify_otps": [f"[{', '.join(verification(slot) for slot in range(8))}]", "60u64"],
+            "is_time_valid": [f"{timestamp}u64", "1747100420u64", "60u64"],
+        },
+    }
+
+def program_id(project_path: str) -> str:
+    with open(os.path.join(project_path, "program.json")) as f:
+        return json.load(f)["program"]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def measure(program: str, function: str, inputs, project_path: str, runs: int) -> dict:
+    """Constraint count and median proving time of one transition."""
+    constraints, durations = None, []
+    for _ in range(runs):
+        result = blockchain_call(program, function, inputs, project_path=project_path)
+        if not result.get("success"):
+            raise RuntimeError(f"{program}/{function} failed: {result.get('stderr') or result.get('error')}")
+        constraints = result["constraints"].get(f"{program}/{function}", constraints)
+        durations.append(result["duration"])
+    return {"constraints": constraints, "seconds": statistics.median(durations)}
+
+def load_history(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def previous_row(history: list, transition: str, build: str):
+    """Most recent row of ``transition`` recorded for another build."""
+    for row in reversed(history):
+        if row["transition"] == transition and row["build"] != build:
+            return row
+    return None
+
+def check_parity(project_path: str, program: str, samples: int) -> int:
+    """Compare generate_otp outputs with the Python reference; returns mismatches."""
+    rng = random.Random(0)
+    mismatches = 0
+    for _ in range(samples):
+        seed, rep_id, bank_name = (rng.getrandbits(rng.choice((8, 32, 64))) for _ in range(3))
+        timestamp = rng.randrange(1_600_000_000, 2_000_000_000)
+        result = blockchain_call(program, "generate_otp",
+                                 [f"{rep_id}field", f"{bank_name}field", f"{timestamp}u64", f"{seed}field"],
+                                 project_path=project_path)
+        match = re.search(r"(\d+)u32", result.get("raw_output", ""))
+        expected = generate_otp(seed, rep_id, bank_name, timestamp)
+        if not match or int(match.group(1)) != expected:
+            mismatches += 1
+            logger.error(f"generate_otp({seed}, {rep_id}, {bank_name}, {timestamp}): circuit "
+                         f"{match.group(1) if match else result.get('error')}, reference {expected}")
+    return mismatches
+
+def main(args):
+    """Main function."""
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    commit = git_commit()
+    now = datetime.utcnow().isoformat()
+
+    minted = blockchain_call("agent_manager.aleo", "mint_agent", ["1234field", "5678field"],
+                             project_path=os.path.join(ROOT, "agent_manager"))
+    if not minted.get("success"):
+        logger.error(f"Could not mint a sample agent record: {minted.get('error')}")
+        return 1
+    samples = sample_inputs(extract_leo_output(minted["raw_output"]))
+
+    rows, regressions = [], []
+    for project in args.projects:
+        project_path = os.path.join(ROOT, project)
+        program = program_id(project_path)
+        build = get_build_cache().source_hash(project_path)
+        for function, inputs in samples[project].items():
+            transition = f"{program}/{function}"
+            row = {"transition": transition, "build": build, "commit": commit, "recorded_at": now,
+                   **measure(program, function, inputs, project_path, args.runs)}
+            rows.append(row)
+            previous = previous_row(history, transition, build)
+            row["previous_constraints"] = previous["constraints"] if previous else None
+            if previous and previous["constraints"] and row["constraints"]:
+                growth = (row["constraints"] - previous["constraints"]) / previous["constraints"] * 100
+                if args.max_regression is not None and growth > args.max_regression:
+                    regressions.append(transition)
+
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, "a") as f:
+        for row in rows:
+            f.write(json.dumps({k: v for k, v in row.items() if k != "previous_constraints"}) + "\n")
+
+    print(f"{'transition':<44} {'constraints':>12} {'previous':>10} {'change':>8} {'seconds':>8}")
+    for row in rows:
+        previous = row["previous_constraints"]
+        change = f"{(row['constraints'] - previous) / previous:+.1%}" if previous and row["constraints"] else "-"
+        print(f"{row['transition']:<44} {row['constraints'] or 0:>12,} {previous or '-':>10} "
+              f"{change:>8} {row['seconds']:>8.2f}")
+    print(f"Recorded {len(rows)} transitions in {history_path}")
+
+    failed = False
+    if regressions:
+        logger.error(f"Constraints grew by more than {args.max_regression}%: {', '.join(regressions)}")
+        failed = True
+    if args.check_parity and "agent_otp_generation" in args.projects:
+        project_path = os.path.join(ROOT, "agent_otp_generation")
+        mismatches = check_parity(project_path, program_id(project_path), args.check_parity)
+        print(f"OTP parity: {args.check_parity - mismatches}/{args.check_parity} outputs match the reference")
+        failed |= mismatches > 0
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record constraint counts and proving time per transition")
+    parser.add_argument("--projects", nargs="+", choices=PROJECTS, default=list(PROJECTS),
+                        help="Leo projects to measure")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per transition (median time is kept)")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY), help="JSON lines history file")
+    parser.add_argument("--max-regression", type=float, help="Fail if constraints grow by more than this percent")
+    parser.add_argument("--check-parity", type=int, default=0, metavar="N",
+                        help="Compare N random generate_otp outputs with the Python reference")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
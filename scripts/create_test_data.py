@@ -24,8 +24,11 @@ from app.db.models.user import User, UserRole
 from app.db.models.employee import Employee
 from app.db.models.blockchain import BlockchainIdentity, AuditLog, AuditLogAction
 from app.core.config import settings
+from app.core.security import hash_password
 from app.blockchain import get_blockchain_client
-from app.utils.crypto import encrypt, generate_numeric_hash
+from app.utils.crypto import encrypt
+from app.utils.kms import new_data_key
+from app.db.repositories.blockchain import short_id_allocator
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -71,10 +74,7 @@ def generate_password_hash(password: str) -> str:
     Returns:
         str: Hashed password
     """
-    import hashlib
-    salt = os.urandom(16).hex()
-    hashed_password = hashlib.sha256((password + salt).encode()).hexdigest() + ":" + salt
-    return hashed_password
+    return hash_password(password)
 
 def create_hr_users(db: SessionLocal) -> List[User]:
     """Create sample HR users with different roles.
@@ -221,8 +221,8 @@ def enable_agent(db: SessionLocal, employee: Employee) -> BlockchainIdentity:
     # Generate seed for OTP
     seed = random.randint(10**6, 10**8)
     
-    # Generate short ID from rep_id
-    short_id = generate_numeric_hash(employee.rep_id, 2)
+    # Allocate a unique short ID (committed with the identity)
+    short_id = short_id_allocator.allocate(db, org_id=employee.org_id)
     
     # Create blockchain badge
     result = blockchain.mint_badge(
@@ -237,20 +237,24 @@ def enable_agent(db: SessionLocal, employee: Employee) -> BlockchainIdentity:
         permissions=employee.permissions
     )
     
-    # Create blockchain identity
+    # Create blockchain identity, its secrets under its own data key
+    data_key = new_data_key()
     identity = BlockchainIdentity(
         employee_id=employee.id,
         aleo_address=result["aleo_address"],
-        private_key_encrypted=encrypt(result["private_key"]),
-        view_key_encrypted=encrypt(result["view_key"]),
+        private_key_encrypted=encrypt(result["private_key"], data_key=data_key),
+        view_key_encrypted=encrypt(result["view_key"], data_key=data_key),
+        data_key_wrapped=data_key,
         short_id=short_id,
-        seed=encrypt(seed),
+        seed=encrypt(seed, data_key=data_key),
         badge_ciphertext=result["badge_ciphertext"],
         otp_digits=settings.DEFAULT_OTP_DIGITS,
         is_active=True
     )
     
     db.add(identity)
+    db.flush()
+    short_id_allocator.assign(db, short_id, identity.id, org_id=employee.org_id)
     db.commit()
     db.refresh(identity)
     
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Verifier snapshot exporter.
+
+Writes every agent identity (active and revoked) to a read-only snapshot
+file for edge verification nodes (see app/core/snapshot.py). Seeds are
+wrapped with the edge snapshot key, created on first export; provision
+the key file and the snapshot to branch verifiers. The file is replaced
+atomically. Use --inspect to check an existing snapshot instead.
+
+After the first export, snapshots are kept current from the agent change
+feed (app/core/change_feed.py) instead of being exported again: --sync
+pulls the changes since the snapshot's feed version from the database,
+and --apply applies a page pulled elsewhere (scripts/agent_changes.py
+--pull --wrap), which needs no database on the verifier.
+
+Example:
+    python scripts/export_snapshot.py snapshots/verifier.snap --org-id 171
+    python scripts/export_snapshot.py snapshots/verifier.snap --sync
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.snapshot import (
+    SnapshotError, VerifierSnapshot, apply_changes, export_snapshot, load_snapshot_key
+)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def inspect(args) -> int:
+    """Print a snapshot's header and check its body."""
+    try:
+        with VerifierSnapshot(args.path, load_snapshot_key(args.key_file)) as snapshot:
+            print(f"Snapshot:     {args.path}")
+            print(f"Created:      {datetime.utcfromtimestamp(snapshot.created_at).isoformat()}")
+            print(f"Org:          {snapshot.org_id or 'all'}")
+            print(f"Agents:       {len(snapshot)} ({snapshot.bucket_count} index buckets)")
+            print(f"Feed version: {snapshot.feed_version}")
+            print(f"OTP:          {snapshot.algorithm}, {snapshot.window_size}s windows")
+            intact = snapshot.check()
+            print(f"Checksum:     {'ok' if intact else 'MISMATCH'}")
+            return 0 if intact else 1
+    except SnapshotError as e:
+        logger.error(str(e))
+        return 1
+
+def apply(args) -> int:
+    """Apply a pulled change feed page to the snapshot."""
+    with open(args.apply) as f:
+        page = json.load(f)
+    try:
+        applied = apply_changes(args.path, page, load_snapshot_key(args.key_file))
+    except SnapshotError as e:
+        logger.error(str(e))
+        return 1
+    logger.info(f"Applied {applied} change(s); snapshot at feed version {page['version']}")
+    return 0
+
+def sync(args) -> int:
+    """Pull every change since the snapshot's feed version and apply it."""
+    from app.core.change_feed import get_change_feed
+    from app.db.base import get_db
+
+    key = load_snapshot_key(args.key_file)
+    feed = get_change_feed()
+    with VerifierSnapshot(args.path, key) as snapshot:
+        org_id = snapshot.org_id or None
+    applied = 0
+    with get_db(org_id) as db:
+        feed.capture(db)
+        while True:
+            with VerifierSnapshot(args.path, key) as snapshot:
+                since = snapshot.feed_version
+            page = feed.pull(db, since=since, org_id=org_id, key=key, capture=False)
+            applied += apply_changes(args.path, page, key)
+            if not page["more"]:
+                break
+    logger.info(f"Applied {applied} change(s); snapshot at feed version {page['version']}")
+    return 0
+
+def main(args):
+    """Main function."""
+    if args.inspect:
+        return inspect(args)
+    if args.apply:
+        return apply(args)
+
+    from app.db.base import get_db, init_db
+
+    init_db()
+    if args.sync:
+        return sync(args)
+    key = load_snapshot_key(args.key_file, create=True)
+    with get_db(args.org_id) as db:
+        export_snapshot(db, args.path, key, org_id=args.org_id)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a read-only verifier snapshot for edge nodes")
+    parser.add_argument("path", help="Snapshot file to write (or inspect)")
+    parser.add_argument("--org-id", type=int, help="Only export agents of this organization")
+    parser.add_argument("--key-file", help="Snapshot key file (default: settings.EDGE_SNAPSHOT_KEY_PATH)")
+    parser.add_argument("--inspect", action="store_true", help="Print and check an existing snapshot")
+    parser.add_argument("--sync", action="store_true", help="Apply the change feed since the snapshot's version")
+    parser.add_argument("--apply", metavar="PAGE", help="Apply a change feed page (JSON) without the database")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
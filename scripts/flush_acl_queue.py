@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""ACL batch flush script.
+
+Submits queued agent mints, revocations and reactivations to the chain.
+Run it from cron (e.g. hourly); by default it only flushes when the queue
+is due (ACL_BATCH_SIZE pending operations, or the oldest one has waited
+ACL_BATCH_INTERVAL_SECONDS). Use --force to flush immediately.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import get_db, init_db
+from app.blockchain.acl_queue import AclChangeQueue
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main(args):
+    """Main function."""
+    init_db()
+    queue = AclChangeQueue()
+
+    with get_db() as db:
+        pending = queue.pending_count(db)
+        if args.force:
+            summary = queue.flush(db)
+        else:
+            summary = queue.maybe_flush(db)
+
+    if summary is None:
+        logger.info(f"{pending} ACL change(s) pending; batch not due yet")
+        return 0
+
+    logger.info(f"Submitted {summary['submitted']} ACL change(s) in {len(summary['batches'])} batch(es): "
+                f"{summary['confirmed']} confirmed, {summary['failed']} failed")
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flush queued ACL changes to the chain")
+    parser.add_argument("--force", action="store_true", help="Flush even if the batch is not due")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -19,10 +19,12 @@ from datetime import datetime
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.db.base import Base, engine, init_db
+from app.db.migrations import migration_metadata
 from app.db.models.user import User, UserRole
 from app.db.models.employee import Employee
 from app.db.models.blockchain import BlockchainIdentity, AuditLog, AuditLogAction, AuthAttempt
 from app.core.config import settings
+from app.core.security import hash_password
 from app.utils.crypto import get_fernet
 from sqlalchemy.orm import Session, sessionmaker
 
@@ -44,16 +46,14 @@ def create_admin_user(db: Session, username: str, password: str) -> User:
     Returns:
         User: Created admin user
     """
-    import hashlib
     # Check if admin already exists
     admin = db.query(User).filter(User.username == username).first()
     if admin:
         logger.info(f"Admin user '{username}' already exists")
         return admin
     
-    # Hash the password (in a real app, use a proper password hashing lib like bcrypt or Argon2)
-    salt = os.urandom(16).hex()
-    hashed_password = hashlib.sha256((password + salt).encode()).hexdigest() + ":" + salt
+    # Hash the password (Argon2id or scrypt, see app.core.security)
+    hashed_password = hash_password(password)
     
     # Create admin user
     admin = User(
@@ -90,7 +90,13 @@ def main(args):
     Args:
         args: Command line arguments
     """
-    # Create tables
+    if args.force:
+        # Drop everything, including migration history, and start over
+        logger.warning("Dropping all tables (--force)...")
+        Base.metadata.drop_all(bind=engine)
+        migration_metadata.drop_all(bind=engine)
+    
+    # Create tables and apply migrations
     logger.info("Creating database tables...")
     init_db()
     
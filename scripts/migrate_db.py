@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Database migration script.
+
+Shows or applies schema migrations (app/db/migrations/versions) on every
+tenant shard.
+
+Examples:
+    python scripts/migrate_db.py status
+    python scripts/migrate_db.py upgrade --batch-size 1000 --pause 0.05
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.migrations import load_migrations, applied_versions, run_migrations
+from app.db.sharding import get_shard_router
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main(args):
+    """Main function."""
+    migrations = load_migrations()
+    for engine in get_shard_router().shards():
+        if args.command == "status":
+            applied = set(applied_versions(engine))
+            print(f"{engine.url!r}:")
+            for migration in migrations:
+                state = "applied" if migration.version in applied else "pending"
+                print(f"  {migration.version:04d}  {state:8}  {migration.description}")
+        else:
+            applied = run_migrations(engine, target=args.target,
+                                     batch_size=args.batch_size, pause=args.pause)
+            logger.info(f"{engine.url!r}: applied {applied or 'nothing, already up-to-date'}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage database schema migrations")
+    parser.add_argument("command", choices=["status", "upgrade"], help="Show or apply migrations")
+    parser.add_argument("--target", type=int, help="Stop after this version")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per backfill batch")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds between backfill batches")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
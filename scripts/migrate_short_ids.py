@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Short ID migration script.
+
+Moves existing blockchain identities from hash-derived short_ids (which
+collide) to allocator-managed ones:
+
+- Active identities keep their short_id when no other active identity of
+  the same org has it; the later duplicates get a fresh id.
+- Revoked identities are recorded as released allocations, so their ids
+  go through quarantine before being reused.
+- short_id 0 is reserved (it marks empty slots in the Leo batch
+  circuits): an active identity holding it is given a fresh id, including
+  one the allocator handed 0 before it was reserved, and a revoked one is
+  not recorded.
+
+Safe to run more than once; identities that already have an allocation
+are skipped. Use --dry-run to list the changes without writing them.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.base import get_db, init_db
+from app.db.models.blockchain import BlockchainIdentity, ShortIdAllocation
+from app.db.repositories.blockchain import short_id_allocator, FIRST_SHORT_ID, MAX_SHORT_IDS
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def migrate(db, dry_run: bool = False) -> int:
+    """Allocate short_ids for all identities without one.
+
+    Args:
+        db: Database session
+        dry_run: Only report what would change
+
+    Returns:
+        int: Number of identities whose short_id changed
+    """
+    # Allocations of the reserved id are dropped, so their identities are reassigned
+    reserved = db.query(ShortIdAllocation).filter(ShortIdAllocation.short_id < FIRST_SHORT_ID)
+    reserved_ids = {row.identity_id for row in reserved}
+    if not dry_run:
+        reserved.delete(synchronize_session=False)
+    allocated = {row.identity_id for row in db.query(ShortIdAllocation.identity_id)
+                 if row.identity_id is not None and row.identity_id not in reserved_ids}
+    taken = {(row.org_id, row.short_id) for row in
+             db.query(ShortIdAllocation.org_id, ShortIdAllocation.short_id)}
+
+    # Active identities first, oldest first, so long-standing agents keep their ids
+    identities = db.query(BlockchainIdentity).order_by(
+        BlockchainIdentity.is_active.desc(),
+        BlockchainIdentity.created_at
+    ).all()
+
+    # First record every id that stays, then allocate the duplicates, so
+    # they cannot be handed a revoked agent's id without quarantine
+    duplicates = []
+    for identity in identities:
+        if identity.id in allocated:
+            continue
+        key = (identity.org_id, identity.short_id)
+        keep = FIRST_SHORT_ID <= identity.short_id < MAX_SHORT_IDS and key not in taken
+
+        if not identity.is_active:
+            if keep:
+                # Record the id as released so it is quarantined before reuse
+                taken.add(key)
+                if not dry_run:
+                    db.add(ShortIdAllocation(
+                        org_id=identity.org_id,
+                        short_id=identity.short_id,
+                        identity_id=None,
+                        released_at=identity.revoked_at or identity.updated_at,
+                        released_by=identity.id
+                    ))
+            continue
+
+        if keep:
+            taken.add(key)
+            if not dry_run:
+                db.add(ShortIdAllocation(org_id=identity.org_id, short_id=identity.short_id,
+                                         identity_id=identity.id))
+            continue
+
+        duplicates.append(identity)
+
+    if dry_run:
+        for identity in duplicates:
+            logger.info(f"Would reassign short_id {identity.short_id} of identity {identity.id}")
+        return len(duplicates)
+
+    db.flush()
+    for identity in duplicates:
+        new_short_id = short_id_allocator.allocate(db, identity.id, org_id=identity.org_id)
+        logger.info(f"Reassigned identity {identity.id}: short_id {identity.short_id} -> {new_short_id}")
+        identity.short_id = new_short_id
+    db.commit()
+    return len(duplicates)
+
+def main(args):
+    """Main function."""
+    init_db()
+    with get_db() as db:
+        changed = migrate(db, dry_run=args.dry_run)
+    logger.info(f"{'Would reassign' if args.dry_run else 'Reassigned'} {changed} short_id(s)")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate blockchain identities to allocated short_ids")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the changes")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -14,7 +14,6 @@ import shutil
 import logging
 import argparse
 from pathlib import Path
-import sqlite3
 import json
 
 # Setup logging
@@ -140,42 +139,35 @@ def transform_agent_utils(content):
     return content
 
 def migrate_database(source_db="zk_agents.db"):
-    """Migrate the database to the new schema if needed."""
+    """Migrate the database to the latest schema version."""
     logger.info(f"Checking database: {source_db}")
     
     if not os.path.exists(source_db):
         logger.warning(f"Database file not found: {source_db}")
         return False
     
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import SQLAlchemyError
+    from app.db.migrations import pending_migrations, run_migrations
+    
+    engine = create_engine(f"sqlite:///{source_db}")
     try:
-        conn = sqlite3.connect(source_db)
-        cursor = conn.cursor()
-        
-        # Get list of tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        tables = [table[0] for table in tables]
-        
-        logger.info(f"Found tables: {', '.join(tables)}")
-        
-        # Check if we need migration
-        needs_migration = "blockchain_identities" not in tables
-        
-        if needs_migration:
-            logger.info("Database needs migration to new schema")
-            # This would contain migration logic
-            # For now, we'll just notify the user
-            logger.warning("Automatic database migration not implemented yet.")
-            logger.warning("Please run scripts/init_db.py to create a new database.")
-        else:
-            logger.info("Database schema looks up-to-date")
+        pending = pending_migrations(engine)
+        if not pending:
+            logger.info("Database schema is up-to-date")
+            return True
         
-        conn.close()
+        logger.info(f"Applying {len(pending)} migration(s): "
+                    f"{', '.join(f'{m.version:04d}' for m in pending)}")
+        run_migrations(engine)
+        logger.info("Database migrated to the latest schema")
         return True
     
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         logger.error(f"Database error: {e}")
         return False
+    finally:
+        engine.dispose()
 
 def create_example_env():
     """Create an example .env file if it doesn't exist."""
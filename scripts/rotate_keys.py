@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Fernet key rotation script.
+
+Re-encrypts every BlockchainIdentity secret (seed, private key, view key)
+under the primary key, online:
+
+1. Deploy with FERNET_KEYS="<new key>,<old key>". New data is encrypted
+   with the new key and everything still decrypts, so the dashboard keeps
+   generating codes throughout.
+2. Run this script. It walks blockchain_identities by id in chunks,
+   re-encrypts each chunk on a process pool and writes it back with one
+   bulk UPDATE per chunk. Progress is checkpointed per chunk, so an
+   interrupted run resumes where it stopped.
+3. Once it reports completion, drop the old key from FERNET_KEYS.
+
+Rows changed concurrently (e.g. an agent re-minted mid-run) are left
+alone: each UPDATE only applies if the ciphertext is still the one that
+was read, and such rows are already encrypted with the new key.
+
+Identities with their own data key (``data_key_wrapped``, see
+app/utils/kms.py) are not encrypted with the Fernet key and are skipped.
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+from app.db.migrations import MigrationContext
+from app.db.sharding import get_shard_router
+from app.utils.crypto import _configured_keys
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Encrypted columns of blockchain_identities
+SECRET_COLUMNS = ("seed", "private_key_encrypted", "view_key_encrypted")
+
+def _init_worker(keys: Tuple[str, ...]) -> None:
+    """Give pool workers the same key list as the parent."""
+    os.environ["FERNET_KEYS"] = ",".join(keys)
+
+def rotate_rows(rows: List[Tuple[str, str, str, str]]) -> List[Dict[str, Optional[str]]]:
+    """Re-encrypt a slice of rows (runs in a pool worker).
+
+    Args:
+        rows: (id, seed, private_key_encrypted, view_key_encrypted) tuples
+
+    Returns:
+        List[Dict]: Update parameters for rows that needed rotation
+    """
+    from app.utils.crypto import is_current, rotate
+
+    updates = []
+    for row_id, *values in rows:
+        if all(is_current(value) for value in values):
+            continue
+        update = {"row_id": row_id}
+        for column, value in zip(SECRET_COLUMNS, values):
+            update[f"old_{column}"] = value
+            update[f"new_{column}"] = value if is_current(value) else rotate(value)
+        updates.append(update)
+    return updates
+
+def make_processor(pool: ProcessPoolExecutor, workers: int, stats: Dict[str, int]):
+    """Build the backfill callback: fan a chunk out to the pool, bulk-update the result."""
+    statement = text(
+        "UPDATE blockchain_identities SET "
+        + ", ".join(f"{column} = :new_{column}" for column in SECRET_COLUMNS)
+        + " WHERE id = :row_id AND "
+        + " AND ".join(f"{column} = :old_{column}" for column in SECRET_COLUMNS)
+    )
+
+    def process(conn, rows) -> None:
+        plain = [(row.id, row.seed, row.private_key_encrypted, row.view_key_encrypted) for row in rows]
+        size = max(1, -(-len(plain) // workers))
+        slices = [plain[start:start + size] for start in range(0, len(plain), size)]
+        updates = [update for result in pool.map(rotate_rows, slices) for update in result]
+        if updates:
+            result = conn.execute(statement, updates)
+            stats["rotated"] += len(updates)
+            # executemany rowcount is the total across parameter sets where supported
+            if result.rowcount is not None and 0 <= result.rowcount < len(updates):
+                stats["skipped"] += len(updates) - result.rowcount
+        stats["scanned"] += len(rows)
+
+    return process
+
+def main(args):
+    """Main function."""
+    keys = _configured_keys()
+    if not keys or len(keys) < 2 and not args.force:
+        logger.error("Set FERNET_KEYS to '<new key>,<old key>' before rotating (or pass --force)")
+        return 1
+
+    # A new primary key starts a new rotation; the same one resumes
+    fingerprint = hashlib.sha256(keys[0].encode()).hexdigest()[:12]
+    stats = {"scanned": 0, "rotated": 0, "skipped": 0}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(keys,)) as pool:
+        process = make_processor(pool, args.workers, stats)
+        for engine in get_shard_router().shards():
+            logger.info(f"Rotating secrets in {engine.url!r}")
+            context = MigrationContext(engine, batch_size=args.chunk_size, pause=args.pause)
+            context.backfill(
+                f"rotate_keys:{fingerprint}",
+                "blockchain_identities",
+                process,
+                columns=("id",) + SECRET_COLUMNS,
+                where="data_key_wrapped IS NULL"
+            )
+
+    logger.info(f"Scanned {stats['scanned']} identities, rotated {stats['rotated']}, "
+                f"skipped {stats['skipped']} changed concurrently")
+    logger.info("Rotation complete; the old key can be removed from FERNET_KEYS")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encrypt identity secrets under the primary Fernet key")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Encryption processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Identities per chunk/transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    parser.add_argument("--force", action="store_true", help="Run with a single configured key")
+
+    args = parser.parse_args()
+
+    sys.exit(main(args))
@@ -0,0 +1,84 @@
+"""test_acl_queue.py"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.blockchain.acl_queue import AclChangeQueue
+from app.blockchain.encrypt import string_to_number
+from app.db.base import Base, import_models
+from app.db.models.blockchain import AclOperation, AclOperationStatus, AclOperationType
+
+MINT, REVOKE, REACTIVATE = AclOperationType.MINT, AclOperationType.REVOKE, AclOperationType.REACTIVATE
+
+class Client:
+    """Client failing the rep_ids in ``failing`` and leaving the last ``short`` results out."""
+
+    def __init__(self, failing=(), short=0):
+        self.failing = {f"{string_to_number(rep_id)}field" for rep_id in failing}
+        self.short = short
+        self.batches = []
+
+    def apply_acl_batch(self, operations):
+        self.batches.append(operations)
+        results = [{"success": op["rep_id"] not in self.failing, "error": "rejected"} for op in operations]
+        return results[:len(results) - self.short]
+
+@pytest.fixture
+def db():
+    import_models()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def statuses(db):
+    return {op.rep_id: op.status for op in db.query(AclOperation).all()}
+
+def test_mint_then_revoke_cancel(db):
+    """A revoke of a still-pending mint cancels both; revoke then reactivate too"""
+    queue = AclChangeQueue(Client(), batch_size=4, interval_seconds=60)
+    assert queue.enqueue(db, MINT, "A1", payload={"org_id": 1}) is not None
+    assert queue.enqueue(db, REVOKE, "A1") is None
+    queue.enqueue(db, REVOKE, "B2", payload={"badge_ciphertext": "record"})
+    assert queue.enqueue(db, REACTIVATE, "B2") is None
+    assert queue.pending_count(db) == 0
+    assert statuses(db) == {"A1": AclOperationStatus.CANCELLED, "B2": AclOperationStatus.CANCELLED}
+
+def test_redundant_operations_are_dropped(db):
+    """Repeating a pending change, or reactivating a pending mint, adds nothing"""
+    queue = AclChangeQueue(Client(), batch_size=4, interval_seconds=60)
+    queue.enqueue(db, MINT, "A1")
+    assert queue.enqueue(db, MINT, "A1") is None
+    assert queue.enqueue(db, REACTIVATE, "A1") is None
+    assert [op.operation for op in queue.pending(db)] == [MINT]
+
+def test_flush_chunks_and_maps_results(db):
+    """Batches hold at most batch_size operations; each result lands on its operation"""
+    client = Client(failing=["R1"])
+    queue = AclChangeQueue(client, batch_size=2, interval_seconds=60, max_attempts=2)
+    for rep_id in ("R0", "R1", "R2"):
+        queue.enqueue(db, MINT, rep_id, payload={"org_id": 3})
+
+    summary = queue.flush(db)
+    assert [len(batch) for batch in client.batches] == [2, 1]
+    assert summary["submitted"] == 3 and summary["confirmed"] == 2 and summary["failed"] == 1
+    assert client.batches[0][0]["bank_name"] == "3field" and client.batches[0][0]["type"] == "mint"
+    assert statuses(db) == {"R0": AclOperationStatus.CONFIRMED, "R1": AclOperationStatus.PENDING,
+                            "R2": AclOperationStatus.CONFIRMED}
+
+    # The failed operation is retried once more, then given up
+    queue.flush(db)
+    failed = db.query(AclOperation).filter(AclOperation.rep_id == "R1").one()
+    assert failed.status == AclOperationStatus.FAILED and failed.attempts == 2
+    assert failed.error_message == "rejected"
+
+def test_missing_results_are_retried(db):
+    """Operations the client returned no result for go back to pending"""
+    queue = AclChangeQueue(Client(short=1), batch_size=4, interval_seconds=60)
+    for rep_id in ("R0", "R1"):
+        queue.enqueue(db, MINT, rep_id)
+    assert queue.flush(db)["confirmed"] == 1
+    pending = queue.pending(db)
+    assert len(pending) == 1 and pending[0].error_message == "No result returned for this operation"
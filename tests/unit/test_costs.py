@@ -0,0 +1,48 @@
+"""test_costs.py"""
+
+from utils.costs import TransitionCost, parse_constraints, parse_fees, plan_batches
+
+MINT = "agent_manager.aleo/mint_agent"
+MINTS = "agent_manager.aleo/mint_agents"
+REVOKE = "agent_manager.aleo/revoke_agent"
+REVOKES = "agent_manager.aleo/revoke_agents"
+
+def ops(kind, count):
+    return [{"type": kind, "n": n} for n in range(count)]
+
+def transitions(plan):
+    return [(batch.transition, len(batch.operations)) for batch in plan]
+
+def test_unmeasured_model_batches():
+    """Without estimates full batches are used and the rest goes singly"""
+    plan = plan_batches(ops("mint", 6) + ops("revoke", 5), {})
+    assert transitions(plan) == [(MINTS, 4), (MINT, 1), (MINT, 1), (REVOKES, 4), (REVOKE, 1)]
+
+def test_measured_batch_with_unmeasured_single_keeps_batching():
+    """A timed batch does not make unmeasured singles look free"""
+    estimates = {MINTS: TransitionCost(11_348, 20_000, 4.0, 1)}
+    assert transitions(plan_batches(ops("mint", 8), estimates)) == [(MINTS, 4), (MINTS, 4)]
+
+def test_expensive_batch_uses_singles():
+    """Singles win once a full batch costs more than capacity singles"""
+    estimates = {MINTS: TransitionCost(11_348, 20_000, 4.0, 1), MINT: TransitionCost(4_217, 3_000, 0.5, 1)}
+    assert transitions(plan_batches(ops("mint", 4), estimates)) == [(MINT, 1)] * 4
+
+def test_remainder_is_padded_only_where_allowed():
+    """A cheap batch pads a partial mint batch; revokes (records) are never padded"""
+    estimates = {MINTS: TransitionCost(11_348, 4_000, 1.0, 1), MINT: TransitionCost(4_217, 3_000, 0.5, 1),
+                 REVOKES: TransitionCost(36_904, 4_000, 1.0, 1), REVOKE: TransitionCost(9_872, 3_000, 0.5, 1)}
+    plan = plan_batches(ops("mint", 3) + ops("revoke", 3), estimates)
+    assert transitions(plan) == [(MINTS, 3), (REVOKE, 1), (REVOKE, 1), (REVOKE, 1)]
+    # Every operation is planned exactly once
+    assert sum(len(batch.operations) for batch in plan) == 6
+
+def test_parse_leo_output():
+    """Constraint counts and fees are read from leo run/execute output"""
+    output = (" •  'agent_manager.aleo/mint_agent' - 4,217 constraints (called 1 time)\n"
+              "  Transaction storage cost: 0.001234 credits\n"
+              "  Finalize cost:            0.002560 credits\n"
+              "  Total fee:                0.004848 credits\n")
+    assert parse_constraints(output) == {MINT: 4217}
+    fees = parse_fees(output)
+    assert fees["storage"] == 1234 and fees["finalize"] == 2560 and fees["total"] == 4848
@@ -1,2 +1,119 @@
 """test_crypto.py"""
 
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.utils import crypto
+
+@pytest.fixture
+def fernet_keys(monkeypatch):
+    """Configure FERNET_KEYS for one test; returns a setter taking the keys, primary first."""
+    monkeypatch.delenv("FERNET_KEY", raising=False)
+    for name in ("_fernet", "_fernet_keys", "_primary_fernet"):
+        monkeypatch.setattr(crypto, name, None)
+
+    def configure(*keys):
+        monkeypatch.setenv("FERNET_KEYS", ",".join(keys))
+    return configure
+
+def test_encrypt_decrypt_round_trip(fernet_keys):
+    """Strings and integers decrypt back to their string form"""
+    fernet_keys(Fernet.generate_key().decode())
+    assert crypto.decrypt(crypto.encrypt("seed value")) == "seed value"
+    assert crypto.decrypt(crypto.encrypt(123456)) == "123456"
+
+def test_decrypt_after_rotation(fernet_keys):
+    """Tokens of the old key still decrypt once a new primary key is added"""
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    fernet_keys(old_key)
+    token = crypto.encrypt("1234")
+
+    fernet_keys(new_key, old_key)
+    assert crypto.decrypt(token) == "1234"
+
+    # Without the old key the token is unreadable
+    fernet_keys(new_key)
+    with pytest.raises(InvalidToken):
+        crypto.decrypt(token)
+
+def test_is_current_and_rotate(fernet_keys):
+    """rotate re-encrypts old tokens under the primary key"""
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    fernet_keys(old_key)
+    token = crypto.encrypt("secret")
+    assert crypto.is_current(token)
+
+    fernet_keys(new_key, old_key)
+    assert not crypto.is_current(token)
+    assert crypto.is_current(crypto.encrypt("fresh"))
+
+    rotated = crypto.rotate(token)
+    assert crypto.is_current(rotated)
+    fernet_keys(new_key)
+    assert crypto.decrypt(rotated) == "secret"
+
+@pytest.fixture
+def local_kms(monkeypatch, tmp_path):
+    """A fresh local KMS and data key cache for one test."""
+    from app.utils import kms
+
+    service = kms.LocalFileKMS(tmp_path / "keyring.json")
+    monkeypatch.setattr(kms, "_kms", service)
+    monkeypatch.setattr(kms, "_data_key_cache", kms.DataKeyCache(ttl_seconds=60, max_size=8))
+    return service
+
+def test_envelope_round_trip(fernet_keys, local_kms):
+    """Records encrypted with their own data key need that key, and survive a KEK rotation"""
+    from app.utils import kms
+
+    fernet_keys(Fernet.generate_key().decode())
+    data_key = kms.new_data_key()
+    token = crypto.encrypt("987654", data_key=data_key)
+    assert crypto.decrypt(token, data_key=data_key) == "987654"
+
+    # Not readable with the app-wide key or another record's data key
+    with pytest.raises(InvalidToken):
+        crypto.decrypt(token)
+    with pytest.raises(InvalidToken):
+        crypto.decrypt(token, data_key=kms.new_data_key())
+
+    # A cold cache unwraps through the KMS, also after the KEK rotated
+    local_kms.rotate_master_key()
+    kms.get_data_key_cache().clear()
+    assert crypto.decrypt(token, data_key=data_key) == "987654"
+    rewrapped = local_kms.rewrap(data_key)
+    assert rewrapped.split(":")[0] == local_kms.key_id
+    assert crypto.decrypt(token, data_key=rewrapped) == "987654"
+
+def test_unwrap_rejects_unknown_kek(local_kms):
+    """A wrapped key naming a KEK the keyring lacks raises KMSError"""
+    from app.utils.kms import KMSError
+
+    wrapped = local_kms.wrap(Fernet.generate_key())
+    with pytest.raises(KMSError):
+        local_kms.unwrap("local-0-missing:" + wrapped.partition(":")[2])
+
+def test_data_key_cache_expiry_and_lru(monkeypatch):
+    """Entries expire after the TTL and the least recently used one is evicted"""
+    from app.utils import kms
+
+    clock = [1000.0]
+    monkeypatch.setattr(kms.time, "monotonic", lambda: clock[0])
+    cache = kms.DataKeyCache(ttl_seconds=10, max_size=2)
+    first, second, third = (Fernet(Fernet.generate_key()) for _ in range(3))
+
+    cache.put("a", first)
+    cache.put("b", second)
+    assert cache.get("a") is first
+    cache.put("c", third)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") is first and cache.get("c") is third
+
+    clock[0] += 10
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+    disabled = kms.DataKeyCache(ttl_seconds=0, max_size=2)
+    disabled.put("a", first)
+    assert disabled.get("a") is None
@@ -0,0 +1,100 @@
+"""test_merkle.py"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.blockchain.audit_anchor import AuditAnchorer
+from app.db.base import Base, import_models
+from app.utils.merkle import MerkleTree, leaf_hash, node_hash, root_to_field, verify_proof
+
+def leaves(count):
+    return [leaf_hash(str(i).encode()) for i in range(count)]
+
+@pytest.mark.parametrize("count", range(1, 10))
+def test_every_proof_verifies(count):
+    """Each leaf's proof leads to the root, for even and odd leaf counts"""
+    tree = MerkleTree(leaves(count))
+    for index, leaf in enumerate(leaves(count)):
+        assert verify_proof(leaf, tree.proof(index), tree.root)
+
+def test_tampered_leaf_and_proof_fail():
+    """A changed leaf, sibling or side no longer verifies"""
+    tree = MerkleTree(leaves(5))
+    proof = tree.proof(2)
+    assert not verify_proof(leaf_hash(b"other"), proof, tree.root)
+    assert not verify_proof(leaves(5)[2], [["L" if side == "R" else "R", h] for side, h in proof], tree.root)
+    assert not verify_proof(leaves(5)[2], [["X", h] for _, h in proof], tree.root)
+
+def test_leaf_and_node_hashes_are_distinct():
+    """An interior node cannot pass as a leaf, and an odd node is promoted unpaired"""
+    a, b, c = leaves(3)
+    tree = MerkleTree([a, b, c])
+    assert tree.root == node_hash(node_hash(a, b), c)
+    assert leaf_hash(bytes.fromhex(a) + bytes.fromhex(b)) != node_hash(a, b)
+
+def test_empty_tree_and_bad_index():
+    """Trees need a leaf and proofs a leaf in range"""
+    with pytest.raises(ValueError):
+        MerkleTree([])
+    with pytest.raises(IndexError):
+        MerkleTree(leaves(2)).proof(2)
+
+def test_root_to_field_fits_the_field():
+    """Roots map to field literals of at most 31 bytes"""
+    value = int(root_to_field("ff" * 32).removesuffix("field"))
+    assert value == int("ff" * 31, 16)
+
+class Reader:
+    """Mapping reader over a dict of audit roots."""
+
+    def __init__(self):
+        self.roots = {}
+
+    def get(self, program, mapping, key):
+        return self.roots.get(key)
+
+class LostResponseClient:
+    """Client whose first broadcast lands but reports a failure."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.calls = 0
+
+    def anchor_audit_root(self, root, leaf_count, interval_end):
+        self.calls += 1
+        if root_to_field(root) in self.reader.roots:
+            return {"success": False, "error": "Finalize failed: audit root is already anchored"}
+        self.reader.roots[root_to_field(root)] = f"{interval_end}u64"
+        return {"success": False, "error": "Timed out after 30s"}
+
+@pytest.fixture
+def db():
+    import_models()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def test_retry_confirms_a_root_already_on_chain(db):
+    """A root that landed despite a lost response is confirmed, not resubmitted"""
+    from app.db.models.blockchain import AuditLog, AuditLogAction
+
+    db.add_all([AuditLog(action=AuditLogAction.AGENT_OTP_GENERATE, org_id=1,
+                         timestamp=datetime(2026, 1, 1, 0, 0, second), resource_id=str(second))
+                for second in range(3)])
+    db.commit()
+    reader = Reader()
+    client = LostResponseClient(reader)
+    anchorer = AuditAnchorer(client, interval_seconds=60, reader=reader)
+    now = datetime(2026, 1, 1, 0, 5)
+
+    assert anchorer.anchor(db, now=now)["failed"] == 1
+    summary = anchorer.anchor(db, now=now)
+    assert summary["intervals"] == 1 and summary["events"] == 3
+    assert client.calls == 1
+    log = db.query(AuditLog).first()
+    assert AuditAnchorer.verify(log, reader)
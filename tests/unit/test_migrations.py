@@ -0,0 +1,43 @@
+"""test_migrations.py"""
+
+import os
+import sys
+import sqlite3
+import subprocess
+
+from sqlalchemy import create_engine, inspect
+
+from app.db.migrations import applied_versions, load_migrations, run_migrations
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+APP_TABLES = {
+    "users", "employees", "blockchain_identities", "audit_logs", "audit_anchors", "auth_attempts",
+    "acl_operations", "short_id_allocations", "agent_changes",
+}
+
+def test_migrate_script_creates_tables_on_empty_db(tmp_path):
+    """scripts/migrate_db.py alone (no model imports) builds the full schema"""
+    db_path = tmp_path / "empty.db"
+    env = dict(os.environ, DB_PATH=str(db_path), HOME=str(tmp_path), SHARD_MAP="{}")
+    subprocess.run([sys.executable, "scripts/migrate_db.py", "upgrade"], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+
+    with sqlite3.connect(db_path) as conn:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        versions = [version for (version,) in conn.execute("SELECT version FROM schema_version")]
+    assert APP_TABLES <= tables
+    assert max(versions) == load_migrations()[-1].version
+
+def test_run_migrations_is_idempotent(tmp_path):
+    """A second run applies nothing and later columns exist"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    applied = run_migrations(engine)
+    assert applied == [migration.version for migration in load_migrations()]
+    assert run_migrations(engine) == []
+    assert sorted(applied_versions(engine)) == applied
+
+    columns = {column["name"] for column in inspect(engine).get_columns("users")}
+    assert "locked_until" in columns
+    columns = {column["name"] for column in inspect(engine).get_columns("short_id_allocations")}
+    assert "released_by" in columns
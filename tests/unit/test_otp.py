@@ -0,0 +1,52 @@
+"""test_otp.py"""
+
+import pytest
+
+from app.core.config import settings
+from app.core.otp import OTPEngine
+
+def test_circuit_algorithm_is_demo_only(monkeypatch):
+    """The circuit's unkeyed mixing is refused outside DEMO_MODE"""
+    monkeypatch.setattr(settings, "DEMO_MODE", False)
+    with pytest.raises(ValueError):
+        OTPEngine("circuit")
+    assert OTPEngine("hmac-sha256").generate(1234, 1, 7, 6, time_window=100)
+
+def test_new_seeds_fit_the_algorithm(monkeypatch):
+    """HMAC seeds are 256-bit; circuit seeds fit the circuit's u64"""
+    monkeypatch.setattr(settings, "DEMO_MODE", True)
+    assert max(OTPEngine("hmac-sha256").new_seed() for _ in range(8)).bit_length() > 64
+    assert all(OTPEngine("circuit").new_seed() < 2 ** 64 for _ in range(8))
+
+NOW = 1_800_000_000
+
+@pytest.fixture(params=["hmac-sha256", "hmac-sha1", "circuit"])
+def engine(request, monkeypatch):
+    monkeypatch.setattr(settings, "DEMO_MODE", True)
+    return OTPEngine(request.param, window_size=60)
+
+def test_matching_window_finds_current_and_skewed_codes(engine):
+    """A code matches the window it was generated for, within the skew"""
+    current = engine.time_window(NOW)
+    for window in (current, current - 1):
+        code = engine.generate(1234, 1, 7, 6, time_window=window)
+        assert engine.matching_window(code, 1234, 1, 7, 6, timestamp=NOW, skew_windows=1) == window
+
+def test_matching_window_rejects_other_codes(engine):
+    """Codes outside the skew, for another agent or tenant, or of another seed do not match"""
+    current = engine.time_window(NOW)
+    old = engine.generate(1234, 1, 7, 6, time_window=current - 2)
+    assert engine.matching_window(old, 1234, 1, 7, 6, timestamp=NOW, skew_windows=1) is None
+    code = engine.generate(1234, 1, 7, 6, time_window=current)
+    assert engine.matching_window(code, 1234, 1, 7, 6, timestamp=NOW, skew_windows=0) == current
+    others = [engine.generate(1234, 1, 8, 6, time_window=current), engine.generate(1234, 2, 7, 6, time_window=current),
+              engine.generate(4321, 1, 7, 6, time_window=current)]
+    for other in others:
+        assert engine.matching_window(other, 1234, 1, 7, 6, timestamp=NOW, skew_windows=0) is None
+
+def test_prepared_states_are_cached(engine):
+    """Repeated codes of a seed reuse its prepared state, within the cache size"""
+    engine.cache_size = 2
+    codes = [engine.generate(seed, 1, 7, 6, timestamp=NOW) for seed in (1, 2, 1, 3)]
+    assert codes[0] == codes[2]
+    assert list(engine._states) == [1, 3]
@@ -0,0 +1,94 @@
+"""test_otp_index.py"""
+
+import os
+import base64
+
+import pytest
+
+from app.core.otp import OTPEngine
+from app.core.otp_index import OTPIndex
+from app.core.snapshot import wrap_seed
+
+NOW = 1_800_000_000
+
+@pytest.fixture
+def engine():
+    return OTPEngine("hmac-sha256", window_size=60)
+
+@pytest.fixture
+def index(engine):
+    index = OTPIndex(engine, skew_windows=1)
+    index.add_agent("alice", "R1", 1111, 1, 10, 6, department="cards", permissions={"refunds": True})
+    index.add_agent("bob", "R2", 2222, 1, 11, 6, department="loans")
+    return index
+
+def code(engine, seed, short_id, window, digits=6):
+    return engine.generate(seed, 1, short_id, digits, time_window=window)
+
+def test_lookup_current_and_skewed_windows(engine, index):
+    """Codes of the current and accepted earlier windows find their agent"""
+    current = engine.time_window(NOW)
+    match = index.lookup(code(engine, 1111, 10, current), now=NOW)
+    assert match.agent.rep_id == "R1" and match.candidates[0][1] == current
+    assert index.lookup(code(engine, 2222, 11, current - 1), now=NOW).agent.rep_id == "R2"
+    assert index.lookup(code(engine, 2222, 11, current - 2), now=NOW).agent is None
+
+def test_roll_builds_ahead_and_drops_old_windows(engine, index):
+    """Windows are kept from the oldest accepted one to the lookahead"""
+    current = engine.time_window(NOW)
+    index.roll(NOW)
+    assert sorted(index._windows) == [current - 1, current, current + 1]
+    index.roll(NOW + 120)
+    assert sorted(index._windows) == [current + 1, current + 2, current + 3]
+    # The window built ahead is already in use when its turn comes
+    assert index.lookup(code(engine, 1111, 10, current + 2), now=NOW + 120).agent.rep_id == "R1"
+
+def test_add_and_remove_update_built_windows(engine, index):
+    """Agents added or removed after a roll are reflected without a rebuild"""
+    current = engine.time_window(NOW)
+    index.roll(NOW)
+    index.add_agent("carol", "R3", 3333, 1, 12, 6)
+    assert index.lookup(code(engine, 3333, 12, current), now=NOW).agent.rep_id == "R3"
+    assert index.remove_agent("alice") and not index.remove_agent("alice")
+    assert index.lookup(code(engine, 1111, 10, current), now=NOW).agent is None
+    # Re-adding an identity replaces its entry, here with a new seed
+    index.add_agent("bob", "R2", 4444, 1, 11, 6)
+    assert index.lookup(code(engine, 2222, 11, current), now=NOW).agent is None
+    assert index.lookup(code(engine, 4444, 11, current), now=NOW).agent.rep_id == "R2"
+    assert len(index) == 2
+
+def test_shared_codes_are_ambiguous_and_can_be_narrowed(engine):
+    """Agents sharing a code are all returned, and filtered by department or permission"""
+    index = OTPIndex(engine, skew_windows=0)
+    for n in range(20):
+        index.add_agent(f"id{n}", f"R{n}", 1000 + n, 1, n, 1, department="cards" if n % 2 else "loans",
+                        permissions={"refunds": n % 4 == 1})
+    current = engine.time_window(NOW)
+    # With one digit, some code is shared by agents of both departments
+    shared = next(c for c in map(str, range(10)) if
+                  {agent.department for agent, _ in index.lookup(c, now=NOW).candidates} == {"cards", "loans"})
+    match = index.lookup(shared, now=NOW)
+    assert match.ambiguous and match.agent is None
+    assert all(window == current for _, window in match.candidates)
+
+    def ids(candidates):
+        return {agent.identity_id for agent, _ in candidates}
+
+    cards = ids(c for c in match.candidates if c[0].department == "cards")
+    assert ids(index.lookup(shared, now=NOW, department="cards").candidates) == cards
+    refunds = ids(c for c in match.candidates if c[0].short_id % 4 == 1)
+    assert ids(index.lookup(shared, now=NOW, permissions=["refunds"]).candidates) == refunds
+
+def test_apply_changes(engine, index):
+    """Change feed entries index active agents and drop revoked or deleted ones"""
+    key = os.urandom(32)
+    wrapped = base64.b64encode(wrap_seed(key, 5555, 1, 13)).decode()
+    changes = [
+        {"identity_id": "dave", "rep_id": "R4", "org_id": 1, "short_id": 13, "change": "enable",
+         "is_active": True, "otp_digits": 6, "wrapped_key": wrapped},
+        {"identity_id": "alice", "org_id": 1, "short_id": 10, "change": "revoke", "is_active": False},
+    ]
+    assert index.apply_changes(changes, key) == 2
+    current = engine.time_window(NOW)
+    assert index.lookup(code(engine, 5555, 13, current), now=NOW).agent.rep_id == "R4"
+    assert index.lookup(code(engine, 1111, 10, current), now=NOW).agent is None
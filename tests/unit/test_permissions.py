@@ -0,0 +1,74 @@
+"""test_permissions.py"""
+
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.permissions import PermissionRegistry, PermissionResolver
+from app.db.base import Base, import_models
+
+ROLES = {"hr_staff": ["view_agents"], "hr_manager": ["view_agents", "enable_agents"]}
+USER_IDS = count(1)
+
+def user(role="hr_staff", permissions=None, superuser=False, updated_at=1):
+    return SimpleNamespace(id=next(USER_IDS), role=SimpleNamespace(value=role), permissions=permissions,
+                           is_superuser=superuser, updated_at=updated_at)
+
+@pytest.fixture
+def resolver():
+    return PermissionResolver(roles=ROLES, permission_registry=PermissionRegistry(), ttl=60)
+
+def test_mask_combines_role_grants_and_superuser(resolver):
+    """Role permissions, enabled custom grants and superuser grants are OR-ed"""
+    staff = user(permissions={"revoke_agents": True, "export": False})
+    assert resolver.permission_names(staff) == ["view_agents", "revoke_agents"]
+    assert resolver.has_permission(staff, "revoke_agents")
+    assert not resolver.has_permission(staff, "export")
+    assert resolver.has_all(user("hr_manager"), resolver.registry.mask(["view_agents", "enable_agents"]))
+    assert set(resolver.permission_names(user(superuser=True))) == {"view_agents", "read_all", "write_all"}
+
+def test_masks_are_cached_per_version(resolver):
+    """A cached mask is reused until the user's updated_at changes"""
+    staff = user()
+    assert not resolver.has_permission(staff, "enable_agents")
+    staff.permissions = {"enable_agents": True}
+    assert not resolver.has_permission(staff, "enable_agents")
+    staff.updated_at = 2
+    assert resolver.has_permission(staff, "enable_agents")
+
+def test_invalidate_and_expiry(resolver):
+    """invalidate drops an entry at once; with no TTL nothing is reused"""
+    staff = user()
+    resolver.has_permission(staff, "enable_agents")
+    staff.permissions = {"enable_agents": True}
+    resolver.invalidate(staff.id)
+    assert resolver.has_permission(staff, "enable_agents")
+
+    uncached = PermissionResolver(roles=ROLES, permission_registry=PermissionRegistry(), ttl=0)
+    staff = user()
+    uncached.has_permission(staff, "enable_agents")
+    staff.permissions = {"enable_agents": True}
+    assert uncached.has_permission(staff, "enable_agents")
+
+def test_user_update_invalidates_shared_resolver():
+    """Saving a user drops its cached mask in the shared resolver"""
+    from app.core.permissions import permission_resolver
+    from app.db.models.user import User, UserRole
+
+    import_models()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    staff = User(username="bob", hashed_password="x", role=UserRole.HR_STAFF)
+    db.add(staff)
+    db.commit()
+    permission_resolver.effective_mask(staff)
+    assert staff.id in permission_resolver._cache
+
+    staff.full_name = "Bob"
+    db.commit()
+    assert staff.id not in permission_resolver._cache
+    db.close()
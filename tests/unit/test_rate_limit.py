@@ -0,0 +1,70 @@
+"""test_rate_limit.py"""
+
+import pytest
+
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimitBackend, RateLimiter
+
+NOW = 1_800_000_000.0
+
+LIMITS = {
+    "otp_generate": RateLimit(per_minute=60, burst=2),
+    "otp_verify_agent": RateLimit(per_minute=60, burst=2),
+    "otp_verify_source": RateLimit(per_minute=60, burst=3),
+}
+
+class BrokenBackend(RateLimitBackend):
+    def take(self, key, limit, now):
+        raise ConnectionError("store down")
+
+@pytest.fixture
+def limiter_with(monkeypatch):
+    """Build a RateLimiter over a backend; denials are collected instead of recorded."""
+    def build(backend):
+        limiter = RateLimiter(limits=LIMITS, backend=backend)
+        limiter.denied = []
+        monkeypatch.setattr(limiter, "_report", lambda name, bucket, key, now, ip: limiter.denied.append(bucket))
+        return limiter
+    return build
+
+def test_bucket_allows_burst_then_refills(limiter_with):
+    """burst requests pass at once, then one per 1/rate seconds"""
+    limiter = limiter_with(MemoryRateLimitBackend())
+    assert limiter.check_generation("agent", NOW) == 0
+    assert limiter.check_generation("agent", NOW) == 0
+    assert limiter.check_generation("agent", NOW) == pytest.approx(1.0)
+    assert limiter.check_generation("agent", NOW + 1) == 0
+    assert limiter.denied == ["otp_generate:agent"]
+
+def test_source_checked_before_agent(limiter_with):
+    """A source guessing across agents is stopped without draining their buckets"""
+    limiter = limiter_with(MemoryRateLimitBackend())
+    for rep_id in range(3):
+        assert limiter.check_verification(rep_id, "10.0.0.1", NOW) == 0
+    assert limiter.check_verification(3, "10.0.0.1", NOW) > 0
+    assert limiter.check_verification(3, "10.0.0.2", NOW) == 0
+
+def test_generation_fails_open_when_store_is_down(limiter_with):
+    """An unavailable store does not stop OTP generation"""
+    limiter = limiter_with(BrokenBackend())
+    assert all(limiter.check_generation("agent", NOW) == 0 for _ in range(10))
+
+def test_verification_fails_closed_when_store_is_down(limiter_with):
+    """Verification attempts keep being limited by per-process buckets"""
+    limiter = limiter_with(BrokenBackend())
+    assert limiter.check_verification(7, None, NOW, org_id=1) == 0
+    assert limiter.check_verification(7, None, NOW, org_id=1) == 0
+    assert limiter.check_verification(7, None, NOW, org_id=1) > 0
+    assert limiter.denied == ["otp_verify_agent:1:7"]
+
+def test_agent_buckets_are_per_tenant(limiter_with):
+    """The same short_id in two orgs is two agents, with separate buckets"""
+    limiter = limiter_with(MemoryRateLimitBackend())
+    assert limiter.check_verification(7, None, NOW, org_id=1) == 0
+    assert limiter.check_verification(7, None, NOW, org_id=1) == 0
+    assert limiter.check_verification(7, None, NOW, org_id=1) > 0
+    assert limiter.check_verification(7, None, NOW, org_id=2) == 0
+
+def test_empty_memory_backend_is_used():
+    """A backend passed in is kept even while it holds no buckets"""
+    backend = MemoryRateLimitBackend()
+    assert RateLimiter(limits=LIMITS, backend=backend).backend is backend
@@ -0,0 +1,88 @@
+"""test_replay.py"""
+
+import pytest
+
+from app.blockchain.verification_batcher import VerificationBatcher
+from app.core.config import settings
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimit, RateLimiter
+from app.core.replay import ReplayCache, ReplayStore
+
+NOW = 1_800_000_000
+WINDOW = NOW // 60
+
+@pytest.fixture
+def cache():
+    return ReplayCache(tolerated_windows=2, window_size=60, shards=4, store=None)
+
+def test_consume_once_per_agent_and_tenant(cache):
+    """A window is consumed once per (org_id, short_id)"""
+    assert cache.consume(7, WINDOW, org_id=1, now=NOW)
+    assert not cache.consume(7, WINDOW, org_id=1, now=NOW)
+    # The same short_id in another tenant is another agent
+    assert cache.consume(7, WINDOW, org_id=2, now=NOW)
+    assert cache.consume(7, WINDOW - 1, org_id=1, now=NOW)
+
+def test_old_windows_are_rejected_and_expired(cache):
+    """Windows past the tolerated range are refused and their entries dropped"""
+    assert not cache.consume(7, WINDOW - 2, org_id=1, now=NOW)
+    assert cache.consume(7, WINDOW, org_id=1, now=NOW)
+    assert len(cache) == 1
+    assert cache.consume(7, WINDOW + 2, org_id=1, now=NOW + 120)
+    assert len(cache) == 1
+
+class BrokenStore(ReplayStore):
+    def add(self, key, ttl_seconds):
+        raise ConnectionError("store down")
+
+def test_store_failure_fails_closed():
+    """A code that cannot be recorded in the shared store is not accepted, nor kept"""
+    cache = ReplayCache(tolerated_windows=2, window_size=60, store=BrokenStore())
+    assert not cache.consume(7, WINDOW, org_id=1, now=NOW)
+    assert len(cache) == 0
+
+class Client:
+    def verify_otp_batch(self, verifications):
+        return [{"success": True} for _ in verifications]
+
+@pytest.fixture
+def batcher(cache):
+    limiter = RateLimiter(limits={"otp_verify_agent": RateLimit(1000, 1000),
+                                  "otp_verify_source": RateLimit(1000, 1000)},
+                          backend=MemoryRateLimitBackend())
+    batcher = VerificationBatcher(Client(), batch_size=8, interval_seconds=0, replay_cache=cache,
+                                  rate_limiter=limiter)
+    yield batcher
+    batcher.stop()
+
+def submit(batcher, **overrides):
+    args = dict(agent_id=7, timestamp=NOW, provided_otp=123456, agent_status=1, expected_otp=123456,
+                time_window=WINDOW, org_id=1, current_time=NOW)
+    args.update(overrides)
+    return batcher.submit(**args).result(timeout=5)
+
+def test_rejected_verifications_do_not_consume_the_code(batcher):
+    """An inactive agent or stale timestamp leaves the code usable"""
+    assert submit(batcher, agent_status=0)["error"] == "agent is not active"
+    assert submit(batcher, timestamp=NOW - settings.OTP_WINDOW_SIZE - 1)["error"] == "OTP outside of time window"
+    assert submit(batcher)["success"]
+    assert submit(batcher)["error"] == "OTP already used"
+
+def test_replay_is_keyed_by_matched_window_and_tenant(batcher):
+    """A shifted timestamp cannot reuse a code; another tenant's agent is separate"""
+    assert submit(batcher)["success"]
+    assert submit(batcher, timestamp=NOW - 59)["error"] == "OTP already used"
+    assert submit(batcher, org_id=2)["success"]
+
+def test_attempts_are_limited_per_tenant(cache, monkeypatch):
+    """An agent's attempt limit is not shared with the same short_id in another org"""
+    limiter = RateLimiter(limits={"otp_verify_agent": RateLimit(1, 1), "otp_verify_source": RateLimit(1000, 1000)},
+                          backend=MemoryRateLimitBackend())
+    monkeypatch.setattr(limiter, "_report", lambda *args: None)
+    batcher = VerificationBatcher(Client(), batch_size=8, interval_seconds=0, replay_cache=cache,
+                                  rate_limiter=limiter)
+    try:
+        assert submit(batcher)["success"]
+        assert submit(batcher, time_window=WINDOW - 1)["error"] == "Too many attempts"
+        assert submit(batcher, org_id=2)["success"]
+    finally:
+        batcher.stop()
@@ -0,0 +1,86 @@
+"""test_resilience.py"""
+
+import pytest
+
+from utils.resilience import (ERROR_PERMANENT, ERROR_TIMEOUT, ERROR_TRANSIENT, CircuitBreaker,
+                              ResilientChainCaller, RetryPolicy, classify_error)
+
+# stderr of failed leo/snarkOS runs, as printed by the CLIs
+TRANSIENT_STDERR = [
+    "Error [ECLI0377010]: Failed to connect to the network endpoint: 503 Service Unavailable",
+    "Error: error sending request for url (http://localhost:3030/testnet/transaction/broadcast): "
+    "error trying to connect: tcp connect error: Connection refused (os error 111)",
+    "Error [ECLI0377099]: snarkVM prover crashed (SIGSEGV)",
+    "Error: Failed to broadcast transaction: HTTP status 502 Bad Gateway",
+    "Error: Request to http://localhost:3030/testnet/latest/height failed with status code 429",
+    "Error: operation timed out",
+]
+
+PERMANENT_STDERR = [
+    "Error [ECLI0377002]: Input record with nonce "
+    "'5034290850232412377502417250345029field' has already been spent",
+    "Error [EPAR0370005]: Failed to parse input '1503field'",
+    "Error [ECLI0377001]: Function 'mint_agnet' does not exist in program 'agent_manager.aleo'",
+    "Error [ECLI0377002]: 'assert.eq' failed: record owner is not the caller",
+    "Error [ECLI0377002]: Finalize failed: agent 5020field was minted by another issuer",
+    # Digits and words inside a record ciphertext are not status codes
+    "Error [ECLI0377000]: Invalid record 'record1qyqsq5029gckc503pq5l429q'",
+]
+
+@pytest.mark.parametrize("stderr", TRANSIENT_STDERR)
+def test_transient_errors(stderr):
+    """Network, endpoint and prover trouble is retried"""
+    assert classify_error(1, stderr) == ERROR_TRANSIENT
+
+@pytest.mark.parametrize("stderr", PERMANENT_STDERR)
+def test_permanent_errors(stderr):
+    """Spent records, bad inputs and failed asserts are not, whatever digits they quote"""
+    assert classify_error(1, stderr) == ERROR_PERMANENT
+
+def test_exit_codes():
+    """Killed processes are transient, a missing binary is permanent"""
+    assert classify_error(-9, "") == ERROR_TRANSIENT
+    assert classify_error(127, "leo: command not found") == ERROR_PERMANENT
+
+class Calls:
+    """Chain call returning queued results and counting attempts."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.count = 0
+
+    def __call__(self, program_name, function_name, inputs, **kwargs):
+        self.count += 1
+        return dict(self.results.pop(0) if len(self.results) > 1 else self.results[0])
+
+def caller(call):
+    return ResilientChainCaller(call, retry_policy=RetryPolicy(max_attempts=3), hedge_delay=None,
+                                breaker_factory=lambda endpoint: CircuitBreaker(failure_threshold=10),
+                                sleep=lambda delay: None)
+
+TRANSIENT = {"success": False, "error": "503", "error_type": ERROR_TRANSIENT}
+
+def test_local_runs_are_retried():
+    """A transient failure of a local run is retried until it succeeds"""
+    call = Calls(TRANSIENT, {"success": True})
+    result = caller(call)("agent_manager.aleo", "mint_agent", [], project_path=".")
+    assert result["success"] and call.count == 2
+
+def test_broadcasts_are_not_retried():
+    """A state-changing transition that may have been broadcast is tried once"""
+    call = Calls(TRANSIENT, {"success": True})
+    result = caller(call)("agent_manager.aleo", "mint_agent", [], is_deployed=True)
+    assert not result["success"] and call.count == 1
+
+def test_read_only_broadcast_retried_but_not_timed_out_writes():
+    """Read-only transitions are always retried; a timed-out write is not"""
+    call = Calls(TRANSIENT, {"success": True})
+    assert caller(call)("agent_manager.aleo", "is_agent_active", [], is_deployed=True)["success"]
+    call = Calls({"success": False, "error": "Timed out", "error_type": ERROR_TIMEOUT})
+    assert not caller(call)("agent_manager.aleo", "revoke_agent", [])["success"]
+    assert call.count == 1
+
+def test_permanent_errors_are_not_retried():
+    """A permanent failure is returned after the first attempt"""
+    call = Calls({"success": False, "error": "bad input", "error_type": ERROR_PERMANENT})
+    assert caller(call)("agent_otp_generate.aleo", "generate_otp", [])["attempts"] == 1
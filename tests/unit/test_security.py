@@ -0,0 +1,101 @@
+"""test_security.py"""
+
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import security
+from app.core.config import settings
+from app.db.base import Base, import_models
+
+@pytest.fixture(autouse=True)
+def cheap_hashes(monkeypatch):
+    """Small scrypt parameters, and attempts collected instead of written."""
+    monkeypatch.setattr(settings, "SCRYPT_LOG_N", 10)
+    monkeypatch.setattr(settings, "MAX_FAILED_LOGINS", 3)
+    attempts = []
+    monkeypatch.setattr(security.auth_attempts, "record", lambda username, result, *args: attempts.append(result))
+    return attempts
+
+def test_scrypt_round_trip(monkeypatch):
+    """scrypt hashes verify, reject other passwords and record their parameters"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ALGORITHM", "scrypt")
+    hashed = security.hash_password("correct horse")
+    assert hashed.startswith("$scrypt$ln=10,r=8,p=1$")
+    assert security.verify_password("correct horse", hashed)
+    assert not security.verify_password("wrong horse", hashed)
+    assert not security.needs_rehash(hashed)
+    monkeypatch.setattr(settings, "SCRYPT_LOG_N", 11)
+    assert security.needs_rehash(hashed)
+
+@pytest.mark.skipif(security._argon2 is None, reason="argon2-cffi is not installed")
+def test_argon2id_round_trip(monkeypatch):
+    """Argon2id hashes verify and scrypt ones are upgraded"""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ALGORITHM", "argon2id")
+    hashed = security.hash_password("correct horse")
+    assert hashed.startswith("$argon2id$")
+    assert security.verify_password("correct horse", hashed)
+    assert not security.verify_password("wrong horse", hashed)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ALGORITHM", "scrypt")
+    assert security.needs_rehash(hashed)
+
+def test_legacy_and_malformed_hashes():
+    """Legacy sha256 hashes verify and always need a rehash; malformed ones never verify"""
+    legacy = f"{hashlib.sha256(b'secret' + b'salt').hexdigest()}:salt"
+    assert security.verify_password("secret", legacy)
+    assert security.needs_rehash(legacy)
+    assert not security.verify_password("secret", "$scrypt$garbage")
+
+@pytest.fixture
+def db():
+    import_models()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def user(db, monkeypatch):
+    from app.db.models.user import User
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ALGORITHM", "scrypt")
+    user = User(username="alice", hashed_password=security.hash_password("secret"))
+    db.add(user)
+    db.commit()
+    return user
+
+def test_lockout_after_failed_logins(db, user, cheap_hashes):
+    """MAX_FAILED_LOGINS failures lock the account, even against the right password"""
+    from app.db.models.blockchain import AuthAttemptResult
+
+    for _ in range(settings.MAX_FAILED_LOGINS):
+        assert security.authenticate(db, "alice", "guess")[0] is None
+    db.refresh(user)
+    assert security.is_locked(user)
+    assert security.authenticate(db, "alice", "secret")[1] == AuthAttemptResult.ACCOUNT_LOCKED
+    assert cheap_hashes.count(AuthAttemptResult.INVALID_CREDENTIALS) == settings.MAX_FAILED_LOGINS
+
+    # Once the lock expires the password works and the counter is reset
+    user.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    authenticated, result = security.authenticate(db, "alice", "secret")
+    assert authenticated is not None and result == AuthAttemptResult.SUCCESS
+    assert authenticated.failed_login_attempts == 0 and authenticated.locked_until is None
+
+def test_unknown_user_is_invalid(db, user):
+    """An unknown username fails like a wrong password"""
+    from app.db.models.blockchain import AuthAttemptResult
+
+    assert security.authenticate(db, "mallory", "secret") == (None, AuthAttemptResult.INVALID_CREDENTIALS)
+
+def test_outdated_hash_is_upgraded_on_login(db, user, monkeypatch):
+    """A successful login rehashes with the current parameters"""
+    monkeypatch.setattr(settings, "SCRYPT_LOG_N", 11)
+    security.authenticate(db, "alice", "secret")
+    db.refresh(user)
+    assert user.hashed_password.startswith("$scrypt$ln=11,")
+    assert security.verify_password("secret", user.hashed_password)
@@ -0,0 +1,56 @@
+"""test_sharding.py"""
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.sharding import (ShardRouter, clear_tenant_caches, tenant_cache, tenant_org_ids,
+                             validate_org_id)
+
+@pytest.fixture
+def router(tmp_path):
+    return ShardRouter(shard_map={7: f"sqlite:///{tmp_path}/big_bank.db"},
+                       default_url=f"sqlite:///{tmp_path}/shared.db")
+
+def test_tenants_route_to_their_shard(router):
+    """Mapped tenants get their own database, the rest share the default"""
+    assert router.url_for(7).endswith("big_bank.db")
+    assert router.url_for(8) == router.url_for(None) == router.url_for(9)
+    # Tenants on the same URL share one engine
+    assert router.engine_for(8) is router.engine_for(9)
+    assert router.engine_for(7) is not router.engine_for(8)
+    assert len(router.shards()) == 2
+
+def test_sessions_are_isolated_per_shard(router):
+    """Rows written through one tenant's session are not in another shard"""
+    with router.session(7) as db:
+        db.execute(text("CREATE TABLE marks (org_id INTEGER)"))
+        db.execute(text("INSERT INTO marks VALUES (7)"))
+        db.commit()
+    with router.session(7) as db:
+        assert db.execute(text("SELECT org_id FROM marks")).scalar() == 7
+    with router.session(8) as db:
+        assert db.execute(text("SELECT count(*) FROM sqlite_master WHERE name = 'marks'")).scalar() == 0
+
+def test_org_ids_must_fit_the_otp_message():
+    """org_ids are one byte, in the shard map as elsewhere"""
+    assert validate_org_id(255) == 255
+    with pytest.raises(ValueError):
+        validate_org_id(256)
+    with pytest.raises(ValueError):
+        ShardRouter(shard_map={300: "sqlite://"}, default_url="sqlite://")
+
+def test_tenant_org_ids(monkeypatch):
+    """The deployment's own org comes first, then mapped ones in order"""
+    monkeypatch.setattr(settings, "ORG_ID", 5)
+    monkeypatch.setattr(settings, "SHARD_MAP", {9: "sqlite://", 5: "sqlite://", 2: "sqlite://"})
+    assert tenant_org_ids() == [5, 2, 9]
+
+def test_tenant_caches_are_separate():
+    """Each tenant's cache is its own dict, cleared independently"""
+    tenant_cache(1, "agents")["a"] = 1
+    tenant_cache(2, "agents")["a"] = 2
+    assert tenant_cache(1, "agents") == {"a": 1}
+    clear_tenant_caches(1)
+    assert tenant_cache(1, "agents") == {} and tenant_cache(2, "agents") == {"a": 2}
+    clear_tenant_caches(2)
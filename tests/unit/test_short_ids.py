@@ -0,0 +1,69 @@
+"""test_short_ids.py"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base, import_models
+from app.db.repositories.blockchain import FIRST_SHORT_ID, ShortIdAllocator, ShortIdExhaustedError
+
+@pytest.fixture
+def db():
+    import_models()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def allocator():
+    return ShortIdAllocator(max_ids=8, quarantine=timedelta(days=30))
+
+def allocate(db, allocator, identity_id=None, **kwargs):
+    return allocator.allocate(db, identity_id or uuid.uuid4(), org_id=1, **kwargs)
+
+def test_zero_is_reserved_and_gaps_are_filled(db, allocator):
+    """Ids start at 1 and a freed id below the highest is handed out first"""
+    assert FIRST_SHORT_ID == 1
+    assert allocate(db, allocator) == 1
+    # An id allocated ahead of its identity is discarded when creation fails
+    assert allocator.allocate(db, None, org_id=1) == 2
+    assert allocate(db, allocator) == 3
+    assert allocator.discard(db, 2, org_id=1)
+    assert allocate(db, allocator) == 2
+    assert allocate(db, allocator) == 4
+    # Each org has its own id space
+    assert allocator.allocate(db, uuid.uuid4(), org_id=2) == 1
+
+def test_exhausted_org(db, allocator):
+    """An org with every id in use cannot allocate"""
+    for _ in range(allocator.max_ids - 1):
+        allocate(db, allocator)
+    with pytest.raises(ShortIdExhaustedError):
+        allocate(db, allocator)
+
+def test_released_ids_are_quarantined(db, allocator):
+    """Only the releasing identity takes its id back early; others wait out the quarantine"""
+    alice, bob = uuid.uuid4(), uuid.uuid4()
+    assert allocate(db, allocator, alice) == 1
+    assert allocator.release(db, alice) == 1
+    db.flush()
+    assert allocate(db, allocator, bob, preferred=1) == 2
+    assert allocate(db, allocator, alice, preferred=1) == 1
+
+    allocator.release(db, bob)
+    db.flush()
+    assert allocate(db, allocator) == 3
+    assert allocate(db, ShortIdAllocator(max_ids=8, quarantine=timedelta(0))) == 2
+
+def test_race_is_retried(db, allocator, monkeypatch):
+    """An id taken by a concurrent allocator fails the unique constraint and is retried"""
+    assert allocate(db, allocator) == 1
+    lowest_free = allocator._lowest_free
+    picks = iter([1])
+    monkeypatch.setattr(allocator, "_lowest_free", lambda db, org_id: next(picks, None) or lowest_free(db, org_id))
+    assert allocate(db, allocator) == 2
@@ -0,0 +1,76 @@
+"""test_snapshot.py"""
+
+import os
+import uuid
+import base64
+
+import pytest
+
+from app.core.snapshot import SnapshotError, VerifierSnapshot, apply_changes, wrap_seed, write_snapshot
+
+NOW = 1_800_000_000
+KEY = os.urandom(32)
+ALICE, BOB, CAROL = (str(uuid.uuid4()) for _ in range(3))
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = tmp_path / "verifier.snap"
+    write_snapshot(path, [(ALICE, 1, 10, True, 6, 1111), (BOB, 1, 11, True, 8, 2222)], KEY,
+                   org_id=1, feed_version=5)
+    return path
+
+def code(snapshot, seed, short_id, digits):
+    return snapshot.engine.generate(seed, 1, short_id, digits, timestamp=NOW)
+
+def change(version, identity_id, short_id, kind="update", active=True, digits=6, seed=None):
+    entry = {"version": version, "identity_id": identity_id, "org_id": 1, "change": kind,
+             "short_id": short_id, "is_active": active, "otp_digits": digits}
+    if seed is not None:
+        entry["wrapped_key"] = base64.b64encode(wrap_seed(KEY, seed, 1, short_id)).decode()
+    return entry
+
+def page(since, *changes):
+    return {"since": since, "version": changes[-1]["version"], "changes": list(changes)}
+
+def test_lookup_and_verify(snapshot_path):
+    """Records are found by (org_id, short_id) and their codes verify"""
+    with VerifierSnapshot(snapshot_path, KEY) as snapshot:
+        assert len(snapshot) == 2 and snapshot.check()
+        assert snapshot.find(1, 11).otp_digits == 8
+        assert snapshot.find(1, 12) is None
+        assert snapshot.verify(code(snapshot, 2222, 11, 8), 11, timestamp=NOW)
+        assert not snapshot.verify(code(snapshot, 1111, 11, 8), 11, timestamp=NOW)
+
+def test_wrong_key_is_rejected(snapshot_path):
+    """A snapshot only opens with the key it was written with"""
+    with pytest.raises(SnapshotError):
+        VerifierSnapshot(snapshot_path, os.urandom(32))
+
+def test_revoke_by_delta_keeps_the_record(snapshot_path):
+    """A revocation without a wrapped key clears the active flag instead of deleting"""
+    assert apply_changes(snapshot_path, page(5, change(6, ALICE, 10, kind="revoke", active=False)), KEY) == 1
+    with VerifierSnapshot(snapshot_path, KEY) as snapshot:
+        alice = snapshot.find(1, 10)
+        assert alice is not None and not alice.active
+        assert not snapshot.verify(code(snapshot, 1111, 10, 6), 10, timestamp=NOW)
+        assert snapshot.feed_version == 6
+
+    # Reactivation brings the key back; a delete drops the record
+    apply_changes(snapshot_path, page(6, change(7, ALICE, 10, kind="reactivate", seed=1111),
+                                      change(8, BOB, 11, kind="delete", active=False)), KEY)
+    with VerifierSnapshot(snapshot_path, KEY) as snapshot:
+        assert snapshot.verify(code(snapshot, 1111, 10, 6), 10, timestamp=NOW)
+        assert snapshot.find(1, 11) is None
+
+def test_unknown_revoked_agent_is_recorded_inactive(snapshot_path):
+    """A revoked agent new to the snapshot is kept, so it is not mistaken for unknown"""
+    apply_changes(snapshot_path, page(5, change(6, CAROL, 12, kind="revoke", active=False)), KEY)
+    with VerifierSnapshot(snapshot_path, KEY) as snapshot:
+        carol = snapshot.find(1, 12)
+        assert carol is not None and not carol.active
+        assert not snapshot.verify("000000", 12, timestamp=NOW)
+
+def test_page_must_continue_the_snapshot(snapshot_path):
+    """A page that does not start at the snapshot's feed version is refused"""
+    with pytest.raises(SnapshotError):
+        apply_changes(snapshot_path, page(4, change(6, ALICE, 10)), KEY)
@@ -0,0 +1,37 @@
+"""test_startup.py"""
+
+import sqlite3
+
+from app.core.startup import DatabaseMarkers, latest_schema_version, needs_migration, read_markers
+
+def test_missing_and_memory_databases(tmp_path):
+    """A database that does not exist yet is uninitialized, and is not created"""
+    path = tmp_path / "new.db"
+    assert read_markers(f"sqlite:///{path}") == DatabaseMarkers(False, None, False)
+    assert not path.exists()
+    assert read_markers("sqlite:///:memory:") == DatabaseMarkers(False, None, False)
+
+def test_markers_follow_schema_and_seed_state(tmp_path):
+    """Schema version and seeding are read from the database itself"""
+    path = tmp_path / "app.db"
+    url = f"sqlite:///{path}"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE employees (id INTEGER)")
+    conn.commit()
+    # Tables created before migrations were tracked
+    assert read_markers(url) == DatabaseMarkers(True, None, False)
+
+    conn.execute("CREATE TABLE schema_version (version INTEGER)")
+    conn.executemany("INSERT INTO schema_version VALUES (?)", [(1,), (latest_schema_version(),)])
+    conn.execute("INSERT INTO employees VALUES (1)")
+    conn.commit()
+    conn.close()
+    assert read_markers(url) == DatabaseMarkers(True, latest_schema_version(), True)
+
+def test_needs_migration():
+    """Only a database at the newest migration file is up to date"""
+    latest = latest_schema_version()
+    assert latest >= 1
+    assert needs_migration(DatabaseMarkers(True, None, False))
+    assert needs_migration(DatabaseMarkers(True, latest - 1, True))
+    assert not needs_migration(DatabaseMarkers(True, latest, True))
@@ -0,0 +1,68 @@
+"""test_tokens.py"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import security
+from app.core.config import settings
+from app.core.security import TokenDenylist, TokenError, JWT_LEEWAY_SECONDS
+
+NOW = 1_800_000_000.0
+
+@pytest.fixture(autouse=True)
+def fresh_denylist(monkeypatch):
+    monkeypatch.setattr(security, "token_denylist", TokenDenylist())
+
+def user():
+    return SimpleNamespace(id=uuid.uuid4(), username="alice", role=SimpleNamespace(value="hr_staff"),
+                           permissions={"enable_agents": True}, is_superuser=False, updated_at=1)
+
+def test_round_trip_and_permissions():
+    """A token decodes to its claims, permissions included"""
+    claims = security.decode_access_token(security.create_access_token(user()))
+    assert claims["username"] == "alice"
+    assert security.token_has_permission(claims, "enable_agents")
+    assert not security.token_has_permission(claims, "delete_everything")
+
+def test_forged_and_expired_tokens_are_rejected(monkeypatch):
+    """A changed payload, another key or an expired token does not verify"""
+    header, payload, signature = security.create_access_token(user()).split(".")
+    with pytest.raises(TokenError):
+        security.decode_access_token(f"{header}.{payload}x.{signature}")
+    with pytest.raises(TokenError):
+        security.decode_access_token("not a token")
+
+    token = security.create_access_token(user(), expires_minutes=1)
+    monkeypatch.setattr(settings, "JWT_SECRET_KEY", settings.JWT_SECRET_KEY + "-rotated")
+    with pytest.raises(TokenError):
+        security.decode_access_token(token)
+
+    monkeypatch.setattr(security.time, "time", lambda: NOW)
+    expired = security.create_access_token(user(), expires_minutes=1)
+    monkeypatch.setattr(security.time, "time", lambda: NOW + 60 + JWT_LEEWAY_SECONDS + 1)
+    with pytest.raises(TokenError, match="expired"):
+        security.decode_access_token(expired)
+
+def test_revoked_token_is_denied():
+    """A revoked token stops verifying; other tokens of the user still do"""
+    token, other = security.create_access_token(user()), security.create_access_token(user())
+    security.revoke_access_token(token)
+    with pytest.raises(TokenError, match="revoked"):
+        security.decode_access_token(token)
+    assert security.decode_access_token(other)
+
+def test_denylist_forgets_expired_tokens():
+    """Entries are swept once their token is past expiry and leeway"""
+    clock = [NOW]
+    denylist = TokenDenylist(clock=lambda: clock[0])
+    denylist.revoke("a", NOW + 10)
+    denylist.revoke("b", NOW + 100)
+    # A token that has already expired is not stored at all
+    denylist.revoke("c", NOW - JWT_LEEWAY_SECONDS - 1)
+    assert denylist.is_revoked("a") and not denylist.is_revoked("c") and len(denylist) == 2
+
+    clock[0] = NOW + 10 + JWT_LEEWAY_SECONDS
+    denylist.sweep()
+    assert not denylist.is_revoked("a") and denylist.is_revoked("b")
@@ -14,11 +14,17 @@ import streamlit.components.v1 as components
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.core.config import settings
+from app.core.otp import get_otp_engine
+from app.core.rate_limit import get_rate_limiter
 from app.blockchain import get_blockchain_client
+from app.blockchain.acl_queue import AclChangeQueue
+from app.core.change_feed import get_change_feed
 from app.db.base import get_db
+from app.db.sharding import tenant_org_ids
 from app.db.models.employee import Employee
-from app.db.models.blockchain import BlockchainIdentity, AuditLog, AuditLogAction
-from app.utils.crypto import decrypt, encrypt, generate_numeric_hash
+from app.db.models.blockchain import BlockchainIdentity, AuditLog, AuditLogAction, AclOperationType, AuthAttemptResult
+from app.utils.crypto import decrypt, encrypt
+from app.db.repositories.blockchain import short_id_allocator
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +33,15 @@ logger = logging.getLogger(__name__)
 # Initialize blockchain client
 blockchain_client = get_blockchain_client()
 
+# One OTP engine for generating and verifying codes
+otp_engine = get_otp_engine()
+
+# Token buckets on OTP generation, checked before any DB or crypto work
+rate_limiter = get_rate_limiter()
+
+# On-chain ACL changes are queued and applied in batches
+acl_queue = AclChangeQueue(blockchain_client)
+
 # Main app configuration
 st.set_page_config(
     page_title="ZK Caller Verification", 
@@ -132,8 +147,9 @@ def create_audit_log(db, action, resource_type=None, resource_id=None, details=N
     try:
         # Use a separate transaction that can fail independently
         # This ensures the main transaction succeeds even if logging fails
-        with get_db() as log_db:
+        with get_db(org_id) as log_db:
             log_entry = AuditLog(
+                org_id=org_id,
                 action=action,
                 resource_type=resource_type,
                 resource_id=resource_id,
@@ -151,6 +167,19 @@ def create_audit_log(db, action, resource_type=None, resource_id=None, details=N
         # Don't let audit logging failures affect the main operations
         return False
 
+# Helper function to publish agent lifecycle changes to the change feed
+def publish_agent_changes():
+    """Capture enables, revocations and reactivations after an admin action.
+
+    scripts/agent_changes.py captures on a schedule as well, so a failure
+    here only delays the change reaching remote verifiers.
+    """
+    try:
+        with get_db(org_id) as feed_db:
+            get_change_feed().capture(feed_db)
+    except Exception as e:
+        logger.error(f"Error capturing agent changes: {e}")
+
 # Session state initialization
 if 'enable_success' not in st.session_state:
     st.session_state.enable_success = False
@@ -164,6 +193,68 @@ if 'current_page' not in st.session_state:
 if 'selected_agent_id' not in st.session_state:
     st.session_state.selected_agent_id = None
 
+if 'access_token' not in st.session_state:
+    st.session_state.access_token = None
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Login (only when REQUIRE_LOGIN is set)
+# ─────────────────────────────────────────────────────────────────────────────
+if settings.REQUIRE_LOGIN:
+    # Imported here so deployments without login never load the hashing stack
+    from app.core.security import authenticate, create_access_token, decode_access_token, revoke_access_token, TokenError
+    
+    # Stateless check: signature, expiry and denylist, no database access
+    token_claims = None
+    if st.session_state.access_token:
+        try:
+            token_claims = decode_access_token(st.session_state.access_token)
+        except TokenError:
+            st.session_state.access_token = None
+    
+    if token_claims is None:
+        st.title("📞 ZK Caller Verification System - OKO Bank")
+        with st.form("login_form"):
+            login_username = st.text_input("Username")
+            login_password = st.text_input("Password", type="password")
+            login_submitted = st.form_submit_button("Log in")
+        
+        if login_submitted:
+            with st.spinner("Signing in..."):
+                with get_db() as db:  # users live on the default database
+                    user, login_result = authenticate(db, login_username, login_password)
+                    if user is not None:
+                        st.session_state.access_token = create_access_token(user)
+            if login_result == AuthAttemptResult.SUCCESS:
+                st.rerun()
+            elif login_result == AuthAttemptResult.ACCOUNT_LOCKED:
+                st.error(f"Too many failed attempts. Try again in {settings.LOCKOUT_MINUTES} minutes.")
+            elif login_result == AuthAttemptResult.ACCOUNT_DISABLED:
+                st.error("This account is disabled.")
+            else:
+                st.error("Invalid username or password.")
+        st.stop()
+    
+    with st.sidebar:
+        st.write(f"Signed in as **{token_claims['username']}**")
+        if st.button("Log out"):
+            revoke_access_token(st.session_state.access_token)
+            st.session_state.access_token = None
+            st.rerun()
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Tenant: the bank whose employees and agents the console manages; each
+# bank may live on its own database shard
+# ─────────────────────────────────────────────────────────────────────────────
+org_ids = tenant_org_ids()
+if st.session_state.get('org_id') not in org_ids:
+    st.session_state.org_id = org_ids[0]
+if len(org_ids) > 1:
+    with st.sidebar:
+        st.session_state.org_id = st.selectbox(
+            "Organization", org_ids, index=org_ids.index(st.session_state.org_id)
+        )
+org_id = st.session_state.org_id
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Header
 # ─────────────────────────────────────────────────────────────────────────────
@@ -197,13 +288,14 @@ if st.session_state.current_page == "HR Admin":
     st.write("Enable call center employees as verified agents by minting their blockchain identity badges")
     
     # Get employee list
-    with get_db() as db:
+    with get_db(org_id) as db:
         # Get employees who don't have blockchain identities yet
         employees = db.query(Employee).join(
             BlockchainIdentity,
             Employee.id == BlockchainIdentity.employee_id,
             isouter=True
         ).filter(
+            Employee.org_id == org_id,
             BlockchainIdentity.id == None
         ).all()
         
@@ -225,8 +317,8 @@ if st.session_state.current_page == "HR Admin":
                 # Get the employee from the selection
                 rep_id = selected.split(" – ")[0]
                 
-                with get_db() as db:
-                    employee = db.query(Employee).filter(Employee.rep_id == rep_id).first()
+                with get_db(org_id) as db:
+                    employee = db.query(Employee).filter(Employee.org_id == org_id, Employee.rep_id == rep_id).first()
                     
                     if employee:
                         # Display employee details
@@ -258,50 +350,50 @@ if st.session_state.current_page == "HR Admin":
                         # Button to enable the employee as an agent
                         if st.button("Mint Badge and Enable Agent", use_container_width=True):
                             with st.spinner("Generating blockchain identity and minting badge..."):
-                                with get_db() as db:
-                                    employee = db.query(Employee).filter(Employee.rep_id == rep_id).first()
+                                with get_db(org_id) as db:
+                                    employee = db.query(Employee).filter(Employee.org_id == org_id, Employee.rep_id == rep_id).first()
                                     
                                     if employee:
                                         # Flag to control execution flow
                                         proceed_with_enable = True
                                         
                                         # Generate seed for OTP
-                                        seed = int.from_bytes(os.urandom(4), 'big')
-                                        logger.info(f"Generated seed for {employee.rep_id}: {seed}")
+                                        seed = otp_engine.new_seed()
+                                        logger.info(f"Generated seed for {employee.rep_id}")
                                         
-                                        # Generate short ID from rep_id
-                                        short_id = generate_numeric_hash(employee.rep_id, 2)
+                                        # Allocate a unique short ID (committed with the identity)
+                                        short_id = short_id_allocator.allocate(db, org_id=employee.org_id)
                                         logger.info(f"Generated short ID for {employee.rep_id}: {short_id}")
                                         
                                         # Log action
-                                        logger.info(f"Minting blockchain badge for employee: {employee.first_name} {employee.last_name}")
+                                        logger.info(f"Creating blockchain account for employee: {employee.first_name} {employee.last_name}")
                                         
-                                        # Create blockchain badge
-                                        result = blockchain_client.mint_badge(
-                                            first_name=employee.first_name,
-                                            last_name=employee.last_name,
-                                            username=employee.username,
-                                            rep_id=employee.rep_id,
-                                            org_id=settings.ORG_ID,
-                                            short_id=short_id,
-                                            seed=seed,
-                                            digits=settings.DEFAULT_OTP_DIGITS,
-                                            permissions=employee.permissions
-                                        )
-                                        
-                                        # Encrypt the sensitive data
                                         try:
+                                            # Create the agent's account; the badge itself is minted
+                                            # on-chain by the queued MINT below
+                                            aleo_address, private_key, view_key = blockchain_client.create_account()
+                                            result = {
+                                                "aleo_address": aleo_address,
+                                                "private_key": private_key,
+                                                "view_key": view_key
+                                            }
+                                            
+                                            # Encrypt the sensitive data
+                                            # Per-identity data key, wrapped by the KMS
+                                            from app.utils.kms import new_data_key
+                                            data_key = new_data_key()
+                                            
                                             # Encrypt the seed properly
                                             seed_str = str(seed)
-                                            encrypted_seed = encrypt(seed_str)
+                                            encrypted_seed = encrypt(seed_str, data_key=data_key)
                                             logger.info(f"Encrypted seed: {encrypted_seed[:20]}...")
                                             
                                             # Encrypt private key
-                                            encrypted_private_key = encrypt(result["private_key"])
+                                            encrypted_private_key = encrypt(result["private_key"], data_key=data_key)
                                             logger.info(f"Encrypted private key: {encrypted_private_key[:20]}...")
                                             
                                             # Encrypt view key
-                                            encrypted_view_key = encrypt(result["view_key"])
+                                            encrypted_view_key = encrypt(result["view_key"], data_key=data_key)
                                             logger.info(f"Encrypted view key: {encrypted_view_key[:20]}...")
                                             
                                             # Create blockchain identity in database
@@ -310,9 +402,11 @@ if st.session_state.current_page == "HR Admin":
                                                 aleo_address=result["aleo_address"],
                                                 private_key_encrypted=encrypted_private_key,
                                                 view_key_encrypted=encrypted_view_key,
+                                                data_key_wrapped=data_key,
                                                 short_id=short_id,
                                                 seed=encrypted_seed,
-                                                badge_ciphertext=result["badge_ciphertext"],
+                                                # Set when the queued mint is confirmed
+                                                badge_ciphertext="",
                                                 otp_digits=settings.DEFAULT_OTP_DIGITS,
                                                 is_active=True
                                             )
@@ -320,9 +414,20 @@ if st.session_state.current_page == "HR Admin":
                                             # Add and commit the identity first to ensure it's saved
                                             # even if audit logging fails
                                             db.add(identity)
+                                            db.flush()
+                                            short_id_allocator.assign(db, short_id, identity.id, org_id=employee.org_id)
                                             db.commit()
                                             logger.info(f"Successfully saved blockchain identity for {employee.rep_id}")
                                             
+                                            # Queue the on-chain mint for the next ACL batch
+                                            acl_queue.enqueue(
+                                                db,
+                                                AclOperationType.MINT,
+                                                employee.rep_id,
+                                                identity_id=identity.id,
+                                                payload={"org_id": employee.org_id}
+                                            )
+                                            
                                             # Now log the action separately - if this fails, it won't affect
                                             # the main transaction that already completed
                                             create_audit_log(
@@ -335,6 +440,9 @@ if st.session_state.current_page == "HR Admin":
                                                     "aleo_address": result["aleo_address"]
                                                 }
                                             )
+
+                                            # Publish the change to remote verifiers right away
+                                            publish_agent_changes()
                                             
                                             # Update session state
                                             st.session_state.enable_success = True
@@ -352,7 +460,11 @@ if st.session_state.current_page == "HR Admin":
                                             logger.info(f"Successfully enabled agent: {employee.rep_id}")
                                             
                                         except Exception as e:
-                                            logger.error(f"Error encrypting sensitive data: {e}")
+                                            logger.error(f"Error enabling agent {employee.rep_id}: {e}")
+                                            # Give the allocated short ID back to the pool
+                                            db.rollback()
+                                            if short_id_allocator.discard(db, short_id, org_id=employee.org_id):
+                                                db.commit()
                                             st.error("Error securing agent data. Please try again or contact system administrator.")
                                             # Don't continue execution
                                             proceed_with_enable = False
@@ -417,11 +529,12 @@ elif st.session_state.current_page == "Agent Dashboard":
     """, unsafe_allow_html=True)
     
     # Get active agents for dropdown
-    with get_db() as db:
+    with get_db(org_id) as db:
         agents = db.query(Employee).join(
             BlockchainIdentity,
             Employee.id == BlockchainIdentity.employee_id
         ).filter(
+            Employee.org_id == org_id,
             BlockchainIdentity.is_active == True
         ).all()
         
@@ -506,15 +619,22 @@ elif st.session_state.current_page == "Agent Dashboard":
             st.session_state.last_otp_code = None
             st.session_state.last_otp_time_window = None
 
+        retry_after = 0.0
         if selected and (generate_button_clicked or auto_generate):
+            retry_after = rate_limiter.check_generation(rep_id)
+            if retry_after:
+                st.warning(f"Too many verification codes requested. Please wait {math.ceil(retry_after)} seconds.")
+
+        if selected and (generate_button_clicked or auto_generate) and not retry_after:
             with st.spinner("Generating verification code..."):
                 try:
-                    with get_db() as db:
+                    with get_db(org_id) as db:
                         # Get agent data from database
                         agent = db.query(BlockchainIdentity).join(
                             Employee,
                             Employee.id == BlockchainIdentity.employee_id
                         ).filter(
+                            Employee.org_id == org_id,
                             Employee.rep_id == rep_id
                         ).first()
                         
@@ -528,7 +648,7 @@ elif st.session_state.current_page == "Agent Dashboard":
                                 logger.info(f"Seed from database: {type(agent.seed)} - {agent.seed[:20] if isinstance(agent.seed, str) else 'not string'}")
                                 
                                 # Decrypt the seed
-                                decrypted_seed = decrypt(agent.seed)
+                                decrypted_seed = decrypt(agent.seed, data_key=agent.data_key_wrapped)
                                 logger.info(f"Decrypted seed type: {type(decrypted_seed)}, value: {decrypted_seed}")
                                 
                                 # Convert to integer (handle both string and int types)
@@ -552,33 +672,12 @@ elif st.session_state.current_page == "Agent Dashboard":
                                 
                                 # Generate OTP with better error handling
                                 try:
-                                    # Manual OTP generation (without blockchain client)
-                                    # If button is clicked, add extra modification to the time to ensure a new code
-                                    if generate_button_clicked:
-                                        # Add the current microseconds to ensure a different seed value
-                                        time_bytes = (time_window + int(time.time() * 1000000) % 1000).to_bytes(8, byteorder='big')
-                                        logger.info("Button clicked, generating fresh code with modified time")
-                                    else:
-                                        time_bytes = time_window.to_bytes(8, byteorder='big')
-                                        
-                                    seed_bytes = seed.to_bytes(8, byteorder='big')
-                                    message = time_bytes + rep_id_numeric.to_bytes(2, byteorder='big')
-                                    
-                                    # Generate HMAC-SHA1
-                                    import hmac
-                                    import hashlib
-                                    hmac_hash = hmac.new(seed_bytes, message, hashlib.sha1).digest()
-                                    
-                                    # Extract 4 bytes from the hash
-                                    offset = hmac_hash[-1] & 0x0F
-                                    code_bytes = hmac_hash[offset:offset+4]
-                                    
-                                    # Convert to code
-                                    code_int = int.from_bytes(code_bytes, byteorder='big') & 0x7FFFFFFF
-                                    code = code_int % (10 ** 6)  # 6-digit code
-                                    
-                                    # Format with leading zeros
-                                    code_str = f"{code:06d}"
+                                    # Same engine as every verifier, so the code can be checked;
+                                    # a code is fixed for its time window
+                                    code_str = otp_engine.generate(
+                                        seed, agent.org_id, rep_id_numeric,
+                                        digits=agent.otp_digits, time_window=time_window
+                                    )
                                     
                                     logger.info(f"Successfully generated OTP: {code_str}")
                                 except Exception as e:
@@ -720,11 +819,12 @@ elif st.session_state.current_page == "Agent Dashboard":
             components.html(countdown_html, height=120)
             
             # Display customer instructions
-            with get_db() as db:
+            with get_db(org_id) as db:
                 agent = db.query(BlockchainIdentity).join(
                     Employee,
                     Employee.id == BlockchainIdentity.employee_id
                 ).filter(
+                    Employee.org_id == org_id,
                     Employee.rep_id == rep_id
                 ).first()
                 employee = db.query(Employee).filter(Employee.id == agent.employee_id).first() if agent else None
@@ -754,11 +854,28 @@ elif st.session_state.current_page == "Agent Management":
     st.header("🔑 Agent Management")
     st.write("Manage agent identities, revoke access, and view activity logs")
     
+    # Pending on-chain ACL changes; scripts/flush_acl_queue.py submits them
+    # when due, or "Sync to chain now" does it on demand
+    with get_db(org_id) as db:
+        pending_acl_changes = acl_queue.pending_count(db)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.info(f"{pending_acl_changes} ACL change(s) waiting for the next on-chain batch")
+    with col2:
+        if st.button("Sync to chain now", disabled=pending_acl_changes == 0):
+            with st.spinner("Submitting ACL batch..."):
+                with get_db(org_id) as db:
+                    summary = acl_queue.flush(db)
+                st.success(f"Submitted {summary['submitted']} change(s) "
+                           f"in {len(summary['batches'])} batch(es)")
+                time.sleep(2)
+                st.rerun()
+    
     # Add tabs for different views
     tab1, tab2 = st.tabs(["Enabled Agents", "All Employees"])
     
     # Get all employees and their blockchain status
-    with get_db() as db:
+    with get_db(org_id) as db:
         # Query all employees with left join to blockchain identities
         employee_data = db.query(
             Employee, 
@@ -766,6 +883,8 @@ elif st.session_state.current_page == "Agent Management":
         ).outerjoin(
             BlockchainIdentity,
             Employee.id == BlockchainIdentity.employee_id
+        ).filter(
+            Employee.org_id == org_id
         ).all()
     
     # Tab 1: Enabled Agents
@@ -841,18 +960,25 @@ elif st.session_state.current_page == "Agent Management":
                         if blockchain_id.is_active:
                             if st.button("Revoke Agent Access", type="primary", key=f"revoke_{employee.id}"):
                                 with st.spinner("Revoking agent access..."):
-                                    with get_db() as db:
+                                    with get_db(org_id) as db:
                                         # Refresh the identity data
                                         agent = db.query(BlockchainIdentity).filter(BlockchainIdentity.id == blockchain_id.id).first()
                                         
-                                        # Call blockchain to revoke
-                                        result = blockchain_client.revoke_badge(agent.badge_ciphertext)
-                                        
-                                        # Update database
+                                        # Update database; the short ID goes into quarantine
                                         agent.is_active = False
                                         agent.revoked_at = datetime.utcnow()
+                                        short_id_allocator.release(db, agent.id)
                                         db.commit()  # Commit the changes first
                                         
+                                        # Queue the on-chain revocation for the next ACL batch
+                                        acl_queue.enqueue(
+                                            db,
+                                            AclOperationType.REVOKE,
+                                            employee.rep_id,
+                                            identity_id=agent.id,
+                                            payload={"org_id": agent.org_id, "badge_ciphertext": agent.badge_ciphertext}
+                                        )
+                                        
                                         # Log the revocation using our safe helper
                                         create_audit_log(
                                             db=db,
@@ -864,6 +990,9 @@ elif st.session_state.current_page == "Agent Management":
                                                 "reason": "Admin revocation"
                                             }
                                         )
+
+                                        # Publish the change to remote verifiers right away
+                                        publish_agent_changes()
                                         
                                         st.success(f"Agent '{employee.first_name} {employee.last_name}' has been revoked")
                                         # Refresh the page
@@ -872,7 +1001,7 @@ elif st.session_state.current_page == "Agent Management":
                         
                         # Recent Activity section
                         st.markdown("### Recent Activity")
-                        with get_db() as db:
+                        with get_db(org_id) as db:
                             logs = db.query(AuditLog).filter(
                                 AuditLog.resource_type == "agent",
                                 AuditLog.resource_id == str(blockchain_id.id)
@@ -980,18 +1109,25 @@ elif st.session_state.current_page == "Agent Management":
                         if blockchain_id.is_active:
                             if st.button("Revoke Agent Access", type="primary", key=f"revoke_all_{employee.id}"):
                                 with st.spinner("Revoking agent access..."):
-                                    with get_db() as db:
+                                    with get_db(org_id) as db:
                                         # Refresh the identity data
                                         agent = db.query(BlockchainIdentity).filter(BlockchainIdentity.id == blockchain_id.id).first()
                                         
-                                        # Call blockchain to revoke
-                                        result = blockchain_client.revoke_badge(agent.badge_ciphertext)
-                                        
-                                        # Update database
+                                        # Update database; the short ID goes into quarantine
                                         agent.is_active = False
                                         agent.revoked_at = datetime.utcnow()
+                                        short_id_allocator.release(db, agent.id)
                                         db.commit()  # Commit the changes first
                                         
+                                        # Queue the on-chain revocation for the next ACL batch
+                                        acl_queue.enqueue(
+                                            db,
+                                            AclOperationType.REVOKE,
+                                            employee.rep_id,
+                                            identity_id=agent.id,
+                                            payload={"org_id": agent.org_id, "badge_ciphertext": agent.badge_ciphertext}
+                                        )
+                                        
                                         # Log the revocation using our safe helper
                                         create_audit_log(
                                             db=db,
@@ -1003,6 +1139,9 @@ elif st.session_state.current_page == "Agent Management":
                                                 "reason": "Admin revocation"
                                             }
                                         )
+
+                                        # Publish the change to remote verifiers right away
+                                        publish_agent_changes()
                                         
                                         st.success(f"Agent '{employee.first_name} {employee.last_name}' has been revoked")
                                         # Refresh the page
@@ -1011,15 +1150,27 @@ elif st.session_state.current_page == "Agent Management":
                         else:
                             if st.button("Reactivate Agent", key=f"reactivate_all_{employee.id}"):
                                 with st.spinner("Reactivating agent..."):
-                                    with get_db() as db:
+                                    with get_db(org_id) as db:
                                         # Refresh the identity data
                                         agent = db.query(BlockchainIdentity).filter(BlockchainIdentity.id == blockchain_id.id).first()
                                         
-                                        # Update database
+                                        # Update database; takes back the old short ID if still free
+                                        agent.short_id = short_id_allocator.allocate(
+                                            db, agent.id, org_id=agent.org_id, preferred=agent.short_id
+                                        )
                                         agent.is_active = True
                                         agent.revoked_at = None
                                         db.commit()  # Commit the changes first
                                         
+                                        # Queue the on-chain reactivation for the next ACL batch
+                                        acl_queue.enqueue(
+                                            db,
+                                            AclOperationType.REACTIVATE,
+                                            employee.rep_id,
+                                            identity_id=agent.id,
+                                            payload={"org_id": agent.org_id}
+                                        )
+                                        
                                         # Log the reactivation using our safe helper
                                         create_audit_log(
                                             db=db,
@@ -1031,6 +1182,9 @@ elif st.session_state.current_page == "Agent Management":
                                                 "reason": "Admin reactivation"
                                             }
                                         )
+
+                                        # Publish the change to remote verifiers right away
+                                        publish_agent_changes()
                                         
                                         st.success(f"Agent '{employee.first_name} {employee.last_name}' has been reactivated")
                                         # Refresh the page
@@ -1039,7 +1193,7 @@ elif st.session_state.current_page == "Agent Management":
                         
                         # Recent Activity section
                         st.markdown("### Recent Activity")
-                        with get_db() as db:
+                        with get_db(org_id) as db:
                             logs = db.query(AuditLog).filter(
                                 AuditLog.resource_type == "agent",
                                 AuditLog.resource_id == str(blockchain_id.id)
@@ -1,4 +1,5 @@
 # caller-guard/utils/__init__.py
 from .blockchain import blockchain_call
+from .resilience import resilient_blockchain_call
 
-__all__ = ['blockchain_call']
\ No newline at end of file
+__all__ = ['blockchain_call', 'resilient_blockchain_call']
\ No newline at end of file
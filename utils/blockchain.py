@@ -1,11 +1,15 @@
-import subprocess
 import os
-import tempfile
 import json
 import re
 
+from utils.build_cache import get_build_cache
+from utils.costs import get_cost_model
+from utils.executor import get_default_executor
+from utils.resilience import classify_error
+
 def blockchain_call(program_name, function_name, inputs, project_path=None, 
-                   is_deployed=False, network=None, endpoint=None):
+                   is_deployed=False, network=None, endpoint=None, timeout=None,
+                   use_build_cache=True):
     """
     Call an Aleo program function using Leo CLI
     
@@ -14,53 +18,87 @@ def blockchain_call(program_name, function_name, inputs, project_path=None,
         function_name: Function to call
         inputs: List of input parameters
         project_path: Path to Leo project
-        is_deployed: Whether to run on deployed program
+        is_deployed: Whether to execute against the deployed program:
+            the transaction is broadcast (``leo execute --broadcast``), so
+            input records are spent and finalize blocks update mappings.
+            Otherwise the transition only runs locally (``leo run``) and
+            leaves the chain state untouched
         network: Network to use (e.g., "testnet")
         endpoint: API endpoint for the network
+        timeout: Seconds before the Leo process (and its children) is killed;
+            None waits forever
+        use_build_cache: For local runs, execute the cached compiled program
+            with snarkvm instead of recompiling with leo (see
+            utils.build_cache); Leo is only invoked when sources changed
+
+    Successful results carry "constraints" (per transition), "fee" (in
+    microcredits, for executions) and "duration" (seconds).
+
+    Failures are returned as {"success": False, "error": ..., "error_type": ...}
+    where error_type is one of "timeout", "transient" or "permanent" (see
+    utils.resilience.classify_error).
     """
-    # Always quote arguments for Leo CLI
-    input_args = [f'"{str(arg)}"' for arg in inputs]
-    formatted_inputs = " ".join(input_args)
-    
-    # Create temp file for output
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.json') as tmp:
-        output_file = tmp.name
-    
     # Get project path
     if project_path is None:
         project_path = os.getcwd()
     
-    # Build command
-    if is_deployed or True:  # Always use leo run
-        network_flag = f"--network {network}" if network else ""
-        endpoint_flag = f"--endpoint \"{endpoint}\"" if endpoint else ""
-        base_cmd = f"cd {project_path} && leo run {function_name} {formatted_inputs} {network_flag} {endpoint_flag}"
-    else:
-        base_cmd = f"cd {project_path} && leo execute {program_name} {function_name} {formatted_inputs}"
-    
-    # Use WSL on Windows
-    cmd = f"wsl -- bash -c '{base_cmd}'" if os.name == 'nt' else base_cmd
-    
+    # Build command as an argv list: no shell, so inputs need no quoting
+    executor = get_default_executor()
+    cwd = project_path
+    artifacts = None
+    if use_build_cache and not (is_deployed or network or endpoint):
+        # Warm build: run the compiled program directly, skipping Leo's
+        # compile and key synthesis
+        artifacts = get_build_cache().ensure(project_path, executor, timeout=timeout)
     try:
-        print(f"Executing: {cmd}")
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        output = result.stdout
+        if artifacts is not None:
+            argv = executor.snarkvm_argv("run", function_name, inputs)
+            cwd = artifacts.build_dir
+        elif is_deployed:
+            argv = executor.leo_argv("execute", function_name, inputs, network=network, endpoint=endpoint,
+                                     extra=["--broadcast"])
+        else:
+            argv = executor.leo_argv("run", function_name, inputs, network=network, endpoint=endpoint)
+    except ValueError as e:
+        # An input too large for the OS argument limit cannot succeed on retry
+        print(f"Invalid input: {e}")
+        return {"success": False, "error": str(e), "error_type": "permanent"}
+    
+    print(f"Executing: {' '.join(argv[:3])} ... (cwd={cwd})")
+    result = executor.run(argv, cwd=cwd, timeout=timeout)
+
+    if result.timed_out:
+        print(f"Command timed out after {timeout}s")
+        return {"success": False, "error": f"Timed out after {timeout}s", "error_type": "timeout"}
 
-        # Try to parse JSON from output, or just return the output
-        try:
-            return json.loads(output)
-        except json.JSONDecodeError:
-            return {"success": True, "raw_output": output.strip()}
+    if result.returncode != 0:
+        print(f"Command failed with exit status {result.returncode}")
+        print(f"Error output: {result.stderr}")
+        return {
+            "success": False,
+            "error": f"Command '{' '.join(argv[:3])}' returned non-zero exit status {result.returncode}.",
+            "stderr": result.stderr.strip(),
+            "error_type": classify_error(result.returncode, result.stderr),
+        }
 
-    except subprocess.CalledProcessError as e:
-        print(f"Command failed: {e}")
-        print(f"Error output: {e.stderr if hasattr(e, 'stderr') else ''}")
-        return {"success": False, "error": str(e)}
-    finally:
-        try:
-            os.unlink(output_file)
-        except:
-            pass
+    # Keep proving/verifying keys synthesized by this run
+    if artifacts is not None:
+        get_build_cache().store(project_path, artifacts.source_hash)
+
+    # Surface constraint counts and fees, and feed them to the cost model
+    costs = get_cost_model().record(project_path, result.stdout, result.duration,
+                                    transition=f"{program_name}/{function_name}")
+
+    # Try to parse JSON from output, or just return the output
+    try:
+        output = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        output = {"success": True, "raw_output": result.stdout.strip()}
+    if isinstance(output, dict):
+        output.setdefault("constraints", costs["constraints"])
+        output.setdefault("fee", costs["fee"])
+        output.setdefault("duration", result.duration)
+    return output
 
 def extract_leo_output(raw_output):
     """
@@ -0,0 +1,207 @@
+"""build_cache.py - Content-addressed cache of compiled Leo programs and keys.
+
+A Leo project's compiled output (``build/main.aleo``, ``main.avm``, prover
+and verifier keys) depends only on ``src/main.leo`` and ``program.json``.
+``BuildCache`` hashes those two files, keeps a copy of the build directory
+for every hash under ``~/.zk_caller_verification/builds/<hash>/`` and
+restores it into the project when the sources match, so ``leo build`` and
+proving-key synthesis only run after a real source change.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Where cached builds are stored
+BUILD_CACHE_DIR = Path.home() / ".zk_caller_verification" / "builds"
+
+# Files that determine the compiled program
+SOURCE_FILES = (("src", "main.leo"), ("program.json",))
+
+# Marker written into a project's build directory after a restore or build
+MARKER_FILE = ".source_hash"
+
+class BuildArtifacts:
+    """A compiled program ready to execute."""
+
+    def __init__(self, project_path: str, build_dir: str, source_hash: str, warm: bool):
+        self.project_path = project_path
+        self.build_dir = build_dir
+        self.source_hash = source_hash
+        self.warm = warm
+
+    def __repr__(self) -> str:
+        return f"BuildArtifacts({self.build_dir}, {self.source_hash[:12]}, warm={self.warm})"
+
+class BuildCache:
+    """Content-addressed store of Leo build directories.
+
+    Args:
+        cache_dir: Root of the cache (default: BUILD_CACHE_DIR)
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else BUILD_CACHE_DIR
+        self._hashes: Dict[str, Tuple[tuple, str]] = {}
+        self._lock = threading.Lock()
+
+    def source_hash(self, project_path: str) -> str:
+        """Hash ``src/main.leo`` and ``program.json`` of a project.
+
+        The result is memoised on the files' size and mtime, so repeated calls
+        cost two ``stat`` calls.
+        """
+        paths = [os.path.join(project_path, *parts) for parts in SOURCE_FILES]
+        stamp = tuple((st.st_size, st.st_mtime_ns) for st in map(os.stat, paths))
+        key = os.path.abspath(project_path)
+        with self._lock:
+            cached = self._hashes.get(key)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, "rb") as f:
+                content = f.read()
+            digest.update(len(content).to_bytes(8, "big"))
+            digest.update(content)
+        value = digest.hexdigest()
+        with self._lock:
+            self._hashes[key] = (stamp, value)
+        return value
+
+    def entry_path(self, source_hash: str) -> Path:
+        return self.cache_dir / source_hash
+
+    def has(self, source_hash: str) -> bool:
+        return (self.entry_path(source_hash) / "main.aleo").exists()
+
+    def lookup(self, project_path: str) -> Optional[BuildArtifacts]:
+        """Return warm artifacts for a project without building anything.
+
+        Restores the cached build into the project when its build directory
+        is stale. Returns None if the sources have never been built.
+        """
+        digest = self.source_hash(project_path)
+        build_dir = os.path.join(project_path, "build")
+        marker = os.path.join(build_dir, MARKER_FILE)
+        try:
+            with open(marker) as f:
+                if f.read().strip() == digest:
+                    return BuildArtifacts(project_path, build_dir, digest, warm=True)
+        except OSError:
+            pass
+
+        if not self.has(digest):
+            return None
+        self._restore(digest, build_dir)
+        logger.info(f"Restored cached build {digest[:12]} into {build_dir}")
+        return BuildArtifacts(project_path, build_dir, digest, warm=True)
+
+    def ensure(self, project_path: str, executor=None, timeout: Optional[float] = None) -> Optional[BuildArtifacts]:
+        """Return up-to-date artifacts for a project, building only on a miss.
+
+        Args:
+            project_path: Leo project directory
+            executor: LeoExecutor used for ``leo build`` (default: shared one)
+            timeout: Seconds allowed for the build
+
+        Returns:
+            Optional[BuildArtifacts]: Artifacts, or None if the build failed
+        """
+        try:
+            artifacts = self.lookup(project_path)
+        except FileNotFoundError:
+            # Not a Leo project with sources; nothing to cache
+            return None
+        if artifacts is not None:
+            return artifacts
+
+        if executor is None:
+            from utils.executor import get_default_executor
+            executor = get_default_executor()
+        digest = self.source_hash(project_path)
+        logger.info(f"No cached build for {project_path} ({digest[:12]}), running leo build")
+        result = executor.run([executor.leo_bin, "build"], cwd=project_path, timeout=timeout)
+        if not result.ok:
+            logger.error(f"leo build failed: {result.stderr.strip()}")
+            return None
+
+        build_dir = os.path.join(project_path, "build")
+        if not os.path.exists(os.path.join(build_dir, "main.aleo")):
+            logger.error(f"leo build produced no build/main.aleo in {project_path}")
+            return None
+        self.store(project_path, digest)
+        return BuildArtifacts(project_path, build_dir, digest, warm=False)
+
+    def store(self, project_path: str, source_hash: Optional[str] = None) -> None:
+        """Copy a project's build directory into the cache and mark it current.
+
+        Files already in the cache entry are kept, so calling this after an
+        execution only adds newly synthesized proving/verifying keys.
+        """
+        digest = source_hash or self.source_hash(project_path)
+        build_dir = os.path.join(project_path, "build")
+        entry = self.entry_path(digest)
+        entry.mkdir(parents=True, exist_ok=True)
+        manifest_path = entry / "manifest.json"
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            manifest = {}
+
+        added = False
+        for root, _, files in os.walk(build_dir):
+            for name in files:
+                src = os.path.join(root, name)
+                relative = os.path.relpath(src, build_dir)
+                if name == MARKER_FILE or relative in manifest:
+                    continue
+                dst = entry / relative
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+                with open(dst, "rb") as f:
+                    manifest[relative] = hashlib.sha256(f.read()).hexdigest()
+                added = True
+
+        if added:
+            tmp_path = manifest_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"source_hash": digest, "files": manifest}, f, indent=2)
+            os.replace(tmp_path, manifest_path)
+        marker = os.path.join(build_dir, MARKER_FILE)
+        if added or not os.path.exists(marker):
+            with open(marker, "w") as f:
+                f.write(digest)
+
+    def _restore(self, source_hash: str, build_dir: str) -> None:
+        entry = self.entry_path(source_hash)
+        os.makedirs(build_dir, exist_ok=True)
+        for root, _, files in os.walk(entry):
+            for name in files:
+                if name == "manifest.json" and root == str(entry):
+                    continue
+                src = os.path.join(root, name)
+                dst = os.path.join(build_dir, os.path.relpath(src, entry))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst)
+        with open(os.path.join(build_dir, MARKER_FILE), "w") as f:
+            f.write(source_hash)
+
+# Build cache shared by blockchain_call
+_default_cache: Optional[BuildCache] = None
+
+def get_build_cache() -> BuildCache:
+    """Get the shared build cache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BuildCache()
+    return _default_cache
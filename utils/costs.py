@@ -0,0 +1,336 @@
+"""costs.py - Fee and proving-cost model for chain calls, with a batch planner.
+
+Leo prints constraint counts for every ``leo run`` and a fee breakdown for
+every ``leo execute``. ``CostModel`` parses those numbers out of the output,
+keeps running averages per transition together with the measured wall-clock
+time, and persists them keyed by the hash of the compiled program
+(``build/main.aleo``), so estimates are thrown away as soon as the program
+changes.
+
+``plan_batches`` uses those estimates to group pending mints and revokes into
+the cheapest mix of single and batched transitions.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Where per-build cost tables are stored
+COST_CACHE_DIR = Path.home() / ".zk_caller_verification" / "costs"
+
+# Rough proving speed used until a transition has been timed
+SECONDS_PER_CONSTRAINT = 2e-5
+
+# 1 credit = 1,000,000 microcredits
+MICROCREDITS_PER_CREDIT = 1_000_000
+
+# "'agent_manager.aleo/mint_agent' - 4,217 constraints (called 1 time)"
+CONSTRAINTS_PATTERN = re.compile(r"'(?P<transition>[\w.]+/\w+)'\s*-\s*(?P<count>[\d,]+)\s+constraints")
+
+# "Transaction storage cost: 0.001 credits", "Total fee: 0.002 credits",
+# "Base execution cost for 'agent_manager.aleo' is 0.001331 credits."
+FEE_PATTERNS = {
+    "storage": re.compile(r"storage cost[^\d]*?(?P<credits>\d+(?:\.\d+)?)\s*credits", re.IGNORECASE),
+    "execution": re.compile(r"(?<!base )execution cost[^\d]*?(?P<credits>\d+(?:\.\d+)?)\s*credits",
+                            re.IGNORECASE),
+    "finalize": re.compile(r"finalize cost[^\d]*?(?P<credits>\d+(?:\.\d+)?)\s*credits", re.IGNORECASE),
+    "priority": re.compile(r"priority fee[^\d]*?(?P<credits>\d+(?:\.\d+)?)\s*credits", re.IGNORECASE),
+    "total": re.compile(r"(?:total fee|base execution cost[^\d]*?is)[^\d]*?(?P<credits>\d+(?:\.\d+)?)\s*credits",
+                        re.IGNORECASE),
+}
+
+def parse_constraints(output: str) -> Dict[str, int]:
+    """Extract constraint counts per transition from Leo output.
+
+    Returns:
+        Dict[str, int]: ``program/function`` to constraint count
+    """
+    return {
+        match.group("transition"): int(match.group("count").replace(",", ""))
+        for match in CONSTRAINTS_PATTERN.finditer(output or "")
+    }
+
+def parse_fees(output: str) -> Dict[str, int]:
+    """Extract the fee breakdown from ``leo execute`` output.
+
+    Returns:
+        Dict[str, int]: Fee components in microcredits (storage, execution,
+        finalize, priority, total); only components present in the output
+    """
+    fees = {}
+    for name, pattern in FEE_PATTERNS.items():
+        match = pattern.search(output or "")
+        if match:
+            fees[name] = int(round(float(match.group("credits")) * MICROCREDITS_PER_CREDIT))
+    if "total" not in fees and fees:
+        fees["total"] = sum(fees.values())
+    return fees
+
+def build_hash(project_path: str) -> str:
+    """Hash a Leo project's compiled program (``build/main.aleo``).
+
+    Falls back to ``src/main.leo`` for projects that have not been built.
+    """
+    for relative in (("build", "main.aleo"), ("src", "main.leo")):
+        path = os.path.join(project_path, *relative)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+    raise FileNotFoundError(f"No compiled program found in {project_path}")
+
+class TransitionCost:
+    """Running averages of the cost of one transition."""
+
+    def __init__(self, constraints: int = 0, fee_microcredits: Optional[int] = None,
+                 seconds: Optional[float] = None, samples: int = 0):
+        self.constraints = constraints
+        self.fee_microcredits = fee_microcredits
+        self.seconds = seconds
+        self.samples = samples
+
+    @property
+    def estimated_seconds(self) -> float:
+        """Measured proving time, or an estimate from the constraint count."""
+        if self.seconds is not None:
+            return self.seconds
+        return self.constraints * SECONDS_PER_CONSTRAINT
+
+    def observe(self, constraints: Optional[int], fee: Optional[int], seconds: Optional[float]) -> None:
+        """Fold one execution into the averages."""
+        self.samples += 1
+        if constraints:
+            self.constraints = constraints
+        if fee is not None:
+            self.fee_microcredits = fee if self.fee_microcredits is None else \
+                self.fee_microcredits + (fee - self.fee_microcredits) / self.samples
+        if seconds is not None:
+            self.seconds = seconds if self.seconds is None else \
+                self.seconds + (seconds - self.seconds) / self.samples
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "constraints": self.constraints,
+            "fee_microcredits": self.fee_microcredits,
+            "seconds": self.seconds,
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TransitionCost":
+        return cls(data.get("constraints", 0), data.get("fee_microcredits"),
+                   data.get("seconds"), data.get("samples", 0))
+
+class CostModel:
+    """Per-build cost tables for Leo transitions.
+
+    Args:
+        cache_dir: Directory holding one ``<build hash>.json`` per program build
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else COST_CACHE_DIR
+        self._tables: Dict[str, Dict[str, TransitionCost]] = {}
+        self._lock = threading.Lock()
+
+    def _table(self, digest: str) -> Dict[str, TransitionCost]:
+        table = self._tables.get(digest)
+        if table is None:
+            table = {}
+            path = self.cache_dir / f"{digest}.json"
+            if path.exists():
+                try:
+                    with open(path) as f:
+                        table = {k: TransitionCost.from_dict(v) for k, v in json.load(f).items()}
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable cost table {path}: {e}")
+            self._tables[digest] = table
+        return table
+
+    def _save(self, digest: str) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self.cache_dir / f"{digest}.json"
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({k: v.to_dict() for k, v in self._tables[digest].items()}, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist cost table: {e}")
+
+    def record(self, project_path: str, output: str, seconds: Optional[float] = None,
+               transition: Optional[str] = None) -> Dict[str, Any]:
+        """Record the costs reported in one Leo invocation's output.
+
+        Args:
+            project_path: Leo project the transition was run from
+            output: Captured stdout of ``leo run``/``leo execute``
+            seconds: Measured wall-clock time of the invocation
+            transition: ``program/function`` if the output has no constraint line
+
+        Returns:
+            Dict[str, Any]: Parsed ``constraints`` and ``fee`` (microcredits)
+        """
+        constraints = parse_constraints(output)
+        fees = parse_fees(output)
+        if transition is None:
+            if not constraints:
+                return {"constraints": {}, "fee": fees}
+            # The called transition is the first one Leo lists
+            transition = next(iter(constraints))
+        try:
+            digest = build_hash(project_path)
+        except FileNotFoundError:
+            return {"constraints": constraints, "fee": fees}
+        with self._lock:
+            table = self._table(digest)
+            cost = table.setdefault(transition, TransitionCost())
+            cost.observe(constraints.get(transition), fees.get("total"), seconds)
+            self._save(digest)
+        return {"constraints": constraints, "fee": fees}
+
+    def estimates(self, project_path: str) -> Dict[str, TransitionCost]:
+        """All cost estimates recorded for the project's current build."""
+        with self._lock:
+            return dict(self._table(build_hash(project_path)))
+
+    def estimate(self, project_path: str, transition: str) -> Optional[TransitionCost]:
+        """Cost estimate for ``program/function`` under the current build."""
+        with self._lock:
+            return self._table(build_hash(project_path)).get(transition)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch planning
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TransitionSpec:
+    """How one operation type maps onto transitions.
+
+    Args:
+        single: Transition handling one operation
+        batch: Transition handling ``capacity`` operations
+        capacity: Slots in the batched transition
+        pad: Whether a partly filled batch can be padded; record inputs
+            cannot be, so such batches only run when full
+    """
+
+    def __init__(self, single: str, batch: Optional[str] = None, capacity: int = 1,
+                 pad: bool = True):
+        self.single = single
+        self.batch = batch
+        self.capacity = capacity if batch else 1
+        self.pad = pad
+
+# Operation types of agent_manager.aleo
+AGENT_MANAGER_SPECS: Dict[str, TransitionSpec] = {
+    "mint": TransitionSpec("agent_manager.aleo/mint_agent", "agent_manager.aleo/mint_agents", 4),
+    "revoke": TransitionSpec("agent_manager.aleo/revoke_agent", "agent_manager.aleo/revoke_agents", 4,
+                             pad=False),
+}
+
+# Operation types of agent_otp_proof.aleo; verify_otps skips padded slots
+OTP_PROOF_SPECS: Dict[str, TransitionSpec] = {
+    "verify": TransitionSpec("agent_otp_proof.aleo/verify_otp", "agent_otp_proof.aleo/verify_otps", 8),
+}
+
+class PlannedBatch:
+    """One transition execution in a batch plan."""
+
+    def __init__(self, transition: str, operations: List[Any], estimated_seconds: float,
+                 estimated_fee: float):
+        self.transition = transition
+        self.operations = operations
+        self.estimated_seconds = estimated_seconds
+        self.estimated_fee = estimated_fee
+
+    def __repr__(self) -> str:
+        return (f"PlannedBatch({self.transition}, ops={len(self.operations)}, "
+                f"seconds={self.estimated_seconds:.2f}, fee={self.estimated_fee:.0f})")
+
+def _cost_of(estimates: Dict[str, TransitionCost], transition: str):
+    cost = estimates.get(transition)
+    if cost is None:
+        return None
+    return cost.estimated_seconds, float(cost.fee_microcredits or 0)
+
+def plan_batches(operations: Iterable[Dict[str, Any]],
+                 estimates: Dict[str, TransitionCost],
+                 specs: Optional[Dict[str, TransitionSpec]] = None,
+                 seconds_weight: float = 1.0,
+                 fee_weight: float = 1.0) -> List[PlannedBatch]:
+    """Group pending operations into the cheapest set of transition executions.
+
+    Operations of each type fill as many full batched transitions as possible;
+    the remainder goes either into one padded batch (where the spec allows
+    padding) or into single transitions, whichever is cheaper under
+    ``seconds_weight * proving_seconds + fee_weight * fee_microcredits``.
+
+    Args:
+        operations: Dicts with a ``type`` key matching ``specs``
+        estimates: ``program/function`` to TransitionCost (see CostModel)
+        specs: Operation type to TransitionSpec (default: AGENT_MANAGER_SPECS)
+        seconds_weight: Weight of one second of proving time
+        fee_weight: Weight of one microcredit of fees
+
+    Returns:
+        List[PlannedBatch]: Executions covering every operation exactly once
+
+    Raises:
+        ValueError: If an operation has an unknown type
+    """
+    specs = AGENT_MANAGER_SPECS if specs is None else specs
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for operation in operations:
+        if operation["type"] not in specs:
+            raise ValueError(f"Unknown operation type: {operation['type']}")
+        by_type.setdefault(operation["type"], []).append(operation)
+
+    def weighted(cost):
+        return seconds_weight * cost[0] + fee_weight * cost[1]
+
+    plan = []
+    for op_type, pending in by_type.items():
+        spec = specs[op_type]
+        single = _cost_of(estimates, spec.single)
+        batch = _cost_of(estimates, spec.batch) if spec.batch else None
+        if single is None:
+            # An unmeasured single is assumed to cost a batch slot, so a
+            # measured batch keeps being used while singles are unmeasured
+            single = (batch[0] / spec.capacity, batch[1] / spec.capacity) if batch is not None else (0.0, 0.0)
+
+        if spec.batch is None or (batch is not None
+                                  and weighted(batch) > spec.capacity * weighted(single)):
+            # A full batch costs more than the same number of singles
+            plan.extend(PlannedBatch(spec.single, [op], *single) for op in pending)
+            continue
+
+        # An unmeasured batch transition is assumed to beat ``capacity``
+        # singles (the per-transaction fee dominates) until it has been timed
+        batch_cost = batch or (0.0, 0.0)
+        full = len(pending) - len(pending) % spec.capacity
+        for start in range(0, full, spec.capacity):
+            plan.append(PlannedBatch(spec.batch, pending[start:start + spec.capacity], *batch_cost))
+        remainder = pending[full:]
+        if (remainder and spec.pad and batch is not None
+                and weighted(batch) < len(remainder) * weighted(single)):
+            plan.append(PlannedBatch(spec.batch, remainder, *batch))
+        else:
+            plan.extend(PlannedBatch(spec.single, [op], *single) for op in remainder)
+    return plan
+
+# Cost model shared by blockchain_call
+_default_model: Optional[CostModel] = None
+
+def get_cost_model() -> CostModel:
+    """Get the shared cost model."""
+    global _default_model
+    if _default_model is None:
+        _default_model = CostModel()
+    return _default_model
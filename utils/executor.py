@@ -0,0 +1,162 @@
+"""executor.py - Shell-free execution of the Leo and snarkVM command line tools.
+
+Commands are passed to the OS as argv lists with ``cwd=`` set to the project
+directory, so no intermediate shell is forked and inputs (including records
+full of braces, quotes and newlines) reach Leo byte for byte. The process
+environment and tool paths are resolved once per executor and reused for
+every call.
+"""
+
+import os
+import time
+import shutil
+import signal
+import subprocess
+from typing import Any, Dict, List, Optional, Sequence
+
+# Linux rejects single arguments longer than MAX_ARG_STRLEN (32 pages)
+MAX_ARG_BYTES = 131072
+
+class ExecutionResult:
+    """Outcome of one Leo/snarkVM process."""
+
+    def __init__(self, argv: List[str], returncode: Optional[int], stdout: str, stderr: str,
+                 timed_out: bool, duration: float):
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and self.returncode == 0
+
+    def __repr__(self) -> str:
+        return (f"ExecutionResult(argv={self.argv[:3]}..., returncode={self.returncode}, "
+                f"timed_out={self.timed_out}, duration={self.duration:.3f})")
+
+class LeoExecutor:
+    """Run Leo/snarkVM commands as argv lists in a reused environment.
+
+    Args:
+        env: Environment for child processes (default: snapshot of os.environ)
+        leo_bin: Leo executable (default: resolved from PATH)
+        snarkvm_bin: snarkVM executable (default: resolved from PATH)
+        use_wsl: Run through WSL (default: on Windows)
+    """
+
+    def __init__(self, env: Optional[Dict[str, str]] = None, leo_bin: Optional[str] = None,
+                 snarkvm_bin: Optional[str] = None, use_wsl: Optional[bool] = None):
+        self.env = dict(os.environ if env is None else env)
+        self.use_wsl = (os.name == 'nt') if use_wsl is None else use_wsl
+        path = self.env.get("PATH")
+        if self.use_wsl:
+            # Resolved inside the WSL distribution, not on the Windows host
+            self.leo_bin = leo_bin or "leo"
+            self.snarkvm_bin = snarkvm_bin or "snarkvm"
+        else:
+            self.leo_bin = leo_bin or shutil.which("leo", path=path) or "leo"
+            self.snarkvm_bin = snarkvm_bin or shutil.which("snarkvm", path=path) or "snarkvm"
+
+    def leo_argv(self, command: str, function_name: str, inputs: Sequence[Any],
+                 network: Optional[str] = None, endpoint: Optional[str] = None,
+                 extra: Sequence[str] = ()) -> List[str]:
+        """Build the argv for ``leo <command> <function> <inputs...>``."""
+        argv = [self.leo_bin, command, function_name]
+        argv.extend(self.format_inputs(inputs))
+        if network:
+            argv.extend(["--network", network])
+        if endpoint:
+            argv.extend(["--endpoint", endpoint])
+        argv.extend(extra)
+        return argv
+
+    def snarkvm_argv(self, command: str, function_name: str, inputs: Sequence[Any],
+                     extra: Sequence[str] = ()) -> List[str]:
+        """Build the argv for ``snarkvm <command> <function> <inputs...>``."""
+        return [self.snarkvm_bin, command, function_name, *self.format_inputs(inputs), *extra]
+
+    @staticmethod
+    def format_inputs(inputs: Sequence[Any]) -> List[str]:
+        """Convert inputs to argv strings, checking the per-argument OS limit.
+
+        Raises:
+            ValueError: If an input exceeds MAX_ARG_BYTES
+        """
+        args = [str(arg) for arg in inputs]
+        for arg in args:
+            if len(arg.encode()) >= MAX_ARG_BYTES:
+                raise ValueError(f"Input of {len(arg.encode())} bytes exceeds the "
+                                 f"{MAX_ARG_BYTES}-byte argument limit")
+        return args
+
+    def run(self, argv: List[str], cwd: Optional[str] = None,
+            timeout: Optional[float] = None) -> ExecutionResult:
+        """Run a command and capture its output.
+
+        Args:
+            argv: Command and arguments
+            cwd: Working directory (the Leo project or build directory)
+            timeout: Seconds before the process group is killed
+
+        Returns:
+            ExecutionResult: Exit status, output and timing
+        """
+        if self.use_wsl:
+            full_argv = ["wsl"] + (["--cd", cwd] if cwd else []) + ["--"] + argv
+            cwd = None
+        else:
+            full_argv = argv
+
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                full_argv,
+                cwd=cwd,
+                env=self.env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                # Own process group, so a timeout also kills provers Leo spawned
+                start_new_session=not self.use_wsl,
+            )
+        except OSError as e:
+            # Same exit status a shell reports for a missing command
+            return ExecutionResult(full_argv, 127, "", str(e), False, time.perf_counter() - start)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            self._kill(process)
+            stdout, stderr = process.communicate()
+            timed_out = True
+        return ExecutionResult(full_argv, process.returncode, stdout or "", stderr or "",
+                               timed_out, time.perf_counter() - start)
+
+    def _kill(self, process: subprocess.Popen) -> None:
+        """Kill a process together with its children."""
+        try:
+            if not self.use_wsl:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+# Executor shared by blockchain_call
+_default_executor: Optional[LeoExecutor] = None
+
+def get_default_executor() -> LeoExecutor:
+    """Get the shared executor, created from the environment on first use."""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = LeoExecutor()
+    return _default_executor
+
+def reset_default_executor() -> None:
+    """Drop the shared executor so the next call re-reads the environment."""
+    global _default_executor
+    _default_executor = None
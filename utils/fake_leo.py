@@ -0,0 +1,805 @@
+"""fake_leo.py - Local stand-in for the Leo and snarkVM command line tools.
+
+Emulates the transitions of ``agent_manager.aleo``, ``agent_otp_generate.aleo``
+and ``agent_otp_proof.aleo`` and prints output formatted like the real CLIs, so
+``blockchain_call`` and the scripts built on it can run offline in CI.
+
+The emulator is configured through environment variables:
+
+    FAKE_LEO_LATENCY        Seconds to sleep per call, either ``0.5`` or a
+                            ``min,max`` range sampled uniformly
+    FAKE_LEO_FAILURE_RATE   Probability (0..1) that a call fails
+    FAKE_LEO_FAILURE_MODE   ``error`` (exit 1 with a network error),
+                            ``hang`` (sleep FAKE_LEO_HANG_SECONDS) or ``crash``
+    FAKE_LEO_HANG_SECONDS   How long a hanging call sleeps (default: 3600)
+    FAKE_LEO_SEED           Seed for deterministic addresses, nonces and faults
+    FAKE_LEO_STATE_DIR      Directory holding devnet state (spent records
+                            and public mappings written by finalize blocks)
+                            shared by all fake processes; unset keeps calls
+                            stateless like ``leo run``
+
+Use ``utils/bin/leo`` and ``utils/bin/snarkvm`` as drop-in executables, or
+``use_fake_leo()`` to put them on PATH for the current process.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Directory holding the ``leo`` and ``snarkvm`` wrapper executables
+BIN_DIR = Path(__file__).resolve().parent / "bin"
+
+# Aleo scalar field modulus, used to keep fake group/field values in range
+FIELD_MODULUS = 8444461749428370424248824938781546531375899335154063827935233455917409239041
+
+# Default caller for executions when no PRIVATE_KEY is configured
+DEFAULT_PRIVATE_KEY = "APrivateKey1zkpFakeLeoDevnetKey"
+
+# Constraint counts reported per transition, roughly in line with snarkVM
+CONSTRAINTS = {
+    "agent_manager.aleo/mint_agent": 4_217,
+    "agent_manager.aleo/revoke_agent": 9_872,
+    "agent_manager.aleo/is_agent_active": 5_104,
+    "agent_manager.aleo/mint_agents": 11_348,
+    "agent_manager.aleo/revoke_agents": 36_904,
+    "agent_otp_generate.aleo/generate_otp": 4_391,
+    "agent_otp_generate.aleo/prove_otp_generation": 4_458,
+    "agent_otp_generate.aleo/anchor_audit_root": 1_187,
+    "agent_otp_generate.aleo/set_anchor_admin": 512,
+    "agent_otp_proof.aleo/verify_otp": 3_890,
+    "agent_otp_proof.aleo/verify_otps": 27_614,
+    "agent_otp_proof.aleo/is_time_valid": 1_402,
+}
+
+# Microcredits charged per constraint and per byte of transaction storage
+MICROCREDITS_PER_CONSTRAINT = 0.25
+STORAGE_MICROCREDITS = 1_000
+
+# Finalize cost of transitions that write public mappings
+FINALIZE_MICROCREDITS = {
+    "agent_manager.aleo/mint_agent": 2_560,
+    "agent_manager.aleo/revoke_agent": 2_560,
+    "agent_manager.aleo/mint_agents": 10_240,
+    "agent_manager.aleo/revoke_agents": 10_240,
+    "agent_otp_generate.aleo/anchor_audit_root": 3_310,
+    "agent_otp_generate.aleo/set_anchor_admin": 1_280,
+}
+
+class FakeLeoError(Exception):
+    """Raised when an emulated transition fails, mirroring a Leo CLI error."""
+
+    def __init__(self, message: str, code: str = "ECLI0377002"):
+        super().__init__(message)
+        self.code = code
+
+class FakeLeoConfig:
+    """Latency, failure injection and determinism settings for the emulator."""
+
+    def __init__(self,
+                 latency: Tuple[float, float] = (0.0, 0.0),
+                 failure_rate: float = 0.0,
+                 failure_mode: str = "error",
+                 hang_seconds: float = 3600.0,
+                 seed: Optional[int] = None,
+                 state_dir: Optional[str] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.hang_seconds = hang_seconds
+        self.seed = seed
+        self.state_dir = state_dir
+
+    @classmethod
+    def from_env(cls, environ: Optional[Dict[str, str]] = None) -> "FakeLeoConfig":
+        """Build a configuration from ``FAKE_LEO_*`` environment variables."""
+        env = os.environ if environ is None else environ
+        latency_spec = env.get("FAKE_LEO_LATENCY", "0")
+        if "," in latency_spec:
+            low, high = (float(part) for part in latency_spec.split(",", 1))
+        else:
+            low = high = float(latency_spec)
+        seed = env.get("FAKE_LEO_SEED")
+        return cls(
+            latency=(low, high),
+            failure_rate=float(env.get("FAKE_LEO_FAILURE_RATE", "0")),
+            failure_mode=env.get("FAKE_LEO_FAILURE_MODE", "error"),
+            hang_seconds=float(env.get("FAKE_LEO_HANG_SECONDS", "3600")),
+            seed=int(seed) if seed is not None else None,
+            state_dir=env.get("FAKE_LEO_STATE_DIR") or None,
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        """Return the ``FAKE_LEO_*`` variables describing this configuration."""
+        env = {
+            "FAKE_LEO_LATENCY": f"{self.latency[0]},{self.latency[1]}",
+            "FAKE_LEO_FAILURE_RATE": str(self.failure_rate),
+            "FAKE_LEO_FAILURE_MODE": self.failure_mode,
+            "FAKE_LEO_HANG_SECONDS": str(self.hang_seconds),
+        }
+        if self.seed is not None:
+            env["FAKE_LEO_SEED"] = str(self.seed)
+        if self.state_dir:
+            env["FAKE_LEO_STATE_DIR"] = self.state_dir
+        return env
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Aleo value helpers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _strip_visibility(value: str) -> str:
+    """Drop a trailing ``.private``/``.public`` visibility suffix."""
+    for suffix in (".private", ".public", ".constant"):
+        if value.endswith(suffix):
+            return value[:-len(suffix)]
+    return value
+
+def parse_literal(value: str, type_name: str) -> int:
+    """Parse an Aleo literal such as ``1234field`` or ``60u64``.
+
+    Args:
+        value: Literal text, optionally with a visibility suffix
+        type_name: Expected type suffix (``field``, ``u8``, ``u32``, ``u64``)
+
+    Returns:
+        int: The numeric value
+
+    Raises:
+        FakeLeoError: If the literal is malformed or of the wrong type
+    """
+    value = _strip_visibility(str(value).strip().strip('"'))
+    if not value.endswith(type_name):
+        raise FakeLeoError(f"Failed to parse input '{value}' as type '{type_name}'", "EPAR0370005")
+    digits = value[:-len(type_name)].replace("_", "")
+    if not digits.isdigit():
+        raise FakeLeoError(f"Failed to parse input '{value}' as type '{type_name}'", "EPAR0370005")
+    number = int(digits)
+    if type_name.startswith("u") and number >= 2 ** int(type_name[1:]):
+        raise FakeLeoError(f"Literal '{value}' is out of range for type '{type_name}'", "EPAR0370005")
+    if type_name == "field" and number >= FIELD_MODULUS:
+        raise FakeLeoError(f"Literal '{value}' is out of range for type 'field'", "EPAR0370005")
+    return number
+
+def parse_array(value: str, type_name: str, length: int) -> List[int]:
+    """Parse an Aleo array literal such as ``[1field, 2field]``.
+
+    Raises:
+        FakeLeoError: If the array is malformed or has the wrong length
+    """
+    body = _strip_visibility(str(value).strip().strip('"'))
+    if not (body.startswith("[") and body.endswith("]")):
+        raise FakeLeoError(f"Failed to parse input '{value}' as type '[{type_name}; {length}u32]'",
+                           "EPAR0370005")
+    items = [item for item in body[1:-1].split(",") if item.strip()]
+    if len(items) != length:
+        raise FakeLeoError(f"Expected an array of {length} elements, found {len(items)}", "EPAR0370005")
+    return [parse_literal(item, type_name) for item in items]
+
+def parse_record(text: str) -> Dict[str, str]:
+    """Parse a plaintext record as printed by Leo into a dict of entries.
+
+    Args:
+        text: Record text of the form ``{ owner: aleo1....private, ... }``
+
+    Returns:
+        Dict[str, str]: Entry name to value, visibility suffixes removed
+
+    Raises:
+        FakeLeoError: If the text is not a record
+    """
+    body = str(text).strip().strip('"').strip()
+    if not (body.startswith("{") and body.endswith("}")):
+        raise FakeLeoError(f"Failed to parse input '{text}' as a record", "EPAR0370005")
+    entries = {}
+    for part in body[1:-1].split(","):
+        if not part.strip():
+            continue
+        if ":" not in part:
+            raise FakeLeoError(f"Failed to parse record entry '{part.strip()}'", "EPAR0370005")
+        key, value = part.split(":", 1)
+        entries[key.strip()] = _strip_visibility(value.strip())
+    return entries
+
+def parse_bool(value: str) -> bool:
+    """Parse an Aleo ``bool`` literal (``true`` or ``false``).
+
+    Raises:
+        FakeLeoError: If the literal is not a bool
+    """
+    value = _strip_visibility(str(value).strip().strip('"'))
+    if value not in ("true", "false"):
+        raise FakeLeoError(f"Failed to parse input '{value}' as type 'bool'", "EPAR0370005")
+    return value == "true"
+
+def parse_struct_array(value: str, length: int) -> List[Dict[str, str]]:
+    """Parse an array of struct literals such as ``[{ a: 1u8 }, { a: 2u8 }]``.
+
+    Raises:
+        FakeLeoError: If the array is malformed or has the wrong length
+    """
+    body = _strip_visibility(str(value).strip().strip('"'))
+    if not (body.startswith("[") and body.endswith("]")):
+        raise FakeLeoError(f"Failed to parse input '{value}' as an array of structs", "EPAR0370005")
+    items = [item.strip() + "}" for item in body[1:-1].split("}") if item.strip(" ,\n")]
+    if len(items) != length:
+        raise FakeLeoError(f"Expected an array of {length} elements, found {len(items)}", "EPAR0370005")
+    return [parse_record(item.lstrip(", ")) for item in items]
+
+def agent_commitment(rep_id: int, bank_name: int) -> int:
+    """``commitment_of`` in ``agent_manager.aleo``: the status mapping key of
+    an agent, 0 for a padding slot (rep_id 0).
+
+    BHP256 is modelled by the hash the off-chain code uses to look statuses
+    up (``app.blockchain.encrypt.commit_hash`` of the field literals).
+    """
+    if rep_id == 0:
+        return 0
+    combined = f"{bank_name}field{rep_id}field".encode()
+    return int.from_bytes(hashlib.sha256(combined).digest(), "big") % (2 ** 248)
+
+def format_future(program: str, function: str, arguments: List[str]) -> str:
+    """Format the Future output of an async transition the way Leo prints it."""
+    lines = ",\n".join(f"    {argument}" for argument in arguments)
+    return (f"{{\n  program_id: {program},\n  function_name: {function},\n"
+            f"  arguments: [\n{lines}\n  ]\n}}")
+
+def format_record(entries: Dict[str, str], public: Tuple[str, ...] = ("_nonce",)) -> str:
+    """Format a record the way Leo prints transition outputs."""
+    lines = []
+    for key, value in entries.items():
+        visibility = "public" if key in public else "private"
+        lines.append(f"  {key}: {value}.{visibility}")
+    return "{\n" + ",\n".join(lines) + "\n}"
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Emulator
+# ─────────────────────────────────────────────────────────────────────────────
+
+class FakeLeo:
+    """In-process emulator of the caller-guard Aleo programs.
+
+    Each transition handler receives the raw input strings and returns a list
+    of output strings (literals or formatted records).
+    """
+
+    def __init__(self, config: Optional[FakeLeoConfig] = None,
+                 private_key: Optional[str] = None):
+        self.config = config or FakeLeoConfig.from_env()
+        self.private_key = private_key or os.environ.get("PRIVATE_KEY") or DEFAULT_PRIVATE_KEY
+        self.caller = self.derive_address(self.private_key)
+        self._rng = random.Random(self.config.seed)
+        self.transitions: Dict[str, Callable[[List[str]], List[str]]] = {
+            "agent_manager.aleo/mint_agent": self._mint_agent,
+            "agent_manager.aleo/revoke_agent": self._revoke_agent,
+            "agent_manager.aleo/is_agent_active": self._is_agent_active,
+            "agent_manager.aleo/mint_agents": self._mint_agents,
+            "agent_manager.aleo/revoke_agents": self._revoke_agents,
+            "agent_otp_generate.aleo/generate_otp": self._generate_otp,
+            "agent_otp_generate.aleo/prove_otp_generation": self._prove_otp_generation,
+            "agent_otp_generate.aleo/anchor_audit_root": self._anchor_audit_root,
+            "agent_otp_generate.aleo/set_anchor_admin": self._set_anchor_admin,
+            "agent_otp_proof.aleo/verify_otp": self._verify_otp,
+            "agent_otp_proof.aleo/verify_otps": self._verify_otps,
+            "agent_otp_proof.aleo/is_time_valid": self._is_time_valid,
+        }
+        # Finalize blocks, applied to the devnet state when broadcast
+        self.finalizers: Dict[str, Callable[[List[str], Dict[str, Any]], None]] = {
+            "agent_manager.aleo/mint_agent": lambda inputs, state: self._set_statuses(
+                state, [agent_commitment(parse_literal(inputs[0], "field"), parse_literal(inputs[1], "field"))], 1),
+            "agent_manager.aleo/revoke_agent": lambda inputs, state: self._set_statuses(
+                state, self._record_commitments(inputs[:1]), 0),
+            "agent_manager.aleo/mint_agents": lambda inputs, state: self._set_statuses(
+                state, [agent_commitment(rep_id, bank_name) for rep_id, bank_name in
+                        zip(parse_array(inputs[0], "field", 4), parse_array(inputs[1], "field", 4))], 1),
+            "agent_manager.aleo/revoke_agents": lambda inputs, state: self._set_statuses(
+                state, self._record_commitments(inputs[:4]), 0),
+            "agent_otp_generate.aleo/anchor_audit_root": self._set_audit_root,
+            "agent_otp_generate.aleo/set_anchor_admin": self._finalize_anchor_admin,
+        }
+
+    # Deterministic value derivation
+
+    def _digest(self, *parts: Any) -> int:
+        material = "|".join(str(part) for part in (self.config.seed,) + parts)
+        return int.from_bytes(hashlib.sha256(material.encode()).digest(), "big")
+
+    def derive_address(self, private_key: str) -> str:
+        """Derive a stable fake ``aleo1...`` address from a private key."""
+        digest = hashlib.sha256(private_key.encode()).hexdigest()
+        return f"aleo1{digest[:58]}"
+
+    def _nonce(self, *parts: Any) -> str:
+        return f"{self._digest('nonce', *parts) % FIELD_MODULUS}group"
+
+    # Transition handlers
+
+    def _agent_record(self, owner: str, rep_id: int, bank_name: int, status: int, *salt: Any) -> str:
+        return format_record({
+            "owner": owner,
+            "rep_id": f"{rep_id}field",
+            "bank_name": f"{bank_name}field",
+            "status": f"{status}u8",
+            "_nonce": self._nonce(owner, rep_id, bank_name, status, *salt),
+        })
+
+    def _status_future(self, function: str, commitment: str, status: int) -> str:
+        return format_future("agent_manager.aleo", function, [self.caller, commitment, f"{status}u8"])
+
+    def _mint_agent(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 2)
+        rep_id = parse_literal(inputs[0], "field")
+        bank_name = parse_literal(inputs[1], "field")
+        return [self._agent_record(self.caller, rep_id, bank_name, 1, "mint"),
+                self._status_future("mint_agent", f"{agent_commitment(rep_id, bank_name)}field", 1)]
+
+    def _load_agent(self, text: str) -> Dict[str, Any]:
+        entries = parse_record(text)
+        for key in ("owner", "rep_id", "bank_name", "status"):
+            if key not in entries:
+                raise FakeLeoError(f"Record is missing entry '{key}'", "EPAR0370005")
+        return {
+            "owner": entries["owner"],
+            "rep_id": parse_literal(entries["rep_id"], "field"),
+            "bank_name": parse_literal(entries["bank_name"], "field"),
+            "status": parse_literal(entries["status"], "u8"),
+            "_nonce": entries.get("_nonce", ""),
+        }
+
+    def _revoke(self, record: str) -> str:
+        agent = self._load_agent(record)
+        if agent["owner"] != self.caller:
+            raise FakeLeoError("'assert.eq' failed: record owner is not the caller")
+        return self._agent_record(agent["owner"], agent["rep_id"], agent["bank_name"], 0,
+                                  "revoke", agent["_nonce"])
+
+    def _record_commitments(self, records: List[str]) -> List[int]:
+        agents = [self._load_agent(record) for record in records]
+        return [agent_commitment(agent["rep_id"], agent["bank_name"]) for agent in agents]
+
+    def _revoke_agent(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 1)
+        commitment = self._record_commitments(inputs)[0]
+        return [self._revoke(inputs[0]), self._status_future("revoke_agent", f"{commitment}field", 0)]
+
+    def _mint_agents(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 2)
+        rep_ids = parse_array(inputs[0], "field", 4)
+        bank_names = parse_array(inputs[1], "field", 4)
+        commitments = [agent_commitment(rep_id, bank_name) for rep_id, bank_name in zip(rep_ids, bank_names)]
+        records = [self._agent_record(self.caller, rep_id, bank_name, 0 if rep_id == 0 else 1, "mint", slot)
+                   for slot, (rep_id, bank_name) in enumerate(zip(rep_ids, bank_names))]
+        arguments = [self.caller, "[" + ", ".join(f"{c}field" for c in commitments) + "]", "1u8"]
+        return records + [format_future("agent_manager.aleo", "mint_agents", arguments)]
+
+    def _revoke_agents(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 4)
+        commitments = self._record_commitments(inputs)
+        records = [self._revoke(value) for value in inputs]
+        arguments = [self.caller, "[" + ", ".join(f"{c}field" for c in commitments) + "]", "0u8"]
+        return records + [format_future("agent_manager.aleo", "revoke_agents", arguments)]
+
+    def _set_statuses(self, state: Dict[str, Any], commitments: List[int], status: int) -> None:
+        """Finalize of mint/revoke: publish statuses, enforcing the first issuer."""
+        mappings = state["mappings"].setdefault("agent_manager.aleo", {})
+        statuses = mappings.setdefault("agent_status", {})
+        issuers = mappings.setdefault("agent_issuer", {})
+        keys = [f"{commitment}field" for commitment in commitments]
+        for key in keys:
+            if key != "0field" and issuers.get(key, self.caller) != self.caller:
+                raise FakeLeoError(f"Finalize failed: agent {key} was minted by another issuer",
+                                   "ECLI0377002")
+        for key in keys:
+            if key != "0field":
+                issuers[key] = self.caller
+                statuses[key] = f"{status}u8"
+
+    def _is_agent_active(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 1)
+        agent = self._load_agent(inputs[0])
+        return ["true" if agent["status"] == 1 else "false"]
+
+    @staticmethod
+    def internal_generate_otp(seed: int, rep_id: int, bank_name: int, timestamp: int) -> int:
+        """``internal_generate_otp`` in ``agent_otp_generate.aleo``, through its
+        Python reference."""
+        from agent_otp_generation.otp_reference import generate_otp
+
+        try:
+            return generate_otp(seed, rep_id, bank_name, timestamp)
+        except ValueError as e:
+            raise FakeLeoError(f"Failed to cast field to u64: {e}")
+
+    def _generate_otp(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 4)
+        rep_id = parse_literal(inputs[0], "field")
+        bank_name = parse_literal(inputs[1], "field")
+        timestamp = parse_literal(inputs[2], "u64")
+        seed = parse_literal(inputs[3], "field")
+        return [f"{self.internal_generate_otp(seed, rep_id, bank_name, timestamp)}u32"]
+
+    def _prove_otp_generation(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 5)
+        rep_id, bank_name, seed = (parse_literal(value, "field") for value in inputs[:3])
+        timestamp = parse_literal(inputs[3], "u64")
+        otp = parse_literal(inputs[4], "u32")
+        if self.internal_generate_otp(seed, rep_id, bank_name, timestamp) != otp:
+            raise FakeLeoError("'assert' failed: computed OTP does not match")
+        return ["true"]
+
+    def _anchor_audit_root(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 3)
+        root = parse_literal(inputs[0], "field")
+        if parse_literal(inputs[1], "u32") == 0:
+            raise FakeLeoError("'assert' failed: leaf_count must be positive")
+        interval_end = parse_literal(inputs[2], "u64")
+        return [format_future("agent_otp_generate.aleo", "anchor_audit_root",
+                              [self.caller, f"{root}field", f"{interval_end}u64"])]
+
+    def _set_audit_root(self, inputs: List[str], state: Dict[str, Any]) -> None:
+        """Finalize of anchor_audit_root: record the root once, admin only."""
+        mappings = state["mappings"].setdefault("agent_otp_generate.aleo", {})
+        if mappings.get("anchor_admin", {}).get("0u8") != self.caller:
+            raise FakeLeoError("Finalize failed: caller is not the anchor admin", "ECLI0377002")
+        roots = mappings.setdefault("audit_roots", {})
+        root = f"{parse_literal(inputs[0], 'field')}field"
+        if root in roots:
+            raise FakeLeoError(f"Finalize failed: audit root {root} is already anchored", "ECLI0377002")
+        roots[root] = f"{parse_literal(inputs[2], 'u64')}u64"
+
+    def _set_anchor_admin(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 1)
+        admin = _strip_visibility(inputs[0])
+        if not admin.startswith("aleo1"):
+            raise FakeLeoError(f"Failed to parse '{admin}' as an address", "EPAR0370005")
+        return [format_future("agent_otp_generate.aleo", "set_anchor_admin", [self.caller, admin])]
+
+    def _finalize_anchor_admin(self, inputs: List[str], state: Dict[str, Any]) -> None:
+        """Finalize of set_anchor_admin: first caller claims, then admin only."""
+        admins = state["mappings"].setdefault("agent_otp_generate.aleo", {}).setdefault("anchor_admin", {})
+        if admins.get("0u8", self.caller) != self.caller:
+            raise FakeLeoError("Finalize failed: caller is not the anchor admin", "ECLI0377002")
+        admins["0u8"] = _strip_visibility(inputs[0])
+
+    @staticmethod
+    def _time_diff(timestamp: int, current_time: int) -> int:
+        return current_time - timestamp if current_time >= timestamp else timestamp - current_time
+
+    def _verify_otp(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 7)
+        parse_literal(inputs[0], "field")
+        timestamp = parse_literal(inputs[1], "u64")
+        provided_otp = parse_literal(inputs[2], "u32")
+        agent_status = parse_literal(inputs[3], "u8")
+        expected_otp = parse_literal(inputs[4], "u32")
+        current_time = parse_literal(inputs[5], "u64")
+        window_size = parse_literal(inputs[6], "u64")
+        if agent_status != 1:
+            raise FakeLeoError("'assert.eq' failed: agent is not active")
+        if provided_otp != expected_otp:
+            raise FakeLeoError("'assert.eq' failed: OTP mismatch")
+        if self._time_diff(timestamp, current_time) > window_size:
+            raise FakeLeoError("'assert' failed: OTP outside of time window")
+        return ["true"]
+
+    def _verify_otps(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 2)
+        checks = parse_struct_array(inputs[0], 8)
+        window_size = parse_literal(inputs[1], "u64")
+        for check in checks:
+            if not parse_bool(check.get("enabled", "")):
+                continue
+            self._verify_otp([check.get(key, "") for key in
+                              ("agent_id", "timestamp", "provided_otp", "agent_status", "expected_otp",
+                               "current_time")] + [f"{window_size}u64"])
+        return ["true"]
+
+    def _is_time_valid(self, inputs: List[str]) -> List[str]:
+        self._expect_arity(inputs, 3)
+        timestamp = parse_literal(inputs[0], "u64")
+        current_time = parse_literal(inputs[1], "u64")
+        window_size = parse_literal(inputs[2], "u64")
+        return ["true" if self._time_diff(timestamp, current_time) <= window_size else "false"]
+
+    @staticmethod
+    def _expect_arity(inputs: List[str], count: int) -> None:
+        if len(inputs) != count:
+            raise FakeLeoError(f"Function expects {count} inputs, found {len(inputs)}", "ECLI0377001")
+
+    # Devnet state
+
+    @contextmanager
+    def _state(self):
+        """Open the shared devnet state file under an exclusive lock."""
+        if not self.config.state_dir:
+            yield None
+            return
+        state_dir = Path(self.config.state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        path = state_dir / "devnet.json"
+        with open(state_dir / "devnet.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = json.loads(path.read_text()) if path.exists() else {}
+                state.setdefault("spent", [])
+                state.setdefault("transactions", 0)
+                state.setdefault("mappings", {})
+                yield state
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(state))
+                os.replace(tmp_path, path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _consume_records(self, inputs: List[str], state: Optional[Dict[str, Any]]) -> None:
+        """Reject records that were already spent on the devnet."""
+        if state is None:
+            return
+        spent = set(state["spent"])
+        nonces = []
+        for value in inputs:
+            if str(value).strip().startswith("{"):
+                nonce = parse_record(value).get("_nonce")
+                if nonce in spent:
+                    raise FakeLeoError(f"Input record with nonce '{nonce}' has already been spent",
+                                       "ECLI0377002")
+                nonces.append(nonce)
+        state["spent"].extend(n for n in nonces if n)
+        state["transactions"] += 1
+
+    # Fault injection
+
+    def _inject_faults(self) -> None:
+        low, high = self.config.latency
+        if high > 0:
+            time.sleep(self._rng.uniform(low, high))
+        if self.config.failure_rate and self._rng.random() < self.config.failure_rate:
+            mode = self.config.failure_mode
+            if mode == "hang":
+                time.sleep(self.config.hang_seconds)
+            if mode == "crash":
+                raise FakeLeoError("snarkVM prover crashed (SIGSEGV)", "ECLI0377099")
+            raise FakeLeoError("Failed to connect to the network endpoint: 503 Service Unavailable",
+                               "ECLI0377010")
+
+    # Public entry points
+
+    def execute(self, program: str, function: str, inputs: List[str],
+                broadcast: bool = False) -> List[str]:
+        """Run a transition in-process and return its outputs.
+
+        Args:
+            program: Program ID, e.g. ``agent_manager.aleo``
+            function: Transition name
+            inputs: Aleo literal or record input strings
+            broadcast: Whether to emulate an on-chain execution, which
+                consumes input records in the devnet state
+
+        Returns:
+            List[str]: Output literals or records
+
+        Raises:
+            FakeLeoError: If the transition fails or a fault is injected
+        """
+        key = f"{program}/{function}"
+        handler = self.transitions.get(key)
+        if handler is None:
+            raise FakeLeoError(f"Function '{function}' does not exist in program '{program}'",
+                               "ECLI0377001")
+        self._inject_faults()
+        outputs = handler(list(inputs))
+        if broadcast:
+            with self._state() as state:
+                self._consume_records(inputs, state)
+                finalizer = self.finalizers.get(key)
+                if state is not None and finalizer is not None:
+                    finalizer(list(inputs), state)
+        return outputs
+
+    def mapping_value(self, program: str, mapping: str, key: str) -> Optional[str]:
+        """Read a public mapping value from the devnet state, like a node's
+        ``/program/{program}/mapping/{mapping}/{key}`` endpoint."""
+        with self._state() as state:
+            if state is None:
+                return None
+            return state["mappings"].get(program, {}).get(mapping, {}).get(key)
+
+    def format_run_output(self, program: str, function: str, outputs: List[str],
+                          leo_banner: bool = True) -> str:
+        """Format transition outputs the way ``leo run`` (or, without the Leo
+        banner lines, ``snarkvm run``) prints them."""
+        key = f"{program}/{function}"
+        lines = []
+        if leo_banner:
+            lines += [f"       Leo ✅ Compiled '{program}' into Aleo instructions", ""]
+        lines += [
+            "⛓  Constraints",
+            "",
+            f" •  '{key}' - {CONSTRAINTS.get(key, 0):,} constraints (called 1 time)",
+            "",
+            "➡️  Output" if outputs else "➡️  No Outputs",
+            "",
+        ]
+        for output in outputs:
+            lines.append(f" • {output}")
+        if leo_banner:
+            lines += ["", f"       Leo ✅ Finished '{key}'"]
+        return "\n".join(lines) + "\n"
+
+    def format_execute_output(self, program: str, function: str, outputs: List[str],
+                              inputs: List[str]) -> str:
+        """Format an execution the way ``leo execute`` prints it, fees included."""
+        key = f"{program}/{function}"
+        constraints = CONSTRAINTS.get(key, 0)
+        storage = STORAGE_MICROCREDITS + 16 * sum(len(str(value)) for value in inputs)
+        finalize = FINALIZE_MICROCREDITS.get(key, 0)
+        execution = int(constraints * MICROCREDITS_PER_CONSTRAINT)
+        total = storage + finalize + execution
+        transaction_id = f"at1{self._digest('tx', key, *inputs) % 10 ** 58:058d}"
+        summary = [
+            f"📦 Creating execution transaction for '{key}'...",
+            "",
+            "📊 Execution Summary:",
+            f"  Transaction storage cost: {storage / 1_000_000:.6f} credits",
+            f"  Execution cost:           {execution / 1_000_000:.6f} credits",
+            f"  Finalize cost:            {finalize / 1_000_000:.6f} credits",
+            f"  Total fee:                {total / 1_000_000:.6f} credits",
+            "",
+            f"✅ Executed '{key}' (transaction ID: {transaction_id})",
+        ]
+        return self.format_run_output(program, function, outputs) + "\n" + "\n".join(summary) + "\n"
+
+def read_program_id(project_path: str) -> str:
+    """Read the program ID from a Leo project's ``program.json``."""
+    with open(os.path.join(project_path, "program.json")) as f:
+        return json.load(f)["program"]
+
+def read_snarkvm_program_id(build_path: str) -> str:
+    """Read the program ID from the first line of a compiled ``main.aleo``."""
+    with open(os.path.join(build_path, "main.aleo")) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("program "):
+                return line[len("program "):].rstrip(";").strip()
+    raise FakeLeoError("No program declaration found in main.aleo", "ECLI0377001")
+
+def write_build_stub(project_path: str, program: str) -> None:
+    """Emulate ``leo build`` output for projects that were never compiled.
+
+    Existing (checked-in) build artifacts are left untouched.
+    """
+    build_dir = os.path.join(project_path, "build")
+    main_path = os.path.join(build_dir, "main.aleo")
+    if os.path.exists(main_path):
+        return
+    os.makedirs(build_dir, exist_ok=True)
+    with open(main_path, "w") as f:
+        f.write(f"program {program};\n")
+    with open(os.path.join(project_path, "program.json")) as src, \
+            open(os.path.join(build_dir, "program.json"), "w") as dst:
+        dst.write(src.read())
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Command line
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _split_args(args: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """Separate positional arguments from ``--flag value`` options."""
+    positional, options = [], {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("--") and len(arg) > 2 and not arg[2].isdigit():
+            name = arg[2:]
+            if "=" in name:
+                name, value = name.split("=", 1)
+                options[name] = value
+            elif i + 1 < len(args) and not args[i + 1].startswith("--"):
+                options[name] = args[i + 1]
+                i += 1
+            else:
+                options[name] = "true"
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, options
+
+def main(argv: Optional[List[str]] = None, tool: str = "leo",
+         stdout=None, stderr=None) -> int:
+    """Entry point for the fake ``leo`` and ``snarkvm`` executables.
+
+    Supported commands are ``leo run|execute|build`` and
+    ``snarkvm run|execute``, run from the project (leo) or build (snarkvm)
+    directory like the real tools.
+
+    Returns:
+        int: Process exit code
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    positional, options = _split_args(argv)
+    if not positional:
+        stderr.write(f"Usage: {tool} <run|execute{'|build' if tool == 'leo' else ''}> <function> [inputs...]\n")
+        return 2
+    command, rest = positional[0], positional[1:]
+    emulator = FakeLeo()
+    try:
+        if tool == "leo" and command == "build":
+            program = read_program_id(os.getcwd())
+            write_build_stub(os.getcwd(), program)
+            stdout.write(f"       Leo ✅ Compiled '{program}' into Aleo instructions\n")
+            return 0
+        if command not in ("run", "execute") or not rest:
+            stderr.write(f"Error [ECLI0377001]: Unsupported command '{' '.join(positional)}'\n")
+            return 2
+        function, inputs = rest[0], rest[1:]
+        if tool == "leo":
+            program = read_program_id(os.getcwd())
+        else:
+            program = read_snarkvm_program_id(os.getcwd())
+        broadcast = command == "execute" and options.get("broadcast", "true") != "false"
+        outputs = emulator.execute(program, function, inputs, broadcast=broadcast)
+        if command == "execute":
+            stdout.write(emulator.format_execute_output(program, function, outputs, inputs))
+        else:
+            stdout.write(emulator.format_run_output(program, function, outputs,
+                                                    leo_banner=tool == "leo"))
+        return 0
+    except FakeLeoError as e:
+        stderr.write(f"Error [{e.code}]: {e}\n")
+        return 1
+    except (OSError, ValueError, KeyError) as e:
+        stderr.write(f"Error [ECLI0377000]: {e}\n")
+        return 1
+
+def fake_leo_env(config: Optional[FakeLeoConfig] = None,
+                 base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return an environment with the fake tools first on PATH.
+
+    Args:
+        config: Emulator configuration to export (default: inherit)
+        base: Environment to extend (default: ``os.environ``)
+
+    Returns:
+        Dict[str, str]: Environment suitable for ``subprocess`` calls
+    """
+    env = dict(os.environ if base is None else base)
+    env["PATH"] = str(BIN_DIR) + os.pathsep + env.get("PATH", "")
+    if config is not None:
+        env.update(config.to_env())
+    return env
+
+@contextmanager
+def use_fake_leo(config: Optional[FakeLeoConfig] = None):
+    """Put the fake ``leo``/``snarkvm`` on PATH for the current process.
+
+    Example:
+        with use_fake_leo(FakeLeoConfig(latency=(0.05, 0.2), failure_rate=0.1)):
+            blockchain_call("agent_manager.aleo", "mint_agent", [...], project_path=...)
+    """
+    from utils.executor import reset_default_executor
+
+    saved = dict(os.environ)
+    os.environ.update(fake_leo_env(config))
+    reset_default_executor()
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+        reset_default_executor()
+
+if __name__ == "__main__":
+    sys.exit(main(tool=os.environ.get("FAKE_LEO_TOOL", "leo")))
@@ -0,0 +1,147 @@
+"""mapping_reader.py - Read public program mappings from a node.
+
+Public mappings are part of the chain state: reading one is a plain HTTP
+GET against a node (``/{network}/program/{program}/mapping/{mapping}/{key}``)
+and needs neither a record nor a proof. ``NodeMappingReader`` keeps one
+pooled ``requests`` session so repeated lookups reuse connections instead
+of opening one per key. ``DevnetMappingReader`` answers the same lookups
+from the fake toolchain's devnet state (``FAKE_LEO_STATE_DIR``), standing
+in for a local node in development and tests.
+"""
+
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Local devnet node used when ALEO_ENDPOINT is not set
+DEFAULT_ENDPOINT = "http://localhost:3030"
+DEFAULT_NETWORK = "testnet"
+
+class MappingReadError(Exception):
+    """Raised when a mapping value cannot be read."""
+    pass
+
+class MappingReader(ABC):
+    """Interface of the mapping readers."""
+
+    @abstractmethod
+    def get(self, program: str, mapping: str, key: str) -> Optional[str]:
+        """Read one mapping value.
+
+        Args:
+            program: Program id, e.g. ``agent_manager.aleo``
+            mapping: Mapping name
+            key: Key literal, e.g. ``123field``
+
+        Returns:
+            Optional[str]: Value literal, or None if the key is not set
+        """
+        pass
+
+    def get_many(self, program: str, mapping: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Read several keys of one mapping; returns values by key."""
+        return {key: self.get(program, mapping, key) for key in keys}
+
+class NodeMappingReader(MappingReader):
+    """Read mappings through a node's REST API with a pooled HTTP session.
+
+    Args:
+        endpoint: Node URL (default: ALEO_ENDPOINT or a local devnet)
+        network: Network name (default: ALEO_NETWORK or testnet)
+        pool_size: Connections kept open to the node
+        timeout: Seconds per request
+        retries: Retries of failed connections and 5xx responses
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, network: Optional[str] = None,
+                 pool_size: int = 10, timeout: float = 5.0, retries: int = 3):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.endpoint = (endpoint or os.environ.get("ALEO_ENDPOINT", DEFAULT_ENDPOINT)).rstrip("/")
+        self.network = network or os.environ.get("ALEO_NETWORK", DEFAULT_NETWORK)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                              allowed_methods=("GET",))
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, program: str, mapping: str, key: str) -> str:
+        return f"{self.endpoint}/{self.network}/program/{program}/mapping/{mapping}/{key}"
+
+    def get(self, program: str, mapping: str, key: str) -> Optional[str]:
+        import requests
+
+        try:
+            response = self.session.get(self.url(program, mapping, key), timeout=self.timeout)
+            response.raise_for_status()
+            # The node answers with a JSON string literal, or null for a missing key
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise MappingReadError(f"Error reading {program}/{mapping}[{key}]: {e}") from e
+
+    def get_many(self, program: str, mapping: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        keys = list(keys)
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, max(len(keys), 1))) as executor:
+            values = executor.map(lambda key: self.get(program, mapping, key), keys)
+            return dict(zip(keys, values))
+
+    def close(self) -> None:
+        self.session.close()
+
+class DevnetMappingReader(MappingReader):
+    """Read mappings from the fake toolchain's devnet state.
+
+    Args:
+        state_dir: Devnet state directory (default: FAKE_LEO_STATE_DIR)
+    """
+
+    def __init__(self, state_dir: Optional[str] = None):
+        state_dir = state_dir or os.environ.get("FAKE_LEO_STATE_DIR")
+        if not state_dir:
+            raise MappingReadError("No devnet state directory configured")
+        self.path = Path(state_dir) / "devnet.json"
+
+    def _mappings(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        try:
+            # Written with os.replace, so a read never sees a partial file
+            return json.loads(self.path.read_text()).get("mappings", {})
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise MappingReadError(f"Invalid devnet state {self.path}: {e}") from e
+
+    def get(self, program: str, mapping: str, key: str) -> Optional[str]:
+        return self._mappings().get(program, {}).get(mapping, {}).get(key)
+
+    def get_many(self, program: str, mapping: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        values = self._mappings().get(program, {}).get(mapping, {})
+        return {key: values.get(key) for key in keys}
+
+# Shared reader
+_mapping_reader: Optional[MappingReader] = None
+
+def get_mapping_reader() -> MappingReader:
+    """Get the shared mapping reader: the devnet state when the fake
+    toolchain keeps one, otherwise the node at ALEO_ENDPOINT."""
+    global _mapping_reader
+    if _mapping_reader is None:
+        if os.environ.get("FAKE_LEO_STATE_DIR"):
+            _mapping_reader = DevnetMappingReader()
+        else:
+            _mapping_reader = NodeMappingReader()
+    return _mapping_reader
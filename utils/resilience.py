@@ -0,0 +1,300 @@
+"""resilience.py - Timeout, retry, circuit-breaker and hedging policy for chain calls.
+
+``blockchain_call`` runs a single Leo process and reports what happened.
+``ResilientChainCaller`` wraps it so that:
+
+- every transition gets a timeout (``TRANSITION_TIMEOUTS``),
+- transient failures are retried a bounded number of times with jittered
+  exponential backoff; a state-changing transition is never retried once
+  it may have been broadcast (``is_deployed``), nor after a timeout, since
+  the transaction may already have been accepted,
+- a per-endpoint circuit breaker fails fast while the prover or endpoint is
+  down instead of queueing more hung processes,
+- read-only transitions are hedged: if the first attempt has not finished
+  after ``hedge_delay`` a second one is started and the first result wins.
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Error classes reported in the "error_type" field of failed results
+ERROR_TIMEOUT = "timeout"
+ERROR_TRANSIENT = "transient"
+ERROR_PERMANENT = "permanent"
+ERROR_CIRCUIT_OPEN = "circuit_open"
+
+# Errors worth retrying: network trouble, overloaded endpoints, prover crashes.
+# Status codes only count in HTTP context: stderr quotes inputs, nonces and
+# record ciphertexts, whose digits must not look like a 503.
+TRANSIENT_PATTERNS = re.compile(
+    r"\b(?:status|HTTP|code)\D{0,10}(?:50[234]|429)\b|"
+    r"\b(?:50[234]|429) (?:Bad Gateway|Service Unavailable|Gateway Time-?out|Too Many Requests)\b|"
+    r"\btimed? ?out\b|\bconnection (?:refused|reset|closed|aborted|timed out)\b|"
+    r"\b(?:failed|unable|error trying) to connect\b|\btemporarily unavailable\b|"
+    r"\brate limit|\btoo many requests\b|\bbroken pipe\b|\bSIGSEGV\b|\bSIGKILL\b|\bout of memory\b",
+    re.IGNORECASE,
+)
+
+# Errors that no retry can fix, even when the message also mentions
+# something transient-looking
+PERMANENT_PATTERNS = re.compile(
+    r"already been spent|failed to parse|does not exist|'assert(?:\.eq)?' failed|finalize failed",
+    re.IGNORECASE,
+)
+
+# Seconds allowed per transition; proving heavy transitions take longer
+DEFAULT_TIMEOUT = 120.0
+TRANSITION_TIMEOUTS = {
+    "agent_manager.aleo/mint_agent": 180.0,
+    "agent_manager.aleo/revoke_agent": 180.0,
+    "agent_manager.aleo/is_agent_active": 60.0,
+    "agent_otp_generate.aleo/generate_otp": 60.0,
+    "agent_otp_generate.aleo/prove_otp_generation": 300.0,
+    "agent_otp_generate.aleo/anchor_audit_root": 60.0,
+    "agent_otp_proof.aleo/verify_otp": 120.0,
+    "agent_otp_proof.aleo/verify_otps": 240.0,
+    "agent_otp_proof.aleo/is_time_valid": 30.0,
+}
+
+# Transitions without side effects, safe to hedge
+READ_ONLY_TRANSITIONS = {
+    "agent_manager.aleo/is_agent_active",
+    "agent_otp_generate.aleo/generate_otp",
+    "agent_otp_proof.aleo/is_time_valid",
+}
+
+def classify_error(returncode: Optional[int], stderr: Optional[str]) -> str:
+    """Classify a failed Leo/snarkVM invocation.
+
+    Args:
+        returncode: Process exit code (negative when killed by a signal)
+        stderr: Captured error output
+
+    Returns:
+        str: ERROR_TRANSIENT if retrying may help, ERROR_PERMANENT otherwise
+    """
+    if returncode is not None and returncode < 0:
+        return ERROR_TRANSIENT
+    if returncode == 127:
+        # Command not found: retrying will not install Leo
+        return ERROR_PERMANENT
+    if stderr and PERMANENT_PATTERNS.search(stderr):
+        return ERROR_PERMANENT
+    if stderr and TRANSIENT_PATTERNS.search(stderr):
+        return ERROR_TRANSIENT
+    return ERROR_PERMANENT
+
+class RetryPolicy:
+    """Bounded retries with "full jitter" exponential backoff."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retry_on: tuple = (ERROR_TRANSIENT, ERROR_TIMEOUT)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+    def should_retry(self, attempt: int, result: Dict[str, Any]) -> bool:
+        """Whether a failed ``result`` from attempt number ``attempt`` is retried."""
+        return attempt < self.max_attempts and result.get("error_type") in self.retry_on
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to sleep before attempt number ``attempt + 1``."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens and calls fail immediately. Once ``reset_timeout`` has passed a
+    single trial call is let through (half-open); its outcome closes or
+    re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: admit exactly one trial call
+            if self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+# One breaker per endpoint ("local" for the local prover)
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(endpoint: Optional[str] = None, **kwargs) -> CircuitBreaker:
+    """Get the shared circuit breaker for an endpoint, creating it if needed."""
+    key = endpoint or "local"
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(**kwargs)
+        return _breakers[key]
+
+class ResilientChainCaller:
+    """Apply timeout, retry, circuit-breaker and hedging policy to chain calls.
+
+    Results use the ``blockchain_call`` format plus an ``attempts`` count;
+    failures carry an ``error_type`` of "timeout", "transient", "permanent"
+    or "circuit_open".
+    """
+
+    def __init__(self,
+                 call: Optional[Callable[..., Dict[str, Any]]] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 default_timeout: float = DEFAULT_TIMEOUT,
+                 read_only: Optional[set] = None,
+                 hedge_delay: Optional[float] = 2.0,
+                 breaker_factory: Callable[[Optional[str]], CircuitBreaker] = get_circuit_breaker,
+                 sleep: Callable[[float], None] = time.sleep):
+        if call is None:
+            from utils.blockchain import blockchain_call
+            call = blockchain_call
+        self.call = call
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeouts = dict(TRANSITION_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.read_only = READ_ONLY_TRANSITIONS if read_only is None else read_only
+        self.hedge_delay = hedge_delay
+        self.breaker_factory = breaker_factory
+        self.sleep = sleep
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chain-hedge")
+
+    def timeout_for(self, program_name: str, function_name: str) -> float:
+        return self.timeouts.get(f"{program_name}/{function_name}", self.default_timeout)
+
+    def __call__(self, program_name: str, function_name: str, inputs: List[Any],
+                 **kwargs) -> Dict[str, Any]:
+        """Call a transition with the resilience policy applied.
+
+        Accepts the same arguments as ``blockchain_call``; an explicit
+        ``timeout`` overrides the per-transition default.
+        """
+        breaker = self.breaker_factory(kwargs.get("endpoint"))
+        kwargs.setdefault("timeout", self.timeout_for(program_name, function_name))
+        read_only = f"{program_name}/{function_name}" in self.read_only
+        # A failed broadcast may still have reached the network
+        may_broadcast = not read_only and bool(kwargs.get("is_deployed"))
+        hedge = read_only and self.hedge_delay is not None
+
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                return {
+                    "success": False,
+                    "error": "Circuit open: chain endpoint is failing, not attempting call",
+                    "error_type": ERROR_CIRCUIT_OPEN,
+                    "attempts": attempt - 1,
+                }
+
+            if hedge:
+                result = self._hedged_call(program_name, function_name, inputs, kwargs)
+            else:
+                result = self.call(program_name, function_name, inputs, **kwargs)
+            result["attempts"] = attempt
+
+            if result.get("success", True):
+                breaker.record_success()
+                return result
+
+            if result.get("error_type") in (ERROR_TRANSIENT, ERROR_TIMEOUT):
+                breaker.record_failure()
+            else:
+                # The endpoint answered; the call itself was bad
+                breaker.record_success()
+
+            if not self.retry_policy.should_retry(attempt, result):
+                return result
+            if may_broadcast or (result.get("error_type") == ERROR_TIMEOUT and not read_only):
+                # A mint or revoke that failed after (or while) broadcasting
+                # may already be accepted; retrying could execute it twice.
+                # Whether to resubmit is left to the caller.
+                return result
+            delay = self.retry_policy.backoff(attempt)
+            logger.info(f"Retrying {program_name}/{function_name} in {delay:.2f}s "
+                        f"after {result.get('error_type')} error (attempt {attempt})")
+            self.sleep(delay)
+
+    def _hedged_call(self, program_name: str, function_name: str, inputs: List[Any],
+                     kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Start a backup request if the first one is slow; first success wins."""
+        first = self._hedge_pool.submit(self.call, program_name, function_name, inputs, **kwargs)
+        done, _ = wait([first], timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        second = self._hedge_pool.submit(self.call, program_name, function_name, inputs, **kwargs)
+        pending = {first, second}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.get("success", True):
+                    return result
+        return result
+
+# Shared default caller
+_default_caller: Optional[ResilientChainCaller] = None
+
+def resilient_blockchain_call(program_name: str, function_name: str, inputs: List[Any],
+                              **kwargs) -> Dict[str, Any]:
+    """``blockchain_call`` with the default resilience policy applied."""
+    global _default_caller
+    if _default_caller is None:
+        _default_caller = ResilientChainCaller()
+    return _default_caller(program_name, function_name, inputs, **kwargs)
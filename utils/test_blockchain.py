@@ -2,12 +2,41 @@
 import os
 import sys
 import json
+import shutil
+
+import pytest
 
 # Add path to utils directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import the blockchain_call function
-from utils.blockchain import blockchain_call
+from utils.blockchain import blockchain_call, extract_leo_output
+from utils.executor import reset_default_executor
+from utils.fake_leo import FakeLeo, fake_leo_env, use_fake_leo
+from utils.mapping_reader import DevnetMappingReader
+from agent_manager.agent_manager_logic import agent_commitment, get_agent_status
+from agent_otp_proof.otp_proof_logic import EMPTY_VERIFICATION, format_verification
+
+# Leo project for agent_manager.aleo, relative to the repository root
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent_manager")
+
+# Local devnet endpoint used for deployed tests (override with ALEO_ENDPOINT)
+ENDPOINT = os.environ.get("ALEO_ENDPOINT", "http://localhost:3030")
+
+def needs_fake_leo() -> bool:
+    """Whether to fall back to the fake Leo binary (real toolchain missing)."""
+    return shutil.which("leo") is None or bool(os.environ.get("USE_FAKE_LEO"))
+
+@pytest.fixture(autouse=True)
+def leo_toolchain(monkeypatch):
+    """Put the fake toolchain on PATH for this module's tests only."""
+    if needs_fake_leo():
+        for name, value in fake_leo_env().items():
+            if os.environ.get(name) != value:
+                monkeypatch.setenv(name, value)
+    reset_default_executor()
+    yield
+    reset_default_executor()
 
 def test_local_execution():
     """Test locally executing a function"""
@@ -16,9 +45,10 @@ def test_local_execution():
         "agent_manager.aleo", 
         "mint_agent",
         ["1234field", "5678field"],
-        project_path="/mnt/d/caller-guard/agent_manager"
+        project_path=PROJECT_PATH
     )
     print(f"Result: {json.dumps(result, indent=2)}")
+    assert result["success"], result.get("error")
 
 def test_deployed_execution():
     """Test executing on the deployed program"""
@@ -28,16 +58,81 @@ def test_deployed_execution():
         "agent_manager.aleo", 
         "mint_agent",
         ["1234field", "5678field"],
-        project_path="/mnt/d/caller-guard/agent_manager",
+        project_path=PROJECT_PATH,
         is_deployed=True,
         network="testnet",
-        endpoint="https://api.explorer.aleo.org/v1"
+        endpoint=ENDPOINT
     )
     print(f"Result: {json.dumps(result, indent=2)}")
+    assert result["success"], result.get("error")
+
+def test_revoke_minted_record():
+    """Test passing a minted record back in as a transition input"""
+    print("Testing record round trip:")
+    minted = blockchain_call(
+        "agent_manager.aleo",
+        "mint_agent",
+        ["1234field", "5678field"],
+        project_path=PROJECT_PATH
+    )
+    assert minted["success"], minted.get("error")
+    record = extract_leo_output(minted["raw_output"])
+    assert record is not None
+
+    revoked = blockchain_call(
+        "agent_manager.aleo",
+        "revoke_agent",
+        [record],
+        project_path=PROJECT_PATH
+    )
+    print(f"Result: {json.dumps(revoked, indent=2)}")
+    assert revoked["success"], revoked.get("error")
+    assert "status: 0u8" in revoked["raw_output"]
+
+@pytest.mark.skipif(not needs_fake_leo(), reason="needs the fake devnet state")
+def test_broadcast_publishes_agent_status(tmp_path, monkeypatch):
+    """Test that executed mints and revocations update the status mapping"""
+    monkeypatch.setenv("FAKE_LEO_STATE_DIR", str(tmp_path))
+    reader = DevnetMappingReader(str(tmp_path))
+    issuer = FakeLeo().caller
+    commitment = agent_commitment("5678field", "1234field")
+
+    minted = blockchain_call("agent_manager.aleo", "mint_agent", ["1234field", "5678field"],
+                             project_path=PROJECT_PATH, is_deployed=True)
+    assert minted["success"], minted.get("error")
+    assert get_agent_status(commitment, issuer, reader) == 1
+    # An agent is only reported for the issuer that minted it
+    assert get_agent_status(commitment, "aleo1other", reader) is None
+
+    revoked = blockchain_call("agent_manager.aleo", "revoke_agent",
+                              [extract_leo_output(minted["raw_output"])],
+                              project_path=PROJECT_PATH, is_deployed=True)
+    assert revoked["success"], revoked.get("error")
+    assert get_agent_status(commitment, issuer, reader) == 0
+
+def test_verify_otps_checks_agent_zero():
+    """Test that only disabled slots are skipped, not agents with short_id 0"""
+    project_path = os.path.join(os.path.dirname(PROJECT_PATH), "agent_otp_proof")
+    agent = {"agent_id": 0, "timestamp": 1747100401, "provided_otp": 111111, "agent_status": 1,
+             "expected_otp": 222222, "current_time": 1747100420}
+
+    def verify(first):
+        slots = [first] + [EMPTY_VERIFICATION] * 7
+        return blockchain_call("agent_otp_proof.aleo", "verify_otps",
+                               [f"[{', '.join(format_verification(v) for v in slots)}]", "60u64"],
+                               project_path=project_path, use_build_cache=False)
+
+    assert not verify(agent)["success"]
+    assert verify(dict(agent, provided_otp=222222))["success"]
 
 if __name__ == "__main__":
-    # Test local first
-    test_local_execution()
-    
-    # Test deployed version
-    test_deployed_execution()
\ No newline at end of file
+    if needs_fake_leo():
+        with use_fake_leo():
+            test_local_execution()
+            test_deployed_execution()
+    else:
+        # Test local first
+        test_local_execution()
+
+        # Test deployed version
+        test_deployed_execution()